@@ -0,0 +1,25 @@
+"""Add retrieval_config to knowledge_bases for two-stage retrieval tuning.
+
+Holds the per-KB knobs for compressed-candidate retrieval (mode, oversample
+factor, recall target). NULL means defaults: two-stage when the KB's
+compressed vector store is complete, oversample picked for 95% recall@k.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "051_kb_retrieval_config"
+down_revision = "050_origami_cache_tokens"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "knowledge_bases",
+        sa.Column("retrieval_config", sa.JSON(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("knowledge_bases", "retrieval_config")
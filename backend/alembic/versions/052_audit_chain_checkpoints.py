@@ -0,0 +1,48 @@
+"""Sequence the audit hash chain and add chain checkpoints.
+
+audit_logs.chain_seq numbers each org's chained entries (NULL for rows
+written outside the chain, including every row from before this change).
+The unique (org_id, chain_seq) index makes two writers that picked the same
+position fail instead of forking the chain.
+
+audit_chain_checkpoints records, every CHECKPOINT_INTERVAL entries, the chain
+head and the Merkle root of the interval so verification can resume from the
+last checkpoint it verified instead of rehashing the whole table.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "052_audit_chain_checkpoints"
+down_revision = "051_kb_retrieval_config"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("audit_logs", sa.Column("chain_seq", sa.BigInteger(), nullable=True))
+    op.create_index(
+        "uq_audit_logs_org_chain_seq", "audit_logs", ["org_id", "chain_seq"], unique=True,
+    )
+
+    op.create_table(
+        "audit_chain_checkpoints",
+        sa.Column("id", sa.UUID(), primary_key=True),
+        sa.Column("org_id", sa.UUID(), sa.ForeignKey("organizations.id"), nullable=True),
+        sa.Column("seq", sa.BigInteger(), nullable=False),
+        sa.Column("entry_hash", sa.String(64), nullable=False),
+        sa.Column("merkle_root", sa.String(64), nullable=False),
+        sa.Column("entry_count", sa.BigInteger(), nullable=False),
+        sa.Column("verified_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "uq_audit_chain_checkpoints_org_seq", "audit_chain_checkpoints", ["org_id", "seq"], unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("uq_audit_chain_checkpoints_org_seq", table_name="audit_chain_checkpoints")
+    op.drop_table("audit_chain_checkpoints")
+    op.drop_index("uq_audit_logs_org_chain_seq", table_name="audit_logs")
+    op.drop_column("audit_logs", "chain_seq")
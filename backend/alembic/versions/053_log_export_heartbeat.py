@@ -0,0 +1,26 @@
+"""Add heartbeat_at to log_export_jobs.
+
+The log export worker bumps heartbeat_at with every progress update so a
+job left in "running" by a worker that died can be reclaimed by another.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "053_log_export_heartbeat"
+down_revision = "052_audit_chain_checkpoints"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("log_export_jobs", sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        "ix_log_export_jobs_claimable", "log_export_jobs", ["status", "created_at"],
+        postgresql_where=sa.text("status IN ('pending', 'running')"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_log_export_jobs_claimable", table_name="log_export_jobs")
+    op.drop_column("log_export_jobs", "heartbeat_at")
@@ -0,0 +1,68 @@
+"""Add the agent interaction ledger used by project breadcrumbs.
+
+agent_interactions holds one row per (source agent, target agent, kind, hour)
+with the call count, summed cost and summed latency; AgentEngine upserts it
+as invoke_agent / delegate_task calls complete. agent_interaction_messages
+points each call at the agent_messages row that carries it so an edge's
+messages are an index range read.
+
+Existing history is loaded with ``python -m scripts.backfill_agent_interactions``.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "054_agent_interactions"
+down_revision = "053_log_export_heartbeat"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "agent_interactions",
+        sa.Column("id", sa.UUID(), primary_key=True),
+        sa.Column("org_id", sa.UUID(), sa.ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("project_id", sa.UUID(), sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("source_agent_id", sa.UUID(), sa.ForeignKey("agents.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("target_agent_id", sa.UUID(), sa.ForeignKey("agents.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("kind", sa.String(30), nullable=False),
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_cost", sa.Numeric(12, 6), nullable=False, server_default="0"),
+        sa.Column("total_latency_ms", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "uq_agent_interactions_edge_bucket", "agent_interactions",
+        ["source_agent_id", "target_agent_id", "kind", "bucket"], unique=True,
+    )
+    op.create_index("ix_agent_interactions_project_bucket", "agent_interactions", ["project_id", "bucket"])
+
+    op.create_table(
+        "agent_interaction_messages",
+        sa.Column("id", sa.UUID(), primary_key=True),
+        sa.Column("source_agent_id", sa.UUID(), sa.ForeignKey("agents.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("target_agent_id", sa.UUID(), sa.ForeignKey("agents.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("message_id", sa.UUID(), sa.ForeignKey("agent_messages.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("tool_call_id", sa.String(255), nullable=False),
+        sa.Column("kind", sa.String(30), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index(
+        "ix_agent_interaction_messages_edge_created", "agent_interaction_messages",
+        ["source_agent_id", "target_agent_id", "created_at"],
+    )
+    op.create_index(
+        "uq_agent_interaction_messages_call", "agent_interaction_messages",
+        ["message_id", "tool_call_id"], unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("uq_agent_interaction_messages_call", table_name="agent_interaction_messages")
+    op.drop_index("ix_agent_interaction_messages_edge_created", table_name="agent_interaction_messages")
+    op.drop_table("agent_interaction_messages")
+    op.drop_index("ix_agent_interactions_project_bucket", table_name="agent_interactions")
+    op.drop_index("uq_agent_interactions_edge_bucket", table_name="agent_interactions")
+    op.drop_table("agent_interactions")
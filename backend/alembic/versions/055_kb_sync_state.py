@@ -0,0 +1,23 @@
+"""Add knowledge_bases.sync_state, the checkpoint of a cloud-storage sync.
+
+kb_sync writes run counters and the resume watermark (highest object key
+whose predecessors are all ingested) here every few seconds, so an
+interrupted sync continues where it stopped and /sync-status can report
+progress.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "055_kb_sync_state"
+down_revision = "054_agent_interactions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("knowledge_bases", sa.Column("sync_state", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("knowledge_bases", "sync_state")
@@ -0,0 +1,44 @@
+"""Add content hashes to KB chunks and the org-wide embedding store.
+
+kb_chunks.content_hash is the sha256 of a chunk's normalized text; when a
+document is re-ingested the old and new chunk sets are diffed on it so
+unchanged chunks stay in place. kb_embeddings keeps one embedding per
+(org, model, dimensions, content hash), stored in pgvector's binary
+format, so text seen before in any document or KB of the org is not
+embedded again.
+
+Existing chunks get their hash the next time their document is re-ingested.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "056_kb_chunk_dedup"
+down_revision = "055_kb_sync_state"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("kb_chunks", sa.Column("content_hash", sa.String(64), nullable=True))
+
+    op.create_table(
+        "kb_embeddings",
+        sa.Column("id", sa.UUID(), primary_key=True),
+        sa.Column("org_id", sa.UUID(), sa.ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("model", sa.String(100), nullable=False),
+        sa.Column("dimensions", sa.Integer(), nullable=False),
+        sa.Column("content_hash", sa.String(64), nullable=False),
+        sa.Column("embedding", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "uq_kb_embeddings_key", "kb_embeddings",
+        ["org_id", "model", "dimensions", "content_hash"], unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("uq_kb_embeddings_key", table_name="kb_embeddings")
+    op.drop_table("kb_embeddings")
+    op.drop_column("kb_chunks", "content_hash")
@@ -0,0 +1,59 @@
+"""Add a per-session message sequence counter.
+
+agent_sessions.next_sequence is the next unreserved agent_messages.sequence.
+Writers reserve blocks from it with one atomic UPDATE ... RETURNING instead
+of reading max(sequence) + 1 before every insert, which let concurrent
+executions of one session pick the same number.
+
+Sessions that already hold duplicate sequences are renumbered (keeping
+their existing order) so (session_id, sequence) can be made unique.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "057_agent_message_sequence"
+down_revision = "056_kb_chunk_dedup"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "agent_sessions",
+        sa.Column("next_sequence", sa.Integer(), nullable=False, server_default="1"),
+    )
+
+    op.execute("""
+        UPDATE agent_messages m SET sequence = r.rn
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY session_id ORDER BY sequence, created_at, id
+            ) AS rn
+            FROM agent_messages
+            WHERE session_id IN (
+                SELECT session_id FROM agent_messages
+                GROUP BY session_id, sequence HAVING count(*) > 1
+            )
+        ) r
+        WHERE m.id = r.id AND m.sequence <> r.rn
+    """)
+
+    op.execute("""
+        UPDATE agent_sessions s SET next_sequence = m.max_sequence + 1
+        FROM (
+            SELECT session_id, max(sequence) AS max_sequence
+            FROM agent_messages GROUP BY session_id
+        ) m
+        WHERE s.id = m.session_id
+    """)
+
+    op.create_index(
+        "uq_agent_messages_session_sequence", "agent_messages",
+        ["session_id", "sequence"], unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("uq_agent_messages_session_sequence", table_name="agent_messages")
+    op.drop_column("agent_sessions", "next_sequence")
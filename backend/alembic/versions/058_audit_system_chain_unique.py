@@ -0,0 +1,32 @@
+"""Make chain positions unique on the system audit chain.
+
+The unique (org_id, chain_seq) index from 052 treats NULLs as distinct, so
+it never rejected two writers appending the same position to the system
+chain (entries without an org); only the advisory lock kept them apart.
+Partial unique indexes on chain_seq / seq WHERE org_id IS NULL close that
+gap for audit_logs and audit_chain_checkpoints.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "058_audit_system_chain_unique"
+down_revision = "057_agent_message_sequence"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "uq_audit_logs_system_chain_seq", "audit_logs", ["chain_seq"], unique=True,
+        postgresql_where=sa.text("org_id IS NULL"),
+    )
+    op.create_index(
+        "uq_audit_chain_checkpoints_system_seq", "audit_chain_checkpoints", ["seq"], unique=True,
+        postgresql_where=sa.text("org_id IS NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index("uq_audit_chain_checkpoints_system_seq", table_name="audit_chain_checkpoints")
+    op.drop_index("uq_audit_logs_system_chain_seq", table_name="audit_logs")
@@ -365,6 +365,11 @@ async def update_org_tier(
         org.bonobot_agent_limit = plan_limits.get(bonobot_plan, 0)
 
     await db.flush()
+    await db.commit()
+
+    # Tier drives the gateway call quota cached in policy snapshots
+    from app.services import policy_cache
+    await policy_cache.invalidate(org.id)
 
     return {
         "id": str(org.id),
@@ -411,6 +416,10 @@ async def patch_org_tier(
     org.bonobot_agent_limit = limit
 
     await db.flush()
+    await db.commit()
+
+    from app.services import policy_cache
+    await policy_cache.invalidate(org.id)
 
     # Log admin action
     try:
@@ -952,6 +961,24 @@ async def admin_reset_router(
     return {"status": "ok", "message": f"Router cache cleared for {scope}"}
 
 
+@router.get("/gateway/log-writer")
+async def admin_gateway_log_writer_stats(
+    _admin: User = Depends(require_superadmin),
+):
+    """Queue depth and flush latency of this worker's gateway request log writer."""
+    from app.services.request_log_writer import request_log_writer
+    return request_log_writer.stats()
+
+
+@router.get("/embeddings/throughput")
+async def admin_embedding_throughput(
+    _admin: User = Depends(require_superadmin),
+):
+    """Per-model embedding throughput and concurrency limits on this worker."""
+    from app.services.embedding_scheduler import embedding_scheduler
+    return embedding_scheduler.stats()
+
+
 # ---------- Knowledge Base ----------
 
 @router.get("/kb")
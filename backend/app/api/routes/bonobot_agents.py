@@ -4,18 +4,20 @@ Bonobot Agents API Routes
 Agent CRUD operations and execution endpoints
 """
 
+import json
+import logging
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 import uuid as uuid_lib
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy import select, func, and_, desc, or_, case, literal_column
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.core.database import get_db
+from app.core.database import get_db, get_db_session
 from app.core.redis import get_redis
 from app.api.dependencies import get_current_user, check_project_scope
 from app.models.user import User
@@ -42,6 +44,10 @@ from app.schemas.bonobot import (
     AgentExecuteResponse,
 )
 from app.services.agent_engine import AgentEngine, AgentRateLimitError
+from app.services.agent_interactions import INTERACTION_KINDS, edge_messages, edge_totals, record_interaction
+from app.services.agent_message_writer import reserve_sequences
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 agent_engine = AgentEngine()
@@ -489,16 +495,151 @@ async def execute_agent(
         )
 
 
+def _execution_error(e: Exception) -> HTTPException:
+    """Map an agent execution failure to the HTTP error the execute endpoint would raise."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, AgentRateLimitError):
+        return HTTPException(status_code=429, detail="Rate limit exceeded")
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Agent execution failed: {str(e)}"
+    )
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/agents/{agent_id}/execute/stream")
+async def execute_agent_stream(
+    agent_id: UUID,
+    request: AgentExecuteRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Execute agent with a message, streaming progress as Server-Sent Events.
+
+    Events: ``session`` (session_id), ``token`` (model output as it arrives),
+    ``tool_start`` / ``tool_end``, ``memory`` (conversation memory written),
+    then ``done`` with the same body as the execute endpoint, or ``error``.
+    Rejections before the run starts (rate limit, budget) are plain HTTP
+    errors; rate-limited streams are not queued.
+    """
+    stmt = select(Agent).where(
+        and_(
+            Agent.id == agent_id,
+            Agent.org_id == current_user.org_id
+        )
+    )
+    result = await db.execute(stmt)
+    agent = result.scalar_one_or_none()
+
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Agent not found"
+        )
+
+    check_project_scope(current_user, agent.project_id)
+
+    if agent.status != "active":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Agent is not active"
+        )
+
+    redis = await get_redis()
+
+    # The run uses its own DB session: this request's closes before the body is sent
+    events = agent_engine.execute_stream(
+        agent_id=agent.id,
+        message=request.message,
+        redis=redis,
+        session_id=request.session_id,
+        user_id=current_user.id,
+    )
+    first_event, first_data = await anext(events)
+    if first_event == "error":
+        await events.aclose()
+        raise _execution_error(first_data)
+
+    org_id = current_user.org_id
+    agent_name = agent.name
+
+    async def sse_generator():
+        session_id = request.session_id
+        event, data = first_event, first_data
+        try:
+            while True:
+                if event == "session":
+                    session_id = UUID(data["session_id"])
+                elif event == "done":
+                    data = AgentExecuteResponse(
+                        run_id=uuid_lib.uuid4(),
+                        session_id=session_id,
+                        agent_id=agent_id,
+                        content=data.content,
+                        tokens=data.tokens,
+                        cost=data.cost,
+                        turns=data.turns,
+                        model_used=data.model_used,
+                        security=data.security,
+                        created_at=datetime.now(timezone.utc),
+                    ).model_dump(mode="json")
+                elif event == "error":
+                    error = _execution_error(data)
+                    data = {"status": error.status_code, "detail": error.detail}
+                yield _sse(event, data)
+                if event in ("done", "error"):
+                    break
+                event, data = await anext(events)
+        finally:
+            await events.aclose()
+
+        # Breadcrumbs for external orchestration, as on the execute endpoint (best-effort)
+        if event == "done" and request.parent_agent_id:
+            try:
+                async with get_db_session() as log_db:
+                    await _log_external_delegation(
+                        parent_agent_id=request.parent_agent_id,
+                        target_agent_id=agent_id,
+                        target_agent_name=agent_name,
+                        org_id=org_id,
+                        message_preview=request.message[:200],
+                        db=log_db,
+                    )
+            except Exception as e:
+                logger.warning(
+                    "Breadcrumb delegation logging failed (non-fatal): parent=%s target=%s error=%s",
+                    request.parent_agent_id, agent_id, e,
+                )
+
+    return StreamingResponse(
+        sse_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 @router.get("/agents/{agent_id}/queue/{ticket_id}")
 async def get_queue_status_endpoint(
     agent_id: UUID,
     ticket_id: str,
+    wait: float = Query(
+        0, ge=0, le=30,
+        description="Seconds to wait for the ticket to finish before answering (long poll)",
+    ),
     current_user: User = Depends(get_current_user),
 ):
-    """Poll status of a queued agent execution request."""
+    """Poll status of a queued agent execution request, optionally waiting for its result."""
     from app.services.agent_queue import get_queue_status
     redis = await get_redis()
-    result = await get_queue_status(ticket_id, redis)
+    result = await get_queue_status(ticket_id, redis, wait=wait)
     if result["status"] == "not_found":
         raise HTTPException(status_code=404, detail="Queue ticket not found")
     return result
@@ -1020,100 +1161,14 @@ async def get_project_breadcrumbs(
     result = await db.execute(stmt)
     connections = result.scalars().all()
 
-    # For each connection, count invoke_agent and delegate_task interactions
-    # within the date range.
-    #
-    # Native invoke_agent calls are recorded in TWO messages:
-    #   1. role="assistant" with tool_calls=[{function:{name:"invoke_agent", arguments:{agent_id:...}}}]
-    #   2. role="tool" with tool_name="invoke_agent" but tool_calls=NULL (only tool_call_id + result)
-    #
-    # We query ASSISTANT messages that have non-null tool_calls, then parse
-    # the JSON in Python to extract function names and target agent_ids.
-    # We also query TOOL messages with tool_name set (for external orchestration
-    # via _log_external_delegation which sets both tool_name and tool_calls).
-
-    interaction_map: dict[tuple[UUID, UUID], dict[str, int]] = {}
-
-    if connections:
-        source_ids = list({c.source_agent_id for c in connections})
-
-        # Query 1: Assistant messages with tool_calls (native invoke_agent)
-        assistant_stmt = (
-            select(
-                AgentSession.agent_id.label("source_agent_id"),
-                AgentMessage.tool_calls,
-            )
-            .join(AgentSession, AgentMessage.session_id == AgentSession.id)
-            .where(
-                and_(
-                    AgentSession.agent_id.in_(source_ids),
-                    AgentMessage.role == "assistant",
-                    AgentMessage.tool_calls.isnot(None),
-                )
-            )
-        )
-        if date_conditions:
-            assistant_stmt = assistant_stmt.where(and_(*date_conditions))
-
-        result = await db.execute(assistant_stmt)
-        assistant_rows = result.all()
-
-        for row in assistant_rows:
-            if not row.tool_calls:
-                continue
-            calls = row.tool_calls if isinstance(row.tool_calls, list) else [row.tool_calls]
-            for call in calls:
-                fn = call.get("function") if isinstance(call, dict) else None
-                if not fn:
-                    continue
-                fn_name = fn.get("name")
-                if fn_name not in ("invoke_agent", "delegate_task"):
-                    continue
-                target_id = _extract_target_agent_id([call])
-                if target_id is None:
-                    continue
-                key = (row.source_agent_id, target_id)
-                if key not in interaction_map:
-                    interaction_map[key] = {"invoke_agent": 0, "delegate_task": 0}
-                interaction_map[key][fn_name] += 1
-
-        # Query 2: Tool messages from external orchestration (_log_external_delegation)
-        ext_stmt = (
-            select(
-                AgentSession.agent_id.label("source_agent_id"),
-                AgentMessage.tool_name,
-                AgentMessage.tool_calls,
-            )
-            .join(AgentSession, AgentMessage.session_id == AgentSession.id)
-            .where(
-                and_(
-                    AgentSession.agent_id.in_(source_ids),
-                    AgentMessage.role == "tool",
-                    AgentMessage.tool_name.in_(["invoke_agent", "delegate_task"]),
-                    AgentMessage.tool_calls.isnot(None),
-                )
-            )
-        )
-        if date_conditions:
-            ext_stmt = ext_stmt.where(and_(*date_conditions))
-
-        result = await db.execute(ext_stmt)
-        ext_rows = result.all()
-
-        for row in ext_rows:
-            target_id = _extract_target_agent_id(row.tool_calls)
-            if target_id is None:
-                continue
-            key = (row.source_agent_id, target_id)
-            if key not in interaction_map:
-                interaction_map[key] = {"invoke_agent": 0, "delegate_task": 0}
-            if row.tool_name in interaction_map[key]:
-                interaction_map[key][row.tool_name] += 1
+    # Interaction counts come from the pre-aggregated ledger (hourly rows
+    # written by AgentEngine and _log_external_delegation), not agent_messages.
+    interaction_map = await edge_totals(db, project_id, dt_from, dt_to) if connections else {}
 
     edges = []
     for conn in connections:
-        key = (conn.source_agent_id, conn.target_agent_id)
-        counts = interaction_map.get(key, {"invoke_agent": 0, "delegate_task": 0})
+        totals = interaction_map.get((conn.source_agent_id, conn.target_agent_id), {})
+        counts = {kind: totals.get(kind, {}).get("count", 0) for kind in INTERACTION_KINDS}
         edges.append({
             "id": str(conn.id),
             "source": str(conn.source_agent_id),
@@ -1124,6 +1179,8 @@ async def get_project_breadcrumbs(
                 "total": counts["invoke_agent"] + counts["delegate_task"],
                 "invoke_agent": counts["invoke_agent"],
                 "delegate_task": counts["delegate_task"],
+                "cost": sum(t["cost"] for t in totals.values()),
+                "latency_ms": sum(t["latency_ms"] for t in totals.values()),
             },
         })
 
@@ -1146,9 +1203,9 @@ async def _log_external_delegation(
 ) -> None:
     """
     Record a synthetic invoke_agent tool-call message in the parent agent's
-    most recent session.  This lets the Breadcrumbs query pick up external
-    (code-orchestrated) delegations with the same format as native
-    invoke_agent calls from the AgentEngine.
+    most recent session and add it to the interaction ledger, so Breadcrumbs
+    shows external (code-orchestrated) delegations like native invoke_agent
+    calls from the AgentEngine.
 
     If the parent agent has no session yet, one is created automatically.
     Skips silently if the parent agent doesn't exist or belongs to a
@@ -1198,13 +1255,8 @@ async def _log_external_delegation(
         db.add(session)
         await db.flush()
 
-    # Next sequence number
-    seq_stmt = (
-        select(func.coalesce(func.max(AgentMessage.sequence), 0))
-        .where(AgentMessage.session_id == session.id)
-    )
-    seq_result = await db.execute(seq_stmt)
-    next_seq = seq_result.scalar() + 1
+    # Next sequence number (also bumps the session's message counters)
+    next_seq = await reserve_sequences(db, session, 1)
 
     # Create the synthetic tool-call message (same shape the engine uses)
     tool_call_payload = [{
@@ -1234,48 +1286,19 @@ async def _log_external_delegation(
         sequence=next_seq,
     )
     db.add(delegation_msg)
-
-    # Bump session counters
-    session.message_count = (session.message_count or 0) + 1
-    session.last_message_at = func.now()
-
     await db.flush()
 
-
-def _extract_target_agent_id(tool_calls) -> Optional[UUID]:
-    """
-    Extract the target agent_id from a tool_calls JSON column.
-
-    Expected shape: [{function: {name: "invoke_agent", arguments: '{"agent_id": "..."}' }}]
-    The arguments value may be a JSON string or already-parsed dict.
-    """
-    import json as _json
-
-    if not tool_calls:
-        return None
-
-    calls = tool_calls if isinstance(tool_calls, list) else [tool_calls]
-    for call in calls:
-        fn = call.get("function") if isinstance(call, dict) else None
-        if not fn:
-            continue
-        args = fn.get("arguments")
-        if args is None:
-            continue
-        # arguments may be a JSON-encoded string or a dict
-        if isinstance(args, str):
-            try:
-                args = _json.loads(args)
-            except (ValueError, TypeError):
-                continue
-        if isinstance(args, dict):
-            aid = args.get("agent_id")
-            if aid:
-                try:
-                    return UUID(str(aid))
-                except (ValueError, TypeError):
-                    continue
-    return None
+    async with db.begin_nested():
+        await record_interaction(
+            db,
+            org_id=org_id,
+            project_id=parent_agent.project_id,
+            source_agent_id=parent_agent_id,
+            target_agent_id=target_agent_id,
+            kind="invoke_agent",
+            message_id=delegation_msg.id,
+            tool_call_id=tool_call_payload[0]["id"],
+        )
 
 
 @router.get("/projects/{project_id}/breadcrumbs/agents/{agent_id}/messages")
@@ -1435,11 +1458,9 @@ async def get_breadcrumb_edge_messages(
     Messages exchanged between two agents along an edge.
 
     Returns delegation messages (invoke_agent / delegate_task) from
-    the source agent's sessions that target the specified target agent.
-    Also returns the corresponding tool-result messages.
+    the source agent's sessions that target the specified target agent,
+    looked up through the interaction ledger.
     """
-    import json as _json
-
     dt_from = _parse_iso_date(date_from)
     dt_to = _parse_iso_date(date_to, end_of_day=True)
 
@@ -1460,46 +1481,9 @@ async def get_breadcrumb_edge_messages(
         if not result.scalar_one_or_none():
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found in this project")
 
-    # Fetch ALL candidate messages from the source agent's sessions that
-    # could be delegation messages (assistant with tool_calls, or tool with
-    # tool_name set).  We filter in Python because the target agent ID is
-    # buried inside a JSON column.
-    candidate_stmt = (
-        select(AgentMessage)
-        .join(AgentSession, AgentMessage.session_id == AgentSession.id)
-        .where(
-            and_(
-                AgentSession.agent_id == source_agent_id,
-                or_(
-                    and_(AgentMessage.role == "assistant", AgentMessage.tool_calls.isnot(None)),
-                    and_(
-                        AgentMessage.role == "tool",
-                        AgentMessage.tool_name.in_(["invoke_agent", "delegate_task"]),
-                        AgentMessage.tool_calls.isnot(None),
-                    ),
-                ),
-            )
-        )
-        .order_by(desc(AgentMessage.created_at))
+    total, page = await edge_messages(
+        db, source_agent_id, target_agent_id, dt_from, dt_to, limit=limit, offset=offset,
     )
-    if dt_from:
-        candidate_stmt = candidate_stmt.where(AgentMessage.created_at >= dt_from)
-    if dt_to:
-        candidate_stmt = candidate_stmt.where(AgentMessage.created_at <= dt_to)
-
-    result = await db.execute(candidate_stmt)
-    candidates = result.scalars().all()
-
-    # Filter in Python: keep only messages that reference the target agent
-    matching = []
-    target_str = str(target_agent_id)
-    for msg in candidates:
-        extracted = _extract_target_agent_id(msg.tool_calls)
-        if extracted and str(extracted) == target_str:
-            matching.append(msg)
-
-    total = len(matching)
-    page = matching[offset : offset + limit]
 
     # Look up source/target agent names
     src_stmt = select(Agent.name).where(Agent.id == source_agent_id)
@@ -240,12 +240,15 @@ async def delete_project(
                         KBDocument.org_id == current_user.org_id,
                     )
                 )
-                await db.execute(
+                deleted_kbs = await db.execute(
                     sa_delete(KnowledgeBase).where(
                         KnowledgeBase.id.in_(ids),
                         KnowledgeBase.org_id == current_user.org_id,
-                    )
+                    ).returning(KnowledgeBase.id)
                 )
+                from app.services.kb_compression import drop_kb
+                for kb_id in deleted_kbs.scalars().all():
+                    await drop_kb(kb_id)
 
         # Opt-in gateway-key revocation
         if delete_gateway_key_ids:
@@ -40,6 +40,8 @@ from app.schemas.gateway import (
 )
 from app.core.database import get_db_session
 from app.services import gateway as gateway_service
+from app.services import spend_ledger
+from app.services.request_log_writer import request_log_writer
 from app.services.gateway import PolicyViolation
 from app.models.cloud_provider import CloudProvider
 from app.models.model import Model
@@ -440,29 +442,23 @@ async def _handle_streaming_completion(
             try:
                 async with get_db_session() as log_db:
                     provider = await _resolve_provider(model_used or model, org_id, log_db)
-                    log_entry = GatewayRequest(
-                        org_id=org_id,
-                        key_id=key_id,
-                        model_requested=model,
-                        model_used=model_used,
-                        status="error" if error_occurred else "success",
-                        error_message=error_message,
-                        input_tokens=total_prompt_tokens,
-                        output_tokens=total_completion_tokens,
-                        latency_ms=elapsed_ms,
-                        cost=cost,
-                        provider=provider,
-                    )
-                    log_db.add(log_entry)
-                    await log_db.flush()
-
-                    # Track managed inference (markup + provider counters)
-                    if not error_occurred and provider and cost > 0:
-                        try:
-                            from app.services.gateway import _track_managed_inference
-                            await _track_managed_inference(log_db, log_entry, org_id)
-                        except Exception as mi_err:
-                            logger.warning(f"Failed to track managed inference (streaming): {mi_err}")
+                # Row + managed-inference pricing are written by the batch writer
+                log_entry = GatewayRequest(
+                    org_id=org_id,
+                    key_id=key_id,
+                    model_requested=model,
+                    model_used=model_used,
+                    status="error" if error_occurred else "success",
+                    error_message=error_message,
+                    input_tokens=total_prompt_tokens,
+                    output_tokens=total_completion_tokens,
+                    latency_ms=elapsed_ms,
+                    cost=cost,
+                    provider=provider,
+                )
+                await request_log_writer.submit(log_entry)
+                if not error_occurred:
+                    await spend_ledger.record_spend(org_id, cost)
             except Exception as log_err:
                 logger.error(f"Failed to log streaming request: {log_err}")
 
@@ -578,29 +574,23 @@ async def _handle_streaming_completion_policy(
             try:
                 async with get_db_session() as log_db:
                     provider = await _resolve_provider(model_used or model, org_id, log_db)
-                    log_entry = GatewayRequest(
-                        org_id=org_id,
-                        key_id=None,  # Routing policy requests don't have a gateway key
-                        model_requested=model,
-                        model_used=model_used,
-                        status="error" if error_occurred else "success",
-                        error_message=error_message,
-                        input_tokens=total_prompt_tokens,
-                        output_tokens=total_completion_tokens,
-                        latency_ms=elapsed_ms,
-                        cost=cost,
-                        provider=provider,
-                    )
-                    log_db.add(log_entry)
-                    await log_db.flush()
-
-                    # Track managed inference (markup + provider counters)
-                    if not error_occurred and provider and cost > 0:
-                        try:
-                            from app.services.gateway import _track_managed_inference
-                            await _track_managed_inference(log_db, log_entry, org_id)
-                        except Exception as mi_err:
-                            logger.warning(f"Failed to track managed inference (streaming policy): {mi_err}")
+                # Row + managed-inference pricing are written by the batch writer
+                log_entry = GatewayRequest(
+                    org_id=org_id,
+                    key_id=None,  # Routing policy requests don't have a gateway key
+                    model_requested=model,
+                    model_used=model_used,
+                    status="error" if error_occurred else "success",
+                    error_message=error_message,
+                    input_tokens=total_prompt_tokens,
+                    output_tokens=total_completion_tokens,
+                    latency_ms=elapsed_ms,
+                    cost=cost,
+                    provider=provider,
+                )
+                await request_log_writer.submit(log_entry)
+                if not error_occurred:
+                    await spend_ledger.record_spend(org_id, cost)
             except Exception as log_err:
                 logger.error(f"Failed to log streaming policy request: {log_err}")
 
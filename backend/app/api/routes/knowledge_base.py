@@ -228,6 +228,9 @@ async def delete_knowledge_base(
     await db.execute(sa_delete(KnowledgeBase).where(KnowledgeBase.id == kb_id))
     await db.flush()
 
+    from app.services.kb_compression import drop_kb
+    await drop_kb(kb_id)
+
     logger.info(f"Deleted knowledge base {kb_id} ({kb_name}) for org {user.org_id}")
 
 
@@ -500,10 +503,14 @@ async def delete_document(
             logger.warning(f"GCS delete failed for doc {doc_id} (continuing with DB delete): {e}")
 
     # Delete chunks via SQL to avoid loading pgvector embedding columns
-    await db.execute(sa_delete(KBChunk).where(KBChunk.document_id == doc_id))
+    deleted = await db.execute(sa_delete(KBChunk).where(KBChunk.document_id == doc_id).returning(KBChunk.id))
+    deleted_chunk_ids = deleted.scalars().all()
     await db.execute(sa_delete(KBDocument).where(KBDocument.id == doc_id))
     await db.flush()
 
+    from app.services.kb_compression import remove_chunks
+    await remove_chunks(kb_id, deleted_chunk_ids)
+
     # Update KB counters
     kb.document_count = max(0, (kb.document_count or 0) - 1)
     kb.chunk_count = max(0, (kb.chunk_count or 0) - chunk_count)
@@ -582,16 +589,8 @@ async def get_sync_status(
     if not kb:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Knowledge base not found")
 
-    # For now, return basic status from the KB record
-    # In a production system, this would check a separate sync_jobs table
-    return KBSyncStatus(
-        knowledge_base_id=kb_id,
-        status=kb.status,
-        progress_percentage=100 if kb.status == "ready" else None,
-        files_processed=kb.document_count,
-        files_total=kb.document_count,
-        current_file=None
-    )
+    from app.services.kb_sync import sync_status
+    return KBSyncStatus(**sync_status(kb))
 
 
 # ─── Search Operations ───
@@ -627,18 +626,16 @@ async def search_knowledge_base(
     top_k = body.top_k if hasattr(body, "top_k") and body.top_k else 5
     
     # Generate embedding for the query using the SAME model as ingestion
-    from app.services.kb_ingestion import EmbeddingGenerator
-    embedding_gen = EmbeddingGenerator(user.org_id)
+    from app.services.query_embedding_cache import embed_query
     # Use the KB's configured embedding model to avoid dimension mismatch
     kb_embed_model = getattr(kb, 'embedding_model', None)
     embed_model = kb_embed_model if (kb_embed_model and kb_embed_model != 'auto') else None
     
     try:
         embed_dims = getattr(kb, 'embedding_dimensions', None)
-        query_embeddings = await embedding_gen.generate_embeddings([body.query], model=embed_model, dimensions=embed_dims)
-        if not query_embeddings:
+        query_embedding = await embed_query(user.org_id, body.query, model=embed_model, dimensions=embed_dims)
+        if not query_embedding:
             raise HTTPException(status_code=500, detail="Failed to generate query embedding")
-        query_embedding = query_embeddings[0]
     except HTTPException:
         raise
     except Exception as e:
@@ -646,30 +643,10 @@ async def search_knowledge_base(
         raise HTTPException(status_code=500, detail=f"Embedding generation failed: {str(e)}")
     
     # Vector similarity search using pgvector
-    from sqlalchemy import text as sa_text
-    embedding_str = "[" + ",".join(str(x) for x in query_embedding) + "]"
+    from app.services.kb_retrieval import nearest_chunks
     
     try:
-        search_result = await db.execute(
-            sa_text("""
-                SELECT c.id, c.content, c.token_count, c.chunk_index,
-                       c.source_file, c.source_page, c.source_section,
-                       1 - (c.embedding <=> CAST(:query_vec AS vector)) AS relevance_score
-                FROM kb_chunks c
-                WHERE c.knowledge_base_id = :kb_id
-                  AND c.org_id = :org_id
-                  AND c.embedding IS NOT NULL
-                ORDER BY c.embedding <=> CAST(:query_vec AS vector)
-                LIMIT :top_k
-            """),
-            {
-                "query_vec": embedding_str,
-                "kb_id": str(kb_id),
-                "org_id": str(user.org_id),
-                "top_k": top_k,
-            },
-        )
-        rows = search_result.fetchall()
+        rows = await nearest_chunks(db, kb, query_embedding, top_k, org_id=user.org_id)
     except Exception as e:
         logger.error(f"pgvector search failed: {e}")
         raise HTTPException(status_code=500, detail=f"Vector search failed: {str(e)}")
@@ -695,7 +672,7 @@ async def search_knowledge_base(
         results.append({
             "chunk_id": str(row.id),
             "content": row.content,
-            "score": round(float(row.relevance_score), 4) if row.relevance_score else 0.0,
+            "score": round(float(row.score), 4) if row.score else 0.0,
             "source_file": row.source_file,
             "source_page": row.source_page,
             "source_section": row.source_section,
@@ -760,6 +737,8 @@ async def get_knowledge_base_stats(
         )
         avg_chunk_size = chunk_size_result.scalar() or 0.0
 
+    from app.services.kb_compression import compression_stats
+
     return KBStats(
         total_documents=kb.document_count,
         total_chunks=kb.chunk_count,
@@ -767,7 +746,8 @@ async def get_knowledge_base_stats(
         document_types=document_types,
         status_counts=status_counts,
         avg_chunk_size=avg_chunk_size,
-        last_sync=kb.last_synced_at
+        last_sync=kb.last_synced_at,
+        compression=await compression_stats(kb),
     )
 
 
@@ -948,34 +928,24 @@ async def get_kb_config(
     if not kb:
         raise HTTPException(status_code=404, detail="Knowledge base not found")
 
-    # Calculate compression stats if enabled
-    stats = {}
-    if kb.compression_method:
-        # Calculate actual storage savings
-        result = await db.execute(
-            select(func.count(KBChunk.id)).where(KBChunk.knowledge_base_id == kb_id)
-        )
-        total_chunks = result.scalar() or 0
+    from app.services.kb_compression import compression_stats
 
-        # Compression ratios (from research benchmarks)
-        compression_ratios = {
-            "scalar-8bit": 3.9,
-            "polar-4bit": 8.0,
-            "polar-8bit": 3.9,
-        }
-        ratio = compression_ratios.get(kb.compression_method, 1.0)
+    stats = await compression_stats(kb) if kb.compression_method else {}
 
-        stats = {
-            "total_chunks": total_chunks,
-            "compression_ratio": ratio,
-            "estimated_savings_percent": int((1 - 1/ratio) * 100) if ratio > 1 else 0,
-        }
+    from app.services.kb_retrieval import retrieval_settings
+
+    effective = retrieval_settings(kb)
 
     return {
         "compression": {
             "method": kb.compression_method or "off",
             "stats": stats,
-        }
+        },
+        "retrieval": {
+            **(kb.retrieval_config or {}),
+            "mode": effective.mode,
+            "effective_oversample": effective.oversample,
+        },
     }
 
 
@@ -993,11 +963,16 @@ async def update_kb_config(
     {
         "compression": {
             "method": "scalar-8bit" | "polar-4bit" | "polar-8bit" | "off"
+        },
+        "retrieval": {
+            "mode": "auto" | "exact",
+            "oversample": 1-64,          (optional)
+            "recall_target": 0.0-1.0     (optional, used when oversample is unset)
         }
     }
 
-    Note: Changing compression method does NOT automatically re-process existing documents.
-    New documents ingested after this change will use the new compression method.
+    Changing the compression method re-encodes the KB's existing chunks in
+    the background; searches use the exact path until the new store is in.
     """
     await _require_ai_context(db, user)
     await feature_gate.require_feature(db, str(user.org_id), "vectorboost")
@@ -1012,6 +987,7 @@ async def update_kb_config(
         raise HTTPException(status_code=404, detail="Knowledge base not found")
 
     # Update compression method
+    previous_method = kb.compression_method
     if "compression" in body:
         method = body["compression"].get("method")
         if method == "off":
@@ -1024,13 +1000,32 @@ async def update_kb_config(
                 detail=f"Invalid compression method. Must be one of: scalar-8bit, polar-4bit, polar-8bit, off"
             )
 
+    # Update two-stage retrieval tuning
+    if "retrieval" in body:
+        from app.services.kb_retrieval import validate_retrieval_config
+
+        try:
+            kb.retrieval_config = validate_retrieval_config(body["retrieval"] or {})
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     await db.flush()
     await db.refresh(kb)
 
-    logger.info(f"Updated KB {kb_id} compression config: {kb.compression_method}")
+    if kb.compression_method != previous_method:
+        # The re-encode reads the KB in its own session, so it must see this change
+        await db.commit()
+        from app.services.kb_compression import schedule_reencode
+        schedule_reencode(kb_id)
+
+    logger.info(
+        f"Updated KB {kb_id} config: compression={kb.compression_method}, "
+        f"retrieval={kb.retrieval_config}"
+    )
 
     return {
         "compression": {
             "method": kb.compression_method or "off",
-        }
+        },
+        "retrieval": kb.retrieval_config or {"mode": "auto"},
     }
\ No newline at end of file
@@ -10,13 +10,14 @@ Provides:
   - Frontend event ingestion proxy for Helios
 """
 
-import hashlib
 import json
+import os
 import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Body, status
+from fastapi.responses import FileResponse, RedirectResponse
 from pydantic import BaseModel, Field
 from sqlalchemy import select, func, and_, delete, desc
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -40,6 +41,8 @@ from app.schemas.logging import (
     LogStatsResponse,
     LogStatsBucket,
 )
+from app.services.audit_chain import verify_chain
+from app.services.log_export import notify_export_queued
 from app.services.log_integrations import get_integration
 
 # ── Routers ──
@@ -171,10 +174,49 @@ async def export_logs(
     db.add(job)
     await db.flush()
     await db.refresh(job)
+    await db.commit()
+    notify_export_queued()
 
     return job
 
 
+@router.get("/logs/export/{job_id}", response_model=LogExportJobResponse)
+async def get_export_job(
+    job_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Poll an export job's status and progress."""
+    job = await db.get(LogExportJob, job_id)
+    if job is None or job.org_id != user.org_id:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+
+@router.get("/logs/export/{job_id}/download")
+async def download_export(
+    job_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Download a completed export (redirects to a signed URL for GCS-backed exports)."""
+    job = await db.get(LogExportJob, job_id)
+    if job is None or job.org_id != user.org_id:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status != "completed" or not job.file_path:
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    if job.download_expires_at and job.download_expires_at < datetime.now(timezone.utc):
+        raise HTTPException(status_code=410, detail="Export download has expired")
+
+    filename = os.path.basename(job.file_path)
+    if job.file_path.startswith("gs://"):
+        from app.services.gcs_storage import generate_export_url
+        return RedirectResponse(await generate_export_url(user.org_id, job.file_path))
+    if not os.path.exists(job.file_path):
+        raise HTTPException(status_code=410, detail="Export file is no longer available")
+    return FileResponse(job.file_path, media_type="application/gzip", filename=filename)
+
+
 # ═══════════════════════════════════════════
 # Log Statistics
 # ═══════════════════════════════════════════
@@ -422,6 +464,8 @@ class HashChainVerifyResponse(BaseModel):
     broken_at_index: Optional[int] = None
     broken_entry_id: Optional[uuid.UUID] = None
     message: str
+    verified_from_seq: Optional[int] = None
+    checkpoint_seq: Optional[int] = None
 
 
 @audit_router.get("/audit-logs", response_model=AuditLogListResponse)
@@ -473,74 +517,17 @@ async def list_audit_logs(
 async def verify_audit_chain(
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
+    full: bool = Query(False, description="Re-verify from the start of the chain instead of the last verified checkpoint"),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(require_admin),
 ):
-    """Verify the tamper-evident hash chain for audit logs. SOC2 CC9.2 evidence."""
-    base = (
-        select(AuditLog)
-        .where(AuditLog.org_id == user.org_id)
-        .order_by(AuditLog.created_at.asc())
-    )
-    if date_from:
-        base = base.where(AuditLog.created_at >= date_from)
-    if date_to:
-        base = base.where(AuditLog.created_at <= date_to)
-
-    result = await db.execute(base)
-    entries = result.scalars().all()
+    """Verify the tamper-evident hash chain for audit logs. SOC2 CC9.2 evidence.
 
-    if not entries:
-        return HashChainVerifyResponse(
-            valid=True, total_entries=0, message="No audit entries in range"
-        )
-
-    prev_hash = ""
-    for idx, entry in enumerate(entries):
-        # Skip entries without hash (pre-migration)
-        if not entry.entry_hash:
-            prev_hash = ""
-            continue
-
-        # Recompute the expected hash
-        hash_input = "|".join([
-            entry.prev_hash or "",
-            str(entry.org_id or ""),
-            str(entry.user_id or ""),
-            entry.action,
-            entry.resource_type,
-            (entry.details_json or {}).get("path", ""),
-            str((entry.details_json or {}).get("status_code", "")),
-            entry.created_at.isoformat(),
-        ])
-        expected_hash = hashlib.sha256(hash_input.encode()).hexdigest()
-
-        if entry.entry_hash != expected_hash:
-            return HashChainVerifyResponse(
-                valid=False,
-                total_entries=len(entries),
-                broken_at_index=idx,
-                broken_entry_id=entry.id,
-                message=f"Hash chain broken at entry {idx} (id={entry.id}): expected {expected_hash[:16]}..., got {entry.entry_hash[:16]}...",
-            )
-
-        # Verify chain linkage
-        if entry.prev_hash != prev_hash and prev_hash and entry.prev_hash:
-            return HashChainVerifyResponse(
-                valid=False,
-                total_entries=len(entries),
-                broken_at_index=idx,
-                broken_entry_id=entry.id,
-                message=f"Chain linkage broken at entry {idx}: prev_hash mismatch",
-            )
-
-        prev_hash = entry.entry_hash
-
-    return HashChainVerifyResponse(
-        valid=True,
-        total_entries=len(entries),
-        message=f"Hash chain verified: {len(entries)} entries, all valid",
-    )
+    Streams the org's chain from the last verified checkpoint (see
+    app/services/audit_chain.py) rather than loading the range into memory.
+    """
+    result = await verify_chain(db, user.org_id, full=full, date_from=date_from, date_to=date_to)
+    return HashChainVerifyResponse(**result)
 
 
 # ═══════════════════════════════════════════
@@ -29,6 +29,7 @@ from app.services.mcp_client import (
     create_mcp_client,
     get_mcp_templates,
     get_mcp_template,
+    mcp_pool,
     MCPConnectionError,
 )
 
@@ -239,12 +240,19 @@ async def update_mcp_server(
         setattr(server, field, value)
 
     # Clear cached tools when config changes (they'll be re-discovered)
-    if "endpoint_config" in update_data or "transport_type" in update_data or "auth_config" in update_data:
+    config_changed = (
+        "endpoint_config" in update_data or "transport_type" in update_data or "auth_config" in update_data
+    )
+    if config_changed:
         server.discovered_tools = None
 
     await db.commit()
     await db.refresh(server)
 
+    # Close pooled connections made with the old config and drop its cached tools
+    if config_changed or update_data.get("enabled") is False:
+        await mcp_pool.invalidate(current_user.org_id, server_id)
+
     return _serialize_mcp_server(server)
 
 
@@ -279,6 +287,7 @@ async def delete_mcp_server(
 
     await db.delete(server)
     await db.commit()
+    await mcp_pool.invalidate(current_user.org_id, server_id)
 
 
 # ─── Test Connection ───
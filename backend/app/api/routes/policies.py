@@ -10,6 +10,7 @@ from app.api.dependencies import get_current_user
 from app.models.user import User
 from app.models.policy import Policy
 from app.schemas.policy import PolicyCreate, PolicyUpdate, PolicyResponse
+from app.services import policy_cache
 
 router = APIRouter(prefix="/policies", tags=["policies"])
 
@@ -51,6 +52,9 @@ async def create_policy(
     db.add(policy)
     await db.flush()
     await db.refresh(policy)
+    # Commit before bumping the version so no worker reloads the old rows
+    await db.commit()
+    await policy_cache.invalidate(user.org_id)
     return policy
 
 
@@ -85,6 +89,8 @@ async def update_policy(
 
     await db.flush()
     await db.refresh(policy)
+    await db.commit()
+    await policy_cache.invalidate(user.org_id)
     return policy
 
 
@@ -107,3 +113,5 @@ async def delete_policy(
 
     await db.delete(policy)
     await db.flush()
+    await db.commit()
+    await policy_cache.invalidate(user.org_id)
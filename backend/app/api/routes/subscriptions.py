@@ -133,6 +133,10 @@ async def update_subscription(
     db.add(history)
     await db.commit()
     await db.refresh(org)
+
+    # Tier drives the gateway call quota cached in policy snapshots
+    from app.services import policy_cache
+    await policy_cache.invalidate(org.id)
     
     # Return updated subscription info
     subscription = await feature_gate.get_organization_subscription(db, str(org.id))
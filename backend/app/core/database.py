@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_asyn
 from sqlalchemy.orm import DeclarativeBase
 
 from app.core.config import settings
+from app.core.pgvector import encode_vector_param, unpack_vector
 
 # Create engine with connection pooling configuration
 engine = create_async_engine(
@@ -24,6 +25,10 @@ def _ensure_pgvector_codec(dbapi_connection, connection_record, connection_proxy
     within SQLAlchemy's async greenlet context. The 'connect' event can fire
     during pool pre-ping or recycling outside the greenlet, causing
     'greenlet_spawn has not been called' errors.
+
+    The codec uses pgvector's binary format, so query vectors can be bound
+    as pre-packed bytes (see app.core.pgvector) instead of decimal strings.
+    Lists and ``[1,2,3]`` literals are still accepted.
     """
     if connection_record.info.get("_pgvector_registered"):
         return
@@ -31,10 +36,10 @@ def _ensure_pgvector_codec(dbapi_connection, connection_record, connection_proxy
     dbapi_connection.await_(
         raw_conn.set_type_codec(
             "vector",
-            encoder=str,
-            decoder=lambda v: [float(x) for x in v[1:-1].split(",")] if v else [],
+            encoder=encode_vector_param,
+            decoder=unpack_vector,
             schema="public",
-            format="text",
+            format="binary",
         )
     )
     connection_record.info["_pgvector_registered"] = True
@@ -0,0 +1,62 @@
+"""
+pgvector binary wire format helpers.
+
+A pgvector ``vector`` in binary form is a big-endian ``uint16`` dimension
+count, a ``uint16`` reserved field (always 0) and then ``dim`` big-endian
+float32 values. Binding query vectors this way skips building and
+re-parsing a ~20 KB decimal string per search for a 1536-dim embedding.
+
+``pack_vector`` / ``unpack_vector`` are used by the asyncpg codec in
+``app.core.database`` and by callers that want to pre-encode a vector once
+(e.g. the query-embedding cache) and bind the bytes directly.
+"""
+
+import struct
+from functools import lru_cache
+from typing import List, Sequence, Union
+
+# kb_chunks.embedding is vector(1536); its struct is built once at import.
+VECTOR_COLUMN_DIMENSIONS = 1536
+
+_HEADER = struct.Struct(">HH")
+
+
+@lru_cache(maxsize=16)
+def _struct_for(dim: int) -> struct.Struct:
+    return struct.Struct(f">HH{dim}f")
+
+
+_COLUMN_STRUCT = _struct_for(VECTOR_COLUMN_DIMENSIONS)
+
+
+def pack_vector(values: Sequence[float]) -> bytes:
+    """Encode *values* in pgvector's binary format."""
+    dim = len(values)
+    packer = _COLUMN_STRUCT if dim == VECTOR_COLUMN_DIMENSIONS else _struct_for(dim)
+    return packer.pack(dim, 0, *values)
+
+
+def unpack_vector(data: bytes) -> List[float]:
+    """Decode pgvector's binary format into a list of floats."""
+    if not data:
+        return []
+    dim, _ = _HEADER.unpack_from(data)
+    packer = _COLUMN_STRUCT if dim == VECTOR_COLUMN_DIMENSIONS else _struct_for(dim)
+    return list(packer.unpack(data[: packer.size])[2:])
+
+
+def parse_vector_literal(text: str) -> List[float]:
+    """Parse a ``[1,2,3]`` pgvector text literal."""
+    text = text.strip()
+    if text.startswith("[") and text.endswith("]"):
+        text = text[1:-1]
+    return [float(x) for x in text.split(",")] if text.strip() else []
+
+
+def encode_vector_param(value: Union[bytes, str, Sequence[float]]) -> bytes:
+    """asyncpg encoder: accept pre-packed bytes, a text literal or a sequence."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, str):
+        return pack_vector(parse_vector_literal(value))
+    return pack_vector(value)
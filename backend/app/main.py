@@ -2,7 +2,6 @@ from contextlib import asynccontextmanager
 
 import sentry_sdk
 from fastapi import FastAPI, HTTPException
-from fastapi.middleware.gzip import GZipMiddleware
 
 from app.core.config import settings
 
@@ -19,14 +18,16 @@ if settings.sentry_dsn:
 from app.core.logging import setup_logging
 from app.core.responses import handle_http_exception, handle_general_exception
 from app.api.routes import health, providers, models, deployments, routing, compliance, export, costs, users, policies, audit, ai, auth, onboarding, notifications, analytics, gateway, routing_policies, admin, knowledge_base, sso, sso_admin, bonobot_projects, bonobot_agents, agent_groups, mcp_servers, rbac, logging as logging_routes, subscriptions, bonbon, widget, agent_memory, agent_scheduler, agent_approval, github_app, secrets
+from app.middleware.pipeline import GZipMiddleware, MiddlewarePipeline
 from app.middleware.security import (
-    RateLimitMiddleware,
-    RequestBodySizeLimitMiddleware,
-    RequestIDMiddleware,
-    SecurityHeadersMiddleware,
+    RateLimitStage,
+    RequestBodySizeLimitStage,
+    RequestIDStage,
+    SecurityHeadersStage,
     configure_cors,
 )
-from app.middleware.audit import AuditMiddleware
+from app.middleware.audit import AuditStage
+from app.middleware.log_emit import LogEmitStage
 
 
 @asynccontextmanager
@@ -45,6 +46,14 @@ async def lifespan(app: FastAPI):
     # Start the log service background flush loop
     from app.services.log_service import log_service
     await log_service.start()
+
+    # Start the batched gateway request log writer
+    from app.services.request_log_writer import request_log_writer
+    await request_log_writer.start()
+
+    # Start the audit chain appender (ordered, batched audit log writes)
+    from app.services.audit_chain import audit_chain
+    await audit_chain.start()
     
     # Start the GCS structured log sink
     from app.core.gcs_log_sink import start_gcs_sink
@@ -62,6 +71,30 @@ async def lifespan(app: FastAPI):
     from app.services.agent_queue import start_queue_drainer
     await start_queue_drainer()
 
+    # Listen for cross-worker gateway router invalidations
+    from app.services.gateway import start_router_cache
+    await start_router_cache()
+
+    # Reconcile Redis spend ledgers against gateway_requests
+    from app.services.spend_ledger import start_spend_reconciler
+    await start_spend_reconciler()
+
+    # Compact memory-mapped KB vector segments in the background
+    from app.services.compressed_vector_store import start_vector_store_compactor
+    await start_vector_store_compactor()
+
+    # Re-encode compressed KB stores that are missing or behind their chunks
+    from app.services.kb_compression import backfill_reencode
+    await backfill_reencode()
+
+    # Process queued log export jobs
+    from app.services.log_export import start_log_export_worker
+    await start_log_export_worker()
+
+    # Keep MCP server connections warm between agent executions
+    from app.services.mcp_client import start_mcp_pool
+    await start_mcp_pool()
+
     # Note: Alembic migrations run in start-prod.sh BEFORE uvicorn starts.
     # Don't run them again here — with multiple workers they'd race each other.
 
@@ -80,6 +113,34 @@ async def lifespan(app: FastAPI):
     except Exception:
         pass
 
+    # Drain queued gateway request logs before the DB pool goes away
+    from app.services.request_log_writer import request_log_writer as _request_log_writer
+    try:
+        await _request_log_writer.stop()
+    except Exception:
+        pass
+
+    # Drain queued audit entries while the DB pool and Redis are still up
+    from app.services.audit_chain import audit_chain as _audit_chain
+    try:
+        await _audit_chain.stop()
+    except Exception:
+        pass
+
+    # Hand an in-progress log export back to the queue before the DB pool closes
+    from app.services.log_export import stop_log_export_worker
+    try:
+        await stop_log_export_worker()
+    except Exception:
+        pass
+
+    # Hand unfinished queue tickets back to Redis while it's still connected
+    from app.services.agent_queue import stop_queue_drainer
+    try:
+        await stop_queue_drainer()
+    except Exception:
+        pass
+
     from app.core.database import database
     from app.core.redis import close_redis
 
@@ -106,9 +167,33 @@ async def lifespan(app: FastAPI):
     except Exception:
         pass
 
-    from app.services.agent_queue import stop_queue_drainer
+    from app.services.gateway import stop_router_cache
     try:
-        await stop_queue_drainer()
+        await stop_router_cache()
+    except Exception:
+        pass
+
+    from app.services.spend_ledger import stop_spend_reconciler
+    try:
+        await stop_spend_reconciler()
+    except Exception:
+        pass
+
+    from app.services.compressed_vector_store import stop_vector_store_compactor
+    try:
+        await stop_vector_store_compactor()
+    except Exception:
+        pass
+
+    from app.services.kb_parsing import stop_parse_pool
+    try:
+        stop_parse_pool()
+    except Exception:
+        pass
+
+    from app.services.mcp_client import stop_mcp_pool
+    try:
+        await stop_mcp_pool()
     except Exception:
         pass
 
@@ -127,31 +212,27 @@ app.add_exception_handler(HTTPException, handle_http_exception)
 app.add_exception_handler(Exception, handle_general_exception)
 
 # Middleware is applied in reverse order (last added = first executed)
-# Order of execution: RequestID → SecurityHeaders → BodySizeLimit → RateLimit → CORS → AuditMiddleware → route
+# Order of execution: GZip → pipeline (RequestID → LogEmit → SecurityHeaders →
+# BodySizeLimit → RateLimit → Audit) → CORS → route
 
-# Audit (innermost — runs closest to route handler, captures response status)
-app.add_middleware(AuditMiddleware)
-
-# CORS
+# CORS (innermost — answers preflights after rate limiting)
 configure_cors(app)
 
-# Rate limiting
-app.add_middleware(RateLimitMiddleware)
-
-# Request body size limit for /v1/* gateway endpoints (rejects before rate-limit slot is consumed)
-app.add_middleware(RequestBodySizeLimitMiddleware)
-
-# Security headers
-app.add_middleware(SecurityHeadersMiddleware)
-
-# Request ID (outermost — ensures all responses get an ID)
-app.add_middleware(RequestIDMiddleware)
-
-# Structured log emit to GCS (after RequestIDMiddleware so request_id is available)
-from app.middleware.log_emit import LogEmitMiddleware
-app.add_middleware(LogEmitMiddleware)
+# Raw-ASGI pipeline: one layer instead of a BaseHTTPMiddleware per concern.
+# /v1/* gateway traffic skips dashboard-only stages (see app/middleware/pipeline.py).
+app.add_middleware(
+    MiddlewarePipeline,
+    stages=[
+        RequestIDStage(),               # Request ID first so every log line and response carries it
+        LogEmitStage(),                 # Structured log emit to GCS
+        SecurityHeadersStage(),
+        RequestBodySizeLimitStage(),    # /v1/* only — rejects before a rate-limit slot is consumed
+        RateLimitStage(),
+        AuditStage(),                   # Dashboard only — written after the response is sent
+    ],
+)
 
-# GZip compression (very outer layer)
+# GZip compression (very outer layer; never buffers text/event-stream)
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 
@@ -4,19 +4,11 @@ SOC2 CC7.2 / CC9.2: Complete audit trail including auth failures and
 sensitive data access (GET on credential/key/user endpoints).
 """
 
-import hashlib
-import json
 import uuid
-import time
 import logging
-from datetime import datetime, timezone
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-
-from app.core.database import async_session as async_session_factory
-from app.models.audit import AuditLog
+from app.middleware.pipeline import RequestContext, Stage
+from app.services.audit_chain import audit_chain
 
 logger = logging.getLogger(__name__)
 
@@ -88,38 +80,36 @@ def _derive_action(method: str, path: str) -> tuple[str, str]:
     return method.lower(), "unknown"
 
 
-def _client_ip(request: Request) -> str:
-    forwarded = request.headers.get("x-forwarded-for")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    return request.client.host if request.client else "unknown"
+class AuditStage(Stage):
+    """Audit sensitive dashboard endpoints once the response has been sent.
 
+    Gateway /v1/* traffic never matches the audited prefixes, so the stage
+    is left off the gateway lane entirely.
+    """
 
-class AuditMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        method = request.method
+    gateway = False
 
+    async def on_complete(self, ctx: RequestContext) -> None:
+        path = ctx.path
+        method = ctx.method
         if not _should_audit(path, method):
-            return await call_next(request)
+            return
 
-        start = time.monotonic()
-        response: Response = await call_next(request)
-        elapsed_ms = round((time.monotonic() - start) * 1000)
+        status_code = ctx.status_code
+        elapsed_ms = round(ctx.elapsed_ms())
 
-        # Fire-and-forget audit write
         try:
             action, resource_type = _derive_action(method, path)
-            ip = _client_ip(request)
+            ip = ctx.forwarded_ip
 
             # Try to get user info from request state (set by auth middleware)
-            user_id = getattr(request.state, "user_id", None)
-            user_name = getattr(request.state, "user_name", None)
-            request_id = getattr(request.state, "request_id", None)
+            user_id = ctx.state.get("user_id")
+            user_name = ctx.state.get("user_name")
+            request_id = ctx.state.get("request_id")
 
             # Extract org_id from the JWT bearer token
             org_id = None
-            auth_header = request.headers.get("authorization", "")
+            auth_header = ctx.headers.get("authorization", "")
             if auth_header.startswith("Bearer "):
                 try:
                     from app.services.auth_service import decode_token
@@ -149,56 +139,21 @@ class AuditMiddleware(BaseHTTPMiddleware):
             details = {
                 "method": method,
                 "path": path,
-                "status_code": response.status_code,
+                "status_code": status_code,
                 "latency_ms": elapsed_ms,
                 "request_id": request_id,
             }
 
-            entry_id = uuid.uuid4()
-            now = datetime.now(timezone.utc)
-
-            async with async_session_factory() as session:
-                # Get previous hash for tamper-evident chain
-                from sqlalchemy import select, desc
-                prev_hash_query = (
-                    select(AuditLog.entry_hash)
-                    .order_by(desc(AuditLog.created_at))
-                    .limit(1)
-                )
-                if org_id is not None:
-                    prev_hash_query = prev_hash_query.where(AuditLog.org_id == org_id)
-                result = await session.execute(prev_hash_query)
-                prev_hash = result.scalar() or ""
-
-                # Compute tamper-evident hash
-                hash_input = "|".join([
-                    prev_hash,
-                    str(org_id or ""),
-                    str(user_id or ""),
-                    action,
-                    resource_type,
-                    path,
-                    str(response.status_code),
-                    now.isoformat(),
-                ])
-                entry_hash = hashlib.sha256(hash_input.encode()).hexdigest()
-
-                log_entry = AuditLog(
-                    id=entry_id,
-                    org_id=org_id,
-                    user_id=user_id,
-                    action=action,
-                    resource_type=resource_type,
-                    resource_id=resource_id,
-                    details_json=details,
-                    ip_address=ip,
-                    user_name=user_name,
-                    prev_hash=prev_hash,
-                    entry_hash=entry_hash,
-                )
-                session.add(log_entry)
-                await session.commit()
+            # Hashed and chained in order by the background appender
+            await audit_chain.submit({
+                "org_id": org_id,
+                "user_id": user_id,
+                "action": action,
+                "resource_type": resource_type,
+                "resource_id": resource_id,
+                "details_json": details,
+                "ip_address": ip,
+                "user_name": user_name,
+            })
         except Exception:
             logger.exception("Failed to write audit log")
-
-        return response
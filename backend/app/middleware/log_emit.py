@@ -1,5 +1,5 @@
 """
-Log Emit Middleware — streams structured request/response events to the GCS log sink.
+Log Emit stage — streams structured request/response events to the GCS log sink.
 
 Every HTTP request/response is emitted as a Sentry-compatible event to GCS,
 enabling Helios on the Orin to ingest, group, and analyze Bonito's operational logs.
@@ -9,16 +9,11 @@ latency to the request path.
 """
 
 import logging
-import time
 import uuid
-from datetime import datetime, timezone
-from typing import Callable, Optional
-
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from typing import Optional
 
 from app.core.gcs_log_sink import get_gcs_sink
+from app.middleware.pipeline import RequestContext, Stage
 
 logger = logging.getLogger(__name__)
 
@@ -92,118 +87,71 @@ def _infer_feature(path: str) -> str:
     return "request"
 
 
-def _client_ip(request: Request) -> str:
-    forwarded = request.headers.get("x-forwarded-for")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    return request.client.host if request.client else "unknown"
-
-
-def _user_agent(request: Request) -> str:
-    return request.headers.get("user-agent", "")
-
-
-async def _get_org_id(request: Request) -> Optional[str]:
-    """Extract org_id from the JWT bearer token without full validation."""
-    auth_header = request.headers.get("authorization", "")
+def _token_claims(ctx: RequestContext) -> dict:
+    """Decode the dashboard JWT bearer token (without full validation) for log context."""
+    auth_header = ctx.headers.get("authorization", "")
     if not auth_header.startswith("Bearer "):
-        return None
+        return {}
     try:
         from app.services.auth_service import decode_token
-        payload = decode_token(auth_header[7:])
-        org_id = payload.get("org_id")
-        return str(org_id) if org_id else None
+        return decode_token(auth_header[7:]) or {}
     except Exception:
-        return None
+        return {}
 
 
-async def _get_user_id(request: Request) -> Optional[str]:
-    """Extract user_id from request state (set by auth middleware) or JWT."""
-    user_id = getattr(request.state, "user_id", None)
-    if user_id:
-        return str(user_id)
-
-    auth_header = request.headers.get("authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return None
-    try:
-        from app.services.auth_service import decode_token
-        payload = decode_token(auth_header[7:])
-        return payload.get("sub")
-    except Exception:
-        return None
-
-
-async def _get_api_key_id(request: Request) -> Optional[str]:
-    """Extract api_key_id from request state."""
-    return getattr(request.state, "api_key_id", None)
-
-
-class LogEmitMiddleware(BaseHTTPMiddleware):
+class LogEmitStage(Stage):
     """
     Emit a structured event for every HTTP request/response to the GCS log sink.
 
     Two events are emitted per request:
     - request_start: level=info, emitted at the start of the request
     - request_end: level based on response status (info/warning/error),
-      emitted at the end with duration_ms
+      emitted once the response has been sent, with duration_ms
 
-    Both events share the same `request_id` for correlation.
+    Both events share the same `request_id` for correlation. Gateway /v1/*
+    requests authenticate with API keys rather than JWTs, so they skip the
+    token decode and only carry the api_key_id a route left on request.state.
     """
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Generate or retrieve request ID
-        request_id = getattr(request.state, "request_id", None)
-        if not request_id:
-            request_id = str(uuid.uuid4())
-            request.state.request_id = request_id
-
-        # Capture start time
-        start = time.monotonic()
+    async def on_request(self, ctx: RequestContext) -> None:
+        if not ctx.request_id:
+            ctx.request_id = str(uuid.uuid4())
+            ctx.state["request_id"] = ctx.request_id
 
-        # Extract context (non-blocking)
-        client_ip = _client_ip(request)
-        ua = _user_agent(request)
-
-        # Get the GCS sink
-        sink = get_gcs_sink()
-
-        # Infer log type and sub-feature from path for GCS routing
-        log_type = _infer_log_type(request.url.path)
-        feature = _infer_feature(request.url.path)
-
-        # Emit request_start event (non-blocking)
-        sink.emit(
+        feature = _infer_feature(ctx.path)
+        get_gcs_sink().emit(
             level="info",
-            message=f"[{feature}] {request.method} {request.url.path}",
+            message=f"[{feature}] {ctx.method} {ctx.path}",
             logger_name="bonito.http",
-            log_type=log_type,
+            log_type=_infer_log_type(ctx.path),
             feature=feature,
-            request_id=request_id,
-            endpoint=request.url.path,
-            method=request.method,
-            ip_address=client_ip,
-            user_agent=ua,
+            request_id=ctx.request_id,
+            endpoint=ctx.path,
+            method=ctx.method,
+            ip_address=ctx.forwarded_ip,
+            user_agent=ctx.headers.get("user-agent", ""),
             extra={
                 "event_type": "request_start",
-                "query_string": str(request.url.query),
-                "path_params": dict(request.path_params) if request.path_params else {},
+                "query_string": ctx.query_string,
+                "path_params": ctx.scope.get("path_params") or {},
             },
         )
+        return None
 
-        # Process request
-        response: Response = await call_next(request)
-
-        # Calculate duration
-        duration_ms = round((time.monotonic() - start) * 1000)
+    async def on_complete(self, ctx: RequestContext) -> None:
+        duration_ms = round(ctx.elapsed_ms())
 
-        # Get user/org context (only available after auth middleware runs)
-        user_id = await _get_user_id(request)
-        org_id = await _get_org_id(request)
-        api_key_id = await _get_api_key_id(request)
+        # Get user/org context (only available after auth has run)
+        user_id = ctx.state.get("user_id")
+        org_id = None
+        if not ctx.is_gateway:
+            claims = _token_claims(ctx)
+            user_id = user_id or claims.get("sub")
+            org_id = claims.get("org_id")
+        api_key_id = ctx.state.get("api_key_id")
 
         # Determine log level from status code
-        status_code = response.status_code
+        status_code = ctx.status_code
         if status_code >= 500:
             level = "error"
         elif status_code >= 400:
@@ -216,30 +164,28 @@ class LogEmitMiddleware(BaseHTTPMiddleware):
         if status_code >= 500:
             exception = {
                 "type": f"HTTP{status_code}",
-                "message": f"{request.method} {request.url.path} returned {status_code}",
+                "message": f"{ctx.method} {ctx.path} returned {status_code}",
             }
 
-        # Emit request_end event
-        sink.emit(
+        feature = _infer_feature(ctx.path)
+        get_gcs_sink().emit(
             level=level,
-            message=f"[{feature}] {request.method} {request.url.path} {status_code} {duration_ms}ms",
+            message=f"[{feature}] {ctx.method} {ctx.path} {status_code} {duration_ms}ms",
             logger_name="bonito.http",
-            log_type=log_type,
+            log_type=_infer_log_type(ctx.path),
             feature=feature,
-            request_id=request_id,
-            user_id=user_id,
-            org_id=org_id,
+            request_id=ctx.request_id,
+            user_id=str(user_id) if user_id else None,
+            org_id=str(org_id) if org_id else None,
             api_key_id=api_key_id,
-            endpoint=request.url.path,
-            method=request.method,
+            endpoint=ctx.path,
+            method=ctx.method,
             status_code=status_code,
             duration_ms=duration_ms,
-            ip_address=client_ip,
-            user_agent=ua,
+            ip_address=ctx.forwarded_ip,
+            user_agent=ctx.headers.get("user-agent", ""),
             exception=exception,
             extra={
                 "event_type": "request_end",
             },
         )
-
-        return response
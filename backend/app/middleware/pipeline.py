@@ -0,0 +1,252 @@
+"""Raw-ASGI middleware pipeline.
+
+Every request used to pass through six BaseHTTPMiddleware layers plus
+GZipMiddleware. Each BaseHTTPMiddleware layer runs the rest of the app in a
+separate task and hands the response back through a memory stream, which
+costs a task, a stream and a send wrapper per layer per request and sits in
+the path of every SSE chunk from the gateway. Starlette's GZipMiddleware
+also never flushes a streaming response until it ends, so token streams
+arrived in one lump when the client sent Accept-Encoding: gzip.
+
+MiddlewarePipeline replaces the six layers with one ASGI callable that runs
+a list of Stage objects against a shared RequestContext:
+
+    on_request(ctx)          -> None to continue, or a Response to short-circuit
+    on_response_start(ctx, headers)   mutate outgoing headers (innermost first)
+    on_complete(ctx)         after the response has been sent (or failed)
+
+Stages are declared in execution order and opt out of one of the two lanes
+with ``gateway = False`` / ``dashboard = False``. Gateway ``/v1/*`` traffic
+takes a fast lane that skips dashboard-only work (audit checks, JWT decoding
+for log context), and the body of every response, streaming or not, is
+forwarded untouched.
+
+GZipMiddleware below is a drop-in for Starlette's that passes
+``text/event-stream`` responses straight through.
+"""
+
+import logging
+import time
+import zlib
+from typing import List, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_PREFIX = "/v1/"
+
+
+class RequestContext:
+    """Per-request state shared by the pipeline stages."""
+
+    __slots__ = (
+        "scope", "path", "method", "is_gateway", "headers",
+        "request_id", "start", "status_code",
+    )
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.path: str = scope["path"]
+        self.method: str = scope["method"]
+        self.is_gateway = self.path.startswith(GATEWAY_PREFIX)
+        self.headers = Headers(scope=scope)
+        self.request_id: Optional[str] = None
+        self.start = time.monotonic()
+        self.status_code: Optional[int] = None
+
+    @property
+    def state(self) -> dict:
+        """Backing dict of ``request.state`` — values set by routes show up here."""
+        return self.scope.setdefault("state", {})
+
+    @property
+    def client_host(self) -> str:
+        client = self.scope.get("client")
+        return client[0] if client else "unknown"
+
+    @property
+    def forwarded_ip(self) -> str:
+        forwarded = self.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+        return self.client_host
+
+    @property
+    def query_string(self) -> str:
+        return self.scope.get("query_string", b"").decode("latin-1")
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.start) * 1000
+
+
+class Stage:
+    """One step of the pipeline. Override only the hooks you need."""
+
+    gateway = True     # Runs for /v1/* gateway traffic
+    dashboard = True   # Runs for everything else
+
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
+        return None
+
+    def on_response_start(self, ctx: RequestContext, headers: MutableHeaders) -> None:
+        pass
+
+    async def on_complete(self, ctx: RequestContext) -> None:
+        pass
+
+
+class MiddlewarePipeline:
+    """Run a list of stages around an ASGI app in a single layer."""
+
+    def __init__(self, app: ASGIApp, stages: Sequence[Stage] = ()):
+        self.app = app
+        self.stages = list(stages)
+        self._gateway = [s for s in self.stages if s.gateway]
+        self._dashboard = [s for s in self.stages if s.dashboard]
+        self._header_stages = {
+            s for s in self.stages if type(s).on_response_start is not Stage.on_response_start
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ctx = RequestContext(scope)
+        stages = self._gateway if ctx.is_gateway else self._dashboard
+
+        entered: List[Stage] = []
+        early: Optional[Response] = None
+        for stage in stages:
+            early = await stage.on_request(ctx)
+            if early is not None:
+                break
+            entered.append(stage)
+
+        # Header hooks run innermost first, as they did when each stage was a layer
+        header_stages = [s for s in reversed(entered) if s in self._header_stages]
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                ctx.status_code = message["status"]
+                if header_stages:
+                    headers = MutableHeaders(scope=message)
+                    for stage in header_stages:
+                        stage.on_response_start(ctx, headers)
+            await send(message)
+
+        try:
+            if early is not None:
+                await early(scope, receive, send_wrapper)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if ctx.status_code is None:
+                ctx.status_code = 500
+            await self._complete(entered, ctx)
+            raise
+        await self._complete(entered, ctx)
+
+    @staticmethod
+    async def _complete(entered: List[Stage], ctx: RequestContext) -> None:
+        for stage in reversed(entered):
+            try:
+                await stage.on_complete(ctx)
+            except Exception:
+                logger.exception(f"Middleware stage {type(stage).__name__} failed on completion")
+
+
+# ---------------------------------------------------------------------------
+# GZip
+# ---------------------------------------------------------------------------
+class GZipMiddleware:
+    """Starlette's GZipMiddleware, minus the buffering of event streams.
+
+    ``text/event-stream`` responses and responses that already carry a
+    Content-Encoding are passed through as they are produced. Everything
+    else is compressed exactly as before: small bodies go out as-is, whole
+    bodies are compressed in one go, and other streaming bodies are
+    compressed incrementally.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 9):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("accept-encoding", ""):
+            await _GZipResponder(self.app, self.minimum_size, self.compresslevel)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class _GZipResponder:
+    def __init__(self, app: ASGIApp, minimum_size: int, compresslevel: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.send: Optional[Send] = None
+        self.initial_message: Optional[Message] = None
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_gzip)
+
+    def _compressor(self):
+        # wbits=31 -> gzip container
+        return zlib.compressobj(self.compresslevel, zlib.DEFLATED, 31)
+
+    async def send_with_gzip(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers or headers.get("content-type", "").startswith("text/event-stream"):
+                # Send headers now so the client sees the stream open immediately
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.initial_message = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.initial_message is not None:
+            initial, self.initial_message = self.initial_message, None
+            if len(body) < self.minimum_size and not more_body:
+                # Don't compress small responses
+                self.passthrough = True
+                await self.send(initial)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=initial["headers"])
+            headers["Content-Encoding"] = "gzip"
+            headers.add_vary_header("Accept-Encoding")
+            self.compressor = self._compressor()
+            if more_body:
+                del headers["Content-Length"]
+                message["body"] = self.compressor.compress(body)
+            else:
+                message["body"] = self.compressor.compress(body) + self.compressor.flush()
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.send(initial)
+            await self.send(message)
+            return
+
+        # Remaining body of a streaming (non-SSE) response
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.flush()
+        message["body"] = chunk
+        await self.send(message)
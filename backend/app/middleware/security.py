@@ -1,18 +1,18 @@
-"""Security middleware: rate limiting, request IDs, security headers."""
+"""Security pipeline stages: rate limiting, request IDs, security headers."""
 
 import os
 import uuid
-import time
 import logging
+from typing import Optional
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from starlette.datastructures import MutableHeaders
 from starlette.responses import Response, JSONResponse
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.core.redis import get_redis
+from app.middleware.pipeline import RequestContext, Stage
 
 logger = logging.getLogger(__name__)
 
@@ -40,58 +40,59 @@ def _get_rate_limit(path: str) -> tuple[int, int]:
     return DEFAULT_RATE_LIMIT
 
 
-def _client_ip(request: Request) -> str:
+def _client_ip(ctx: RequestContext) -> str:
     """Return the direct connection IP for rate-limiting.
 
     Never trust X-Forwarded-For blindly — it can be spoofed by any client.
     We use the socket-level peer address which cannot be forged.
     """
-    return request.client.host if request.client else "unknown"
+    return ctx.client_host
 
 
 # ---------------------------------------------------------------------------
-# Request Body Size Limit Middleware
+# Request Body Size Limit
 # ---------------------------------------------------------------------------
 # Maximum body size for /v1/* gateway endpoints (10 MB).
 # Supports enterprise RAG pipelines, multi-document ingestion, code review snapshots.
 GATEWAY_MAX_BODY_BYTES = 10 * 1024 * 1024
 
 
-class RequestBodySizeLimitMiddleware(BaseHTTPMiddleware):
+class RequestBodySizeLimitStage(Stage):
     """Reject oversized request bodies on gateway /v1/* endpoints.
 
     This prevents attackers from sending massive prompts that incur
     cloud costs. Returns 413 Payload Too Large if exceeded.
     """
 
-    async def dispatch(self, request: Request, call_next):
-        if request.url.path.startswith("/v1/"):
-            content_length = request.headers.get("content-length")
-            if content_length and int(content_length) > GATEWAY_MAX_BODY_BYTES:
-                return JSONResponse(
-                    status_code=413,
-                    content={
-                        "error": {
-                            "message": f"Request body too large. Maximum size is {GATEWAY_MAX_BODY_BYTES // 1024}KB.",
-                            "type": "invalid_request_error",
-                            "code": "payload_too_large",
-                        }
-                    },
-                )
-        return await call_next(request)
+    dashboard = False
+
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
+        content_length = ctx.headers.get("content-length")
+        if content_length and int(content_length) > GATEWAY_MAX_BODY_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={
+                    "error": {
+                        "message": f"Request body too large. Maximum size is {GATEWAY_MAX_BODY_BYTES // 1024}KB.",
+                        "type": "invalid_request_error",
+                        "code": "payload_too_large",
+                    }
+                },
+            )
+        return None
 
 
 # ---------------------------------------------------------------------------
-# Rate Limiting Middleware
+# Rate Limiting
 # ---------------------------------------------------------------------------
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class RateLimitStage(Stage):
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
         # Skip rate limiting in test environment
         if os.environ.get("TESTING"):
-            return await call_next(request)
+            return None
 
-        ip = _client_ip(request)
-        path = request.url.path
+        ip = _client_ip(ctx)
+        path = ctx.path
         limit, window = _get_rate_limit(path)
 
         # Determine bucket key based on tier
@@ -133,52 +134,55 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 headers={"Retry-After": "5"},
             )
 
-        return await call_next(request)
+        return None
 
 
 # ---------------------------------------------------------------------------
-# Request ID Middleware
+# Request ID
 # ---------------------------------------------------------------------------
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
-        request.state.request_id = request_id
-        
-        start_time = time.time()
-        response: Response = await call_next(request)
-        duration_ms = round((time.time() - start_time) * 1000, 2)
-        
+class RequestIDStage(Stage):
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
+        ctx.request_id = ctx.headers.get("x-request-id") or str(uuid.uuid4())
+        ctx.state["request_id"] = ctx.request_id
+        return None
+
+    def on_response_start(self, ctx: RequestContext, headers: MutableHeaders) -> None:
+        headers["X-Request-ID"] = ctx.request_id
+
+    async def on_complete(self, ctx: RequestContext) -> None:
         # Log the request
         logger.info(
-            f"{request.method} {request.url.path} -> {response.status_code}",
+            f"{ctx.method} {ctx.path} -> {ctx.status_code}",
             extra={
-                "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
-                "duration_ms": duration_ms,
+                "request_id": ctx.request_id,
+                "method": ctx.method,
+                "path": ctx.path,
+                "status_code": ctx.status_code,
+                "duration_ms": round(ctx.elapsed_ms(), 2),
             }
         )
-        
-        response.headers["X-Request-ID"] = request_id
-        return response
 
 
 # ---------------------------------------------------------------------------
-# Security Headers Middleware
+# Security Headers
 # ---------------------------------------------------------------------------
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response: Response = await call_next(request)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), camera=(), microphone=()"
-        response.headers["Cache-Control"] = "no-store"
+class SecurityHeadersStage(Stage):
+    def __init__(self):
+        headers = {
+            "X-Content-Type-Options": "nosniff",
+            "X-Frame-Options": "DENY",
+            "X-XSS-Protection": "1; mode=block",
+            "Referrer-Policy": "strict-origin-when-cross-origin",
+            "Permissions-Policy": "geolocation=(), camera=(), microphone=()",
+            "Cache-Control": "no-store",
+        }
         if not _is_dev():
-            response.headers["Strict-Transport-Security"] = "max-age=63072000; includeSubDomains"
-        return response
+            headers["Strict-Transport-Security"] = "max-age=63072000; includeSubDomains"
+        self.headers = headers
+
+    def on_response_start(self, ctx: RequestContext, headers: MutableHeaders) -> None:
+        for name, value in self.headers.items():
+            headers[name] = value
 
 
 # ---------------------------------------------------------------------------
@@ -5,7 +5,7 @@ from app.models.deployment import Deployment
 from app.models.cost import CostRecord
 from app.models.user import User
 from app.models.policy import Policy
-from app.models.audit import AuditLog
+from app.models.audit import AuditLog, AuditChainCheckpoint
 from app.models.onboarding import OnboardingProgress
 from app.models.gateway import GatewayRequest, GatewayKey, GatewayRateLimit, GatewayConfig
 from app.models.notifications import Notification, AlertRule, NotificationPreference
@@ -17,6 +17,7 @@ from app.models.agent import Agent
 from app.models.agent_session import AgentSession
 from app.models.agent_message import AgentMessage
 from app.models.agent_connection import AgentConnection
+from app.models.agent_interaction import AgentInteraction, AgentInteractionMessage
 from app.models.agent_trigger import AgentTrigger
 from app.models.agent_mcp_server import AgentMCPServer
 # Enterprise features
@@ -43,7 +44,7 @@ from app.models.refresh_token import RefreshToken
 
 # Secrets and KB models
 from app.models.org_secret import OrgSecret
-from app.models.knowledge_base import KnowledgeBase, KBDocument, KBChunk
+from app.models.knowledge_base import KnowledgeBase, KBDocument, KBChunk, KBEmbedding
 
 # Discover
 from app.models.discover_log import DiscoverLog
@@ -57,4 +58,4 @@ from app.models.access_token import AccessToken
 # Project manifests (snapshot for restore_project)
 from app.models.project_manifest import ProjectManifest
 
-__all__ = ["Organization", "CloudProvider", "Model", "Deployment", "CostRecord", "User", "Policy", "AuditLog", "OnboardingProgress", "GatewayRequest", "GatewayKey", "GatewayRateLimit", "GatewayConfig", "Notification", "AlertRule", "NotificationPreference", "SSOConfig", "Project", "Agent", "AgentSession", "AgentMessage", "AgentConnection", "AgentTrigger", "AgentMCPServer", "AgentGroup", "Role", "RoleAssignment", "LogIntegration", "PlatformLog", "LogExportJob", "LogAggregation", "AgentMemory", "AgentSchedule", "ScheduledExecution", "AgentApprovalAction", "AgentApprovalConfig", "GitHubAppInstallation", "GitHubReviewUsage", "CodeReviewSnapshot", "OrgSecret", "KnowledgeBase", "KBDocument", "KBChunk", "DiscoverLog", "AgentScalingEvent", "AccessToken", "ProjectManifest"]
+__all__ = ["Organization", "CloudProvider", "Model", "Deployment", "CostRecord", "User", "Policy", "AuditLog", "AuditChainCheckpoint", "OnboardingProgress", "GatewayRequest", "GatewayKey", "GatewayRateLimit", "GatewayConfig", "Notification", "AlertRule", "NotificationPreference", "SSOConfig", "Project", "Agent", "AgentSession", "AgentMessage", "AgentConnection", "AgentInteraction", "AgentInteractionMessage", "AgentTrigger", "AgentMCPServer", "AgentGroup", "Role", "RoleAssignment", "LogIntegration", "PlatformLog", "LogExportJob", "LogAggregation", "AgentMemory", "AgentSchedule", "ScheduledExecution", "AgentApprovalAction", "AgentApprovalConfig", "GitHubAppInstallation", "GitHubReviewUsage", "CodeReviewSnapshot", "OrgSecret", "KnowledgeBase", "KBDocument", "KBChunk", "KBEmbedding", "DiscoverLog", "AgentScalingEvent", "AccessToken", "ProjectManifest"]
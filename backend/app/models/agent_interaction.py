@@ -0,0 +1,57 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import String, DateTime, ForeignKey, Integer, BigInteger, Numeric, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class AgentInteraction(Base):
+    """Hourly roll-up of agent -> agent calls (invoke_agent / delegate_task) for breadcrumbs."""
+
+    __tablename__ = "agent_interactions"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    org_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
+    project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    source_agent_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("agents.id", ondelete="CASCADE"), nullable=False)
+    target_agent_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("agents.id", ondelete="CASCADE"), nullable=False)
+    kind: Mapped[str] = mapped_column(String(30), nullable=False)  # "invoke_agent", "delegate_task"
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)  # start of the hour (UTC)
+
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_cost: Mapped[Decimal] = mapped_column(Numeric(precision=12, scale=6), nullable=False, default=0)
+    total_latency_ms: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index(
+            "uq_agent_interactions_edge_bucket",
+            "source_agent_id", "target_agent_id", "kind", "bucket",
+            unique=True,
+        ),
+        Index("ix_agent_interactions_project_bucket", "project_id", "bucket"),
+    )
+
+
+class AgentInteractionMessage(Base):
+    """One row per agent -> agent call, pointing at the message that carries it (edge drill-down)."""
+
+    __tablename__ = "agent_interaction_messages"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    source_agent_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("agents.id", ondelete="CASCADE"), nullable=False)
+    target_agent_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("agents.id", ondelete="CASCADE"), nullable=False)
+    message_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("agent_messages.id", ondelete="CASCADE"), nullable=False)
+    tool_call_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    kind: Mapped[str] = mapped_column(String(30), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_agent_interaction_messages_edge_created", "source_agent_id", "target_agent_id", "created_at"),
+        Index("uq_agent_interaction_messages_call", "message_id", "tool_call_id", unique=True),
+    )
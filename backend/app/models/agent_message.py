@@ -3,7 +3,7 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Optional
 
-from sqlalchemy import String, DateTime, Text, ForeignKey, Integer, Boolean, JSON, Numeric
+from sqlalchemy import String, DateTime, Text, ForeignKey, Integer, Boolean, JSON, Numeric, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -37,10 +37,14 @@ class AgentMessage(Base):
     latency_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     
     # Ordering
-    sequence: Mapped[int] = mapped_column(Integer, nullable=False)  # ordering within session
+    sequence: Mapped[int] = mapped_column(Integer, nullable=False)  # ordering within session (see AgentSession.next_sequence)
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    session = relationship("AgentSession", back_populates="messages")
\ No newline at end of file
+    session = relationship("AgentSession", back_populates="messages")
+
+    __table_args__ = (
+        Index("uq_agent_messages_session_sequence", "session_id", "sequence", unique=True),
+    )
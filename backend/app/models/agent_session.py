@@ -24,6 +24,9 @@ class AgentSession(Base):
     message_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     total_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
     total_cost: Mapped[Decimal] = mapped_column(Numeric(precision=10, scale=4), nullable=False, default=0)
+
+    # Next unreserved AgentMessage.sequence; writers reserve blocks from it atomically
+    next_sequence: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
     
     # Configuration
     session_metadata: Mapped[dict] = mapped_column("metadata", JSON, default=dict)
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, DateTime, ForeignKey, JSON, Index
+from sqlalchemy import BigInteger, String, DateTime, ForeignKey, JSON, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 
@@ -24,10 +24,46 @@ class AuditLog(Base):
     # SOC2 CC9.2: Tamper-evident hash chain
     prev_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     entry_hash: Mapped[str] = mapped_column(String(64), nullable=False, server_default="")
+    # Position in the org's chain (assigned by services/audit_chain.py); NULL for unchained rows
+    chain_seq: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     __table_args__ = (
         Index("idx_audit_logs_org_created", "org_id", "created_at"),
         Index("idx_audit_logs_action", "action", "created_at"),
         Index("idx_audit_logs_ip", "ip_address", "created_at"),
+        Index("uq_audit_logs_org_chain_seq", "org_id", "chain_seq", unique=True),
+        # NULLs are distinct above, so the system chain (org_id NULL) needs its own
+        Index(
+            "uq_audit_logs_system_chain_seq", "chain_seq", unique=True,
+            postgresql_where=text("org_id IS NULL"), sqlite_where=text("org_id IS NULL"),
+        ),
+    )
+
+
+class AuditChainCheckpoint(Base):
+    """Periodic commitment to an org's audit chain.
+
+    Written every CHECKPOINT_INTERVAL entries in the same transaction as the
+    entry that closes the interval: the chain head at that point plus the
+    Merkle root of the interval's entry hashes. Verification resumes from the
+    newest checkpoint it has already verified.
+    """
+    __tablename__ = "audit_chain_checkpoints"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    org_id: Mapped[Optional[uuid.UUID]] = mapped_column(ForeignKey("organizations.id"), nullable=True)
+    seq: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    entry_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    merkle_root: Mapped[str] = mapped_column(String(64), nullable=False)
+    entry_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    verified_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("uq_audit_chain_checkpoints_org_seq", "org_id", "seq", unique=True),
+        Index(
+            "uq_audit_chain_checkpoints_system_seq", "seq", unique=True,
+            postgresql_where=text("org_id IS NULL"), sqlite_where=text("org_id IS NULL"),
+        ),
     )
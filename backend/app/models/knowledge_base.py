@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from typing import Optional, List
 
-from sqlalchemy import String, DateTime, Integer, Float, ForeignKey, BigInteger, Index, Boolean, JSON, Text, Column
+from sqlalchemy import String, DateTime, Integer, Float, ForeignKey, BigInteger, Index, Boolean, JSON, Text, Column, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import ARRAY
@@ -30,6 +30,7 @@ class KnowledgeBase(Base):
 
     # Compression configuration (VectorPack)
     compression_method: Mapped[Optional[str]] = mapped_column(String(50), nullable=True, default=None)  # null/None = off, "scalar-8bit", "polar-4bit", "polar-8bit"
+    retrieval_config: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True, default=None)  # {"mode", "oversample", "recall_target"}, see kb_retrieval
     
     # Status
     status: Mapped[str] = mapped_column(String(20), default='pending')  # pending, syncing, ready, error
@@ -38,6 +39,7 @@ class KnowledgeBase(Base):
     total_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
     last_synced_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     sync_schedule: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)  # cron expression
+    sync_state: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True, default=None)  # checkpoint of the current/last storage sync, see kb_sync
     
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -97,6 +99,7 @@ class KBChunk(Base):
     
     # Content
     content: Mapped[str] = mapped_column(Text, nullable=False)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)  # sha256 of the normalized text, see kb_embedding_store
     token_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     chunk_index: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # position within document
     
@@ -122,4 +125,22 @@ class KBChunk(Base):
         Index("ix_kb_chunks_document_id", "document_id"),
         Index("ix_kb_chunks_org_id", "org_id"),
         # HNSW index for embedding is created in the migration
-    )
\ No newline at end of file
+    )
+
+
+class KBEmbedding(Base):
+    """Embedding of a chunk's normalized text, shared by every document and KB in the org."""
+
+    __tablename__ = "kb_embeddings"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    org_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    dimensions: Mapped[int] = mapped_column(Integer, nullable=False)  # 0 = model's native size
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    embedding: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # pgvector binary format (app.core.pgvector)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("uq_kb_embeddings_key", "org_id", "model", "dimensions", "content_hash", unique=True),
+    )
@@ -5,7 +5,7 @@ from typing import Optional, Dict, Any
 from sqlalchemy import String, DateTime, Integer, Float, ForeignKey, BigInteger, Index, Boolean, Text, Date
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 
 from app.core.database import Base
 
@@ -86,11 +86,16 @@ class LogExportJob(Base):
     error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # Bumped by the export worker with each progress update
     completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     __table_args__ = (
         Index("ix_log_export_jobs_org_status", "org_id", "status"),
         Index("ix_log_export_jobs_user_created", "user_id", "created_at"),
+        Index(
+            "ix_log_export_jobs_claimable", "status", "created_at",
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
     )
 
 
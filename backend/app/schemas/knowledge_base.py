@@ -182,6 +182,9 @@ class KBSyncStatus(BaseModel):
     progress_percentage: Optional[int] = None
     files_processed: int = 0
     files_total: int = 0
+    files_failed: int = 0
+    files_skipped: int = 0  # unchanged since the last sync
+    files_deleted: int = 0
     current_file: Optional[str] = None
     error_message: Optional[str] = None
     started_at: Optional[datetime] = None
@@ -208,6 +211,7 @@ class KBStats(BaseModel):
     status_counts: Dict[str, int]  # {"ready": 8, "processing": 2, ...}
     avg_chunk_size: float
     last_sync: Optional[datetime]
+    compression: Optional[Dict[str, Any]] = None  # compressed store size, re-encode state, retrieval latency
 
 
 # ─── Gateway integration schemas (for RAG) ───
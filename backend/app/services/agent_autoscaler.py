@@ -5,6 +5,7 @@ Phase 1 ("virtual scaling"): raises the effective RPM in Redis — no replica ag
 Phase 2 ("replica"): creates clone agents and load-balances across them.
 
 Scale-up is reactive (checked on every request in _check_rate_limit).
+Utilization is read from the shared sliding-window limiter (rate_limiter).
 Scale-down runs in a background loop (30s interval, advisory-locked).
 """
 
@@ -19,6 +20,7 @@ from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import async_session
+from app.services import rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +59,16 @@ def _get_config(agent) -> dict:
     }
 
 
+def rate_limit_args(agent) -> tuple[str, str | None]:
+    """Sliding-window key prefix and effective-RPM override key for an agent.
+
+    The override key is only consulted when autoscaling is enabled, matching
+    get_effective_rpm.
+    """
+    limit_key = _EFFECTIVE_RPM_KEY.format(agent_id=agent.id) if agent.autoscale_enabled else None
+    return f"agent_rate:{agent.id}", limit_key
+
+
 async def get_effective_rpm(agent, redis: Redis) -> int:
     """Get the current effective RPM for an agent.
 
@@ -181,8 +193,6 @@ async def _scale_down_check():
             )
             agents = result.scalars().all()
 
-            current_minute = int(time.time() // 60)
-
             for agent in agents:
                 cfg = _get_config(agent)
 
@@ -197,10 +207,9 @@ async def _scale_down_check():
                     await redis.delete(rpm_key)
                     continue
 
-                # Get current utilization
-                rate_key = f"agent_rate:{agent.id}:{current_minute}"
-                count_str = await redis.get(rate_key)
-                current_count = int(count_str) if count_str else 0
+                # Get current utilization (sliding window)
+                usage = await rate_limiter.peek(redis, f"agent_rate:{agent.id}", effective_rpm)
+                current_count = usage.used
                 utilization = current_count / effective_rpm if effective_rpm > 0 else 0
 
                 if utilization >= cfg["scale_down_threshold"]:
@@ -291,10 +300,8 @@ async def get_scaling_status(agent, redis: Redis) -> dict:
     effective_rpm = await get_effective_rpm(agent, redis)
     scaling_active = effective_rpm > agent.rate_limit_rpm
 
-    current_minute = int(time.time() // 60)
-    rate_key = f"agent_rate:{agent.id}:{current_minute}"
-    count_str = await redis.get(rate_key)
-    current_count = int(count_str) if count_str else 0
+    usage = await rate_limiter.peek(redis, f"agent_rate:{agent.id}", effective_rpm)
+    current_count = usage.used
     utilization = current_count / effective_rpm if effective_rpm > 0 else 0
 
     scaled_key = _SCALED_AT_KEY.format(agent_id=agent.id)
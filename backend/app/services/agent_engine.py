@@ -14,7 +14,8 @@ SECURITY-FIRST DESIGN:
 - Session isolation and limits
 
 ASYNC ORCHESTRATION (v2):
-- Parallel invoke_agent: multiple invoke_agent tool calls in a single turn run concurrently via asyncio.gather
+- Parallel tool calls: consecutive read-only tool calls (and invoke_agent) in a single turn run
+  concurrently, each on its own DB session; mutating calls run alone, in the model's order
 - delegate_task: fire-and-forget background sub-agent execution, returns task_id immediately
 - check_task: poll a background task's status by task_id
 - collect_results: wait for multiple background tasks to complete and gather results
@@ -29,14 +30,15 @@ import logging
 import re
 import time
 import httpx
+from contextvars import ContextVar
 from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Optional, List, Dict, Any
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from urllib.parse import urlparse
 from ipaddress import ip_address, IPv4Address, IPv6Address
 
 from fastapi import HTTPException
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from redis.asyncio import Redis
 
@@ -49,9 +51,13 @@ from app.models.knowledge_base import KnowledgeBase, KBChunk
 from app.models.audit import AuditLog
 from app.schemas.bonobot import AgentRunResult, SecurityMetadata
 from app.services.gateway import chat_completion as gateway_chat_completion
+from app.services.gateway import chat_completion_stream as gateway_chat_completion_stream
 from app.services.kb_content import search_knowledge_base
 from app.services.audit_service import log_audit_event
-from app.services.mcp_client import MCPClientManager, make_namespaced_tool_name
+from app.services.agent_interactions import INTERACTION_KINDS, record_interaction
+from app.services.agent_message_writer import AgentMessageWriter
+from app.services.mcp_client import MCPClientManager, make_namespaced_tool_name, mcp_pool
+from app.services.task_notify import TaskWaiter, publish_task_done, task_channel
 # Enterprise feature services
 from app.services.agent_memory_service import AgentMemoryService
 from app.services.agent_approval_service import AgentApprovalService
@@ -85,6 +91,38 @@ BACKGROUND_TASK_TTL = 300  # 5 minutes
 # Maximum wait time for collect_results (seconds)
 COLLECT_RESULTS_MAX_WAIT = 60
 
+# Maximum tool calls running at once within one execution
+MAX_PARALLEL_TOOL_CALLS = 4
+
+# Events buffered between a streamed execution and its client. A slow client
+# holds the execution back instead of growing the buffer.
+STREAM_EVENT_BUFFER = 64
+
+# Receives (event, data) as a streamed execution progresses
+EventSink = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# The running execution, as the parent of the tasks it delegates. A context
+# variable rather than engine state: engines are shared between requests.
+_execution_id: ContextVar[Optional[str]] = ContextVar("agent_execution_id", default=None)
+
+# Progress events of the running execution, when it is streamed (see execute_stream)
+_event_sink: ContextVar[Optional[EventSink]] = ContextVar("agent_event_sink", default=None)
+
+# MCP connections of the running execution. Its pooled leases are exclusive,
+# so they must be released by the execution that took them.
+_mcp_manager: ContextVar[Optional[MCPClientManager]] = ContextVar("agent_mcp_manager", default=None)
+
+# Streamed executions still finishing after their client went away
+_detached_runs: Set[asyncio.Task] = set()
+
+# Built-in tools without side effects. Calls to these in one model turn may run
+# concurrently; so may MCP tools annotated readOnlyHint and GET http_requests.
+# invoke_agent also runs concurrently (each sub-agent gets its own session).
+# Every other call is treated as mutating and runs alone, in order.
+READ_ONLY_TOOLS = frozenset({
+    "search_knowledge_base", "get_current_time", "list_models", "check_task",
+})
+
 
 class AgentEngine:
     """OpenClaw-inspired agent execution engine with enterprise security."""
@@ -97,9 +135,6 @@ class AgentEngine:
         # Track recursion depth for nested agent invocations
         self._depth = _depth
         
-        # MCP client manager for this engine instance
-        self._mcp_manager: Optional[MCPClientManager] = None
-        
         # Enterprise feature services
         self._memory_service = AgentMemoryService()
         self._approval_service = AgentApprovalService()
@@ -138,9 +173,15 @@ class AgentEngine:
         db: AsyncSession,
         redis: Redis,
         session_id: Optional[uuid.UUID] = None,
-        user_id: Optional[uuid.UUID] = None
+        user_id: Optional[uuid.UUID] = None,
+        on_event: Optional[EventSink] = None,
     ) -> AgentRunResult:
-        """Run a single agent turn with comprehensive security controls."""
+        """Run a single agent turn with comprehensive security controls.
+
+        With *on_event*, model output is streamed from the gateway and
+        progress is reported as it happens: ``session``, ``token``,
+        ``tool_start``, ``tool_end`` and ``memory`` events.
+        """
         
         # SECURITY STEP 1: Rate limiting check (with HPA autoscale)
         _rl_remaining, _rl_effective_rpm, _rl_scaling_active = await self._check_rate_limit(agent, redis)
@@ -160,24 +201,31 @@ class AgentEngine:
             await db.rollback()
             audit_id = uuid.uuid4()  # placeholder
         
+        execution = _execution_id.set(uuid.uuid4().hex)
+        sink = _event_sink.set(on_event)
+        mcp = _mcp_manager.set(None)
         try:
             # 1. Resolve or create session
             session = await self._resolve_session(agent, session_id, db)
             
             # SECURITY STEP 5: Session message limit enforcement
             await self._enforce_session_limits(agent, session, db)
+            await self._emit("session", {"session_id": str(session.id), "agent_id": str(agent.id)})
             
             # 2. Connect to MCP servers (if any configured)
             await self._connect_mcp_servers(agent, db)
             
-            # 3. Persist user message
-            await self._persist_message(session, role="user", content=sanitized_message, db=db)
+            # 3. Persist user message (flushed now: context assembly reads the history).
+            # The writer is per execution — engines are shared between concurrent requests.
+            writer = AgentMessageWriter(db, session)
+            writer.add("user", content=sanitized_message)
+            await writer.flush()
             
             # 4. Assemble context + tools (including dynamic invoke_agent + MCP tools)
             messages, tools = await self._assemble_context(agent, session, sanitized_message, db)
             
             # 5. Agent loop (with tool execution and security)
-            result = await self._run_agent_loop(agent, session, messages, tools, db, redis, audit_id)
+            result = await self._run_agent_loop(agent, session, messages, tools, db, redis, audit_id, writer)
 
             # Update security metadata with input sanitization flag
             result.security.input_sanitized = input_sanitized
@@ -185,7 +233,7 @@ class AgentEngine:
             # 5b. Store conversation turn in Memwright (non-fatal)
             if result.content:
                 try:
-                    await self._memwright.store(
+                    stored = await self._memwright.store(
                         session_id=str(session.id),
                         agent_id=str(agent.id),
                         org_id=str(agent.org_id),
@@ -193,6 +241,8 @@ class AgentEngine:
                         assistant_msg=result.content,
                         model_id=agent.model_id,
                     )
+                    if stored:
+                        await self._emit("memory", {"store": "memwright", "session_id": str(session.id)})
                 except Exception as e:
                     logger.warning(f"Memwright store failed (non-fatal): {e}")
 
@@ -214,6 +264,74 @@ class AgentEngine:
         finally:
             # Always disconnect MCP servers when done
             await self._disconnect_mcp_servers()
+            _mcp_manager.reset(mcp)
+            _event_sink.reset(sink)
+            _execution_id.reset(execution)
+
+    async def execute_stream(
+        self,
+        agent_id: uuid.UUID,
+        message: str,
+        redis: Redis,
+        session_id: Optional[uuid.UUID] = None,
+        user_id: Optional[uuid.UUID] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Run ``execute`` and yield its progress as (event, data) pairs.
+
+        Ends with ``("done", AgentRunResult)`` or ``("error", exception)``.
+        The execution runs in its own task and DB session, so a client that
+        stops reading doesn't cut it short: it finishes, persists and
+        commits as a non-streamed execution would, with events dropped.
+        """
+        from app.core.database import get_db_session
+
+        events: asyncio.Queue = asyncio.Queue(maxsize=STREAM_EVENT_BUFFER)
+        detached = False
+
+        async def _emit(event: str, data: Any) -> None:
+            if not detached:
+                await events.put((event, data))
+
+        async def _run() -> None:
+            try:
+                async with get_db_session() as db:
+                    agent = await db.get(Agent, agent_id)
+                    if agent is None:
+                        raise ValueError(f"Agent {agent_id} not found")
+                    result = await self.execute(
+                        agent=agent,
+                        message=message,
+                        db=db,
+                        redis=redis,
+                        session_id=session_id,
+                        user_id=user_id,
+                        on_event=_emit,
+                    )
+                await _emit("done", result)
+            except Exception as e:
+                await _emit("error", e)
+
+        task = asyncio.create_task(_run())
+        try:
+            while True:
+                event, data = await events.get()
+                yield event, data
+                if event in ("done", "error"):
+                    return
+        finally:
+            if not task.done():
+                # Client went away — let the execution finish unobserved
+                detached = True
+                while not events.empty():
+                    events.get_nowait()
+                _detached_runs.add(task)
+                task.add_done_callback(_detached_runs.discard)
+
+    async def _emit(self, event: str, data: Dict[str, Any]) -> None:
+        """Report progress to a streaming caller, if there is one."""
+        sink = _event_sink.get()
+        if sink is not None:
+            await sink(event, data)
 
     async def _resolve_session(
         self,
@@ -249,57 +367,42 @@ class AgentEngine:
         await db.flush()  # Get ID
         return session
 
-    async def _persist_message(
+    async def _record_interaction(
         self,
-        session: AgentSession,
-        role: str,
+        agent: Agent,
+        message: AgentMessage,
+        tool_call: Dict[str, Any],
+        tool_name: str,
+        result: Any,
+        execution_time_ms: int,
         db: AsyncSession,
-        content: Optional[str] = None,
-        tool_calls: Optional[Dict] = None,
-        tool_call_id: Optional[str] = None,
-        tool_name: Optional[str] = None,
-        model_used: Optional[str] = None,
-        input_tokens: Optional[int] = None,
-        output_tokens: Optional[int] = None,
-        cost: Optional[Decimal] = None,
-        latency_ms: Optional[int] = None,
-    ):
-        """Persist a message to the session."""
-        # Get next sequence number
-        stmt = select(func.coalesce(func.max(AgentMessage.sequence), 0) + 1).where(
-            AgentMessage.session_id == session.id
-        )
-        result = await db.execute(stmt)
-        sequence = result.scalar()
-
-        message = AgentMessage(
-            session_id=session.id,
-            org_id=session.org_id,
-            role=role,
-            content=content,
-            tool_calls=tool_calls,
-            tool_call_id=tool_call_id,
-            tool_name=tool_name,
-            model_used=model_used,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
-            cost=cost,
-            latency_ms=latency_ms,
-            sequence=sequence
-        )
-        db.add(message)
-        
-        # Update session stats
-        session.message_count += 1
-        session.last_message_at = datetime.now(timezone.utc)
-        if cost:
-            session.total_cost += cost
-        if input_tokens and output_tokens:
-            session.total_tokens += (input_tokens + output_tokens)
-        elif output_tokens:
-            session.total_tokens += output_tokens
-
-        await db.flush()
+        writer: AgentMessageWriter,
+    ) -> None:
+        """Add a completed invoke_agent / delegate_task call to the breadcrumbs ledger."""
+        if not isinstance(result, dict) or "error" in result:
+            return  # rejected before reaching a valid target agent
+        # The ledger row references the assistant message, still buffered in *writer*
+        await writer.flush()
+        try:
+            args = tool_call.get("function", {}).get("arguments") or "{}"
+            args = json.loads(args) if isinstance(args, str) else args
+            target_agent_id = uuid.UUID(str(args.get("agent_id")))
+            # Savepoint: a ledger failure must not abort the run's transaction
+            async with db.begin_nested():
+                await record_interaction(
+                    db,
+                    org_id=agent.org_id,
+                    project_id=agent.project_id,
+                    source_agent_id=agent.id,
+                    target_agent_id=target_agent_id,
+                    kind=tool_name,
+                    message_id=message.id,
+                    tool_call_id=str(tool_call.get("id") or (message.tool_calls or []).index(tool_call)),
+                    cost=result.get("cost") or 0,
+                    latency_ms=execution_time_ms,
+                )
+        except Exception as e:
+            logger.warning(f"Could not record {tool_name} interaction for agent {agent.id}: {e}")
 
     async def _get_connected_agents(self, agent: Agent, db: AsyncSession) -> List[Dict[str, Any]]:
         """Load agents connected to this agent (outbound handoff/escalation connections)."""
@@ -343,7 +446,10 @@ class AgentEngine:
         if not mcp_servers:
             return
 
-        self._mcp_manager = MCPClientManager()
+        # Connections and tool catalogs come from the per-org pool, so a warm
+        # execution skips process spawn, initialize and tools/list
+        manager = MCPClientManager(pool=mcp_pool, org_id=agent.org_id)
+        _mcp_manager.set(manager)
         server_configs = [
             {
                 "id": str(s.id),
@@ -355,23 +461,26 @@ class AgentEngine:
             for s in mcp_servers
         ]
 
-        mcp_tools = await self._mcp_manager.connect_servers(server_configs)
+        mcp_tools = await manager.connect_servers(server_configs)
 
         # Update discovered_tools cache in DB
         for s in mcp_servers:
             server_id = str(s.id)
-            client = self._mcp_manager._clients.get(server_id)
+            client = manager._clients.get(server_id)
             if client and client.connected:
-                s.discovered_tools = [t.to_dict() for t in client.tools]
+                discovered = [t.to_dict() for t in manager.server_tools(server_id)]
+                if s.discovered_tools != discovered:
+                    s.discovered_tools = discovered
                 s.last_connected_at = datetime.now(timezone.utc)
 
         await db.flush()
 
     async def _disconnect_mcp_servers(self) -> None:
         """Disconnect all MCP clients."""
-        if self._mcp_manager:
-            await self._mcp_manager.disconnect_all()
-            self._mcp_manager = None
+        manager = _mcp_manager.get()
+        if manager:
+            _mcp_manager.set(None)
+            await manager.disconnect_all()
 
     async def _assemble_context(
         self,
@@ -392,16 +501,15 @@ class AgentEngine:
         tools = self._get_tool_definitions(agent, connected_agents)
         
         # Merge MCP tools into the tool list
-        if self._mcp_manager:
-            for namespaced_name, (server_id, original_name) in self._mcp_manager._tool_map.items():
+        mcp_manager = _mcp_manager.get()
+        if mcp_manager:
+            for namespaced_name, (server_id, original_name) in mcp_manager._tool_map.items():
                 # Check if the MCP tool is allowed by tool policy
                 if self._is_tool_allowed(agent, namespaced_name):
-                    client = self._mcp_manager._clients.get(server_id)
-                    if client:
-                        for tool_def in client.tools:
-                            if tool_def.name == original_name:
-                                tools.append(tool_def.to_openai_tool(namespaced_name))
-                                break
+                    for tool_def in mcp_manager.server_tools(server_id):
+                        if tool_def.name == original_name:
+                            tools.append(tool_def.to_openai_tool(namespaced_name))
+                            break
         
         # Build system prompt with tool info
         system_prompt = self._build_system_prompt(agent, tools, connected_agents)
@@ -593,9 +701,13 @@ class AgentEngine:
         tools: List[Dict[str, Any]],
         db: AsyncSession,
         redis: Redis,
-        audit_id: uuid.UUID
+        audit_id: uuid.UUID,
+        writer: AgentMessageWriter,
     ) -> AgentRunResult:
-        """Execute the model inference + tool call loop with security tracking."""
+        """Execute the model inference + tool call loop with security tracking.
+
+        Messages are buffered in *writer* and written once per turn.
+        """
         turn = 0
         total_tokens = 0
         total_cost = Decimal(0)
@@ -604,6 +716,9 @@ class AgentEngine:
         # Security tracking
         tools_used = []
         knowledge_bases_accessed = []
+
+        # Caps concurrent tool calls across the whole execution
+        tool_slots = asyncio.Semaphore(MAX_PARALLEL_TOOL_CALLS)
         
         while turn < agent.max_turns:
             try:
@@ -618,10 +733,9 @@ class AgentEngine:
                 # Calculate latency
                 latency_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
                 
-                # Persist assistant message
-                await self._persist_message(
-                    session,
-                    role="assistant",
+                # Buffer assistant message (written with this turn's tool results)
+                assistant_record = writer.add(
+                    "assistant",
                     content=assistant_message.get("content"),
                     tool_calls=assistant_message.get("tool_calls"),
                     model_used=response.get("model"),
@@ -629,7 +743,6 @@ class AgentEngine:
                     output_tokens=response.get("usage", {}).get("completion_tokens"),
                     cost=Decimal(str(response.get("cost", 0))),
                     latency_ms=latency_ms,
-                    db=db
                 )
                 
                 messages.append(assistant_message)
@@ -638,65 +751,12 @@ class AgentEngine:
                 if not assistant_message.get("tool_calls"):
                     break
                 
-                # ── Execute tool calls with parallel invoke_agent support ──
-                all_tool_calls = assistant_message.get("tool_calls", [])
-                
-                # Separate parallelizable invoke_agent calls from sequential ones
-                parallelizable_names = {"invoke_agent"}
-                invoke_calls = [
-                    tc for tc in all_tool_calls
-                    if tc.get("function", {}).get("name") in parallelizable_names
-                ]
-                other_calls = [
-                    tc for tc in all_tool_calls
-                    if tc.get("function", {}).get("name") not in parallelizable_names
-                ]
-                
-                # Helper to execute a single tool call with tracking
-                async def _execute_and_track(tool_call):
-                    tool_start_time = datetime.now(timezone.utc)
-                    tool_name = tool_call.get("function", {}).get("name")
-                    
-                    result = await self._execute_tool(agent, tool_call, db, redis)
-                    
-                    execution_time_ms = int(
-                        (datetime.now(timezone.utc) - tool_start_time).total_seconds() * 1000
-                    )
-                    return tool_call, tool_name, result, execution_time_ms
-                
-                # Collect all (tool_call, name, result, time) tuples in original order
-                executed_results = []
-                
-                # 1. Run non-invoke tools sequentially first (they may have side effects)
-                for tc in other_calls:
-                    executed_results.append(await _execute_and_track(tc))
-                
-                # 2. Run invoke_agent calls in PARALLEL via asyncio.gather
-                if invoke_calls:
-                    if len(invoke_calls) == 1:
-                        # Single invoke — no need for gather overhead
-                        executed_results.append(await _execute_and_track(invoke_calls[0]))
-                    else:
-                        parallel_results = await asyncio.gather(
-                            *[_execute_and_track(tc) for tc in invoke_calls],
-                            return_exceptions=True
-                        )
-                        for pr in parallel_results:
-                            if isinstance(pr, Exception):
-                                # Wrap exception so we can still append a tool message
-                                logger.error(f"Parallel invoke_agent failed: {pr}")
-                                # Find the corresponding tool_call from invoke_calls
-                                idx = parallel_results.index(pr)
-                                tc = invoke_calls[idx]
-                                executed_results.append(
-                                    (tc, tc.get("function", {}).get("name"),
-                                     {"error": f"Parallel execution failed: {str(pr)}"},
-                                     0)
-                                )
-                            else:
-                                executed_results.append(pr)
-                
-                # 3. Process all results: track, log, append to messages
+                # ── Execute tool calls (read-only ones concurrently) ──
+                executed_results = await self._run_tool_calls(
+                    agent, assistant_message.get("tool_calls", []), db, redis, tool_slots
+                )
+
+                # Process all results in call order: track, log, append to messages
                 for tool_call, tool_name, result, execution_time_ms in executed_results:
                     # Track tool usage for security metadata
                     if tool_name and tool_name not in tools_used:
@@ -717,6 +777,11 @@ class AgentEngine:
                         json.loads(tool_call.get("function", {}).get("arguments", "{}")),
                         result, execution_time_ms, db, agent.org_id
                     )
+
+                    if tool_name in INTERACTION_KINDS:
+                        await self._record_interaction(
+                            agent, assistant_record, tool_call, tool_name, result, execution_time_ms, db, writer
+                        )
                     
                     tool_msg = {
                         "role": "tool",
@@ -725,20 +790,23 @@ class AgentEngine:
                     }
                     messages.append(tool_msg)
                     
-                    await self._persist_message(
-                        session,
-                        role="tool",
-                        content=json.dumps(result),
+                    writer.add(
+                        "tool",
+                        content=tool_msg["content"],
                         tool_call_id=tool_call.get("id"),
                         tool_name=tool_name,
-                        db=db
                     )
-                
+
+                # Turn boundary: assistant message + tool results in one batch
+                await writer.flush()
                 turn += 1
                 
             except Exception as e:
                 logger.error(f"Error in agent loop for agent {agent.id}: {e}")
                 break
+
+        # Final assistant message (or whatever a failed turn buffered)
+        await writer.flush()
         
         # Calculate budget information
         from app.models.project import Project
@@ -753,13 +821,12 @@ class AgentEngine:
             budget_percent_used = project.budget_spent / project.budget_monthly
         
         # Get current rate limit remaining (HPA-aware)
-        from app.services.agent_autoscaler import get_effective_rpm
-        current_minute = int(time.time() // 60)
-        key = f"agent_rate:{agent.id}:{current_minute}"
-        current_count = await redis.get(key)
-        current_count = int(current_count) if current_count else 0
-        effective_rpm = await get_effective_rpm(agent, redis)
-        rate_limit_remaining = max(0, effective_rpm - current_count)
+        from app.services import rate_limiter
+        from app.services.agent_autoscaler import rate_limit_args
+        prefix, limit_key = rate_limit_args(agent)
+        usage = await rate_limiter.peek(redis, prefix, agent.rate_limit_rpm, limit_key=limit_key)
+        effective_rpm = usage.limit
+        rate_limit_remaining = usage.remaining
         scaling_active = effective_rpm > agent.rate_limit_rpm
 
         return AgentRunResult(
@@ -781,6 +848,95 @@ class AgentEngine:
             )
         )
 
+    def _is_read_only_call(self, tool_call: Dict[str, Any]) -> bool:
+        """Whether a tool call may run concurrently with the turn's other read-only calls."""
+        tool_name = tool_call.get("function", {}).get("name")
+
+        mcp_manager = _mcp_manager.get()
+        if mcp_manager and mcp_manager.is_mcp_tool(tool_name):
+            return mcp_manager.is_read_only_tool(tool_name)
+
+        if tool_name == "http_request":
+            try:
+                args = json.loads(tool_call.get("function", {}).get("arguments", "{}"))
+            except (ValueError, TypeError):
+                return False
+            return isinstance(args, dict) and str(args.get("method", "GET")).upper() == "GET"
+
+        return tool_name in READ_ONLY_TOOLS or tool_name == "invoke_agent"
+
+    async def _run_tool_calls(
+        self,
+        agent: Agent,
+        tool_calls: List[Dict[str, Any]],
+        db: AsyncSession,
+        redis: Redis,
+        slots: asyncio.Semaphore,
+    ) -> List[tuple]:
+        """Execute one turn's tool calls and return (tool_call, name, result, ms) in call order.
+
+        Consecutive read-only calls run concurrently, bounded by *slots*, each on
+        its own DB session (an AsyncSession can't be shared between tasks). A
+        mutating call waits for everything before it and runs alone on *db*.
+        """
+        from app.core.database import get_db_session
+
+        async def _execute_and_track(tool_call, own_session: bool):
+            tool_name = tool_call.get("function", {}).get("name")
+            async with slots:
+                await self._emit("tool_start", {"id": tool_call.get("id"), "name": tool_name})
+                tool_start_time = datetime.now(timezone.utc)
+                if own_session:
+                    async with get_db_session() as tool_db:
+                        result = await self._execute_tool(agent, tool_call, tool_db, redis)
+                else:
+                    result = await self._execute_tool(agent, tool_call, db, redis)
+            execution_time_ms = int(
+                (datetime.now(timezone.utc) - tool_start_time).total_seconds() * 1000
+            )
+            await self._emit("tool_end", {
+                "id": tool_call.get("id"),
+                "name": tool_name,
+                "ok": not (isinstance(result, dict) and "error" in result),
+                "execution_time_ms": execution_time_ms,
+            })
+            return tool_call, tool_name, result, execution_time_ms
+
+        executed_results = []
+        batch: List[Dict[str, Any]] = []
+
+        async def _run_batch():
+            if len(batch) == 1:
+                # Single call — no need for gather overhead or a second session
+                executed_results.append(await _execute_and_track(batch[0], own_session=False))
+            elif batch:
+                parallel_results = await asyncio.gather(
+                    *[_execute_and_track(tc, own_session=True) for tc in batch],
+                    return_exceptions=True,
+                )
+                for tc, pr in zip(batch, parallel_results):
+                    if isinstance(pr, BaseException):
+                        # Wrap exception so we can still append a tool message
+                        logger.error(f"Parallel tool call failed: {pr}")
+                        executed_results.append(
+                            (tc, tc.get("function", {}).get("name"),
+                             {"error": f"Parallel execution failed: {str(pr)}"},
+                             0)
+                        )
+                    else:
+                        executed_results.append(pr)
+            batch.clear()
+
+        for tool_call in tool_calls:
+            if self._is_read_only_call(tool_call):
+                batch.append(tool_call)
+            else:
+                await _run_batch()
+                executed_results.append(await _execute_and_track(tool_call, own_session=False))
+        await _run_batch()
+
+        return executed_results
+
     async def _call_gateway(
         self,
         agent: Agent,
@@ -807,12 +963,21 @@ class AgentEngine:
             # Use a separate DB session so gateway queries don't conflict
             # with the agent engine's transaction (same pattern as RAG retrieval)
             async with get_db_session() as gw_db:
-                response = await gateway_chat_completion(
-                    request_data=request_data,
-                    org_id=agent.org_id,
-                    key_id=self.INTERNAL_KEY_ID,
-                    db=gw_db,
-                )
+                if _event_sink.get() is not None:
+                    response = await gateway_chat_completion_stream(
+                        request_data=request_data,
+                        org_id=agent.org_id,
+                        key_id=self.INTERNAL_KEY_ID,
+                        db=gw_db,
+                        on_delta=lambda text: self._emit("token", {"content": text}),
+                    )
+                else:
+                    response = await gateway_chat_completion(
+                        request_data=request_data,
+                        org_id=agent.org_id,
+                        key_id=self.INTERNAL_KEY_ID,
+                        db=gw_db,
+                    )
             
             return response
             
@@ -855,10 +1020,11 @@ class AgentEngine:
             return {"error": f"Tool '{tool_name}' is not allowed for this agent"}
         
         # Check if this is an MCP tool call
-        if self._mcp_manager and self._mcp_manager.is_mcp_tool(tool_name):
+        mcp_manager = _mcp_manager.get()
+        if mcp_manager and mcp_manager.is_mcp_tool(tool_name):
             try:
                 args = json.loads(tool_call.get("function", {}).get("arguments", "{}"))
-                return await self._mcp_manager.call_tool(tool_name, args)
+                return await mcp_manager.call_tool(tool_name, args)
             except Exception as e:
                 logger.error(f"MCP tool execution failed for {tool_name}: {e}")
                 return {"error": f"MCP tool execution failed: {str(e)}"}
@@ -1298,6 +1464,7 @@ class AgentEngine:
 
         task_id = str(uuid.uuid4())
         redis_key = f"task:{agent.org_id}:{task_id}"
+        notify = task_channel(agent.org_id, _execution_id.get() or task_id)
 
         # Store task metadata in Redis
         await redis.hset(redis_key, mapping={
@@ -1307,6 +1474,7 @@ class AgentEngine:
             "message": message[:500],  # Truncate for storage
             "created_at": datetime.now(timezone.utc).isoformat(),
             "depth": str(self._depth + 1),
+            "notify": notify,  # collect_results waits on this channel
         })
         await redis.expire(redis_key, BACKGROUND_TASK_TTL)
 
@@ -1320,6 +1488,7 @@ class AgentEngine:
                 message=message,
                 depth=self._depth + 1,
                 redis=redis,
+                notify=notify,
             )
         )
 
@@ -1339,10 +1508,12 @@ class AgentEngine:
         message: str,
         depth: int,
         redis: Redis,
+        notify: Optional[str] = None,
     ):
         """Run agent execution in the background and store the result in Redis.
 
         Uses its own DB session since the original request may have already completed.
+        Once the final state is stored, the completion is published on *notify*.
         """
         redis_key = f"task:{org_id}:{task_id}"
 
@@ -1356,6 +1527,7 @@ class AgentEngine:
                         "status": "failed",
                         "error": "Target agent not found in background execution",
                     })
+                    await publish_task_done(redis, notify, task_id, "failed")
                     return
 
                 engine = AgentEngine(_depth=depth)
@@ -1374,6 +1546,7 @@ class AgentEngine:
                     "model_used": result.model_used or "",
                     "completed_at": datetime.now(timezone.utc).isoformat(),
                 })
+            await publish_task_done(redis, notify, task_id, "completed")
 
         except Exception as e:
             logger.error(f"Background task {task_id} failed: {e}")
@@ -1385,6 +1558,7 @@ class AgentEngine:
                 })
             except Exception:
                 logger.error(f"Failed to write error state for task {task_id}")
+            await publish_task_done(redis, notify, task_id, "failed")
 
     async def _tool_check_task(self, agent: Agent, args: Dict[str, Any], db: AsyncSession, redis: Redis) -> Dict[str, Any]:
         """Check the status of a previously delegated background task."""
@@ -1406,43 +1580,53 @@ class AgentEngine:
         }
 
     async def _tool_collect_results(self, agent: Agent, args: Dict[str, Any], db: AsyncSession, redis: Redis) -> Dict[str, Any]:
-        """Collect results from multiple delegated tasks. Polls until all complete or timeout."""
+        """Collect results from multiple delegated tasks. Waits until all complete or timeout.
+
+        Blocks on the completion channels recorded with the pending tasks and
+        re-reads a task's state when it is announced; the state in Redis stays
+        authoritative and is checked once more before giving up.
+        """
         task_ids = args.get("task_ids", [])
         if not task_ids:
             return {"error": "task_ids list is required"}
 
-        start = time.time()
-        results = []
-        all_done = False
-
-        while time.time() - start < COLLECT_RESULTS_MAX_WAIT:
-            all_done = True
-            results = []
-
-            for tid in task_ids:
-                redis_key = f"task:{agent.org_id}:{tid}"
-                task_data = await redis.hgetall(redis_key)
+        deadline = time.monotonic() + COLLECT_RESULTS_MAX_WAIT
+        results: Dict[str, Dict[str, Any]] = {}
 
+        async def _check(tids) -> None:
+            for tid in tids:
+                task_data = await redis.hgetall(f"task:{agent.org_id}:{tid}")
                 if not task_data:
-                    results.append({"task_id": tid, "status": "not_found"})
+                    results[tid] = {"task_id": tid, "status": "not_found"}
                     continue
-
                 decoded = {
                     k.decode() if isinstance(k, bytes) else k:
                     v.decode() if isinstance(v, bytes) else v
                     for k, v in task_data.items()
                 }
-                results.append({"task_id": tid, **decoded})
-
-                if decoded.get("status") == "pending":
-                    all_done = False
-
-            if all_done:
-                break
-
-            await asyncio.sleep(1)
+                results[tid] = {"task_id": tid, **decoded}
+
+        def _pending() -> List[str]:
+            return [tid for tid in task_ids if results[tid].get("status") == "pending"]
+
+        await _check(task_ids)
+        if _pending():
+            channels = [results[tid].get("notify") for tid in _pending()]
+            async with TaskWaiter(redis, channels) as waiter:
+                # Subscribed now — anything that finished before this point is caught here
+                await _check(_pending())
+                while _pending() and (remaining := deadline - time.monotonic()) > 0:
+                    woken = await waiter.wait(remaining)
+                    if woken is not None and woken not in results:
+                        continue  # Another task of the same parent
+                    await _check([woken] if woken is not None else _pending())
+                if _pending():
+                    await _check(_pending())
 
-        return {"results": results, "all_completed": all_done}
+        return {
+            "results": [results[tid] for tid in task_ids],
+            "all_completed": not _pending(),
+        }
 
     async def _tool_send_notification(self, agent: Agent, args: Dict[str, Any], db: AsyncSession, redis: Redis) -> Dict[str, Any]:
         """Send an in-app notification via the notification service."""
@@ -1528,35 +1712,30 @@ class AgentEngine:
         can intercept it for queue-eligible agents before the global
         exception handler converts it to a JSON response.
         """
-        from app.services.agent_autoscaler import get_effective_rpm, maybe_scale_up
+        from app.services import rate_limiter
+        from app.services.agent_autoscaler import maybe_scale_up, rate_limit_args
 
-        current_minute = int(time.time() // 60)
-        key = f"agent_rate:{agent.id}:{current_minute}"
+        prefix, limit_key = rate_limit_args(agent)
 
-        current_count = await redis.get(key)
-        current_count = int(current_count) if current_count else 0
+        # One script call: sliding-window count + effective RPM override
+        result = await rate_limiter.hit(redis, prefix, agent.rate_limit_rpm, limit_key=limit_key)
+        effective_rpm = result.limit
+        prior_count = result.used - 1 if result.allowed else result.used
 
-        # Get effective RPM (may be scaled up from base)
-        effective_rpm = await get_effective_rpm(agent, redis)
+        # Check if we need to scale up (reactive — only touches Redis when it scales)
+        scaled_rpm = await maybe_scale_up(agent, prior_count, effective_rpm, redis)
+        if not result.allowed and scaled_rpm > effective_rpm:
+            result = await rate_limiter.hit(redis, prefix, agent.rate_limit_rpm, limit_key=limit_key)
+        effective_rpm = max(scaled_rpm, result.limit)
 
-        # Check if we need to scale up (reactive — runs on every request)
-        effective_rpm = await maybe_scale_up(agent, current_count, effective_rpm, redis)
-
-        scaling_active = effective_rpm > agent.rate_limit_rpm
-
-        if current_count >= effective_rpm:
+        if not result.allowed:
             raise AgentRateLimitError(
                 agent_name=agent.name,
                 effective_rpm=effective_rpm,
             )
 
-        # Increment counter
-        pipeline = redis.pipeline()
-        pipeline.incr(key)
-        pipeline.expire(key, 60)  # Expire after 1 minute
-        await pipeline.execute()
-
-        return effective_rpm - current_count - 1, effective_rpm, scaling_active
+        scaling_active = effective_rpm > agent.rate_limit_rpm
+        return max(0, effective_rpm - result.used), effective_rpm, scaling_active
 
     async def _enforce_budget_limit(self, agent: Agent, db: AsyncSession):
         """Hard budget enforcement - 402 error when exceeded."""
@@ -0,0 +1,245 @@
+"""
+Agent interaction ledger — pre-aggregated agent -> agent edges for breadcrumbs.
+
+Project breadcrumbs used to load every assistant message with tool_calls
+for the project's agents and parse the JSON in Python to count
+invoke_agent / delegate_task edges, which grows with every message a
+project ever sends. Instead, each call is recorded once, when it runs:
+
+  agent_interactions          (source, target, kind, hour) -> count,
+                              summed cost, summed latency
+  agent_interaction_messages  one row per call -> the agent_messages row
+                              that carries it, for the edge drill-down
+
+Writers:
+  - AgentEngine, after an invoke_agent / delegate_task tool call returns
+  - the external-orchestration delegation log (bonobot_agents)
+  - scripts/backfill_agent_interactions.py for history
+
+``record_interaction`` is idempotent per (message, tool call): the pointer
+row is inserted first and the hourly roll-up is only bumped when it was
+new, so the backfill can be re-run and overlaps the live writer safely.
+"""
+
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple, Union
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.agent_interaction import AgentInteraction, AgentInteractionMessage
+
+logger = logging.getLogger(__name__)
+
+INTERACTION_KINDS = ("invoke_agent", "delegate_task")
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    """Start of the UTC hour containing *ts*."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _call_args(call: Any) -> Optional[dict]:
+    fn = call.get("function") if isinstance(call, dict) else None
+    if not fn:
+        return None
+    args = fn.get("arguments")
+    # arguments may be a JSON-encoded string or an already-parsed dict
+    if isinstance(args, str):
+        try:
+            args = json.loads(args)
+        except (ValueError, TypeError):
+            return None
+    return args if isinstance(args, dict) else None
+
+
+def _agent_id(args: Optional[dict]) -> Optional[uuid.UUID]:
+    aid = (args or {}).get("agent_id")
+    if not aid:
+        return None
+    try:
+        return uuid.UUID(str(aid))
+    except (ValueError, TypeError):
+        return None
+
+
+def extract_target_agent_id(tool_calls) -> Optional[uuid.UUID]:
+    """
+    The first target agent_id in a tool_calls JSON column.
+
+    Expected shape: [{function: {name: "invoke_agent", arguments: '{"agent_id": "..."}' }}]
+    """
+    if not tool_calls:
+        return None
+    calls = tool_calls if isinstance(tool_calls, list) else [tool_calls]
+    for call in calls:
+        target = _agent_id(_call_args(call))
+        if target is not None:
+            return target
+    return None
+
+
+def interaction_calls(tool_calls, kind: Optional[str] = None) -> List[Tuple[str, str, uuid.UUID]]:
+    """
+    (tool_call_id, kind, target agent id) for every agent -> agent call in tool_calls.
+
+    *kind* is for messages that name the tool outside the payload (the
+    external-orchestration log row); calls without an id get their index.
+    """
+    if not tool_calls:
+        return []
+    calls = tool_calls if isinstance(tool_calls, list) else [tool_calls]
+    found = []
+    for i, call in enumerate(calls):
+        if not isinstance(call, dict):
+            continue
+        name = kind or (call.get("function") or {}).get("name")
+        if name not in INTERACTION_KINDS:
+            continue
+        target = _agent_id(_call_args(call))
+        if target is None:
+            continue
+        found.append((str(call.get("id") or i), name, target))
+    return found
+
+
+async def record_interaction(
+    db: AsyncSession,
+    *,
+    org_id: uuid.UUID,
+    project_id: uuid.UUID,
+    source_agent_id: uuid.UUID,
+    target_agent_id: uuid.UUID,
+    kind: str,
+    message_id: uuid.UUID,
+    tool_call_id: str,
+    cost: Union[Decimal, float] = 0,
+    latency_ms: int = 0,
+    at: Optional[datetime] = None,
+) -> bool:
+    """Add one call to the ledger. Returns False if that call was already recorded."""
+    at = at or datetime.now(timezone.utc)
+    inserted = (await db.execute(
+        pg_insert(AgentInteractionMessage)
+        .values(
+            id=uuid.uuid4(),
+            source_agent_id=source_agent_id,
+            target_agent_id=target_agent_id,
+            message_id=message_id,
+            tool_call_id=tool_call_id,
+            kind=kind,
+            created_at=at,
+        )
+        .on_conflict_do_nothing(index_elements=["message_id", "tool_call_id"])
+        .returning(AgentInteractionMessage.id)
+    )).scalar_one_or_none()
+    if inserted is None:
+        return False
+
+    cost = Decimal(str(cost or 0))
+    latency_ms = int(latency_ms or 0)
+    await db.execute(
+        pg_insert(AgentInteraction)
+        .values(
+            id=uuid.uuid4(),
+            org_id=org_id,
+            project_id=project_id,
+            source_agent_id=source_agent_id,
+            target_agent_id=target_agent_id,
+            kind=kind,
+            bucket=hour_bucket(at),
+            count=1,
+            total_cost=cost,
+            total_latency_ms=latency_ms,
+            updated_at=datetime.now(timezone.utc),
+        )
+        .on_conflict_do_update(
+            index_elements=["source_agent_id", "target_agent_id", "kind", "bucket"],
+            set_={
+                "count": AgentInteraction.count + 1,
+                "total_cost": AgentInteraction.total_cost + cost,
+                "total_latency_ms": AgentInteraction.total_latency_ms + latency_ms,
+                "updated_at": datetime.now(timezone.utc),
+            },
+        )
+    )
+    return True
+
+
+async def edge_totals(
+    db: AsyncSession,
+    project_id: uuid.UUID,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> dict:
+    """
+    {(source, target): {kind: {"count", "cost", "latency_ms"}}} for a project.
+
+    Hourly buckets are matched by their start, so a range edge that falls
+    inside an hour includes that whole hour.
+    """
+    stmt = (
+        select(
+            AgentInteraction.source_agent_id,
+            AgentInteraction.target_agent_id,
+            AgentInteraction.kind,
+            func.sum(AgentInteraction.count).label("count"),
+            func.sum(AgentInteraction.total_cost).label("cost"),
+            func.sum(AgentInteraction.total_latency_ms).label("latency_ms"),
+        )
+        .where(AgentInteraction.project_id == project_id)
+        .group_by(AgentInteraction.source_agent_id, AgentInteraction.target_agent_id, AgentInteraction.kind)
+    )
+    if date_from:
+        stmt = stmt.where(AgentInteraction.bucket >= hour_bucket(date_from))
+    if date_to:
+        stmt = stmt.where(AgentInteraction.bucket <= date_to)
+
+    totals: dict = {}
+    for row in (await db.execute(stmt)).all():
+        totals.setdefault((row.source_agent_id, row.target_agent_id), {})[row.kind] = {
+            "count": int(row.count or 0),
+            "cost": float(row.cost or 0),
+            "latency_ms": int(row.latency_ms or 0),
+        }
+    return totals
+
+
+async def edge_messages(
+    db: AsyncSession,
+    source_agent_id: uuid.UUID,
+    target_agent_id: uuid.UUID,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> Tuple[int, list]:
+    """(total, page of AgentMessage newest first) carrying calls along one edge."""
+    from app.models.agent_message import AgentMessage
+
+    ids = select(AgentInteractionMessage.message_id).where(
+        AgentInteractionMessage.source_agent_id == source_agent_id,
+        AgentInteractionMessage.target_agent_id == target_agent_id,
+    )
+    if date_from:
+        ids = ids.where(AgentInteractionMessage.created_at >= date_from)
+    if date_to:
+        ids = ids.where(AgentInteractionMessage.created_at <= date_to)
+    ids = ids.distinct()
+
+    total = (await db.execute(select(func.count()).select_from(ids.subquery()))).scalar() or 0
+    page = (await db.execute(
+        select(AgentMessage)
+        .where(AgentMessage.id.in_(ids))
+        .order_by(AgentMessage.created_at.desc(), AgentMessage.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )).scalars().all()
+    return total, page
@@ -0,0 +1,147 @@
+"""
+Agent message writer — buffered persistence with reserved sequence numbers.
+
+AgentEngine used to persist each message on its own: a
+``SELECT coalesce(max(sequence), 0) + 1`` followed by a flush that
+inserted the row and updated the session counters. A turn with N tool
+results cost about 3(N + 1) round trips, and two executions of the same
+session could read the same max(sequence) and write duplicate numbers.
+
+Now messages are buffered per execution and written a turn at a time:
+
+  1. one ``UPDATE agent_sessions ... RETURNING next_sequence`` reserves a
+     block of sequence numbers for the whole batch and adds the batch to
+     the session counters (message_count, total_tokens, total_cost);
+  2. one multi-row INSERT writes the messages.
+
+The UPDATE is atomic per session row, so concurrent writers always get
+disjoint blocks, and each batch keeps the order its messages were added.
+A unique index on (session_id, sequence) backs this up.
+
+Usage:
+    writer = AgentMessageWriter(db, session)
+    record = writer.add("assistant", content="...", tool_calls=[...])
+    writer.add("tool", content="...", tool_call_id="call_1")
+    await writer.flush()  # at the turn boundary
+"""
+
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models.agent_message import AgentMessage
+from app.models.agent_session import AgentSession
+
+
+async def reserve_sequences(
+    db: AsyncSession,
+    session: AgentSession,
+    count: int,
+    tokens: int = 0,
+    cost: Decimal = Decimal(0),
+) -> int:
+    """Reserve *count* consecutive sequence numbers for *session*; returns the first.
+
+    The same UPDATE adds *count* messages, *tokens* and *cost* to the
+    session counters, and the in-memory *session* is kept in step without
+    marking it dirty (a later flush must not write the counters back as
+    absolute values over a concurrent writer's increments).
+    """
+    now = datetime.now(timezone.utc)
+    result = await db.execute(
+        update(AgentSession)
+        .where(AgentSession.id == session.id)
+        .values(
+            next_sequence=AgentSession.next_sequence + count,
+            message_count=AgentSession.message_count + count,
+            total_tokens=AgentSession.total_tokens + tokens,
+            total_cost=AgentSession.total_cost + cost,
+            last_message_at=now,
+        )
+        .returning(AgentSession.next_sequence)
+        .execution_options(synchronize_session=False)
+    )
+    next_sequence = result.scalar_one()
+
+    set_committed_value(session, "next_sequence", next_sequence)
+    set_committed_value(session, "message_count", (session.message_count or 0) + count)
+    set_committed_value(session, "total_tokens", (session.total_tokens or 0) + tokens)
+    set_committed_value(session, "total_cost", (session.total_cost or Decimal(0)) + cost)
+    set_committed_value(session, "last_message_at", now)
+    return next_sequence - count
+
+
+def _message_tokens(message: AgentMessage) -> int:
+    if message.input_tokens and message.output_tokens:
+        return message.input_tokens + message.output_tokens
+    return message.output_tokens or 0
+
+
+class AgentMessageWriter:
+    """Buffers one execution's messages for a session and writes them in batches."""
+
+    def __init__(self, db: AsyncSession, session: AgentSession):
+        self._db = db
+        self._session = session
+        self._pending: List[AgentMessage] = []
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(
+        self,
+        role: str,
+        content: Optional[str] = None,
+        tool_calls: Optional[Any] = None,
+        tool_call_id: Optional[str] = None,
+        tool_name: Optional[str] = None,
+        model_used: Optional[str] = None,
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        cost: Optional[Decimal] = None,
+        latency_ms: Optional[int] = None,
+    ) -> AgentMessage:
+        """Buffer a message. Its id is set now; its sequence on ``flush()``."""
+        message = AgentMessage(
+            id=uuid.uuid4(),
+            session_id=self._session.id,
+            org_id=self._session.org_id,
+            role=role,
+            content=content,
+            tool_calls=tool_calls,
+            tool_call_id=tool_call_id,
+            tool_name=tool_name,
+            is_compaction_summary=False,
+            model_used=model_used,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost=cost,
+            latency_ms=latency_ms,
+        )
+        self._pending.append(message)
+        return message
+
+    async def flush(self) -> None:
+        """Write buffered messages: one sequence reservation, one multi-row INSERT."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        first = await reserve_sequences(
+            self._db,
+            self._session,
+            len(pending),
+            tokens=sum(_message_tokens(m) for m in pending),
+            cost=sum((m.cost for m in pending if m.cost), Decimal(0)),
+        )
+        for offset, message in enumerate(pending):
+            message.sequence = first + offset
+
+        self._db.add_all(pending)
+        await self._db.flush()
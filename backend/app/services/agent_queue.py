@@ -4,35 +4,90 @@ When an agent execute request hits a 429 rate limit (even after HPA autoscaling)
 instead of dropping the request, the queue:
 1. Stores the request payload in Redis
 2. Returns a queue ticket (202 Accepted)
-3. Background drainer processes queued requests at a safe rate
-4. Results are stored in Redis for polling
+3. Background drainer processes queued requests as soon as the agent has capacity
+4. Results are stored in Redis and announced on the ticket's completion
+   channel (see task_notify), so status requests can wait instead of polling
+
+Draining is event-driven rather than polled. enqueue_request adds the agent
+to a ready set; each worker's dispatcher blocks on BZPOPMIN against it and
+starts a drain task for the agent it pops. A drain task keeps up to the
+agent's effective RPM (agent_autoscaler.get_effective_rpm, capped by
+DRAIN_MAX_PER_AGENT) tickets running at once, each with its own DB session,
+and exits when the agent's queue is empty. A rate-limited ticket goes back
+to the front of the queue and the agent backs off for DRAIN_RETRY_DELAY.
+
+Tickets are claimed with LMOVE into the worker's in-flight list, so a worker
+that dies mid-run doesn't lose them: every worker heartbeats a TTL key, and
+the recovery sweep moves tickets from lists whose owner's heartbeat expired
+back to the front of their agent's queue. The same sweep re-arms agents that
+still have queued tickets but fell out of the ready set.
 
 Redis keys:
     agent_queue:{agent_id}              — LIST of ticket_ids (FIFO)
-    agent_queue_req:{ticket_id}         — HASH: message, agent_id, org_id, user_id, status, ...
+    agent_queue_req:{ticket_id}         — HASH: message, agent_id, org_id, user_id, status, notify, ...
     agent_queue_result:{ticket_id}      — HASH: content, tokens, cost, etc. (set when complete)
+    agent_queue_ready                   — ZSET of agent_ids with queued work (score = enqueue time)
+    agent_queue_agents                  — SET of agent_ids that have a queue (recovery sweep)
+    agent_queue_workers                 — SET of drainer worker ids
+    agent_queue_worker:{worker_id}      — heartbeat STRING with TTL
+    agent_queue_inflight:{worker_id}    — LIST of ticket_ids a worker is running
 """
 
 import asyncio
-import json
 import logging
+import os
+import socket
+import json
 import time
 import uuid as uuid_lib
-from typing import Optional
+from typing import Dict, Optional, Set
 
 from redis.asyncio import Redis
 
+from app.services.task_notify import TaskWaiter, task_channel
+
 logger = logging.getLogger(__name__)
 
 # ─── Config ───
 QUEUE_MAX_DEPTH = 500          # Max queued items per agent
 QUEUE_RESULT_TTL = 3600        # Results kept for 1 hour
 QUEUE_REQUEST_TTL = 3600       # Request metadata TTL
-DRAIN_INTERVAL = 2.0           # Seconds between drain attempts
-DRAIN_BATCH_SIZE = 3           # Requests to dequeue per drain cycle
-
-# Background task handle
+TICKET_ESTIMATE_SECONDS = 2.0  # Rough per-ticket wait used for estimated_wait_seconds
+QUEUE_STATUS_MAX_WAIT = 30.0   # Longest a status request may block waiting for the result
+DRAIN_BLOCK_TIMEOUT = 5.0      # Seconds the dispatcher blocks on the ready set per call
+DRAIN_MAX_CONCURRENCY = 32     # Tickets running at once per worker (each holds a DB session)
+DRAIN_MAX_PER_AGENT = 16       # Cap on per-agent concurrency, below the effective RPM
+DRAIN_RETRY_DELAY = 2.0        # Back-off after an agent is still rate limited
+WORKER_HEARTBEAT_INTERVAL = 10.0
+WORKER_HEARTBEAT_TTL = 30      # Worker is considered dead once its heartbeat expires
+
+READY_KEY = "agent_queue_ready"
+AGENTS_KEY = "agent_queue_agents"
+WORKERS_KEY = "agent_queue_workers"
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid_lib.uuid4().hex[:8]}"
+
+# Background task handles
 _task: Optional[asyncio.Task] = None
+_recovery_task: Optional[asyncio.Task] = None
+
+# Per-agent drain tasks on this worker, and agents popped from the ready set
+# while their drain task was already running (it re-checks before exiting)
+_draining: Dict[str, asyncio.Task] = {}
+_rearm: Set[str] = set()
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def _queue_key(agent_id) -> str:
+    return f"agent_queue:{agent_id}"
+
+
+def _inflight_key(worker_id: str) -> str:
+    return f"agent_queue_inflight:{worker_id}"
+
+
+def _heartbeat_key(worker_id: str) -> str:
+    return f"agent_queue_worker:{worker_id}"
 
 
 async def enqueue_request(
@@ -44,9 +99,13 @@ async def enqueue_request(
     parent_agent_id: Optional[uuid_lib.UUID],
     redis: Redis,
 ) -> dict:
-    """Enqueue a rate-limited request. Returns ticket info."""
+    """Enqueue a rate-limited request and wake a drainer. Returns ticket info.
+
+    The ticket's completion is published on its parent agent's channel, or
+    on its own when there is no parent.
+    """
     ticket_id = str(uuid_lib.uuid4())
-    queue_key = f"agent_queue:{agent_id}"
+    queue_key = _queue_key(agent_id)
     req_key = f"agent_queue_req:{ticket_id}"
 
     # Check queue depth
@@ -66,6 +125,7 @@ async def enqueue_request(
         "message": message,
         "session_id": str(session_id) if session_id else "",
         "parent_agent_id": str(parent_agent_id) if parent_agent_id else "",
+        "notify": task_channel(org_id, parent_agent_id or ticket_id),
         "status": "queued",
         "queued_at": str(time.time()),
         "position": depth + 1,
@@ -74,6 +134,8 @@ async def enqueue_request(
     pipeline.hset(req_key, mapping=req_data)
     pipeline.expire(req_key, QUEUE_REQUEST_TTL)
     pipeline.rpush(queue_key, ticket_id)
+    pipeline.sadd(AGENTS_KEY, str(agent_id))
+    pipeline.zadd(READY_KEY, {str(agent_id): time.time()}, nx=True)
     await pipeline.execute()
 
     logger.info(f"Queued request {ticket_id} for agent {agent_id} (position {depth + 1})")
@@ -82,15 +144,37 @@ async def enqueue_request(
         "queued": True,
         "ticket_id": ticket_id,
         "position": depth + 1,
-        "estimated_wait_seconds": (depth + 1) * DRAIN_INTERVAL,
+        "estimated_wait_seconds": (depth + 1) * TICKET_ESTIMATE_SECONDS,
     }
 
 
 async def get_queue_status(
     ticket_id: str,
     redis: Redis,
+    wait: float = 0.0,
 ) -> dict:
-    """Get status of a queued request."""
+    """Get status of a queued request.
+
+    With *wait*, a ticket that is still queued or processing is waited on for
+    up to that many seconds: the status is returned as soon as its completion
+    is published, or re-read once more when the wait runs out.
+    """
+    if wait > 0:
+        req_data = await redis.hgetall(f"agent_queue_req:{ticket_id}")
+        if req_data.get("status") not in (None, "completed", "failed"):
+            deadline = time.monotonic() + min(wait, QUEUE_STATUS_MAX_WAIT)
+            async with TaskWaiter(redis, [req_data.get("notify")]) as waiter:
+                # Subscribed — a completion from here on can't be missed
+                status = await get_queue_status(ticket_id, redis)
+                while status["status"] not in ("completed", "failed", "not_found"):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    woken = await waiter.wait(remaining)
+                    if woken is None or woken == ticket_id:
+                        status = await get_queue_status(ticket_id, redis)
+            return status
+
     req_key = f"agent_queue_req:{ticket_id}"
     result_key = f"agent_queue_result:{ticket_id}"
 
@@ -124,8 +208,7 @@ async def get_queue_status(
         }
     else:
         # Still queued or processing
-        agent_id = req_data.get("agent_id", "")
-        queue_key = f"agent_queue:{agent_id}"
+        queue_key = _queue_key(req_data.get("agent_id", ""))
         # Approximate position
         queue_items = await redis.lrange(queue_key, 0, -1)
         try:
@@ -136,147 +219,244 @@ async def get_queue_status(
             "status": status,
             "ticket_id": ticket_id,
             "position": position,
-            "estimated_wait_seconds": position * DRAIN_INTERVAL if position else 0,
+            "estimated_wait_seconds": position * TICKET_ESTIMATE_SECONDS if position else 0,
         }
 
 
 async def get_agent_queue_depth(agent_id: uuid_lib.UUID, redis: Redis) -> int:
     """Get current queue depth for an agent."""
-    return await redis.llen(f"agent_queue:{agent_id}")
+    return await redis.llen(_queue_key(agent_id))
 
 
-async def _drain_agent_queue(agent_id_str: str, redis: Redis):
-    """Process queued requests for a single agent."""
-    from app.core.database import get_db_session
-    from app.models.agent import Agent
-    from app.models.user import User
-    from sqlalchemy import select
+# ─── Draining ───
 
-    queue_key = f"agent_queue:{agent_id_str}"
-    agent_id = uuid_lib.UUID(agent_id_str)
 
-    processed = 0
-    for _ in range(DRAIN_BATCH_SIZE):
-        # Pop from front of queue (FIFO)
-        ticket_id = await redis.lpop(queue_key)
-        if not ticket_id:
-            break
+async def _requeue(redis: Redis, agent_id_str: str, ticket_id: str):
+    """Move a ticket from this worker's in-flight list back to the front of its queue."""
+    pipeline = redis.pipeline(transaction=True)
+    pipeline.lrem(_inflight_key(WORKER_ID), 1, ticket_id)
+    pipeline.lpush(_queue_key(agent_id_str), ticket_id)
+    pipeline.hset(f"agent_queue_req:{ticket_id}", "status", "queued")
+    pipeline.sadd(AGENTS_KEY, agent_id_str)
+    pipeline.zadd(READY_KEY, {agent_id_str: time.time()}, nx=True)
+    await pipeline.execute()
 
-        req_key = f"agent_queue_req:{ticket_id}"
-        req_data = await redis.hgetall(req_key)
-        if not req_data:
-            continue
 
-        # Mark as processing
-        await redis.hset(req_key, "status", "processing")
+async def _finish(
+    redis: Redis, ticket_id: str, fields: dict, result: Optional[dict] = None, notify: Optional[str] = None,
+):
+    """Record a ticket's final status (and result) and release it from the in-flight list.
 
-        try:
-            async with get_db_session() as db:
-                # Load agent
-                result = await db.execute(select(Agent).where(Agent.id == agent_id))
-                agent = result.scalar_one_or_none()
-                if not agent:
-                    await redis.hset(req_key, mapping={"status": "failed", "error": "Agent not found"})
-                    continue
-
-                # Execute via agent engine
-                from app.services.agent_engine import AgentEngine
-                agent_engine = AgentEngine()
-                user_id_str = req_data.get("user_id", "")
-                session_id_str = req_data.get("session_id", "")
-
-                run_result = await agent_engine.execute(
-                    agent=agent,
-                    message=req_data["message"],
-                    db=db,
-                    redis=redis,
-                    session_id=uuid_lib.UUID(session_id_str) if session_id_str else None,
-                    user_id=uuid_lib.UUID(user_id_str) if user_id_str else None,
-                )
-
-                # Store result
-                result_key = f"agent_queue_result:{ticket_id}"
-                result_data = {
-                    "content": run_result.content or "",
-                    "tokens": str(run_result.tokens),
-                    "cost": str(run_result.cost),
-                    "turns": str(run_result.turns),
-                    "model_used": run_result.model_used or "",
-                    "effective_rpm": str(run_result.security.effective_rpm or 0),
-                    "scaling_active": "true" if run_result.security.scaling_active else "false",
-                }
-                pipeline = redis.pipeline()
-                pipeline.hset(result_key, mapping=result_data)
-                pipeline.expire(result_key, QUEUE_RESULT_TTL)
-                pipeline.hset(req_key, "status", "completed")
-                await pipeline.execute()
-
-                processed += 1
-                logger.info(f"Queue drain: completed {ticket_id} for agent {agent_id_str}")
+    With *notify*, the completion is published in the same transaction, after the result is stored.
+    """
+    pipeline = redis.pipeline(transaction=True)
+    if result is not None:
+        result_key = f"agent_queue_result:{ticket_id}"
+        pipeline.hset(result_key, mapping=result)
+        pipeline.expire(result_key, QUEUE_RESULT_TTL)
+    pipeline.hset(f"agent_queue_req:{ticket_id}", mapping=fields)
+    pipeline.lrem(_inflight_key(WORKER_ID), 1, ticket_id)
+    if notify:
+        pipeline.publish(notify, json.dumps({"task_id": ticket_id, "status": fields.get("status")}))
+    await pipeline.execute()
 
-        except Exception as e:
-            from app.services.agent_engine import AgentRateLimitError
-            err_msg = str(e)[:500]
-            is_rate_limit = isinstance(e, AgentRateLimitError) or "429" in err_msg or "rate limit" in err_msg.lower()
-            if is_rate_limit:
-                # Put it back at the front of the queue — not ready yet
-                await redis.lpush(queue_key, ticket_id)
-                await redis.hset(req_key, "status", "queued")
-                logger.debug(f"Queue drain: re-queued {ticket_id} (still rate limited)")
-                break  # Stop draining this agent — it's at capacity
-            else:
-                await redis.hset(req_key, mapping={"status": "failed", "error": err_msg})
-                logger.error(f"Queue drain failed for {ticket_id}: {err_msg}")
 
-    return processed
+async def _run_ticket(agent_id_str: str, ticket_id: str, redis: Redis) -> bool:
+    """Execute one claimed ticket. Returns False if the agent is still rate limited."""
+    from app.core.database import get_db_session
+    from app.models.agent import Agent
+    from sqlalchemy import select
 
+    req_key = f"agent_queue_req:{ticket_id}"
+    req_data = await redis.hgetall(req_key)
+    if not req_data:
+        # Request metadata expired — nothing left to run
+        await redis.lrem(_inflight_key(WORKER_ID), 1, ticket_id)
+        return True
+
+    # Mark as processing
+    await redis.hset(req_key, "status", "processing")
+    notify = req_data.get("notify") or None
+
+    try:
+        async with get_db_session() as db:
+            # Load agent
+            result = await db.execute(select(Agent).where(Agent.id == uuid_lib.UUID(agent_id_str)))
+            agent = result.scalar_one_or_none()
+            if not agent:
+                await _finish(redis, ticket_id, {"status": "failed", "error": "Agent not found"}, notify=notify)
+                return True
+
+            # Execute via agent engine
+            from app.services.agent_engine import AgentEngine
+            agent_engine = AgentEngine()
+            user_id_str = req_data.get("user_id", "")
+            session_id_str = req_data.get("session_id", "")
+
+            run_result = await agent_engine.execute(
+                agent=agent,
+                message=req_data["message"],
+                db=db,
+                redis=redis,
+                session_id=uuid_lib.UUID(session_id_str) if session_id_str else None,
+                user_id=uuid_lib.UUID(user_id_str) if user_id_str else None,
+            )
+
+        # Store result
+        await _finish(
+            redis,
+            ticket_id,
+            {"status": "completed"},
+            result={
+                "content": run_result.content or "",
+                "tokens": str(run_result.tokens),
+                "cost": str(run_result.cost),
+                "turns": str(run_result.turns),
+                "model_used": run_result.model_used or "",
+                "effective_rpm": str(run_result.security.effective_rpm or 0),
+                "scaling_active": "true" if run_result.security.scaling_active else "false",
+            },
+            notify=notify,
+        )
+        logger.info(f"Queue drain: completed {ticket_id} for agent {agent_id_str}")
+        return True
+
+    except Exception as e:
+        from app.services.agent_engine import AgentRateLimitError
+        err_msg = str(e)[:500]
+        is_rate_limit = isinstance(e, AgentRateLimitError) or "429" in err_msg or "rate limit" in err_msg.lower()
+        if is_rate_limit:
+            # Put it back at the front of the queue — not ready yet
+            await _requeue(redis, agent_id_str, ticket_id)
+            logger.debug(f"Queue drain: re-queued {ticket_id} (still rate limited)")
+            return False
+        await _finish(redis, ticket_id, {"status": "failed", "error": err_msg}, notify=notify)
+        logger.error(f"Queue drain failed for {ticket_id}: {err_msg}")
+        return True
+
+
+async def _agent_concurrency(agent_id_str: str, redis: Redis) -> int:
+    """How many of an agent's tickets may run at once: its effective RPM, capped."""
+    from app.core.database import get_db_session
+    from app.models.agent import Agent
+    from app.services.agent_autoscaler import get_effective_rpm
+    from sqlalchemy import select
 
-DRAIN_IDLE_INTERVAL = 30.0  # Seconds between scans when no queues found
+    async with get_db_session() as db:
+        result = await db.execute(select(Agent).where(Agent.id == uuid_lib.UUID(agent_id_str)))
+        agent = result.scalar_one_or_none()
+    if agent is None:
+        return 1  # Tickets fail individually with "Agent not found"
+    rpm = await get_effective_rpm(agent, redis)
+    return max(1, min(rpm or 1, DRAIN_MAX_PER_AGENT))
 
 
-async def _drain_loop():
-    """Background loop that drains all agent queues.
+async def _drain_agent_queue(agent_id_str: str, redis: Redis) -> int:
+    """Drain one agent's queue with up to its effective RPM of tickets in flight.
 
-    Uses adaptive polling: fast (DRAIN_INTERVAL) when queues have items,
-    slow (DRAIN_IDLE_INTERVAL) when idle — avoids Redis SCAN noise.
+    Returns the number of tickets claimed. Exits once the queue is empty,
+    nothing is running, and the agent wasn't re-armed in the meantime.
     """
-    from app.core.redis import get_redis
+    slots = _slots or asyncio.Semaphore(DRAIN_MAX_CONCURRENCY)
+    queue_key = _queue_key(agent_id_str)
+    inflight_key = _inflight_key(WORKER_ID)
+    running: Set[asyncio.Task] = set()
+    rate_limited = False
+    claimed = 0
+
+    def _done(task: asyncio.Task):
+        nonlocal rate_limited
+        running.discard(task)
+        slots.release()
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error(f"Queue drain task error for agent {agent_id_str}: {task.exception()}")
+        elif task.result() is False:
+            rate_limited = True
+
+    try:
+        limit = await _agent_concurrency(agent_id_str, redis)
+        while True:
+            if rate_limited:
+                # Let in-flight tickets finish, then give the window time to slide
+                if running:
+                    await asyncio.wait(set(running))
+                await asyncio.sleep(DRAIN_RETRY_DELAY)
+                rate_limited = False
+                # The autoscaler may have raised the effective RPM meanwhile
+                limit = await _agent_concurrency(agent_id_str, redis)
+                continue
+
+            if len(running) >= limit:
+                await asyncio.wait(set(running), return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            await slots.acquire()
+            ticket_id = await redis.lmove(queue_key, inflight_key, "LEFT", "RIGHT")
+            if ticket_id:
+                claimed += 1
+                task = asyncio.create_task(_run_ticket(agent_id_str, ticket_id, redis))
+                running.add(task)
+                task.add_done_callback(_done)
+                continue
+            slots.release()
+
+            if running:
+                # A finishing ticket may be pushed back if still rate limited
+                await asyncio.wait(set(running), return_when=asyncio.FIRST_COMPLETED)
+                continue
+            if agent_id_str in _rearm:
+                # Popped from the ready set again while we were finishing up
+                _rearm.discard(agent_id_str)
+                continue
+            return claimed
+    finally:
+        for task in list(running):
+            task.cancel()
+
+
+def _start_drain(agent_id_str: str, redis: Redis):
+    """Start a drain task for an agent, or re-arm the one already running."""
+    task = _draining.get(agent_id_str)
+    if task is not None and not task.done():
+        _rearm.add(agent_id_str)
+        return
+    task = asyncio.create_task(_drain_agent_queue(agent_id_str, redis))
+    _draining[agent_id_str] = task
+    task.add_done_callback(lambda t: _drain_finished(agent_id_str, t))
+
+
+def _drain_finished(agent_id_str: str, task: asyncio.Task):
+    if _draining.get(agent_id_str) is task:
+        del _draining[agent_id_str]
+    _rearm.discard(agent_id_str)
+    if not task.cancelled() and task.exception() is not None:
+        # Queued tickets stay put; the recovery sweep re-arms the agent
+        logger.error(f"Queue drain error for {agent_id_str}: {task.exception()}")
 
-    logger.info("Agent queue drainer started")
 
-    idle_cycles = 0
+async def _drain_loop():
+    """Dispatcher: block on the ready set and start a drain task per popped agent."""
+    from app.core.redis import get_redis
+
+    global _slots
+    _slots = asyncio.Semaphore(DRAIN_MAX_CONCURRENCY)
+    logger.info(f"Agent queue drainer started (worker {WORKER_ID})")
 
     while True:
         try:
-            # Adaptive sleep: 2s when active, 30s when idle
-            sleep_time = DRAIN_IDLE_INTERVAL if idle_cycles >= 3 else DRAIN_INTERVAL
-            await asyncio.sleep(sleep_time)
+            # Don't take agents off the ready set while every slot is busy —
+            # another worker with capacity can pick them up instead
+            await _slots.acquire()
+            _slots.release()
 
             redis = await get_redis()
-
-            # Find all agent queues with pending items
-            # Scan for agent_queue:* keys
-            queue_keys = []
-            async for key in redis.scan_iter(match="agent_queue:*", count=100):
-                # Filter out req/result keys
-                if "req" not in key and "result" not in key:
-                    queue_keys.append(key)
-
-            found_work = False
-            for queue_key in queue_keys:
-                depth = await redis.llen(queue_key)
-                if depth == 0:
-                    continue
-
-                found_work = True
-                # Extract agent_id from key
-                agent_id_str = queue_key.replace("agent_queue:", "")
-                try:
-                    await _drain_agent_queue(agent_id_str, redis)
-                except Exception as e:
-                    logger.error(f"Queue drain error for {agent_id_str}: {e}")
-
-            idle_cycles = 0 if found_work else idle_cycles + 1
+            popped = await redis.bzpopmin(READY_KEY, timeout=DRAIN_BLOCK_TIMEOUT)
+            if not popped:
+                continue
+            _, agent_id_str, _ = popped
+            _start_drain(agent_id_str, redis)
 
         except asyncio.CancelledError:
             logger.info("Agent queue drainer stopping")
@@ -286,22 +466,113 @@ async def _drain_loop():
             await asyncio.sleep(5)
 
 
+# ─── Recovery ───
+
+
+async def _heartbeat(redis: Redis):
+    pipeline = redis.pipeline()
+    pipeline.set(_heartbeat_key(WORKER_ID), str(time.time()), ex=WORKER_HEARTBEAT_TTL)
+    pipeline.sadd(WORKERS_KEY, WORKER_ID)
+    await pipeline.execute()
+
+
+async def recover_dead_workers(redis: Redis) -> int:
+    """Requeue in-flight tickets of workers whose heartbeat expired.
+
+    Each ticket is first moved atomically into this worker's in-flight list,
+    so a recovery that dies half-way is itself recovered later. Returns the
+    number of tickets requeued.
+    """
+    recovered = 0
+    for worker_id in await redis.smembers(WORKERS_KEY):
+        if worker_id == WORKER_ID or await redis.exists(_heartbeat_key(worker_id)):
+            continue
+        dead_key = _inflight_key(worker_id)
+        while True:
+            # Newest claim first, each pushed to the front: original order survives
+            ticket_id = await redis.lmove(dead_key, _inflight_key(WORKER_ID), "RIGHT", "RIGHT")
+            if ticket_id is None:
+                break
+            agent_id_str = await redis.hget(f"agent_queue_req:{ticket_id}", "agent_id")
+            if not agent_id_str:
+                await redis.lrem(_inflight_key(WORKER_ID), 1, ticket_id)
+                continue
+            await _requeue(redis, agent_id_str, ticket_id)
+            recovered += 1
+        await redis.srem(WORKERS_KEY, worker_id)
+        logger.warning(f"Agent queue: recovered in-flight tickets from dead worker {worker_id}")
+    return recovered
+
+
+async def _rearm_stranded(redis: Redis):
+    """Put agents with queued tickets back on the ready set; forget empty ones."""
+    for agent_id_str in await redis.smembers(AGENTS_KEY):
+        if await redis.llen(_queue_key(agent_id_str)) > 0:
+            await redis.zadd(READY_KEY, {agent_id_str: time.time()}, nx=True)
+        else:
+            await redis.srem(AGENTS_KEY, agent_id_str)
+
+
+async def _release_inflight(redis: Redis):
+    """On shutdown: hand this worker's unfinished tickets back to their queues."""
+    inflight = await redis.lrange(_inflight_key(WORKER_ID), 0, -1)
+    for ticket_id in reversed(inflight):
+        agent_id_str = await redis.hget(f"agent_queue_req:{ticket_id}", "agent_id")
+        if agent_id_str:
+            await _requeue(redis, agent_id_str, ticket_id)
+    pipeline = redis.pipeline()
+    pipeline.delete(_inflight_key(WORKER_ID), _heartbeat_key(WORKER_ID))
+    pipeline.srem(WORKERS_KEY, WORKER_ID)
+    await pipeline.execute()
+
+
+async def _recovery_loop():
+    """Heartbeat this worker and recover work stranded by dead workers."""
+    from app.core.redis import get_redis
+
+    while True:
+        try:
+            redis = await get_redis()
+            await _heartbeat(redis)
+            await recover_dead_workers(redis)
+            await _rearm_stranded(redis)
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            logger.warning(f"Agent queue recovery sweep failed (non-fatal): {e}")
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+
 async def start_queue_drainer():
-    """Start the background queue drainer."""
-    global _task
+    """Start the background queue dispatcher and recovery sweep."""
+    global _task, _recovery_task
     if _task is None or _task.done():
         _task = asyncio.create_task(_drain_loop())
         logger.info("Agent queue drainer task created")
+    if _recovery_task is None or _recovery_task.done():
+        _recovery_task = asyncio.create_task(_recovery_loop())
 
 
 async def stop_queue_drainer():
-    """Stop the background queue drainer."""
-    global _task
-    if _task and not _task.done():
-        _task.cancel()
+    """Stop the drainer and return this worker's in-flight tickets to their queues."""
+    global _task, _recovery_task
+    tasks = [t for t in (_task, _recovery_task, *_draining.values()) if t and not t.done()]
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
         try:
-            await _task
-        except asyncio.CancelledError:
+            await task
+        except (asyncio.CancelledError, Exception):
             pass
-        logger.info("Agent queue drainer stopped")
+    _draining.clear()
+    _rearm.clear()
     _task = None
+    _recovery_task = None
+
+    try:
+        from app.core.redis import get_redis
+        await _release_inflight(await get_redis())
+    except Exception as e:
+        logger.warning(f"Agent queue: failed to release in-flight tickets: {e}")
+    logger.info("Agent queue drainer stopped")
@@ -0,0 +1,616 @@
+"""
+Memory-mapped compressed vector store — one directory of append-only
+segments per knowledge base, searched in place.
+
+Every KB search today goes through pgvector on the full float32
+``kb_chunks.embedding`` column. This store keeps the ``CompressionCodebook``
+encoding of each chunk on local disk in a fixed-stride layout that workers
+mmap read-only and scan with the codebook's vectorized scorer. Pages are
+shared through the OS page cache, so N workers cost one copy of the codes,
+and the codes are 8-32x smaller than the float32 embeddings.
+
+Layout (under VECTOR_STORE_DIR/{kb_id}/):
+    manifest.json          — {"segments": [seq, ...], "next_seq": n}, replaced atomically
+    seg-{seq:08d}.bvs      — header + radii + packed codes + QJL bits
+    seg-{seq:08d}.ids      — chunk-id sidecar, 16 raw UUID bytes per row
+    tombstones.ids         — append-only (chunk id, segment bound) records
+    rebuild                — present while a re-encode is staging segments
+    .lock                  — flock for writers (append / delete / compact)
+
+Segment file (little-endian):
+    [64-byte header][float32 radii x count][codes: count x code_stride]
+    [qjl: count x qjl_stride]
+
+The header carries the codebook config (dimensions, bits, rotation seed,
+QJL flag) so a segment can be searched without the KnowledgeBase row.
+
+Writes never modify a published file: ``append`` writes a new segment and
+swaps the manifest, ``delete`` appends tombstones, and ``compact`` merges
+live rows into one segment. A tombstone only hides rows in segments older
+than the delete, so a chunk can be deleted and re-appended. A rebuild
+(compression method changed) stages re-encoded segments next to the live
+ones and swaps them in with one manifest write. Readers
+re-check the manifest mtime on every search and remap when it changes;
+mappings of unlinked segments stay valid until dropped.
+
+Usage:
+    from app.services.compressed_vector_store import compressed_vector_store
+
+    await asyncio.to_thread(compressed_vector_store.append, kb_id, chunk_ids, embeddings, bits=4)
+    hits = await asyncio.to_thread(compressed_vector_store.search, kb_id, query, 50)
+
+    # In lifespan:
+    await start_vector_store_compactor()
+    await stop_vector_store_compactor()
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.vector_compression import CompressionCodebook, top_k_scores
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+VECTOR_STORE_DIR = os.environ.get("VECTOR_STORE_DIR", "data/vector_store")
+COMPACT_MAX_SEGMENTS = 8          # Merge once a KB has more segments than this
+COMPACT_TOMBSTONE_RATIO = 0.2     # ...or once this fraction of rows is deleted
+COMPACT_INTERVAL = 300            # Seconds between background compaction sweeps
+REBUILD_MARKER_TTL = 3600         # Ignore a rebuild marker older than this (rebuild died)
+
+_MAGIC = b"BVS1"
+_VERSION = 1
+# magic, version, bits, use_qjl, dimensions, rotation_seed, count, code_stride, qjl_stride
+_HEADER = struct.Struct("<4sHBBIIQII")
+_HEADER_SIZE = 64
+_ID_SIZE = 16
+_ID_DTYPE = np.dtype(f"S{_ID_SIZE}")
+# chunk id, hides that chunk in segments with seq < bound
+_TOMBSTONE_DTYPE = np.dtype([("id", _ID_DTYPE), ("bound", "<u8")])
+
+# Codebooks are regenerated from their seed (a QR of a dims x dims matrix),
+# so share one instance per config across KBs and searches.
+_codebooks: Dict[Tuple[int, int, int, bool], CompressionCodebook] = {}
+_codebooks_lock = threading.Lock()
+
+
+def get_codebook(dimensions: int, bits: int, rotation_seed: int, use_qjl: bool = True) -> CompressionCodebook:
+    """Return the shared codebook for a config, building it on first use."""
+    key = (dimensions, bits, rotation_seed, use_qjl)
+    with _codebooks_lock:
+        cb = _codebooks.get(key)
+        if cb is None:
+            cb = CompressionCodebook.from_dict({
+                "dimensions": dimensions,
+                "bits": bits,
+                "rotation_seed": rotation_seed,
+                "use_qjl": use_qjl,
+            })
+            _codebooks[key] = cb
+        return cb
+
+
+def codebook_for_kb(kb_id, dimensions: int, bits: int) -> CompressionCodebook:
+    """Per-KB codebook, seeded the same way as CompressionCodebook.create."""
+    rotation_seed = int(hashlib.sha256(str(kb_id).encode()).hexdigest()[:8], 16)
+    return get_codebook(dimensions, bits, rotation_seed)
+
+
+@dataclass
+class _Segment:
+    """One mapped segment. Arrays are zero-copy views into the mmaps."""
+    seq: int
+    codebook: CompressionCodebook
+    radii: np.ndarray
+    codes: np.ndarray
+    qjl: np.ndarray
+    ids: np.ndarray
+    live: Optional[np.ndarray] = None  # bool mask, None when nothing is deleted
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def live_count(self) -> int:
+        return self.count if self.live is None else int(self.live.sum())
+
+    @property
+    def config(self) -> Tuple[int, int, int, bool]:
+        cb = self.codebook
+        return (cb.dimensions, cb.bits, cb.rotation_seed, cb.use_qjl)
+
+
+@dataclass
+class _KBView:
+    """A KB's segments as of one (manifest, tombstones) state."""
+    stamp: tuple
+    segments: List[_Segment]
+    next_seq: int
+
+
+class CompressedVectorStore:
+    """Per-KB segment store. Methods are blocking; call them via asyncio.to_thread."""
+
+    def __init__(self, root: str = VECTOR_STORE_DIR):
+        self.root = root
+        self._views: Dict[str, _KBView] = {}
+        self._views_lock = threading.Lock()
+
+    # ── Paths ──
+
+    def kb_dir(self, kb_id) -> str:
+        return os.path.join(self.root, str(kb_id))
+
+    def _segment_path(self, kb_id, seq: int, ext: str) -> str:
+        return os.path.join(self.kb_dir(kb_id), f"seg-{seq:08d}.{ext}")
+
+    def kb_ids(self) -> List[str]:
+        """KBs that have a store on this disk."""
+        try:
+            return [
+                name for name in os.listdir(self.root)
+                if os.path.exists(os.path.join(self.root, name, "manifest.json"))
+            ]
+        except FileNotFoundError:
+            return []
+
+    # ── Writers ──
+
+    @contextmanager
+    def _write_lock(self, kb_id):
+        """Cross-process writer lock for one KB (flock on .lock)."""
+        os.makedirs(self.kb_dir(kb_id), exist_ok=True)
+        fd = os.open(os.path.join(self.kb_dir(kb_id), ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def append(
+        self,
+        kb_id,
+        chunk_ids: Sequence[uuid.UUID],
+        embeddings,
+        bits: int = 4,
+    ) -> int:
+        """Encode embeddings and publish them as a new segment. Returns rows written."""
+        if len(chunk_ids) == 0:
+            return 0
+        codebook, radii, codes, qjl, ids = self._encode(kb_id, chunk_ids, embeddings, bits)
+        with self._write_lock(kb_id):
+            manifest = self._read_manifest(kb_id)
+            seq = manifest["next_seq"]
+            self._write_segment(kb_id, seq, codebook, radii, codes, qjl, ids)
+            self._write_manifest(kb_id, manifest["segments"] + [seq], seq + 1)
+        return len(ids)
+
+    @staticmethod
+    def _encode(kb_id, chunk_ids, embeddings, bits: int):
+        arr = np.asarray(embeddings, dtype=np.float32)
+        if arr.ndim != 2 or len(arr) != len(chunk_ids):
+            raise ValueError(f"expected {len(chunk_ids)} embeddings, got array of shape {arr.shape}")
+        codebook = codebook_for_kb(kb_id, arr.shape[1], bits)
+        radii, codes, qjl = codebook.encode(arr)
+        ids = np.array([_id_bytes(c) for c in chunk_ids], dtype=_ID_DTYPE)
+        return codebook, radii, codes, qjl, ids
+
+    def delete(self, kb_id, chunk_ids: Sequence[uuid.UUID]) -> None:
+        """Hide chunks from search. Space is reclaimed by compaction."""
+        if len(chunk_ids) == 0 or not os.path.isdir(self.kb_dir(kb_id)):
+            return
+        with self._write_lock(kb_id):
+            bound = self._read_manifest(kb_id)["next_seq"]
+            data = np.array([(_id_bytes(c), bound) for c in chunk_ids], dtype=_TOMBSTONE_DTYPE).tobytes()
+            fd = os.open(self._tombstone_path(kb_id), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, data)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def drop(self, kb_id) -> None:
+        """Remove a KB's store entirely (KB deleted)."""
+        with self._views_lock:
+            self._views.pop(str(kb_id), None)
+        shutil.rmtree(self.kb_dir(kb_id), ignore_errors=True)
+
+    # ── Rebuild (re-encode every row with a new codebook) ──
+
+    def begin_rebuild(self, kb_id, exclusive: bool = False) -> Optional[int]:
+        """
+        Start a rebuild. Returns the seq that separates old segments from new.
+
+        Segments written by ``stage`` are not searchable until ``publish``
+        swaps them in for every segment older than the returned seq. Appends
+        and deletes keep working in the meantime; compaction is paused so it
+        can't fold old segments into new ones.
+
+        With ``exclusive``, returns None instead when another rebuild of the
+        KB is already running (in this process or another worker).
+        """
+        with self._write_lock(kb_id):
+            if exclusive and self._rebuilding(kb_id):
+                return None
+            since_seq = self._read_manifest(kb_id)["next_seq"]
+            _write_atomic(self._rebuild_marker_path(kb_id), [str(since_seq).encode()])
+            return since_seq
+
+    def stage(self, kb_id, chunk_ids: Sequence[uuid.UUID], embeddings, bits: int = 4) -> Optional[int]:
+        """Encode rows into an unpublished segment for a rebuild. Returns its seq."""
+        if len(chunk_ids) == 0:
+            return None
+        codebook, radii, codes, qjl, ids = self._encode(kb_id, chunk_ids, embeddings, bits)
+        with self._write_lock(kb_id):
+            manifest = self._read_manifest(kb_id)
+            seq = manifest["next_seq"]
+            self._write_segment(kb_id, seq, codebook, radii, codes, qjl, ids)
+            self._write_manifest(kb_id, manifest["segments"], seq + 1)
+        return seq
+
+    def publish_rebuild(self, kb_id, since_seq: int, staged: Sequence[int]) -> None:
+        """Replace every segment older than since_seq with the staged segments."""
+        with self._write_lock(kb_id):
+            manifest = self._read_manifest(kb_id)
+            old = [seq for seq in manifest["segments"] if seq < since_seq]
+            keep = sorted(set(staged) | {seq for seq in manifest["segments"] if seq >= since_seq})
+            self._write_manifest(kb_id, keep, manifest["next_seq"])
+            self._trim_tombstones(kb_id, keep[0] if keep else None)
+            self._remove_segments(kb_id, old)
+            self._clear_rebuild_marker(kb_id)
+        logger.info(f"Rebuilt vector store for KB {kb_id}: {len(old)} old -> {len(staged)} new segments")
+
+    def abort_rebuild(self, kb_id, staged: Sequence[int]) -> None:
+        """Throw away staged segments and leave the published store as it was."""
+        if not os.path.isdir(self.kb_dir(kb_id)):
+            return  # dropped while rebuilding
+        with self._write_lock(kb_id):
+            self._remove_segments(kb_id, staged)
+            self._clear_rebuild_marker(kb_id)
+
+    def _rebuilding(self, kb_id) -> bool:
+        try:
+            age = time.time() - os.stat(self._rebuild_marker_path(kb_id)).st_mtime
+        except FileNotFoundError:
+            return False
+        # A rebuild that died without publishing shouldn't block compaction forever
+        return age < REBUILD_MARKER_TTL
+
+    def _clear_rebuild_marker(self, kb_id) -> None:
+        try:
+            os.remove(self._rebuild_marker_path(kb_id))
+        except FileNotFoundError:
+            pass
+
+    def _remove_segments(self, kb_id, seqs: Sequence[int]) -> None:
+        for seq in seqs:
+            for ext in ("bvs", "ids"):
+                try:
+                    os.remove(self._segment_path(kb_id, seq, ext))
+                except FileNotFoundError:
+                    pass
+
+    def compact(self, kb_id) -> bool:
+        """
+        Merge segments that share a codebook config and drop deleted rows.
+
+        Returns True if anything was rewritten.
+        """
+        with self._write_lock(kb_id):
+            if self._rebuilding(kb_id):
+                return False
+            view = self._load_view(kb_id)
+            if view is None or not self._needs_compaction(view):
+                return False
+
+            groups: Dict[tuple, List[_Segment]] = {}
+            for seg in view.segments:
+                groups.setdefault(seg.config, []).append(seg)
+
+            next_seq = view.next_seq
+            keep: List[int] = []
+            replaced: List[int] = []
+            for segs in groups.values():
+                if len(segs) == 1 and segs[0].live is None:
+                    keep.append(segs[0].seq)
+                    continue
+                replaced.extend(s.seq for s in segs)
+                masks = [s.live if s.live is not None else slice(None) for s in segs]
+                ids = np.concatenate([s.ids[m] for s, m in zip(segs, masks)])
+                if len(ids) == 0:
+                    continue
+                self._write_segment(
+                    kb_id,
+                    next_seq,
+                    segs[0].codebook,
+                    np.concatenate([s.radii[m] for s, m in zip(segs, masks)]),
+                    np.concatenate([s.codes[m] for s, m in zip(segs, masks)]),
+                    np.concatenate([s.qjl[m] for s, m in zip(segs, masks)]),
+                    ids,
+                )
+                keep.append(next_seq)
+                next_seq += 1
+
+            keep.sort()
+            self._write_manifest(kb_id, keep, next_seq)
+            self._trim_tombstones(kb_id, min((s for s in keep if s < view.next_seq), default=None))
+            self._remove_segments(kb_id, replaced)
+            logger.info(
+                f"Compacted vector store for KB {kb_id}: "
+                f"{len(view.segments)} -> {len(keep)} segments"
+            )
+            return True
+
+    def needs_compaction(self, kb_id) -> bool:
+        view = self._get_view(kb_id)
+        return view is not None and self._needs_compaction(view)
+
+    @staticmethod
+    def _needs_compaction(view: _KBView) -> bool:
+        if len(view.segments) > COMPACT_MAX_SEGMENTS:
+            return True
+        total = sum(s.count for s in view.segments)
+        dead = total - sum(s.live_count for s in view.segments)
+        return dead > 0 and (dead >= total * COMPACT_TOMBSTONE_RATIO or dead == total)
+
+    # ── Readers ──
+
+    def search(self, kb_id, query: List[float], top_k: int = 10) -> List[Tuple[uuid.UUID, float]]:
+        """Top-k (chunk_id, cosine score) over every live row of the KB."""
+        view = self._get_view(kb_id)
+        if view is None or top_k <= 0:
+            return []
+
+        ids: List[np.ndarray] = []
+        scores: List[np.ndarray] = []
+        for seg in view.segments:
+            seg_scores = seg.codebook.score_packed(query, seg.radii, seg.codes)
+            if seg_scores is None:
+                return []
+            if seg.live is not None:
+                seg_scores[~seg.live] = -np.inf
+            best = [i for i, s in top_k_scores(seg_scores, top_k) if s != -np.inf]
+            ids.append(seg.ids[best])
+            scores.append(seg_scores[best])
+
+        if not ids:
+            return []
+        all_ids = np.concatenate(ids)
+        all_scores = np.concatenate(scores)
+        return [
+            (uuid.UUID(bytes=all_ids[i].ljust(_ID_SIZE, b"\x00")), score)
+            for i, score in top_k_scores(all_scores, top_k)
+        ]
+
+    def count(self, kb_id) -> int:
+        """Live (non-deleted) rows in the KB's store."""
+        view = self._get_view(kb_id)
+        return 0 if view is None else sum(s.live_count for s in view.segments)
+
+    def disk_usage(self, kb_id) -> Dict[str, int]:
+        """Bytes on disk for the KB's published segments, tombstones and manifest."""
+        view = self._get_view(kb_id)
+        if view is None:
+            return {"segments": 0, "total_bytes": 0, "bits": 0}
+        total = 0
+        for seg in view.segments:
+            for ext in ("bvs", "ids"):
+                try:
+                    total += os.path.getsize(self._segment_path(kb_id, seg.seq, ext))
+                except FileNotFoundError:
+                    pass
+        for path in (self._manifest_path(kb_id), self._tombstone_path(kb_id)):
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return {
+            "segments": len(view.segments),
+            "total_bytes": total,
+            "bits": max((s.codebook.bits for s in view.segments), default=0),
+        }
+
+    def _get_view(self, kb_id) -> Optional[_KBView]:
+        """Cached view, reloaded when the manifest or tombstones change."""
+        key = str(kb_id)
+        stamp = self._stamp(kb_id)
+        if stamp is None:
+            return None
+        with self._views_lock:
+            view = self._views.get(key)
+            if view is None or view.stamp != stamp:
+                view = self._load_view(kb_id)
+                if view is None:
+                    self._views.pop(key, None)
+                else:
+                    self._views[key] = view
+            return view
+
+    def _stamp(self, kb_id) -> Optional[tuple]:
+        try:
+            m = os.stat(self._manifest_path(kb_id))
+        except FileNotFoundError:
+            return None
+        try:
+            tombstones = os.stat(self._tombstone_path(kb_id))
+            t = (tombstones.st_ino, tombstones.st_size)
+        except FileNotFoundError:
+            t = None
+        return (m.st_ino, m.st_mtime_ns, m.st_size, t)
+
+    def _load_view(self, kb_id) -> Optional[_KBView]:
+        stamp = self._stamp(kb_id)
+        if stamp is None:
+            return None
+        manifest = self._read_manifest(kb_id)
+        segments = [self._map_segment(kb_id, seq) for seq in manifest["segments"]]
+        tombstones = self._read_tombstones(kb_id)
+        if len(tombstones):
+            for seg in segments:
+                applicable = tombstones["id"][tombstones["bound"] > seg.seq]
+                if len(applicable):
+                    live = ~np.isin(seg.ids, applicable)
+                    seg.live = None if live.all() else live
+        return _KBView(stamp=stamp, segments=segments, next_seq=manifest["next_seq"])
+
+    def _map_segment(self, kb_id, seq: int) -> _Segment:
+        data = _map_file(self._segment_path(kb_id, seq, "bvs"))
+        magic, version, bits, use_qjl, dims, seed, count, code_stride, qjl_stride = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Unsupported vector segment {seq} for KB {kb_id}")
+
+        codebook = get_codebook(dims, bits, seed, bool(use_qjl))
+        offset = _HEADER_SIZE
+        radii = np.frombuffer(data, dtype="<f4", count=count, offset=offset)
+        offset += count * 4
+        codes = np.frombuffer(data, dtype=np.uint8, count=count * code_stride, offset=offset).reshape(count, code_stride)
+        offset += count * code_stride
+        qjl = np.frombuffer(data, dtype=np.uint8, count=count * qjl_stride, offset=offset).reshape(count, qjl_stride)
+        ids = np.frombuffer(_map_file(self._segment_path(kb_id, seq, "ids")), dtype=_ID_DTYPE, count=count)
+        return _Segment(seq=seq, codebook=codebook, radii=radii, codes=codes, qjl=qjl, ids=ids)
+
+    # ── Files ──
+
+    def _manifest_path(self, kb_id) -> str:
+        return os.path.join(self.kb_dir(kb_id), "manifest.json")
+
+    def _tombstone_path(self, kb_id) -> str:
+        return os.path.join(self.kb_dir(kb_id), "tombstones.ids")
+
+    def _rebuild_marker_path(self, kb_id) -> str:
+        return os.path.join(self.kb_dir(kb_id), "rebuild")
+
+    def _read_manifest(self, kb_id) -> dict:
+        try:
+            with open(self._manifest_path(kb_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"segments": [], "next_seq": 0}
+
+    def _write_manifest(self, kb_id, segments: List[int], next_seq: int) -> None:
+        _write_atomic(
+            self._manifest_path(kb_id),
+            [json.dumps({"segments": segments, "next_seq": next_seq}).encode()],
+        )
+
+    def _read_tombstones(self, kb_id) -> np.ndarray:
+        try:
+            with open(self._tombstone_path(kb_id), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        usable = len(data) - len(data) % _TOMBSTONE_DTYPE.itemsize
+        return np.frombuffer(data[:usable], dtype=_TOMBSTONE_DTYPE)
+
+    def _trim_tombstones(self, kb_id, oldest_seq: Optional[int]) -> None:
+        """Drop tombstones that no longer hide a row in any remaining segment."""
+        tombstones = self._read_tombstones(kb_id)
+        if oldest_seq is None:
+            tombstones = tombstones[:0]
+        else:
+            tombstones = tombstones[tombstones["bound"] > oldest_seq]
+        if len(tombstones):
+            _write_atomic(self._tombstone_path(kb_id), [tombstones.tobytes()])
+        else:
+            try:
+                os.remove(self._tombstone_path(kb_id))
+            except FileNotFoundError:
+                pass
+
+    def _write_segment(self, kb_id, seq, codebook, radii, codes, qjl, ids) -> None:
+        count = len(ids)
+        header = _HEADER.pack(
+            _MAGIC, _VERSION, codebook.bits, int(codebook.use_qjl), codebook.dimensions,
+            codebook.rotation_seed, count, codes.shape[1], qjl.shape[1],
+        ).ljust(_HEADER_SIZE, b"\x00")
+        _write_atomic(
+            self._segment_path(kb_id, seq, "bvs"),
+            [
+                header,
+                np.ascontiguousarray(radii, dtype="<f4").tobytes(),
+                np.ascontiguousarray(codes).tobytes(),
+                np.ascontiguousarray(qjl).tobytes(),
+            ],
+        )
+        _write_atomic(self._segment_path(kb_id, seq, "ids"), [np.ascontiguousarray(ids).tobytes()])
+
+
+
+def _id_bytes(chunk_id) -> bytes:
+    return chunk_id.bytes if isinstance(chunk_id, uuid.UUID) else uuid.UUID(str(chunk_id)).bytes
+
+
+def _map_file(path: str):
+    """Read-only shared mapping of a whole file (pages shared across workers)."""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_atomic(path: str, parts: List[bytes]) -> None:
+    """Write to a temp file, fsync, then rename over path."""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        for part in parts:
+            f.write(part)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+compressed_vector_store = CompressedVectorStore()
+
+
+# ─── Background compaction ───
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _run_loop():
+    """Background loop that compacts KB stores with too many segments or deletes."""
+    while True:
+        await asyncio.sleep(COMPACT_INTERVAL)
+        for kb_id in compressed_vector_store.kb_ids():
+            try:
+                if compressed_vector_store.needs_compaction(kb_id):
+                    await asyncio.to_thread(compressed_vector_store.compact, kb_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Vector store compaction failed for KB {kb_id}: {e}")
+
+
+async def start_vector_store_compactor():
+    """Start the background compaction loop."""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run_loop())
+        logger.info("Vector store compactor started")
+
+
+async def stop_vector_store_compactor():
+    """Stop the background compaction loop."""
+    global _task
+    if _task and not _task.done():
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+    _task = None
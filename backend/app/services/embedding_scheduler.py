@@ -0,0 +1,303 @@
+"""
+Embedding scheduler — coalesced, adaptive batching for EmbeddingGenerator.
+
+EmbeddingGenerator used to send fixed batches of 20 texts one after
+another, with a DB session + ``get_router`` per batch and a 0.5 s sleep in
+between, so a large document spent most of its ingest time asleep and two
+documents for the same org never shared a request.
+
+Texts are now queued on a *lane* per (org, model, dimensions) — the
+platform-key fallback has a single lane shared by every org — and the
+lane's dispatcher:
+
+  - coalesces texts from every concurrent caller into batches sized by the
+    model's max input count and a token budget (MODEL_BATCH_LIMITS),
+  - keeps several batches in flight under an AIMD limit: +1/limit per
+    successful batch, halved on a rate-limit error,
+  - re-queues a rate-limited batch at the front and pauses the lane with
+    exponential backoff instead of failing the caller.
+
+Each caller gets its own vectors back in order; an error other than a rate
+limit fails only the callers that had texts in that batch.
+
+Per-model throughput is kept in-process and exposed through
+``embedding_scheduler.stats()`` (GET /api/admin/embeddings/throughput).
+
+Usage:
+    from app.services.embedding_scheduler import embedding_scheduler
+
+    vectors = await embedding_scheduler.embed(lane_key, model, texts, send_batch)
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ── Constants ──
+
+DEFAULT_MAX_INPUTS = 96
+DEFAULT_MAX_BATCH_TOKENS = 8_000
+
+# model -> (max inputs per request, token budget per request)
+MODEL_BATCH_LIMITS: Dict[str, Tuple[int, int]] = {
+    "text-embedding-3-small": (2048, 250_000),
+    "text-embedding-3-large": (2048, 250_000),
+    "text-embedding-005": (250, 18_000),
+    "text-multilingual-embedding-002": (250, 18_000),
+    "gemini-embedding-001": (1, 2_048),
+    "amazon.titan-embed-text-v2:0": (1, 8_000),
+    "amazon.titan-embed-text-v1": (1, 8_000),
+    "cohere.embed-english-v3": (96, 40_000),
+    "cohere.embed-multilingual-v3": (96, 40_000),
+    "cohere.embed-v4:0": (96, 120_000),
+}
+
+INITIAL_CONCURRENCY = 2
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+LINGER_SECONDS = 0.01            # wait for other callers before sending a short batch
+RATE_LIMIT_BACKOFF_BASE = 1.0    # seconds, doubled per consecutive rate-limited batch
+RATE_LIMIT_BACKOFF_MAX = 30.0
+MAX_RATE_LIMIT_RETRIES = 6       # per text, before its caller gets the error
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+SendBatch = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token), same as TextChunker."""
+    return len(text) // 4 + 1
+
+
+def batch_limits(model: str) -> Tuple[int, int]:
+    return MODEL_BATCH_LIMITS.get(model, (DEFAULT_MAX_INPUTS, DEFAULT_MAX_BATCH_TOKENS))
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    err = str(exc).lower()
+    return (
+        "rate limit" in err or "rate_limit" in err or "429" in err
+        or "too many requests" in err or "RateLimitError" in type(exc).__name__
+    )
+
+
+class _Request:
+    """One embed() call: its result slots and the future the caller awaits."""
+
+    __slots__ = ("results", "remaining", "future")
+
+    def __init__(self, size: int):
+        self.results: List[Optional[List[float]]] = [None] * size
+        self.remaining = size
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def fill(self, index: int, vector: List[float]) -> None:
+        if self.future.done():
+            return
+        self.results[index] = vector
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.future.set_result(self.results)
+
+    def fail(self, exc: BaseException) -> None:
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+class _Entry:
+    __slots__ = ("request", "index", "text", "tokens", "attempts")
+
+    def __init__(self, request: _Request, index: int, text: str):
+        self.request = request
+        self.index = index
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.attempts = 0
+
+
+class _ModelStats:
+    def __init__(self):
+        self.texts = 0
+        self.tokens = 0
+        self.batches = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.latency_total = 0.0
+        self._recent: Deque[Tuple[float, int, int]] = deque()  # (finished_at, texts, tokens)
+
+    def record(self, texts: int, tokens: int, latency: float) -> None:
+        now = time.monotonic()
+        self.texts += texts
+        self.tokens += tokens
+        self.batches += 1
+        self.latency_total += latency
+        self._recent.append((now, texts, tokens))
+        while self._recent and self._recent[0][0] < now - THROUGHPUT_WINDOW_SECONDS:
+            self._recent.popleft()
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        recent = [r for r in self._recent if r[0] >= now - THROUGHPUT_WINDOW_SECONDS]
+        span = THROUGHPUT_WINDOW_SECONDS if recent else 1.0
+        return {
+            "texts": self.texts,
+            "tokens": self.tokens,
+            "batches": self.batches,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "avg_batch_size": round(self.texts / self.batches, 1) if self.batches else 0,
+            "avg_latency_ms": round(1000 * self.latency_total / self.batches, 1) if self.batches else 0,
+            "texts_per_second": round(sum(r[1] for r in recent) / span, 2),
+            "tokens_per_second": round(sum(r[2] for r in recent) / span, 2),
+        }
+
+
+class _Lane:
+    """Queue + dispatcher for one (org, model, dimensions)."""
+
+    def __init__(self, model: str, stats: _ModelStats):
+        self.model = model
+        self.stats = stats
+        self.loop = asyncio.get_running_loop()
+        self.max_inputs, self.max_tokens = batch_limits(model)
+        self.send: Optional[SendBatch] = None
+        self.pending: Deque[_Entry] = deque()
+        self.limit = float(INITIAL_CONCURRENCY)
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.rate_limit_streak = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    def submit(self, texts: List[str], send: SendBatch) -> asyncio.Future:
+        # Latest caller's sender wins, so a refreshed router is picked up
+        self.send = send
+        request = _Request(len(texts))
+        self.pending.extend(_Entry(request, i, text) for i, text in enumerate(texts))
+        self._wake.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return request.future
+
+    async def _run(self) -> None:
+        while self.pending or self.in_flight:
+            if not self.pending or self.in_flight >= int(self.limit):
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if (delay := self.cooldown_until - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+                continue
+            if not self._batch_full():
+                await asyncio.sleep(LINGER_SECONDS)
+
+            batch = self._take_batch()
+            if not batch:
+                continue
+            self.in_flight += 1
+            task = asyncio.create_task(self._send(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    def _batch_full(self) -> bool:
+        count = tokens = 0
+        for entry in self.pending:
+            count += 1
+            tokens += entry.tokens
+            if count >= self.max_inputs or tokens >= self.max_tokens:
+                return True
+        return False
+
+    def _take_batch(self) -> List[_Entry]:
+        batch: List[_Entry] = []
+        tokens = 0
+        while self.pending and len(batch) < self.max_inputs:
+            entry = self.pending[0]
+            if entry.request.future.done():  # caller failed or went away
+                self.pending.popleft()
+                continue
+            if batch and tokens + entry.tokens > self.max_tokens:
+                break
+            batch.append(self.pending.popleft())
+            tokens += entry.tokens
+        return batch
+
+    async def _send(self, batch: List[_Entry]) -> None:
+        texts = [entry.text for entry in batch]
+        started = time.monotonic()
+        try:
+            vectors = await self.send(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Embedding count ({len(vectors)}) doesn't match input count ({len(texts)})")
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self._rate_limited(batch, e)
+            else:
+                self.stats.errors += 1
+                logger.error(f"Embedding batch of {len(texts)} failed for model {self.model}: {e}")
+                for entry in batch:
+                    entry.request.fail(e)
+        else:
+            self.rate_limit_streak = 0
+            self.limit = min(MAX_CONCURRENCY, self.limit + 1 / self.limit)
+            for entry, vector in zip(batch, vectors):
+                entry.request.fill(entry.index, vector)
+            self.stats.record(len(texts), sum(entry.tokens for entry in batch), time.monotonic() - started)
+        finally:
+            self.in_flight -= 1
+            self._wake.set()
+
+    def _rate_limited(self, batch: List[_Entry], exc: Exception) -> None:
+        self.stats.rate_limited += 1
+        self.limit = max(MIN_CONCURRENCY, self.limit / 2)
+        delay = min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF_BASE * 2 ** self.rate_limit_streak)
+        self.rate_limit_streak += 1
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+        logger.warning(
+            f"Embedding rate-limited for model {self.model}: "
+            f"concurrency -> {int(self.limit)}, pausing {delay:.1f}s"
+        )
+        for entry in reversed(batch):
+            entry.attempts += 1
+            if entry.attempts > MAX_RATE_LIMIT_RETRIES:
+                entry.request.fail(exc)
+            else:
+                self.pending.appendleft(entry)
+
+
+class EmbeddingScheduler:
+    def __init__(self):
+        self._lanes: Dict[Hashable, _Lane] = {}
+        self._stats: Dict[str, _ModelStats] = {}
+
+    async def embed(self, lane_key: Hashable, model: str, texts: List[str], send: SendBatch) -> List[List[float]]:
+        """
+        Embed *texts* on the lane for *lane_key*, batched with every other
+        caller on that lane. *send* embeds one batch and returns its vectors.
+        """
+        if not texts:
+            return []
+        lane = self._lanes.get(lane_key)
+        if lane is None or lane.loop is not asyncio.get_running_loop():
+            stats = self._stats.setdefault(model, _ModelStats())
+            lane = self._lanes[lane_key] = _Lane(model, stats)
+        return await lane.submit(list(texts), send)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model throughput plus the live concurrency limits, for admin endpoints."""
+        models = {model: stats.snapshot() for model, stats in self._stats.items()}
+        for lane in self._lanes.values():
+            entry = models[lane.model]
+            entry["lanes"] = entry.get("lanes", 0) + 1
+            entry["in_flight"] = entry.get("in_flight", 0) + lane.in_flight
+            entry["queued"] = entry.get("queued", 0) + len(lane.pending)
+            entry["max_concurrency_limit"] = max(entry.get("max_concurrency_limit", 0), int(lane.limit))
+        return {"models": models}
+
+
+embedding_scheduler = EmbeddingScheduler()
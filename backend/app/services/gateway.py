@@ -6,6 +6,8 @@ LiteLLM model list, and provides completion/embedding calls with
 automatic failover.
 """
 
+import asyncio
+import copy
 import json
 import time
 import uuid
@@ -13,13 +15,12 @@ import hashlib
 import secrets
 import logging
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from typing import Any, Awaitable, Callable, Optional
 
 import litellm
-from sqlalchemy import select, func, and_, cast, Date, text as sa_text
+from sqlalchemy import select, func, and_, cast, Date
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.redis import redis_client
 from app.core.database import get_db_session
 from app.models.cloud_provider import CloudProvider
 from app.models.gateway import GatewayRequest, GatewayKey, GatewayRateLimit
@@ -28,6 +29,9 @@ from app.models.routing_policy import RoutingPolicy
 from app.models.model import Model
 from app.models.deployment import Deployment
 from app.schemas.gateway import RoutingStrategy
+from app.services import policy_cache, rate_limiter, router_cache, spend_ledger
+from app.services.request_log_writer import request_log_writer
+from app.services.policy_cache import OrgCounters, PolicySnapshot
 from app.services.log_emitters import emit_gateway_event
 from app.services.managed_inference import calculate_marked_up_cost
 
@@ -723,9 +727,114 @@ async def _build_model_list(creds: dict, db: AsyncSession = None, org_id: uuid.U
 
 
 # ─── Per-org router cache (with TTL for token refresh) ───
+#
+# Two tiers: an in-process dict of built routers, backed by the shared
+# Redis tier in ``router_cache`` that holds the serialized model list once
+# per org for every worker. Entries inside the refresh-ahead window are
+# still served while a single background task (single-flight locally and
+# across workers) rebuilds them, so live requests only block on a rebuild
+# when an org has no usable entry anywhere.
+
+_routers: dict[uuid.UUID, tuple[litellm.Router, float]] = {}  # org → (router, built_at)
+_ROUTER_TTL = router_cache.ROUTER_CONFIG_TTL  # 50 minutes — refresh before Azure AD tokens expire (1 hr)
+_REFRESH_RETRY_SECONDS = 5  # min gap between refresh attempts when another worker holds the lock
+
+_refresh_tasks: dict[uuid.UUID, asyncio.Task] = {}
+_refresh_not_before: dict[uuid.UUID, float] = {}
+_router_generation: dict[uuid.UUID, int] = {}  # bumped on local invalidation
+_router_epoch = 0  # bumped when every org is invalidated at once
+_COLD_BUILD_WAIT_SECONDS = 10.0  # how long a cold worker waits for another worker's build
+
+
+def _make_router(model_list: list[dict]) -> litellm.Router:
+    """Construct a LiteLLM router from a built model list."""
+    if not model_list:
+        # Return a router with empty model list — calls will fail gracefully
+        return litellm.Router(model_list=[], routing_strategy="simple-shuffle")
+    return litellm.Router(
+        model_list=model_list,
+        routing_strategy="simple-shuffle",
+        num_retries=2,
+        retry_after=1,
+        timeout=120,
+        allowed_fails=2,
+        cooldown_time=30,
+    )
+
+
+async def _rebuild_model_list(db: AsyncSession, org_id: uuid.UUID) -> list[dict]:
+    """Full (slow) rebuild: Vault credentials + DB model catalog."""
+    creds = await _get_provider_credentials(db, org_id)
+    return await _build_model_list(creds, db=db, org_id=org_id)
+
+
+def _install_router(org_id: uuid.UUID, model_list: list[dict], built_at: float) -> litellm.Router:
+    # Router may annotate its deployments in place; keep the cached copy clean.
+    router = _make_router(copy.deepcopy(model_list))
+    _routers[org_id] = (router, built_at)
+    return router
+
+
+def _local_generation(org_id: uuid.UUID) -> tuple[int, int]:
+    return _router_epoch, _router_generation.get(org_id, 0)
+
+
+def _drop_local_router(org_id: Optional[uuid.UUID]) -> None:
+    """Forget in-process routers (invalidation listener callback)."""
+    global _router_epoch
+    if org_id is not None:
+        _routers.pop(org_id, None)
+        _router_generation[org_id] = _router_generation.get(org_id, 0) + 1
+    else:
+        _routers.clear()
+        _router_epoch += 1
+
+
+async def _refresh_router(org_id: uuid.UUID) -> None:
+    """Background rebuild of one org's router. Never raises."""
+    local_gen = _local_generation(org_id)
+    try:
+        local = _routers.get(org_id)
+        local_built_at = local[1] if local else 0.0
+
+        # Another worker may already have refreshed the shared entry.
+        shared = await router_cache.load_model_list(org_id)
+        if shared and shared[1] > local_built_at and not router_cache.needs_refresh(shared[1]):
+            if _local_generation(org_id) == local_gen:
+                _install_router(org_id, shared[0], shared[1])
+            return
+
+        token = await router_cache.acquire_refresh_lock(org_id)
+        if token is None:
+            # Someone else is rebuilding; pick it up from Redis shortly.
+            _refresh_not_before[org_id] = time.time() + _REFRESH_RETRY_SECONDS
+            return
+        try:
+            shared_gen = await router_cache.get_generation(org_id)
+            async with get_db_session() as db:
+                model_list = await _rebuild_model_list(db, org_id)
+            built_at = time.time()
+            await router_cache.store_model_list(org_id, model_list, built_at, generation=shared_gen)
+            if _local_generation(org_id) == local_gen:
+                _install_router(org_id, model_list, built_at)
+            logger.info(f"Background router refresh complete for org {org_id} ({len(model_list)} models)")
+        finally:
+            await router_cache.release_refresh_lock(org_id, token)
+    except Exception as e:
+        logger.warning(f"Background router refresh failed for org {org_id}: {e}")
+        _refresh_not_before[org_id] = time.time() + _REFRESH_RETRY_SECONDS
+    finally:
+        _refresh_tasks.pop(org_id, None)
 
-_routers: dict[uuid.UUID, tuple[litellm.Router, float]] = {}  # org → (router, created_at)
-_ROUTER_TTL = 3000  # 50 minutes — refresh before Azure AD tokens expire (1 hr)
+
+def _schedule_router_refresh(org_id: uuid.UUID) -> None:
+    """Start a background refresh for *org_id* unless one is already running."""
+    task = _refresh_tasks.get(org_id)
+    if task and not task.done():
+        return
+    if time.time() < _refresh_not_before.get(org_id, 0.0):
+        return
+    _refresh_tasks[org_id] = asyncio.create_task(_refresh_router(org_id))
 
 
 async def get_router(
@@ -733,44 +842,66 @@ async def get_router(
     org_id: uuid.UUID,
 ) -> litellm.Router:
     """Get or create a LiteLLM router for *org_id*."""
+    now = time.time()
     cached = _routers.get(org_id)
-    if cached and time.time() - cached[1] < _ROUTER_TTL:
+    if cached and router_cache.is_fresh(cached[1], now):
+        if router_cache.needs_refresh(cached[1], now):
+            _schedule_router_refresh(org_id)
         return cached[0]
 
-    creds = await _get_provider_credentials(db, org_id)
-    model_list = await _build_model_list(creds, db=db, org_id=org_id)
-
-    now = time.time()
-
-    if not model_list:
-        # Return a router with empty model list — calls will fail gracefully
-        router = litellm.Router(model_list=[], routing_strategy="simple-shuffle")
-        _routers[org_id] = (router, now)
+    # Local miss — another worker may have built this org's list already.
+    shared = await router_cache.load_model_list(org_id)
+    if shared and router_cache.is_fresh(shared[1], now):
+        model_list, built_at = shared
+        router = _install_router(org_id, model_list, built_at)
+        if router_cache.needs_refresh(built_at, now):
+            _schedule_router_refresh(org_id)
         return router
 
-    router = litellm.Router(
-        model_list=model_list,
-        routing_strategy="simple-shuffle",
-        num_retries=2,
-        retry_after=1,
-        timeout=120,
-        allowed_fails=2,
-        cooldown_time=30,
-    )
-    _routers[org_id] = (router, now)
-    return router
+    # Nothing usable anywhere: build inline. If another worker is already
+    # building this org, wait for its result instead of hitting Vault too.
+    token = await router_cache.acquire_refresh_lock(org_id)
+    if token is None:
+        shared = await router_cache.wait_for_model_list(org_id, _COLD_BUILD_WAIT_SECONDS)
+        if shared:
+            return _install_router(org_id, *shared)
+    try:
+        local_gen = _local_generation(org_id)
+        shared_gen = await router_cache.get_generation(org_id)
+        model_list = await _rebuild_model_list(db, org_id)
+        built_at = time.time()
+        await router_cache.store_model_list(org_id, model_list, built_at, generation=shared_gen)
+        if _local_generation(org_id) != local_gen:
+            # Invalidated mid-build — serve this request but don't cache it.
+            return _make_router(copy.deepcopy(model_list))
+        return _install_router(org_id, model_list, built_at)
+    finally:
+        if token is not None:
+            await router_cache.release_refresh_lock(org_id, token)
 
 
 async def reset_router(org_id: uuid.UUID | None = None):
     """Force router re-initialization.
 
     If *org_id* is given only that org's router is cleared; otherwise
-    all cached routers are dropped.
+    all cached routers are dropped. The shared Redis entry is removed and
+    every worker is told to drop its in-process copy.
     """
-    if org_id is not None:
-        _routers.pop(org_id, None)
-    else:
-        _routers.clear()
+    _drop_local_router(org_id)
+    await router_cache.invalidate(org_id)
+
+
+async def start_router_cache():
+    """Start listening for router invalidations from other workers."""
+    await router_cache.start_invalidation_listener(_drop_local_router)
+
+
+async def stop_router_cache():
+    """Stop the invalidation listener and any in-flight refreshes."""
+    await router_cache.stop_invalidation_listener()
+    for task in list(_refresh_tasks.values()):
+        task.cancel()
+    _refresh_tasks.clear()
 
 
 async def get_available_models(
@@ -838,50 +969,52 @@ async def check_model_allowed(key: GatewayKey, model: str) -> None:
         )
 
 
-async def check_spend_cap(db: AsyncSession, org_id: uuid.UUID) -> None:
+async def check_spend_cap(
+    db: AsyncSession,
+    org_id: uuid.UUID,
+    snapshot: Optional[PolicySnapshot] = None,
+    counters: Optional[OrgCounters] = None,
+) -> None:
     """Check if the org has exceeded its daily spend cap.
 
-    Reads the active 'spend_limits' policy from the DB and compares
-    today's total cost from gateway_requests against max_daily_spend.
+    With a compiled *snapshot* the cap comes from memory and today's spend
+    from the Redis counter in *counters*; otherwise the active
+    'spend_limits' policy is read from the DB.
     """
-    # Fetch active spend_limits policy for this org
-    result = await db.execute(
-        select(Policy).where(
-            and_(
-                Policy.org_id == org_id,
-                Policy.type == "spend_limits",
-                Policy.enabled.is_(True),
+    if snapshot is not None:
+        max_daily_spend = snapshot.max_daily_spend
+    else:
+        # Fetch active spend_limits policy for this org
+        result = await db.execute(
+            select(Policy).where(
+                and_(
+                    Policy.org_id == org_id,
+                    Policy.type == "spend_limits",
+                    Policy.enabled.is_(True),
+                )
             )
         )
-    )
-    policy = result.scalar_one_or_none()
-    if not policy:
-        return  # no spend cap configured
-
-    rules = policy.rules_json or {}
-    max_daily_spend = rules.get("max_daily_spend")
+        policy = result.scalar_one_or_none()
+        if not policy:
+            return  # no spend cap configured
+        rules = policy.rules_json or {}
+        max_daily_spend = rules.get("max_daily_spend")
     if max_daily_spend is None:
         return  # no cap set in rules
 
-    # Query today's total cost
-    today_start = datetime.now(timezone.utc).replace(
-        hour=0, minute=0, second=0, microsecond=0
-    )
-    today_cost_result = await db.execute(
-        select(func.coalesce(func.sum(GatewayRequest.cost), 0)).where(
-            and_(
-                GatewayRequest.org_id == org_id,
-                GatewayRequest.created_at >= today_start,
-                GatewayRequest.status == "success",
-            )
-        )
-    )
-    today_cost = float(today_cost_result.scalar())
+    if counters is not None and counters.today_spend is not None:
+        today_cost = counters.today_spend
+    else:
+        today_cost = await spend_ledger.get_today_spend(db, org_id)
 
     max_daily = float(max_daily_spend)
     
-    # Notify at 80% threshold
-    if today_cost >= max_daily * 0.8 and today_cost < max_daily:
+    # Notify at 80% threshold (once per crossing — see spend_ledger)
+    if (
+        today_cost >= max_daily * 0.8
+        and today_cost < max_daily
+        and await spend_ledger.claim_threshold_alert(org_id, "80", max_daily)
+    ):
         try:
             from app.services.notifications import notification_service
             await notification_service.notify_org_admins(
@@ -895,52 +1028,64 @@ async def check_spend_cap(db: AsyncSession, org_id: uuid.UUID) -> None:
             logger.warning(f"Failed to send spend alert notification: {e}")
     
     if today_cost >= max_daily:
-        try:
-            from app.services.notifications import notification_service
-            await notification_service.notify_org_admins(
-                db,
-                org_id,
-                type="cost_alert",
-                title=f"🚫 Daily spend cap exceeded: ${today_cost:.2f} / ${max_daily:.2f}",
-                body=f"All gateway requests are now blocked. Increase the spend cap in Governance → Policies or wait until tomorrow.",
-            )
-        except Exception as e:
-            logger.warning(f"Failed to send spend cap notification: {e}")
+        if await spend_ledger.claim_threshold_alert(org_id, "100", max_daily):
+            try:
+                from app.services.notifications import notification_service
+                await notification_service.notify_org_admins(
+                    db,
+                    org_id,
+                    type="cost_alert",
+                    title=f"🚫 Daily spend cap exceeded: ${today_cost:.2f} / ${max_daily:.2f}",
+                    body=f"All gateway requests are now blocked. Increase the spend cap in Governance → Policies or wait until tomorrow.",
+                )
+            except Exception as e:
+                logger.warning(f"Failed to send spend cap notification: {e}")
         
         raise PolicyViolation(
-            f"Daily spend cap of ${max_daily_spend:.2f} exceeded "
+            f"Daily spend cap of ${max_daily:.2f} exceeded "
             f"(today's spend: ${today_cost:.2f}). "
             f"Contact your admin to increase the limit.",
             status_code=429,
         )
 
 
-async def check_model_access_policy(db: AsyncSession, org_id: uuid.UUID, model: str) -> None:
-    """Check org-level model_access policies from the DB.
+async def check_model_access_policy(
+    db: AsyncSession,
+    org_id: uuid.UUID,
+    model: str,
+    snapshot: Optional[PolicySnapshot] = None,
+) -> None:
+    """Check org-level model_access policies.
 
-    These are org-wide restrictions beyond per-key allowed_models.
+    These are org-wide restrictions beyond per-key allowed_models. With a
+    compiled *snapshot* no query is made.
     """
-    result = await db.execute(
-        select(Policy).where(
-            and_(
-                Policy.org_id == org_id,
-                Policy.type == "model_access",
-                Policy.enabled.is_(True),
+    if snapshot is not None:
+        if snapshot.allowed_models is None or model in snapshot.allowed_models:
+            return
+        rules = snapshot.model_access
+    else:
+        result = await db.execute(
+            select(Policy).where(
+                and_(
+                    Policy.org_id == org_id,
+                    Policy.type == "model_access",
+                    Policy.enabled.is_(True),
+                )
             )
         )
-    )
-    policy = result.scalar_one_or_none()
-    if not policy:
-        return  # no org-level model restriction
+        policy = result.scalar_one_or_none()
+        if not policy:
+            return  # no org-level model restriction
+        rules = ((policy.name, tuple((policy.rules_json or {}).get("allowed_models") or ())),)
 
-    rules = policy.rules_json or {}
-    allowed_models = rules.get("allowed_models") or []
-    if allowed_models and model not in allowed_models:
-        raise PolicyViolation(
-            f"Model '{model}' is not approved by organization policy "
-            f"'{policy.name}'. Approved models: {', '.join(allowed_models)}",
-            status_code=403,
-        )
+    for policy_name, allowed_models in rules:
+        if allowed_models and model not in allowed_models:
+            raise PolicyViolation(
+                f"Model '{model}' is not approved by organization policy "
+                f"'{policy_name}'. Approved models: {', '.join(allowed_models)}",
+                status_code=403,
+            )
 
 
 async def enforce_policies(
@@ -950,32 +1095,55 @@ async def enforce_policies(
 ) -> None:
     """Run all policy checks before forwarding a gateway request.
 
-    Raises PolicyViolation if any check fails.
+    Org policies come from the in-memory snapshot in ``policy_cache``, so
+    a warm request only touches Redis. Raises PolicyViolation if any check
+    fails.
     """
     # 1. Per-key model allow-list
     await check_model_allowed(key, model)
 
-    # 2. Org-level model access policy (from DB)
-    await check_model_access_policy(db, key.org_id, model)
+    snapshot, counters = await policy_cache.get_policy_state(db, key.org_id)
+
+    # 2. Org-level model access policy
+    await check_model_access_policy(db, key.org_id, model, snapshot=snapshot)
 
     # 3. Daily spend cap
-    await check_spend_cap(db, key.org_id)
+    await check_spend_cap(db, key.org_id, snapshot=snapshot, counters=counters)
 
     # 4. Monthly gateway call quota
-    await check_monthly_quota(db, key.org_id)
+    await check_monthly_quota(db, key.org_id, snapshot=snapshot, counters=counters)
 
 
-async def check_monthly_quota(db: AsyncSession, org_id: uuid.UUID) -> None:
+async def check_monthly_quota(
+    db: AsyncSession,
+    org_id: uuid.UUID,
+    snapshot: Optional[PolicySnapshot] = None,
+    counters: Optional[OrgCounters] = None,
+) -> None:
     """Check if org has exceeded monthly gateway call quota for their tier.
 
-    Emits a notification at 80% usage and blocks at 100%.
+    Emits a notification at 80% usage and blocks at 100%. When the tier
+    limit is in *snapshot* and the call counter in *counters*, no query is
+    made.
     """
     from app.services.feature_gate import feature_gate
 
     try:
-        usage_info = await feature_gate.check_usage_limit(
-            db, str(org_id), "gateway_calls_per_month"
-        )
+        if snapshot is not None and (
+            snapshot.monthly_call_limit == float("inf")
+            or (counters is not None and counters.month_calls is not None)
+        ):
+            limit_value = snapshot.monthly_call_limit
+            current = counters.month_calls if counters and counters.month_calls is not None else 0
+            usage_info = {
+                "limit": limit_value,
+                "current": current,
+                "at_limit": limit_value != float("inf") and current >= limit_value,
+            }
+        else:
+            usage_info = await feature_gate.check_usage_limit(
+                db, str(org_id), "gateway_calls_per_month"
+            )
 
         # Unlimited plans skip the check
         if usage_info["limit"] == float("inf"):
@@ -1026,6 +1194,9 @@ async def _track_managed_inference(
     Looks up the CloudProvider for the org+provider, checks is_managed,
     and if true: sets is_managed on the log entry, calculates marked-up
     cost, and increments the provider's managed usage counters.
+
+    Gateway handlers no longer call this inline — request_log_writer
+    applies the same pricing per batch.
     """
     if not log_entry.provider or not log_entry.cost:
         return
@@ -1114,6 +1285,28 @@ async def _resolve_provider_for_log(
 
 # ─── Completions ───
 
+def _models_to_try(model: str, router: litellm.Router) -> tuple[list[str], Optional[str]]:
+    """Models to attempt for *model* — primary first, then cross-provider fallbacks — and its provider."""
+    models_to_try = [model]
+
+    # Pre-compute available model names from the router for fallback lookup
+    available_model_names: set[str] = set()
+    try:
+        for entry in router.model_list:
+            available_model_names.add(entry["model_name"])
+    except Exception:
+        pass
+
+    # Find the provider of the requested model for fallback selection
+    primary_provider = _detect_provider_from_model(model, router.model_list)
+
+    if primary_provider:
+        fallbacks = _find_fallback_models(model, primary_provider, available_model_names)
+        models_to_try.extend(fallbacks)
+
+    return models_to_try, primary_provider
+
+
 async def chat_completion(
     request_data: dict,
     org_id: uuid.UUID,
@@ -1162,23 +1355,7 @@ async def chat_completion(
         status="success",
     )
 
-    # Build the list of models to try: primary first, then cross-provider fallbacks
-    models_to_try = [model]
-
-    # Pre-compute available model names from the router for fallback lookup
-    available_model_names: set[str] = set()
-    try:
-        for entry in router.model_list:
-            available_model_names.add(entry["model_name"])
-    except Exception:
-        pass
-
-    # Find the provider of the requested model for fallback selection
-    primary_provider = _detect_provider_from_model(model, router.model_list)
-
-    if primary_provider:
-        fallbacks = _find_fallback_models(model, primary_provider, available_model_names)
-        models_to_try.extend(fallbacks)
+    models_to_try, primary_provider = _models_to_try(model, router)
 
     last_error: Optional[Exception] = None
     failover_from: Optional[str] = None
@@ -1233,11 +1410,8 @@ async def chat_completion(
                     f"for org {org_id} (attempt {attempt_idx + 1})"
                 )
 
-            db.add(log_entry)
-            await db.flush()
-
-            # Track managed inference (markup + provider counters)
-            await _track_managed_inference(db, log_entry, org_id)
+            await request_log_writer.submit(log_entry)
+            await spend_ledger.record_spend(org_id, log_entry.cost)
 
             # Add RAG + failover metadata to response
             response_dict = response.model_dump()
@@ -1307,8 +1481,7 @@ async def chat_completion(
                         latency_ms=int((time.time() - start) * 1000),
                     )
                     err_log.provider = _detect_provider_from_model(attempt_model, router.model_list)
-                    async with get_db_session() as err_db:
-                        err_db.add(err_log)
+                    await request_log_writer.submit(err_log)
                 except Exception as log_err:
                     logger.warning(f"Failed to log failover entry: {log_err}")
                 continue
@@ -1326,11 +1499,7 @@ async def chat_completion(
             f"[all-failovers-exhausted] Tried {len(models_to_try)} models: "
             f"{', '.join(models_to_try)}. Last error: {str(last_error)[:500]}"
         )
-    try:
-        async with get_db_session() as log_db:
-            log_db.add(log_entry)
-    except Exception as log_err:
-        logger.error(f"Failed to log error request: {log_err}")
+    await request_log_writer.submit(log_entry)
 
     # Emit error to platform logging system
     try:
@@ -1352,6 +1521,211 @@ async def chat_completion(
     raise last_error
 
 
+class _StreamedMessage:
+    """Rebuilds an assistant message from OpenAI-format stream chunks."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.id: Optional[str] = None
+        self.finish_reason: Optional[str] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._content: list[str] = []
+        self._tool_calls: dict[int, dict] = {}
+
+    def add(self, chunk: dict) -> Optional[str]:
+        """Fold one chunk in; returns its content delta, if any."""
+        self.id = chunk.get("id") or self.id
+        self.model = chunk.get("model") or self.model
+        usage = chunk.get("usage")
+        if usage:
+            self.prompt_tokens = usage.get("prompt_tokens") or self.prompt_tokens
+            self.completion_tokens = usage.get("completion_tokens") or self.completion_tokens
+
+        choices = chunk.get("choices") or []
+        if not choices:
+            return None
+        self.finish_reason = choices[0].get("finish_reason") or self.finish_reason
+        delta = choices[0].get("delta") or {}
+
+        # Tool calls arrive in fragments keyed by index: id and name once,
+        # arguments spread over many chunks
+        for fragment in delta.get("tool_calls") or []:
+            call = self._tool_calls.setdefault(
+                fragment.get("index", len(self._tool_calls)),
+                {"id": None, "type": "function", "function": {"name": "", "arguments": ""}},
+            )
+            call["id"] = fragment.get("id") or call["id"]
+            function = fragment.get("function") or {}
+            call["function"]["name"] += function.get("name") or ""
+            call["function"]["arguments"] += function.get("arguments") or ""
+
+        content = delta.get("content")
+        if content:
+            self._content.append(content)
+        return content or None
+
+    @property
+    def content(self) -> str:
+        return "".join(self._content)
+
+    def message(self) -> dict:
+        message: dict[str, Any] = {"role": "assistant", "content": self.content or None}
+        if self._tool_calls:
+            message["tool_calls"] = [self._tool_calls[i] for i in sorted(self._tool_calls)]
+        return message
+
+
+async def chat_completion_stream(
+    request_data: dict,
+    org_id: uuid.UUID,
+    key_id: uuid.UUID,
+    db: AsyncSession,
+    on_delta: Callable[[str], Awaitable[None]],
+) -> dict:
+    """Streaming chat completion for internal callers (the agent engine).
+
+    Content deltas are handed to *on_delta* as they arrive. Returns the same
+    response dict as chat_completion, rebuilt from the chunks, and logs and
+    charges the request the same way. Cross-provider failover only applies
+    until the first delta has been handed out.
+    """
+    router = await get_router(db, org_id)
+    model = request_data.get("model", "")
+    start = time.time()
+    request_data.pop("bonito", None)
+
+    log_entry = GatewayRequest(
+        org_id=org_id,
+        key_id=key_id,
+        model_requested=model,
+        status="success",
+    )
+    models_to_try, primary_provider = _models_to_try(model, router)
+
+    last_error: Optional[Exception] = None
+    failover_from: Optional[str] = None
+
+    for attempt_idx, attempt_model in enumerate(models_to_try):
+        streamed = _StreamedMessage(attempt_model)
+        emitted = False
+        try:
+            response = await router.acompletion(
+                **{**request_data, "model": attempt_model},
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for chunk in response:
+                delta = streamed.add(chunk.model_dump())
+                if delta:
+                    emitted = True
+                    await on_delta(delta)
+        except Exception as e:
+            last_error = e
+            if not emitted and _is_retriable_provider_error(e) and attempt_idx < len(models_to_try) - 1:
+                failover_from = failover_from or attempt_model
+                logger.warning(
+                    f"Provider error on streamed '{attempt_model}' for org {org_id}, "
+                    f"trying fallback model ({attempt_idx + 2}/{len(models_to_try)})"
+                )
+                continue
+            break
+
+        # Streams often omit usage — estimate it like the public streaming route
+        if not streamed.prompt_tokens:
+            try:
+                streamed.prompt_tokens = litellm.token_counter(
+                    model=streamed.model, messages=request_data.get("messages", []),
+                )
+            except Exception:
+                logger.warning(f"Prompt token estimation failed for model {streamed.model}")
+        if not streamed.completion_tokens and streamed.content:
+            try:
+                streamed.completion_tokens = litellm.token_counter(model=streamed.model, text=streamed.content)
+            except Exception:
+                logger.warning(f"Completion token estimation failed for model {streamed.model}")
+
+        elapsed_ms = int((time.time() - start) * 1000)
+        log_entry.model_used = streamed.model
+        log_entry.input_tokens = streamed.prompt_tokens
+        log_entry.output_tokens = streamed.completion_tokens
+        log_entry.latency_ms = elapsed_ms
+        log_entry.cost = compute_request_cost(streamed.model, streamed.prompt_tokens, streamed.completion_tokens)
+        log_entry.provider = (
+            _detect_provider_from_model(attempt_model, router.model_list)
+            or primary_provider
+            or await _resolve_provider_for_log(db, org_id, streamed.model or "")
+        )
+        if attempt_idx > 0 and failover_from:
+            log_entry.error_message = f"[failover] Original model '{failover_from}' unavailable; routed to '{attempt_model}'"
+
+        await request_log_writer.submit(log_entry)
+        await spend_ledger.record_spend(org_id, log_entry.cost)
+
+        # Emit to platform logging system (fire-and-forget), as chat_completion does
+        try:
+            await emit_gateway_event(
+                org_id, "request",
+                resource_type="model",
+                message=f"Chat completion (stream): {attempt_model}" + (
+                    f" (failover from {model})" if attempt_idx > 0 else ""
+                ),
+                duration_ms=elapsed_ms,
+                cost=log_entry.cost,
+                metadata={
+                    "model": model,
+                    "model_used": log_entry.model_used,
+                    "input_tokens": log_entry.input_tokens,
+                    "output_tokens": log_entry.output_tokens,
+                    "provider": log_entry.provider,
+                    "stream": True,
+                    "failover": attempt_idx > 0,
+                    "failover_from": failover_from,
+                },
+            )
+        except Exception:
+            pass
+
+        return {
+            "id": streamed.id,
+            "object": "chat.completion",
+            "model": streamed.model,
+            "choices": [{"index": 0, "message": streamed.message(), "finish_reason": streamed.finish_reason}],
+            "usage": {
+                "prompt_tokens": streamed.prompt_tokens,
+                "completion_tokens": streamed.completion_tokens,
+                "total_tokens": streamed.prompt_tokens + streamed.completion_tokens,
+            },
+            "cost": float(log_entry.cost or 0),
+        }
+
+    # All attempts exhausted - log the final error
+    elapsed_ms = int((time.time() - start) * 1000)
+    log_entry.status = "error"
+    log_entry.error_message = str(last_error)[:1000]
+    log_entry.latency_ms = elapsed_ms
+    await request_log_writer.submit(log_entry)
+
+    try:
+        await emit_gateway_event(
+            org_id, "error",
+            severity="error",
+            message=f"Chat completion (stream) error: {model} - {str(last_error)[:200]}",
+            duration_ms=elapsed_ms,
+            metadata={
+                "model": model,
+                "error": str(last_error)[:500],
+                "stream": True,
+                "failover_attempted": failover_from is not None,
+                "models_tried": models_to_try,
+            },
+        )
+    except Exception:
+        pass
+
+    raise last_error
+
+
 async def completion(request_data: dict, org_id: uuid.UUID, key_id: uuid.UUID, db: AsyncSession) -> dict:
     """Legacy text completion."""
     router = await get_router(db, org_id)
@@ -1369,19 +1743,15 @@ async def completion(request_data: dict, org_id: uuid.UUID, key_id: uuid.UUID, d
         log_entry.output_tokens = getattr(usage, "completion_tokens", 0) if usage else 0
         log_entry.latency_ms = elapsed_ms
         log_entry.cost = litellm.completion_cost(completion_response=response) or 0.0
-        db.add(log_entry)
-        await db.flush()
+        await request_log_writer.submit(log_entry)
+        await spend_ledger.record_spend(org_id, log_entry.cost)
         return response.model_dump()
     except Exception as e:
         elapsed_ms = int((time.time() - start) * 1000)
         log_entry.status = "error"
         log_entry.error_message = str(e)[:1000]
         log_entry.latency_ms = elapsed_ms
-        try:
-            async with get_db_session() as log_db:
-                log_db.add(log_entry)
-        except Exception as log_err:
-            logger.error(f"Failed to log error request: {log_err}")
+        await request_log_writer.submit(log_entry)
         raise
 
 
@@ -1401,19 +1771,15 @@ async def embedding(request_data: dict, org_id: uuid.UUID, key_id: uuid.UUID, db
         log_entry.input_tokens = getattr(usage, "prompt_tokens", 0) if usage else 0
         log_entry.latency_ms = elapsed_ms
         log_entry.cost = litellm.completion_cost(completion_response=response) or 0.0
-        db.add(log_entry)
-        await db.flush()
+        await request_log_writer.submit(log_entry)
+        await spend_ledger.record_spend(org_id, log_entry.cost)
         return response.model_dump()
     except Exception as e:
         elapsed_ms = int((time.time() - start) * 1000)
         log_entry.status = "error"
         log_entry.error_message = str(e)[:1000]
         log_entry.latency_ms = elapsed_ms
-        try:
-            async with get_db_session() as log_db:
-                log_db.add(log_entry)
-        except Exception as log_err:
-            logger.error(f"Failed to log error request: {log_err}")
+        await request_log_writer.submit(log_entry)
         raise
 
 
@@ -1465,11 +1831,8 @@ async def image_generation(
 
         log_entry.provider = await _resolve_provider_for_log(db, org_id, model)
 
-        db.add(log_entry)
-        await db.flush()
-
-        # Track managed inference
-        await _track_managed_inference(db, log_entry, org_id)
+        await request_log_writer.submit(log_entry)
+        await spend_ledger.record_spend(org_id, log_entry.cost)
 
         # Emit to platform logging
         try:
@@ -1497,11 +1860,7 @@ async def image_generation(
         log_entry.status = "error"
         log_entry.error_message = str(e)[:1000]
         log_entry.latency_ms = elapsed_ms
-        try:
-            async with get_db_session() as log_db:
-                log_db.add(log_entry)
-        except Exception as log_err:
-            logger.error(f"Failed to log image gen error: {log_err}")
+        await request_log_writer.submit(log_entry)
 
         # Emit error event
         try:
@@ -1598,9 +1957,8 @@ async def image_edit(
         log_entry.cost = per_image * n
         log_entry.provider = await _resolve_provider_for_log(db, org_id, model)
 
-        db.add(log_entry)
-        await db.flush()
-        await _track_managed_inference(db, log_entry, org_id)
+        await request_log_writer.submit(log_entry)
+        await spend_ledger.record_spend(org_id, log_entry.cost)
 
         try:
             await emit_gateway_event(
@@ -1621,11 +1979,7 @@ async def image_edit(
         log_entry.status = "error"
         log_entry.error_message = str(e)[:1000]
         log_entry.latency_ms = elapsed_ms
-        try:
-            async with get_db_session() as log_db:
-                log_db.add(log_entry)
-        except Exception as log_err:
-            logger.error(f"Failed to log image edit error: {log_err}")
+        await request_log_writer.submit(log_entry)
         try:
             await emit_gateway_event(
                 org_id, "error",
@@ -1725,10 +2079,8 @@ async def video_generation(
 
         log_entry.provider = await _resolve_provider_for_log(db, org_id, model)
 
-        db.add(log_entry)
-        await db.flush()
-
-        await _track_managed_inference(db, log_entry, org_id)
+        await request_log_writer.submit(log_entry)
+        await spend_ledger.record_spend(org_id, log_entry.cost)
 
         try:
             await emit_gateway_event(
@@ -1755,11 +2107,7 @@ async def video_generation(
         log_entry.status = "error"
         log_entry.error_message = str(e)[:1000]
         log_entry.latency_ms = elapsed_ms
-        try:
-            async with get_db_session() as log_db:
-                log_db.add(log_entry)
-        except Exception as log_err:
-            logger.error(f"Failed to log video gen error: {log_err}")
+        await request_log_writer.submit(log_entry)
 
         try:
             await emit_gateway_event(
@@ -1862,23 +2210,18 @@ async def validate_api_key(db: AsyncSession, raw_key: str) -> Optional[GatewayKe
 # ─── Rate limiting (Redis-backed) ───
 
 async def check_rate_limit(key_id: uuid.UUID, rate_limit: int) -> bool:
-    """Check and increment rate limit. Returns True if allowed.
-    
+    """Check and count one request against the key's per-minute limit. Returns True if allowed.
+
+    Sliding window with local leasing for hot keys (see rate_limiter).
     Gracefully allows all requests if Redis is unavailable (fail-open).
     """
-    if redis_client is None:
+    from app.core.redis import redis_client as _rc
+    if _rc is None:
         return True  # No Redis → skip rate limiting (fail-open)
-    
-    try:
-        now = int(time.time())
-        window = now - (now % 60)  # 1-minute window
-        redis_key = f"gateway:ratelimit:{key_id}:{window}"
 
-        count = await redis_client.incr(redis_key)
-        if count == 1:
-            await redis_client.expire(redis_key, 120)  # expire after 2 minutes
-
-        return count <= rate_limit
+    try:
+        result = await rate_limiter.hit(_rc, f"gateway:ratelimit:{key_id}", rate_limit, lease=True)
+        return result.allowed
     except Exception as e:
         logger.warning(f"Rate limit check failed (allowing request): {e}")
         return True  # Fail-open: allow request if Redis is down
@@ -2098,7 +2441,8 @@ async def _perform_rag_retrieval(kb_name: str, messages: list, org_id: uuid.UUID
 async def _perform_rag_retrieval_inner(kb_name: str, messages: list, org_id: uuid.UUID, db: AsyncSession) -> Optional[dict]:
     """Inner RAG retrieval with its own DB session."""
     from app.models.knowledge_base import KnowledgeBase, KBChunk, KBDocument
-    from app.services.kb_ingestion import EmbeddingGenerator
+    from app.services.kb_retrieval import nearest_chunks
+    from app.services.query_embedding_cache import embed_query
     
     # Find knowledge base by name
     kb_result = await db.execute(
@@ -2122,46 +2466,24 @@ async def _perform_rag_retrieval_inner(kb_name: str, messages: list, org_id: uui
         return None
     
     # Generate embedding for the query using the SAME model as ingestion
-    embedding_gen = EmbeddingGenerator(org_id)
+    # (cached per org/model/dims, so repeated questions skip the provider)
     kb_embed_model = getattr(kb, 'embedding_model', None)
     embed_model = kb_embed_model if (kb_embed_model and kb_embed_model != 'auto') else None
     try:
         embed_dims = getattr(kb, 'embedding_dimensions', None)
-        query_embeddings = await embedding_gen.generate_embeddings([user_query], model=embed_model, dimensions=embed_dims)
-        if not query_embeddings:
+        query_embedding = await embed_query(org_id, user_query, model=embed_model, dimensions=embed_dims)
+        if not query_embedding:
             logger.error("Failed to generate query embedding")
             return None
-        
-        query_embedding = query_embeddings[0]
     except Exception as e:
         logger.error(f"Failed to generate query embedding: {e}")
         return None
     
     # Vector similarity search using pgvector cosine distance
     top_k = 5
-    embedding_str = "[" + ",".join(str(x) for x in query_embedding) + "]"
     
     try:
-        search_result = await db.execute(
-            sa_text("""
-                SELECT c.id, c.content, c.token_count, c.chunk_index,
-                       c.source_file, c.source_page, c.source_section,
-                       1 - (c.embedding <=> CAST(:query_vec AS vector)) AS relevance_score
-                FROM kb_chunks c
-                WHERE c.knowledge_base_id = :kb_id
-                  AND c.org_id = :org_id
-                  AND c.embedding IS NOT NULL
-                ORDER BY c.embedding <=> CAST(:query_vec AS vector)
-                LIMIT :top_k
-            """),
-            {
-                "query_vec": embedding_str,
-                "kb_id": str(kb.id),
-                "org_id": str(org_id),
-                "top_k": top_k,
-            },
-        )
-        rows = search_result.fetchall()
+        rows = await nearest_chunks(db, kb, query_embedding, top_k, org_id=org_id)
     except Exception as e:
         logger.error(f"pgvector search failed: {e}")
         return None
@@ -2178,7 +2500,7 @@ async def _perform_rag_retrieval_inner(kb_name: str, messages: list, org_id: uui
             "source_file": row.source_file,
             "source_page": row.source_page,
             "source_section": row.source_section,
-            "relevance_score": round(float(row.relevance_score), 4) if row.relevance_score else 0,
+            "relevance_score": round(float(row.score), 4) if row.score else 0,
         }
         chunks.append(chunk)
         sources.append({
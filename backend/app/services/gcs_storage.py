@@ -24,6 +24,9 @@ logger = logging.getLogger(__name__)
 # Bucket name -- override via env var for staging/dev
 BUCKET_NAME = os.getenv("BONITO_KB_BUCKET", "bonito-kb-prod")
 
+# Log exports are uploaded resumably in chunks of this size (multiple of 256 KB)
+EXPORT_UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
 # Service account JSON can come from:
 #   1. BONITO_KB_SA_KEY env var (JSON string)
 #   2. BONITO_KB_SA_KEY_PATH env var (path to JSON file)
@@ -191,6 +194,55 @@ async def delete_kb_folder(org_id: uuid.UUID, kb_id: uuid.UUID) -> int:
     return count
 
 
+async def upload_export_file(org_id: uuid.UUID, local_path: str, filename: str) -> str:
+    """
+    Upload a finished log export from local disk.
+
+    Stored under {org_id}/log-exports/{filename}; the upload is resumable and
+    sent in chunks so multi-GB exports never sit in memory.
+
+    Returns the full GCS path (gs://bucket/path).
+    """
+    import asyncio
+
+    client = _get_client()
+    bucket = client.bucket(BUCKET_NAME)
+    path = f"{org_id}/log-exports/{filename}"
+    blob = bucket.blob(path, chunk_size=EXPORT_UPLOAD_CHUNK_BYTES)
+
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(
+        None,
+        lambda: blob.upload_from_filename(local_path, content_type="application/gzip"),
+    )
+
+    gcs_uri = f"gs://{BUCKET_NAME}/{path}"
+    logger.info(f"Uploaded log export {filename} to {gcs_uri}")
+    return gcs_uri
+
+
+async def generate_export_url(org_id: uuid.UUID, gcs_uri: str, expiration_minutes: int = 15) -> str:
+    """Signed download URL for a log export uploaded by upload_export_file."""
+    import asyncio
+    from datetime import timedelta
+
+    path = gcs_uri.removeprefix(f"gs://{BUCKET_NAME}/")
+    if not path.startswith(f"{org_id}/log-exports/"):
+        raise ValueError("Export does not belong to this organization")
+
+    client = _get_client()
+    blob = client.bucket(BUCKET_NAME).blob(path)
+
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        None,
+        lambda: blob.generate_signed_url(
+            expiration=timedelta(minutes=expiration_minutes),
+            method="GET",
+        ),
+    )
+
+
 async def generate_signed_url(
     org_id: uuid.UUID,
     kb_id: uuid.UUID,
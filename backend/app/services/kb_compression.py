@@ -0,0 +1,249 @@
+"""
+KB compression — keeps each KB's compressed vector store in step with its chunks.
+
+``KnowledgeBase.compression_method`` picks the code width of the KB's
+``compressed_vector_store`` (a CompressionCodebook seeded from the KB id):
+
+    None           -> off: the store is dropped and retrieval scans pgvector
+    "polar-4bit"   -> 4-bit codes
+    "polar-8bit"   -> 8-bit codes
+    "scalar-8bit"  -> 8-bit codes
+
+The float32 embeddings stay in ``kb_chunks``: retrieval re-ranks the
+compressed candidates exactly there, and a method change re-encodes from
+them.
+
+Hooks:
+  - ``index_chunks`` after ingestion commits new chunks
+  - ``remove_chunks`` / ``drop_kb`` when chunks or KBs are deleted
+  - ``schedule_reencode`` when the method changes; runs in the background,
+    one task per KB, staging new segments next to the live ones and
+    swapping them in at the end so searches never see a half-built store
+  - ``backfill_reencode`` at startup, for compressed KBs whose store is
+    missing or behind (method set before the store existed, fresh disk)
+
+Store errors are logged and never fail the caller — a store that is behind
+the KB only sends retrieval down the exact path (see kb_retrieval).
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from app.core.database import get_db_session
+from app.models.knowledge_base import KBChunk, KnowledgeBase
+from app.services.compressed_vector_store import compressed_vector_store
+from app.services.kb_retrieval import COMPRESSION_BITS, kb_bits, retrieval_latency
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+REENCODE_PAGE_SIZE = 2_000        # Chunks read and encoded per step of a re-encode
+
+_reencode_tasks: Dict[str, asyncio.Task] = {}
+_reencode_again: set = set()
+_reencode_state: Dict[str, Dict[str, Any]] = {}
+
+
+def compression_enabled(kb) -> bool:
+    return (getattr(kb, "compression_method", None) or "") in COMPRESSION_BITS
+
+
+# ─── Incremental updates ───
+
+async def index_chunks(kb, chunk_ids: Sequence[uuid.UUID], embeddings: Sequence[Sequence[float]]) -> int:
+    """Encode freshly stored chunks into the KB's store. Returns rows written."""
+    if not compression_enabled(kb) or not chunk_ids:
+        return 0
+    try:
+        return await asyncio.to_thread(
+            compressed_vector_store.append, kb.id, list(chunk_ids), embeddings, kb_bits(kb),
+        )
+    except Exception as e:
+        logger.warning(f"Could not index {len(chunk_ids)} chunks for KB {kb.id}: {e}")
+        return 0
+
+
+async def remove_chunks(kb_id, chunk_ids: Sequence[uuid.UUID]) -> None:
+    """Hide deleted chunks from the KB's store."""
+    if not chunk_ids:
+        return
+    try:
+        await asyncio.to_thread(compressed_vector_store.delete, kb_id, list(chunk_ids))
+    except Exception as e:
+        logger.warning(f"Could not remove {len(chunk_ids)} chunks from KB {kb_id} store: {e}")
+
+
+async def drop_kb(kb_id) -> None:
+    """Remove a deleted KB's store."""
+    task = _reencode_tasks.get(str(kb_id))
+    if task is not None:
+        task.cancel()
+    try:
+        await asyncio.to_thread(compressed_vector_store.drop, kb_id)
+    except Exception as e:
+        logger.warning(f"Could not drop vector store for KB {kb_id}: {e}")
+
+
+# ─── Re-encode ───
+
+def schedule_reencode(kb_id, backfill: bool = False) -> None:
+    """
+    Re-encode the KB's chunks with its current compression_method in the background.
+
+    A change that arrives while a re-encode is running queues one more pass
+    rather than starting a second task. A ``backfill`` pass only runs if
+    the store is still behind once it starts (see ``reencode_kb``).
+    """
+    key = str(kb_id)
+    task = _reencode_tasks.get(key)
+    if task is not None and not task.done():
+        if not backfill:
+            _reencode_again.add(key)
+        return
+    _reencode_tasks[key] = asyncio.create_task(_reencode_loop(kb_id, backfill))
+
+
+async def _reencode_loop(kb_id, backfill: bool = False) -> None:
+    key = str(kb_id)
+    try:
+        while True:
+            _reencode_again.discard(key)
+            try:
+                await reencode_kb(kb_id, backfill=backfill)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Re-encode of KB {kb_id} failed: {e}")
+                _reencode_state[key] = {"status": "failed", "error": str(e)[:500]}
+            if key not in _reencode_again:
+                return
+            backfill = False
+    finally:
+        _reencode_tasks.pop(key, None)
+
+
+async def _chunk_page(kb_id, after: Optional[uuid.UUID]) -> List[Any]:
+    """One keyset page of (id, embedding) for the KB's embedded chunks."""
+    stmt = (
+        select(KBChunk.id, KBChunk.embedding)
+        .where(KBChunk.knowledge_base_id == kb_id, KBChunk.embedding.isnot(None))
+        .order_by(KBChunk.id)
+        .limit(REENCODE_PAGE_SIZE)
+    )
+    if after is not None:
+        stmt = stmt.where(KBChunk.id > after)
+    async with get_db_session() as session:
+        return (await session.execute(stmt)).all()
+
+
+async def reencode_kb(kb_id, backfill: bool = False) -> int:
+    """
+    Rebuild the KB's store from kb_chunks with its current method. Returns rows encoded.
+
+    Chunks ingested or deleted while this runs land in the live store as
+    usual and survive the swap. A ``backfill`` rebuild is skipped when the
+    store has caught up or another worker is already rebuilding it, so
+    workers starting together encode each KB once.
+    """
+    key = str(kb_id)
+    async with get_db_session() as session:
+        kb = await session.get(KnowledgeBase, kb_id)
+    if kb is None or not compression_enabled(kb):
+        await asyncio.to_thread(compressed_vector_store.drop, kb_id)
+        _reencode_state.pop(key, None)
+        return 0
+
+    if backfill and not await _store_behind(kb_id, kb.chunk_count):
+        return 0
+    since_seq = await asyncio.to_thread(compressed_vector_store.begin_rebuild, kb_id, backfill)
+    if since_seq is None:
+        logger.info(f"KB {kb_id} store is already being rebuilt, skipping backfill")
+        return 0
+    bits = kb_bits(kb)
+    state = _reencode_state[key] = {"status": "running", "bits": bits, "encoded": 0, "total": kb.chunk_count or 0}
+    staged: List[int] = []
+    try:
+        after = None
+        while True:
+            rows = await _chunk_page(kb_id, after)
+            if not rows:
+                break
+            seq = await asyncio.to_thread(
+                compressed_vector_store.stage, kb_id,
+                [r.id for r in rows], [r.embedding for r in rows], bits,
+            )
+            if seq is not None:
+                staged.append(seq)
+            state["encoded"] += len(rows)
+            after = rows[-1].id
+            if len(rows) < REENCODE_PAGE_SIZE:
+                break
+        await asyncio.to_thread(compressed_vector_store.publish_rebuild, kb_id, since_seq, staged)
+    except BaseException:
+        await asyncio.to_thread(compressed_vector_store.abort_rebuild, kb_id, staged)
+        raise
+
+    state["status"] = "completed"
+    logger.info(f"Re-encoded {state['encoded']} chunks for KB {kb_id} at {bits} bits")
+    return state["encoded"]
+
+
+async def _store_behind(kb_id, chunk_count: Optional[int]) -> bool:
+    stored = await asyncio.to_thread(compressed_vector_store.count, kb_id)
+    return stored < (chunk_count or 0)
+
+
+async def backfill_reencode() -> int:
+    """
+    Schedule a re-encode for every compressed KB whose store is behind its chunks.
+
+    ``schedule_reencode`` only fires on a method change, so KBs that already
+    had a method when the store was introduced — or whose store lives on a
+    disk that was replaced — would otherwise stay on the exact path for
+    good. Run once at startup; returns the number of KBs scheduled.
+    """
+    try:
+        async with get_db_session() as session:
+            rows = (await session.execute(
+                select(KnowledgeBase.id, KnowledgeBase.chunk_count)
+                .where(KnowledgeBase.compression_method.in_(list(COMPRESSION_BITS)))
+            )).all()
+        scheduled = 0
+        for kb_id, chunk_count in rows:
+            if await _store_behind(kb_id, chunk_count):
+                schedule_reencode(kb_id, backfill=True)
+                scheduled += 1
+    except Exception as e:
+        logger.warning(f"Compressed store backfill failed: {e}")
+        return 0
+    if scheduled:
+        logger.info(f"Scheduled compressed store backfill for {scheduled} KBs")
+    return scheduled
+
+
+# ─── Stats ───
+
+async def compression_stats(kb) -> Dict[str, Any]:
+    """Storage and re-encode state of the KB's compressed store."""
+    usage = await asyncio.to_thread(compressed_vector_store.disk_usage, kb.id)
+    stored = await asyncio.to_thread(compressed_vector_store.count, kb.id)
+    float32_bytes = stored * (kb.embedding_dimensions or 0) * 4
+    ratio = round(float32_bytes / usage["total_bytes"], 2) if usage["total_bytes"] else None
+    return {
+        "method": kb.compression_method,
+        "bits": usage["bits"],
+        "total_chunks": kb.chunk_count or 0,
+        "stored_chunks": stored,
+        "segments": usage["segments"],
+        "store_bytes": usage["total_bytes"],
+        "float32_bytes": float32_bytes,
+        "compression_ratio": ratio,
+        "estimated_savings_percent": int((1 - 1 / ratio) * 100) if ratio and ratio > 1 else 0,
+        "complete": stored > 0 and stored >= (kb.chunk_count or 0),
+        "reencode": _reencode_state.get(str(kb.id)),
+        "latency": retrieval_latency(kb.id),
+    }
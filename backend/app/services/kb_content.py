@@ -1053,7 +1053,7 @@ import uuid
 import logging
 from typing import List, Dict, Any, Optional
 
-from sqlalchemy import text as sa_text, select, and_
+from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 _kb_logger = logging.getLogger(__name__)
@@ -1073,7 +1073,8 @@ async def search_knowledge_base(
     Returns a list of dicts with keys: content, source_name, score, chunk_index.
     """
     from app.models.knowledge_base import KnowledgeBase, KBChunk
-    from app.services.kb_ingestion import EmbeddingGenerator
+    from app.services.kb_retrieval import nearest_chunks
+    from app.services.query_embedding_cache import embed_query
 
     if db is None:
         return []
@@ -1095,7 +1096,6 @@ async def search_knowledge_base(
         return []
 
     # Generate embedding for the query using the SAME model as ingestion
-    embedding_gen = EmbeddingGenerator(org_id or kb.org_id)
     # Use the KB's configured embedding model to avoid dimension mismatch
     kb_embedding_model = getattr(kb, 'embedding_model', None)
     if kb_embedding_model and kb_embedding_model != 'auto':
@@ -1104,37 +1104,18 @@ async def search_knowledge_base(
         embed_model = None  # auto-detect
     try:
         embed_dims = getattr(kb, 'embedding_dimensions', None)
-        query_embeddings = await embedding_gen.generate_embeddings([query], model=embed_model, dimensions=embed_dims)
-        if not query_embeddings:
+        query_embedding = await embed_query(
+            org_id or kb.org_id, query, model=embed_model, dimensions=embed_dims
+        )
+        if not query_embedding:
             _kb_logger.error("Failed to generate query embedding")
             return []
-        query_embedding = query_embeddings[0]
     except Exception as e:
         _kb_logger.error(f"Embedding generation failed: {e}")
         return []
 
-    embedding_str = "[" + ",".join(str(x) for x in query_embedding) + "]"
-
     try:
-        result = await db.execute(
-            sa_text("""
-                SELECT c.content, c.source_file, c.chunk_index,
-                       1 - (c.embedding <=> CAST(:query_vec AS vector)) AS score
-                FROM kb_chunks c
-                WHERE c.knowledge_base_id = :kb_id
-                  AND c.org_id = :org_id
-                  AND c.embedding IS NOT NULL
-                ORDER BY c.embedding <=> CAST(:query_vec AS vector)
-                LIMIT :top_k
-            """),
-            {
-                "query_vec": embedding_str,
-                "kb_id": str(kb_id),
-                "org_id": str(org_id or kb.org_id),
-                "top_k": limit,
-            },
-        )
-        rows = result.fetchall()
+        rows = await nearest_chunks(db, kb, query_embedding, limit, org_id=org_id or kb.org_id)
     except Exception as e:
         _kb_logger.error(f"Vector search failed for KB {kb_id}: {e}")
         return []
@@ -0,0 +1,257 @@
+"""
+KB embedding store — content-hash chunk dedup and embedding reuse.
+
+A re-ingested document used to lose every chunk and have all of them
+embedded and inserted again, even when one paragraph changed. Now:
+
+  - every chunk carries ``content_hash``: sha256 of its NFKC-normalized,
+    whitespace-collapsed text;
+  - re-ingest diffs the document's old chunks against the new ones on that
+    hash (``plan_chunks``): matching rows stay in place (only chunk_index is
+    fixed up when it moved), the rest are deleted or inserted
+    (``write_document_chunks``);
+  - vectors for the inserted chunks come from ``kb_embeddings`` when the
+    same text was embedded before anywhere in the org with the same model
+    and dimensions; only misses reach the provider (``embed_chunks``), and
+    their vectors are added to the store.
+
+Old chunks without a hash (ingested before migration 056) are hashed from
+their content during the diff and get the hash written when kept.
+"""
+
+import hashlib
+import logging
+import uuid
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, case, delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db_session
+from app.core.pgvector import pack_vector, unpack_vector
+from app.models.knowledge_base import KBChunk, KBEmbedding
+from app.services.query_embedding_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+LOOKUP_BATCH = 1000  # hashes per IN (...) query
+
+EmbedFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def chunk_hash(text: str) -> str:
+    """sha256 of the chunk's normalized text."""
+    return hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class OldChunk:
+    id: uuid.UUID
+    content_hash: str
+    chunk_index: Optional[int]
+    token_count: int
+    hashed: bool  # False when the hash was computed here and is not stored yet
+
+
+@dataclass
+class ChunkPlan:
+    """How a document's new chunks map onto its old ones."""
+
+    keep: List[Tuple[OldChunk, int]] = field(default_factory=list)  # (old row, new chunk_index)
+    add: List[int] = field(default_factory=list)  # indexes into the new chunk list
+    drop: List[OldChunk] = field(default_factory=list)
+
+
+async def load_document_chunks(db: AsyncSession, doc_id: uuid.UUID) -> List[OldChunk]:
+    """A document's current chunks, without their vectors."""
+    rows = await db.execute(
+        select(
+            KBChunk.id, KBChunk.content_hash, KBChunk.chunk_index, KBChunk.token_count,
+            # Text is only read for rows that predate content hashes
+            case((KBChunk.content_hash.is_(None), KBChunk.content), else_=None).label("content"),
+        ).where(KBChunk.document_id == doc_id)
+    )
+    return [
+        OldChunk(
+            id=row.id,
+            content_hash=row.content_hash or chunk_hash(row.content or ""),
+            chunk_index=row.chunk_index,
+            token_count=row.token_count or 0,
+            hashed=row.content_hash is not None,
+        )
+        for row in rows.all()
+    ]
+
+
+def plan_chunks(old: Sequence[OldChunk], hashes: Sequence[str]) -> ChunkPlan:
+    """Match new chunk hashes to old rows, in document order; repeats match one-to-one."""
+    available: Dict[str, deque] = defaultdict(deque)
+    for row in sorted(old, key=lambda r: r.chunk_index if r.chunk_index is not None else -1):
+        available[row.content_hash].append(row)
+
+    plan = ChunkPlan()
+    for index, h in enumerate(hashes):
+        if available.get(h):
+            plan.keep.append((available[h].popleft(), index))
+        else:
+            plan.add.append(index)
+    plan.drop = [row for rows in available.values() for row in rows]
+    return plan
+
+
+async def lookup(
+    db: AsyncSession, org_id: uuid.UUID, model: str, dimensions: int, hashes: Sequence[str],
+) -> Dict[str, List[float]]:
+    """Stored vectors for whichever of *hashes* the org has embedded before."""
+    found: Dict[str, List[float]] = {}
+    unique = list(dict.fromkeys(hashes))
+    for start in range(0, len(unique), LOOKUP_BATCH):
+        rows = await db.execute(
+            select(KBEmbedding.content_hash, KBEmbedding.embedding).where(
+                KBEmbedding.org_id == org_id,
+                KBEmbedding.model == model,
+                KBEmbedding.dimensions == dimensions,
+                KBEmbedding.content_hash.in_(unique[start:start + LOOKUP_BATCH]),
+            )
+        )
+        found.update((row.content_hash, unpack_vector(row.embedding)) for row in rows.all())
+    return found
+
+
+async def store(
+    db: AsyncSession, org_id: uuid.UUID, model: str, dimensions: int, vectors: Dict[str, List[float]],
+) -> None:
+    if not vectors:
+        return
+    await db.execute(
+        pg_insert(KBEmbedding)
+        .values([
+            {
+                "id": uuid.uuid4(), "org_id": org_id, "model": model, "dimensions": dimensions,
+                "content_hash": h, "embedding": pack_vector(vector),
+            }
+            for h, vector in vectors.items()
+        ])
+        .on_conflict_do_nothing(index_elements=["org_id", "model", "dimensions", "content_hash"])
+    )
+
+
+async def embed_chunks(
+    org_id: uuid.UUID,
+    model: str,
+    dimensions: Optional[int],
+    texts: Sequence[str],
+    hashes: Sequence[str],
+    embed: EmbedFn,
+) -> Tuple[List[List[float]], int]:
+    """
+    Vectors for *texts*, reusing the org's stored embeddings. Each distinct
+    text that is not stored is embedded once. Returns (vectors, reused count).
+    """
+    if not texts:
+        return [], 0
+    dims = dimensions or 0
+    async with get_db_session() as db:
+        known = await lookup(db, org_id, model, dims, hashes)
+
+    missing = {h: text for text, h in zip(texts, hashes) if h not in known}
+    if missing:
+        fresh = await embed(list(missing.values()))
+        if len(fresh) != len(missing):
+            raise ValueError(f"Embedding count ({len(fresh)}) doesn't match chunk count ({len(missing)})")
+        new = dict(zip(missing, fresh))
+        try:
+            async with get_db_session() as db:
+                await store(db, org_id, model, dims, new)
+        except Exception as e:
+            # The vectors are still good for this ingest; only reuse is lost
+            logger.warning(f"Could not store {len(new)} embeddings for org {org_id}: {e}")
+        known.update(new)
+
+    reused = sum(1 for h in hashes if h not in missing)
+    return [known[h] for h in hashes], reused
+
+
+@dataclass
+class ChunkWrite:
+    removed: List[uuid.UUID]  # chunk ids deleted
+    added: List[uuid.UUID]  # chunk ids inserted, in plan.add order
+    chunk_delta: int
+    token_delta: int
+
+
+async def write_document_chunks(
+    db: AsyncSession,
+    *,
+    kb_id: uuid.UUID,
+    org_id: uuid.UUID,
+    doc_id: uuid.UUID,
+    file_name: str,
+    chunks: Sequence[str],
+    tokens: Sequence[int],
+    hashes: Sequence[str],
+    plan: ChunkPlan,
+    vectors: Sequence[List[float]],
+    metadata: Optional[dict] = None,
+    pages: Optional[Sequence[Optional[int]]] = None,
+    sections: Optional[Sequence[Optional[str]]] = None,
+) -> ChunkWrite:
+    """
+    Apply *plan*: drop, re-index and insert chunk rows. *vectors* line up
+    with plan.add; *pages* and *sections*, when given, with *chunks*.
+    """
+    pages = pages or [None] * len(chunks)
+    sections = sections or [None] * len(chunks)
+    removed = [row.id for row in plan.drop]
+    if removed:
+        await db.execute(delete(KBChunk).where(KBChunk.id.in_(removed)))
+
+    moved = [
+        {
+            "b_id": row.id, "b_index": index, "b_hash": row.content_hash,
+            "b_page": pages[index], "b_section": sections[index],
+        }
+        for row, index in plan.keep
+        if row.chunk_index != index or not row.hashed
+    ]
+    if moved:
+        await db.execute(
+            update(KBChunk.__table__)
+            .where(KBChunk.__table__.c.id == bindparam("b_id"))
+            .values(
+                chunk_index=bindparam("b_index"), content_hash=bindparam("b_hash"),
+                source_page=bindparam("b_page"), source_section=bindparam("b_section"),
+            ),
+            moved,
+        )
+
+    added = []
+    for index, embedding in zip(plan.add, vectors):
+        chunk_id = uuid.uuid4()
+        db.add(KBChunk(
+            id=chunk_id,
+            document_id=doc_id,
+            knowledge_base_id=kb_id,
+            org_id=org_id,
+            content=chunks[index],
+            content_hash=hashes[index],
+            token_count=tokens[index],
+            chunk_index=index,
+            embedding=embedding,
+            source_file=file_name,
+            source_page=pages[index],
+            source_section=sections[index],
+            extra_metadata=dict(metadata or {}),
+        ))
+        added.append(chunk_id)
+
+    return ChunkWrite(
+        removed=removed,
+        added=added,
+        chunk_delta=len(plan.add) - len(plan.drop),
+        token_delta=sum(tokens[i] for i in plan.add) - sum(row.token_count for row in plan.drop),
+    )
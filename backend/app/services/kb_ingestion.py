@@ -13,76 +13,123 @@ Design principles:
 
 import hashlib
 import logging
+import re
 import uuid
 import asyncio
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional, Tuple, AsyncGenerator
+from typing import List, Dict, Any, Optional, Tuple, AsyncGenerator, Callable, Iterable, Iterator
 from io import BytesIO
 import mimetypes
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 
-from app.models.knowledge_base import KnowledgeBase, KBDocument, KBChunk
+from app.models.knowledge_base import KnowledgeBase, KBDocument
 from app.core.database import get_db_session
+from app.services.embedding_scheduler import embedding_scheduler
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class TextSegment:
+    """A run of parsed text and where in the document it came from."""
+    text: str
+    page: Optional[int] = None
+    section: Optional[str] = None
+
+
+@dataclass
+class TextChunk:
+    text: str
+    page: Optional[int] = None
+    section: Optional[str] = None
+
+
 class DocumentParser:
     """Document parsing for various file types using lightweight libraries."""
-    
+
+    MARKDOWN_HEADING = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
     @staticmethod
-    def parse_pdf(content: bytes) -> str:
-        """Parse PDF content using PyPDF2/pypdf."""
+    def iter_pdf(content: bytes) -> Iterator[TextSegment]:
+        """Yield a PDF page by page (PyPDF2/pypdf), with 1-based page numbers."""
         try:
             import PyPDF2
-            from io import BytesIO
-            
-            pdf_reader = PyPDF2.PdfReader(BytesIO(content))
-            text_parts = []
-            
-            for page in pdf_reader.pages:
-                try:
-                    text_parts.append(page.extract_text())
-                except Exception as e:
-                    logger.warning(f"Failed to extract text from PDF page: {e}")
-                    continue
-            
-            return "\n\n".join(text_parts)
-            
         except ImportError:
             raise ImportError("PyPDF2 is required for PDF parsing. Install with: pip install PyPDF2")
+
+        try:
+            pdf_reader = PyPDF2.PdfReader(BytesIO(content))
+            pages = pdf_reader.pages
         except Exception as e:
             raise ValueError(f"Failed to parse PDF: {e}")
-    
+
+        for number, page in enumerate(pages, start=1):
+            try:
+                text = page.extract_text()
+            except Exception as e:
+                logger.warning(f"Failed to extract text from PDF page {number}: {e}")
+                continue
+            yield TextSegment(text=text or "", page=number)
+
     @staticmethod
-    def parse_docx(content: bytes) -> str:
-        """Parse DOCX content using python-docx."""
+    def iter_docx(content: bytes) -> Iterator[TextSegment]:
+        """Yield a DOCX heading by heading (python-docx); tables follow as their own segment."""
         try:
             import docx
-            from io import BytesIO
-            
-            doc = docx.Document(BytesIO(content))
-            text_parts = []
-            
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text_parts.append(paragraph.text)
-            
-            # Also extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = " | ".join(cell.text.strip() for cell in row.cells)
-                    if row_text.strip():
-                        text_parts.append(row_text)
-            
-            return "\n\n".join(text_parts)
-            
         except ImportError:
             raise ImportError("python-docx is required for DOCX parsing. Install with: pip install python-docx")
+
+        try:
+            doc = docx.Document(BytesIO(content))
         except Exception as e:
             raise ValueError(f"Failed to parse DOCX: {e}")
+
+        section, parts = None, []
+        for paragraph in doc.paragraphs:
+            if not paragraph.text.strip():
+                continue
+            style = paragraph.style.name if paragraph.style is not None else ""
+            if style.startswith("Heading") or style == "Title":
+                if parts:
+                    yield TextSegment(text="\n\n".join(parts), section=section)
+                section, parts = paragraph.text.strip()[:500], []
+            parts.append(paragraph.text)
+        if parts:
+            yield TextSegment(text="\n\n".join(parts), section=section)
+
+        # Also extract text from tables
+        rows = []
+        for table in doc.tables:
+            for row in table.rows:
+                row_text = " | ".join(cell.text.strip() for cell in row.cells)
+                if row_text.strip():
+                    rows.append(row_text)
+        if rows:
+            yield TextSegment(text="\n\n".join(rows), section=section)
+
+    @classmethod
+    def iter_markdown(cls, content: bytes) -> Iterator[TextSegment]:
+        """Yield Markdown split at its headings."""
+        text = content.decode("utf-8")
+        headings = list(cls.MARKDOWN_HEADING.finditer(text))
+        bounds = [0] + [m.start() for m in headings] + [len(text)]
+        titles = [None] + [m.group(1)[:500] for m in headings]
+        for start, end, title in zip(bounds, bounds[1:], titles):
+            if text[start:end].strip():
+                yield TextSegment(text=cls.parse_markdown(text[start:end].encode("utf-8")), section=title)
+
+    @classmethod
+    def parse_pdf(cls, content: bytes) -> str:
+        """Parse PDF content using PyPDF2/pypdf."""
+        return "\n\n".join(segment.text for segment in cls.iter_pdf(content))
+
+    @classmethod
+    def parse_docx(cls, content: bytes) -> str:
+        """Parse DOCX content using python-docx."""
+        return "\n\n".join(segment.text for segment in cls.iter_docx(content))
     
     @staticmethod
     def parse_html(content: bytes) -> str:
@@ -181,21 +228,146 @@ class DocumentParser:
         
         return parser(content)
 
+    @classmethod
+    def iter_segments(cls, content: bytes, file_type: str) -> Iterator[TextSegment]:
+        """
+        Parse a document lazily: PDFs page by page, DOCX and Markdown by
+        heading. Other formats come back as a single segment.
+        """
+        iterators = {
+            'pdf': cls.iter_pdf,
+            'docx': cls.iter_docx,
+            'md': cls.iter_markdown,
+            'markdown': cls.iter_markdown,
+        }
+        iterator = iterators.get(file_type.lower())
+        if iterator is None:
+            yield TextSegment(text=cls.parse_document(content, file_type))
+            return
+        yield from iterator(content)
+
+
+def tiktoken_counter(encoding: str) -> Optional[Callable[[str], int]]:
+    """Token counter for a tiktoken encoding (e.g. "cl100k_base"), or None if tiktoken is missing."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    enc = tiktoken.get_encoding(encoding)
+    return lambda text: len(enc.encode(text, disallowed_special=()))
+
 
 class TextChunker:
-    """Text chunking with configurable size and overlap."""
-    
-    def __init__(self, chunk_size: int = 512, overlap: int = 50):
+    """
+    Text chunking with configurable size and overlap.
+
+    Splits on paragraphs, then lines, sentences, words and finally raw
+    characters, packing consecutive pieces into chunks of up to chunk_size
+    tokens. Pieces are packed against a running length instead of being
+    re-measured as a growing string, each separator level makes one pass
+    over the text it is given, and chunks are yielded as soon as they close.
+
+    Token counts are estimated at ~4 characters per token unless a
+    *tokenizer* (text -> token count, see ``tiktoken_counter``) is given;
+    with one, a chunk's size is the sum of its pieces' counts.
+    """
+
+    SEPARATORS = ["\n\n", "\n", ". ", "! ", "? ", " ", ""]
+
+    def __init__(self, chunk_size: int = 512, overlap: int = 50, tokenizer: Optional[Callable[[str], int]] = None):
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.tokenizer = tokenizer
     
     def estimate_tokens(self, text: str) -> int:
         """Rough token estimation: ~4 characters per token for English."""
+        if self.tokenizer is not None:
+            return self.tokenizer(text)
         return len(text) // 4
-    
+
+    @property
+    def _budget(self) -> int:
+        """Chunk size in characters, or in tokens with a tokenizer."""
+        # len // 4 <= chunk_size  <=>  len <= chunk_size * 4 + 3
+        return self.chunk_size if self.tokenizer is not None else self.chunk_size * 4 + 3
+
+    def iter_split(self, text: str, separators: List[str] = None) -> Iterator[str]:
+        """Lazily yield the chunks of *text*, without overlap."""
+        if separators is None:
+            separators = self.SEPARATORS
+        if not text.strip():
+            return
+        if self.estimate_tokens(text) <= self.chunk_size:
+            yield text.strip()
+            return
+        yield from self._split(text, separators, 0)
+
+    def _split(self, text: str, separators: List[str], level: int) -> Iterator[str]:
+        if level >= len(separators) or not separators[level]:
+            # No more separators, split by characters
+            step = self.chunk_size * 4  # 4 chars per token
+            for i in range(0, len(text), step):
+                chunk = text[i:i + step].strip()
+                if chunk:
+                    yield chunk
+            return
+
+        separator = separators[level]
+        size = self.tokenizer or len
+        sep_size = size(separator)
+        budget = self._budget
+        current: List[str] = []  # pieces of the open chunk, joined by separator on close
+        current_size = 0
+
+        # The outer level walks the text by offset, so only one paragraph is
+        # copied at a time; inner levels split a single oversized piece,
+        # where str.split is much faster than a find() loop
+        pieces = self._iter_pieces(text, separator) if level == 0 else text.split(separator)
+        for piece in pieces:
+            if not piece or piece.isspace():
+                continue
+            piece_size = size(piece)
+
+            # Would adding this piece exceed the chunk size?
+            if current:
+                if current_size + sep_size + piece_size <= budget:
+                    current_size += sep_size + piece_size
+                    current.append(piece)
+                    continue
+                # Current chunk is full, start a new one
+                yield separator.join(current).strip()
+                current = []
+            elif piece_size <= budget:
+                current.append(piece)
+                current_size = piece_size
+                continue
+
+            # If the piece itself is too large, split it at the next separator
+            if piece_size > budget:
+                yield from self._split(piece, separators, level + 1)
+            else:
+                piece = piece.strip()
+                current, current_size = [piece], size(piece)
+
+        # Don't forget the last chunk
+        if current:
+            yield separator.join(current).strip()
+
+    @staticmethod
+    def _iter_pieces(text: str, separator: str) -> Iterator[str]:
+        """Lazy ``text.split(separator)``."""
+        start, width = 0, len(separator)
+        while True:
+            stop = text.find(separator, start)
+            if stop < 0:
+                yield text[start:]
+                return
+            yield text[start:stop]
+            start = stop + width
+
     def split_text_recursive(self, text: str, separators: List[str] = None) -> List[str]:
         """
-        Recursively split text using different separators.
+        Split text using different separators.
         
         Order of preference:
         1. Paragraphs (\n\n)
@@ -204,102 +376,49 @@ class TextChunker:
         4. Words ( )
         5. Characters
         """
-        if separators is None:
-            separators = ["\n\n", "\n", ". ", "! ", "? ", " ", ""]
-        
-        if not text.strip():
-            return []
-        
-        # Check if text is already small enough
-        if self.estimate_tokens(text) <= self.chunk_size:
-            return [text.strip()]
-        
-        if not separators:
-            # No more separators, split by characters
-            chunks = []
-            for i in range(0, len(text), self.chunk_size * 4):  # 4 chars per token
-                chunk = text[i:i + self.chunk_size * 4]
-                if chunk.strip():
-                    chunks.append(chunk.strip())
-            return chunks
-        
-        separator = separators[0]
-        remaining_separators = separators[1:]
-        
-        # Split by current separator
-        splits = text.split(separator)
-        
-        # Recombine splits into chunks
-        chunks = []
-        current_chunk = ""
-        
-        for split in splits:
-            if not split.strip():
-                continue
-            
-            # Would adding this split exceed the chunk size?
-            potential_chunk = current_chunk + (separator if current_chunk else "") + split
-            
-            if self.estimate_tokens(potential_chunk) <= self.chunk_size:
-                current_chunk = potential_chunk
-            else:
-                # Current chunk is full, start a new one
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                
-                # If the split itself is too large, recursively split it
-                if self.estimate_tokens(split) > self.chunk_size:
-                    sub_chunks = self.split_text_recursive(split, remaining_separators)
-                    chunks.extend(sub_chunks)
-                    current_chunk = ""
-                else:
-                    current_chunk = split.strip()
-        
-        # Don't forget the last chunk
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        return chunks
-    
+        return list(self.iter_split(text, separators))
+
+    def _overlapped(self, previous: str, chunk: str) -> str:
+        """*chunk* prefixed with the last ``overlap`` words of *previous* (all of it if shorter)."""
+        tail = previous.rsplit(None, self.overlap)
+        if len(tail) >= self.overlap:
+            return " ".join(tail[-self.overlap:]) + " " + chunk
+        return previous + " " + chunk
+
     def add_overlap(self, chunks: List[str]) -> List[str]:
         """Add overlap between consecutive chunks."""
         if len(chunks) <= 1 or self.overlap <= 0:
             return chunks
-        
-        overlapped_chunks = []
-        
-        for i, chunk in enumerate(chunks):
-            if i == 0:
-                overlapped_chunks.append(chunk)
-                continue
-            
-            # Get overlap from previous chunk
-            prev_chunk = chunks[i-1]
-            prev_words = prev_chunk.split()
-            
-            if len(prev_words) >= self.overlap:
-                overlap_text = " ".join(prev_words[-self.overlap:])
-                overlapped_chunk = overlap_text + " " + chunk
+        return [chunks[0]] + [self._overlapped(prev, chunk) for prev, chunk in zip(chunks, chunks[1:])]
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """Lazily yield the chunks of *text*, with overlap."""
+        previous = None
+        for chunk in self.iter_split(text):
+            if previous is not None and self.overlap > 0:
+                yield self._overlapped(previous, chunk)
             else:
-                overlapped_chunk = prev_chunk + " " + chunk
-            
-            overlapped_chunks.append(overlapped_chunk)
-        
-        return overlapped_chunks
-    
+                yield chunk
+            previous = chunk
+
     def chunk_text(self, text: str) -> List[str]:
         """Main chunking method."""
-        if not text.strip():
-            return []
-        
-        # Split recursively
-        chunks = self.split_text_recursive(text)
-        
-        # Add overlap
-        chunks = self.add_overlap(chunks)
-        
-        # Filter out empty chunks
-        return [chunk for chunk in chunks if chunk.strip()]
+        return list(self.iter_chunks(text))
+
+    def chunk_segments(self, segments: Iterable[TextSegment]) -> Iterator[TextChunk]:
+        """
+        Chunk a stream of segments lazily, one segment in memory at a time.
+        Chunks never span segments, so each keeps its page and section;
+        overlap still carries across segment boundaries.
+        """
+        previous = None
+        for segment in segments:
+            if not segment.text.strip():
+                continue
+            for chunk in self.iter_split(segment.text):
+                text = self._overlapped(previous, chunk) if previous is not None and self.overlap > 0 else chunk
+                previous = chunk
+                yield TextChunk(text=text, page=segment.page, section=segment.section)
 
 
 class EmbeddingGenerator:
@@ -417,11 +536,8 @@ class EmbeddingGenerator:
         from app.core.config import settings
 
         dims = dimensions or self.PLATFORM_DIMENSIONS
-        embeddings = []
-        batch_size = 20
 
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
+        async def send(batch: List[str]) -> List[List[float]]:
             try:
                 response = await asyncio.wait_for(
                     litellm.aembedding(
@@ -432,30 +548,16 @@ class EmbeddingGenerator:
                     ),
                     timeout=self.EMBEDDING_TIMEOUT,
                 )
-                for item in response.data:
-                    embeddings.append(item["embedding"])
             except asyncio.TimeoutError:
                 logger.error(f"Platform embedding timed out after {self.EMBEDDING_TIMEOUT}s")
                 raise RuntimeError("Platform embedding timed out. Please try again.")
-            except Exception as e:
-                logger.error(f"Platform embedding failed for batch {i//batch_size}: {e}")
-                raise
-
-            if i + batch_size < len(texts):
-                await asyncio.sleep(0.5)
-
-        return embeddings
-
-    async def generate_embeddings(self, texts: List[str], model: str = None, dimensions: int = None) -> List[List[float]]:
-        """
-        Generate embeddings for a list of texts.
+            return [item["embedding"] for item in response.data]
 
-        Routes through the org's LiteLLM router when they have an embedding-capable
-        provider. Falls back to platform-level OpenAI key when they don't.
-        """
-        if not texts:
-            return []
+        # One platform key for every org, so one lane shared by all of them
+        return await embedding_scheduler.embed(("platform", self.PLATFORM_MODEL, dims), self.PLATFORM_MODEL, texts, send)
 
+    async def resolve_model(self, model: str = None) -> str:
+        """*model*, or the org's cheapest embedding model when None. Raises if there is none."""
         if model is None:
             async with get_db_session() as db:
                 model = await self.get_cheapest_embedding_model(db)
@@ -465,7 +567,10 @@ class EmbeddingGenerator:
                 f"No embedding model available for org {self.org_id}. "
                 f"Connect a provider with embedding support (OpenAI, GCP Vertex AI, or AWS Bedrock)."
             )
+        return model
 
+    def effective_dimensions(self, model: str, dimensions: Optional[int]) -> Optional[int]:
+        """The dimensions to request from *model* for a KB configured with *dimensions*."""
         # Some models (Bedrock Titan, Cohere) don't accept a dimensions param
         # at all — passing it causes 400 "Malformed input request" errors.
         # Strip it entirely for these models.
@@ -473,7 +578,7 @@ class EmbeddingGenerator:
             logger.info(
                 f"Model {model} does not accept dimensions param — using native output"
             )
-            dimensions = None
+            return None
 
         # Clamp dimensions to model's max to prevent pgvector insert errors
         # (e.g. GCP text-embedding-005 maxes at 768 but KB default is 1024)
@@ -483,7 +588,28 @@ class EmbeddingGenerator:
                 logger.warning(
                     f"Requested {dimensions} dims but {model} maxes at {max_dims} — clamping"
                 )
-                dimensions = max_dims
+                return max_dims
+        return dimensions
+
+    def store_dimensions(self, model: str, dimensions: Optional[int]) -> int:
+        """Dimensions the vectors for (*model*, *dimensions*) actually have, for kb_embedding_store keys (0 = native)."""
+        dimensions = self.effective_dimensions(model, dimensions)
+        if self._use_platform_key:
+            dimensions = dimensions or self.PLATFORM_DIMENSIONS
+        return dimensions or 0
+
+    async def generate_embeddings(self, texts: List[str], model: str = None, dimensions: int = None) -> List[List[float]]:
+        """
+        Generate embeddings for a list of texts.
+
+        Routes through the org's LiteLLM router when they have an embedding-capable
+        provider. Falls back to platform-level OpenAI key when they don't.
+        """
+        if not texts:
+            return []
+
+        model = await self.resolve_model(model)
+        dimensions = self.effective_dimensions(model, dimensions)
 
         # Platform key fallback — call OpenAI directly, not through org router
         if self._use_platform_key:
@@ -494,39 +620,30 @@ class EmbeddingGenerator:
 
         from app.services.gateway import get_router
 
-        embeddings = []
-        batch_size = 20  # Process in batches to avoid rate limits
+        # One router lookup per call; the scheduler batches across concurrent calls
+        async with get_db_session() as db:
+            router = await get_router(db, self.org_id)
 
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
+        async def send(batch: List[str]) -> List[List[float]]:
+            embed_kwargs = {"model": model, "input": batch}
+            if dimensions:
+                embed_kwargs["dimensions"] = dimensions
             try:
-                async with get_db_session() as db:
-                    router = await get_router(db, self.org_id)
-                    # Timeout to prevent hanging on unactivated/unavailable models
-                    embed_kwargs = {"model": model, "input": batch}
-                    if dimensions:
-                        embed_kwargs["dimensions"] = dimensions
-                    response = await asyncio.wait_for(
-                        router.aembedding(**embed_kwargs),
-                        timeout=self.EMBEDDING_TIMEOUT,
-                    )
-                    for item in response.data:
-                        embeddings.append(item["embedding"])
+                # Timeout to prevent hanging on unactivated/unavailable models
+                response = await asyncio.wait_for(
+                    router.aembedding(**embed_kwargs),
+                    timeout=self.EMBEDDING_TIMEOUT,
+                )
             except asyncio.TimeoutError:
-                logger.error(f"Embedding timed out after {self.EMBEDDING_TIMEOUT}s for model {model} (batch {i//batch_size}). "
+                logger.error(f"Embedding timed out after {self.EMBEDDING_TIMEOUT}s for model {model}. "
                              f"Model may not be activated — check provider console or use one-click activation.")
                 raise RuntimeError(
                     f"Embedding model '{model}' timed out. It may not be activated on your cloud provider. "
                     f"Use Bonito's model activation feature or choose a different embedding model."
                 )
-            except Exception as e:
-                logger.error(f"Embedding generation failed for batch {i//batch_size}: {e}")
-                raise
-
-            # Small delay between batches to avoid rate limits
-            if i + batch_size < len(texts):
-                await asyncio.sleep(0.5)
+            return [item["embedding"] for item in response.data]
 
+        embeddings = await embedding_scheduler.embed((self.org_id, model, dimensions), model, texts, send)
         logger.info(f"Generated {len(embeddings)} embeddings successfully")
         return embeddings
 
@@ -543,8 +660,10 @@ async def process_document(
     Steps:
     1. Parse document content
     2. Split into chunks
-    3. Generate embeddings
-    4. Store in database
+    3. Diff the chunks against the document's stored ones by content hash
+    4. Generate embeddings for new chunks (reusing the org's stored vectors)
+    5. Store in database: unchanged chunks stay, the rest are dropped/added
+    6. Encode into the KB's compressed vector store (if compression is on)
     """
     async with get_db_session() as db:
         # Get document and knowledge base info
@@ -564,6 +683,7 @@ async def process_document(
             logger.error(f"Knowledge base {kb_id} not found")
             return
         
+        was_ready = doc.status == "ready"
         try:
             # Mark as processing
             doc.status = "processing"
@@ -571,77 +691,76 @@ async def process_document(
             
             logger.info(f"Processing document {doc_id} ({doc.file_name})")
             
-            # Step 1: Parse document content
-            parsed_text = DocumentParser.parse_document(content, doc.file_type or "txt")
-            
-            if not parsed_text.strip():
-                raise ValueError("No text content found in document")
-            
-            # Step 2: Split into chunks
-            chunker = TextChunker(
-                chunk_size=kb.chunk_size,
-                overlap=kb.chunk_overlap
-            )
-            chunks = chunker.chunk_text(parsed_text)
-            
-            if not chunks:
-                raise ValueError("No chunks generated from document")
-            
-            # Step 3: Generate embeddings
+            # Steps 1-2: Parse and chunk in the parse process pool, off the event loop
+            from app.services import kb_embedding_store
+            from app.services.kb_parsing import parse_document
+
+            parsed = await parse_document(content, doc.file_type or "txt", kb.chunk_size, kb.chunk_overlap)
+            chunks, tokens, hashes = parsed.chunks, parsed.tokens, parsed.hashes
+
+            # Step 3: Diff against the document's current chunks by content hash
+            old_chunks = await kb_embedding_store.load_document_chunks(db, doc_id)
+            plan = kb_embedding_store.plan_chunks(old_chunks, hashes)
+
+            # Step 4: Embed only the new chunks, reusing the org's stored vectors
             embedding_gen = EmbeddingGenerator(doc.org_id)
-            embed_model = kb.embedding_model if kb.embedding_model != "auto" else None
+            embed_model = await embedding_gen.resolve_model(
+                kb.embedding_model if kb.embedding_model != "auto" else None
+            )
             # Pass target dimensions to support OpenAI dimension reduction
             # (e.g., text-embedding-3-small can produce 768 instead of default 1536)
             embed_dims = kb.embedding_dimensions if kb.embedding_dimensions else None
-            embeddings = await embedding_gen.generate_embeddings(
-                chunks, 
-                model=embed_model,
-                dimensions=embed_dims
+            embeddings, reused = await kb_embedding_store.embed_chunks(
+                doc.org_id,
+                embed_model,
+                embedding_gen.store_dimensions(embed_model, embed_dims),
+                [chunks[i] for i in plan.add],
+                [hashes[i] for i in plan.add],
+                lambda texts: embedding_gen.generate_embeddings(texts, model=embed_model, dimensions=embed_dims),
             )
-            
-            if len(embeddings) != len(chunks):
-                raise ValueError(f"Embedding count ({len(embeddings)}) doesn't match chunk count ({len(chunks)})")
-            
-            # Step 4: Store chunks in database
-            chunk_objects = []
-            total_tokens = 0
-            
-            for i, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
-                token_count = chunker.estimate_tokens(chunk_text)
-                total_tokens += token_count
-                
-                chunk_obj = KBChunk(
-                    document_id=doc_id,
-                    knowledge_base_id=kb_id,
-                    org_id=doc.org_id,
-                    content=chunk_text,
-                    token_count=token_count,
-                    chunk_index=i,
-                    embedding=embedding,
-                    source_file=doc.file_name,
-                    source_page=None,  # TODO: Extract page numbers during parsing
-                    source_section=None,  # TODO: Extract sections during parsing
-                    extra_metadata={"processed_at": datetime.now(timezone.utc).isoformat()}
-                )
-                chunk_objects.append(chunk_obj)
-            
-            # Bulk insert chunks
-            db.add_all(chunk_objects)
-            
+
+            # Step 5: Apply the diff to the stored chunks
+            written = await kb_embedding_store.write_document_chunks(
+                db,
+                kb_id=kb_id,
+                org_id=doc.org_id,
+                doc_id=doc_id,
+                file_name=doc.file_name,
+                chunks=chunks,
+                tokens=tokens,
+                hashes=hashes,
+                plan=plan,
+                vectors=embeddings,
+                pages=parsed.pages,
+                sections=parsed.sections,
+                metadata={"processed_at": datetime.now(timezone.utc).isoformat()},
+            )
+            total_tokens = sum(tokens)
+
+            # Update knowledge base counters (a re-processed document is already counted)
+            if not was_ready:
+                kb.document_count += 1
+            kb.chunk_count += written.chunk_delta
+            kb.total_tokens += written.token_delta
+            if kb.status == "pending":
+                kb.status = "ready"
+
             # Update document status
             doc.status = "ready"
             doc.chunk_count = len(chunks)
             doc.updated_at = datetime.now(timezone.utc)
-            
-            # Update knowledge base counters
-            kb.document_count += 1
-            kb.chunk_count += len(chunks)
-            kb.total_tokens += total_tokens
-            if kb.status == "pending":
-                kb.status = "ready"
-            
+
             await db.commit()
-            
+
+            # Keep the KB's compressed store in step (no-op when compression is off)
+            from app.services.kb_compression import index_chunks, remove_chunks
+            await remove_chunks(kb_id, written.removed)
+            await index_chunks(kb, written.added, embeddings)
+
+            logger.info(
+                f"Document {doc_id}: kept {len(plan.keep)} chunks, dropped {len(plan.drop)}, "
+                f"added {len(plan.add)} ({reused} embeddings reused)"
+            )
             logger.info(f"Successfully processed document {doc_id}: {len(chunks)} chunks, {total_tokens} tokens")
             
         except Exception as e:
@@ -679,7 +798,6 @@ async def sync_from_cloud_storage(kb_id: uuid.UUID) -> None:
     """
     from app.services.storage_connector import sync_kb_from_storage
     await sync_kb_from_storage(kb_id)
-    await asyncio.sleep(1)  # Simulate work
 
 
 async def search_chunks(
@@ -692,11 +810,12 @@ async def search_chunks(
     """
     Search for similar chunks using pgvector cosine similarity.
 
-    Uses the ``<=>`` (cosine distance) operator provided by pgvector.
+    Scoring is exact cosine (pgvector ``<=>``); candidates come from the
+    KB's compressed store when it is complete (see ``kb_retrieval``).
     Returns up to *top_k* results whose cosine similarity (1 - distance)
     meets or exceeds *min_score*.
     """
-    from sqlalchemy import text as sa_text
+    from app.services.kb_retrieval import nearest_chunks
 
     async with get_db_session() as db:
         # Verify knowledge base access
@@ -707,12 +826,13 @@ async def search_chunks(
                     KnowledgeBase.org_id == org_id
                 )
             )
-            kb = kb_result.scalar_one_or_none()
-            if not kb:
+        else:
+            kb_result = await db.execute(select(KnowledgeBase).where(KnowledgeBase.id == kb_id))
+        kb = kb_result.scalar_one_or_none()
+        if not kb:
+            if org_id:
                 raise ValueError("Knowledge base not found or access denied")
-
-        # Build the pgvector literal expected by CAST(... AS vector)
-        embedding_str = "[" + ",".join(str(x) for x in query_embedding) + "]"
+            return []
 
         logger.info(
             f"Vector search in KB {kb_id} for {len(query_embedding)}-dim embedding "
@@ -720,25 +840,7 @@ async def search_chunks(
         )
 
         try:
-            result = await db.execute(
-                sa_text("""
-                    SELECT c.id, c.content, c.token_count, c.chunk_index,
-                           c.source_file, c.source_page, c.source_section,
-                           c.document_id,
-                           1 - (c.embedding <=> CAST(:query_vec AS vector)) AS score
-                    FROM kb_chunks c
-                    WHERE c.knowledge_base_id = :kb_id
-                      AND c.embedding IS NOT NULL
-                    ORDER BY c.embedding <=> CAST(:query_vec AS vector)
-                    LIMIT :top_k
-                """),
-                {
-                    "query_vec": embedding_str,
-                    "kb_id": str(kb_id),
-                    "top_k": top_k,
-                },
-            )
-            rows = result.fetchall()
+            rows = await nearest_chunks(db, kb, query_embedding, top_k)
         except Exception as e:
             logger.error(f"pgvector search failed for KB {kb_id}: {e}")
             return []
@@ -0,0 +1,166 @@
+"""
+KB document parsing in a process pool.
+
+PyPDF2, python-docx and BeautifulSoup are pure-Python and CPU-bound; run
+inline they held the event loop (or, in a thread, the GIL) for seconds on
+a large upload and stalled gateway traffic on that worker. Parsing and
+chunking now run in a small pool of spawned worker processes:
+
+  - every task has a timeout; a hung parser gets its pool torn down and
+    replaced, and any task that only failed because it shared that pool is
+    retried once;
+  - each worker's address space is capped (RLIMIT_AS) so a hostile or huge
+    file fails with "too large" instead of taking the host down;
+  - workers are recycled after TASKS_PER_WORKER files so parser leaks
+    don't accumulate.
+
+Inside a worker the document is parsed lazily (PDF page by page, DOCX and
+Markdown heading by heading) and fed straight into
+``TextChunker.chunk_segments``, so the full text of a large document is
+never held alongside all of its chunks. Each chunk keeps the page and
+section it came from (KBChunk.source_page / source_section).
+
+Usage:
+    from app.services.kb_parsing import parse_document
+
+    parsed = await parse_document(content, "pdf", chunk_size=512, overlap=50)
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+PARSE_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+PARSE_TIMEOUT_SECONDS = 120.0
+PARSE_MEMORY_LIMIT_MB = 1536     # address-space cap per worker process; 0 disables it
+TASKS_PER_WORKER = 50            # files a worker parses before it is replaced
+# tiktoken encoding for exact chunk token counts (e.g. "cl100k_base"); unset = ~4 chars per token
+CHUNK_TOKENIZER = os.getenv("KB_CHUNK_TOKENIZER") or None
+
+
+@dataclass
+class ParsedDocument:
+    """Chunks of one document plus their per-chunk metadata, index-aligned."""
+
+    chunks: List[str] = field(default_factory=list)
+    tokens: List[int] = field(default_factory=list)
+    hashes: List[str] = field(default_factory=list)
+    pages: List[Optional[int]] = field(default_factory=list)
+    sections: List[Optional[str]] = field(default_factory=list)
+
+
+def parse_and_chunk(content: bytes, file_type: str, chunk_size: int, overlap: int) -> ParsedDocument:
+    """Parse a file and split it into chunks. CPU-bound; runs in a pool worker."""
+    from app.services.kb_embedding_store import chunk_hash
+    from app.services.kb_ingestion import DocumentParser, TextChunker, tiktoken_counter
+
+    tokenizer = tiktoken_counter(CHUNK_TOKENIZER) if CHUNK_TOKENIZER else None
+    chunker = TextChunker(chunk_size=chunk_size, overlap=overlap, tokenizer=tokenizer)
+    parsed = ParsedDocument()
+    for chunk in chunker.chunk_segments(DocumentParser.iter_segments(content, file_type)):
+        parsed.chunks.append(chunk.text)
+        parsed.tokens.append(chunker.estimate_tokens(chunk.text))
+        parsed.hashes.append(chunk_hash(chunk.text))
+        parsed.pages.append(chunk.page)
+        parsed.sections.append(chunk.section)
+
+    if not parsed.chunks:
+        raise ValueError("No text content found in document")
+    return parsed
+
+
+def _init_worker(memory_limit_mb: int) -> None:
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Could not cap parse worker memory at {memory_limit_mb} MB: {e}")
+
+
+class ParsePool:
+    """Process pool with per-task timeouts and per-worker memory caps."""
+
+    def __init__(
+        self,
+        workers: int = PARSE_WORKERS,
+        timeout: float = PARSE_TIMEOUT_SECONDS,
+        memory_limit_mb: int = PARSE_MEMORY_LIMIT_MB,
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the server process has threads and open sockets
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb,),
+                max_tasks_per_child=TASKS_PER_WORKER,
+            )
+        return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        """Kill *executor*'s workers; the next task starts a fresh pool."""
+        if self._executor is not executor:
+            return
+        self._executor = None
+        # ProcessPoolExecutor has no way to stop a running task; kill its workers.
+        # Its other tasks then fail with BrokenProcessPool and are retried in run().
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """Run ``fn(*args)`` in a worker process. Failures surface as ValueError."""
+        timeout = timeout or self.timeout
+        for attempt in range(2):
+            executor = self._get_executor()
+            future = asyncio.wrap_future(executor.submit(fn, *args))
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                self._discard(executor)
+                raise ValueError(f"Parsing timed out after {timeout:.0f}s")
+            except MemoryError:
+                raise ValueError(f"Document is too large to parse (worker memory limit {self.memory_limit_mb} MB)")
+            except BrokenProcessPool:
+                # A worker died: this task crashed it, or another task's timeout tore the pool down
+                self._discard(executor)
+                if attempt:
+                    raise ValueError("Document parser crashed")
+                logger.warning("Parse pool broke; retrying on a fresh pool")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+parse_pool = ParsePool()
+
+
+async def parse_document(content: bytes, file_type: str, chunk_size: int, overlap: int) -> ParsedDocument:
+    """Parse and chunk a document in the process pool."""
+    return await parse_pool.run(parse_and_chunk, content, file_type or "txt", chunk_size, overlap)
+
+
+def stop_parse_pool() -> None:
+    parse_pool.shutdown()
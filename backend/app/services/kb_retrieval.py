@@ -0,0 +1,267 @@
+"""
+KB chunk retrieval — exact pgvector scan, or compressed candidates + exact
+re-rank.
+
+Every RAG path (gateway RAG, the KB search endpoint, agent KB search and
+``kb_ingestion.search_chunks``) used to run
+
+    ORDER BY embedding <=> :q LIMIT k
+
+over the KB's ``kb_chunks`` rows, which without an ANN index is a full scan
+of 6 KB float32 vectors per query. ``nearest_chunks`` is the one place that
+query now lives. When the KB's compressed vector store
+(``compressed_vector_store``) holds every chunk, retrieval runs in two
+stages:
+
+  1. Scan the KB's CompressionCodebook codes (memory-mapped, 4-8 bit) and
+     keep the best ``top_k * oversample`` chunk ids
+  2. Re-rank only those ids with exact cosine distance in pgvector
+     (primary-key lookups), returning the same rows and scores as before
+
+Scores are always exact; only the candidate set is approximate, so recall
+is the one knob. A KB can tune it via ``knowledge_bases.retrieval_config``:
+
+    {"mode": "auto" | "exact",   # auto = two-stage when the store is complete
+     "oversample": 8,            # candidates per requested result
+     "recall_target": 0.95}      # used to pick oversample when it isn't set
+
+Recall targets map to oversample factors through OVERSAMPLE_RECALL, measured
+with retrieval_benchmark.py (1536-d, 20k clustered chunks, recall@10).
+
+Falls back to the exact scan when the store is missing or behind the KB
+(fewer rows than ``kb.chunk_count``), when the re-rank finds fewer rows than
+it should (store has ids the DB no longer has), or on any store error.
+
+Per-KB latency of each path is kept in-process (``retrieval_latency``) for
+the KB stats endpoint.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text as sa_text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.pgvector import pack_vector
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+RETRIEVAL_MODES = ("auto", "exact")
+DEFAULT_RECALL_TARGET = 0.95
+MAX_OVERSAMPLE = 64
+MAX_CANDIDATES = 2000             # Upper bound on stage-1 ids sent to Postgres
+
+# KnowledgeBase.compression_method -> code width in the compressed store
+COMPRESSION_BITS = {"polar-4bit": 4, "polar-8bit": 8, "scalar-8bit": 8}
+DEFAULT_BITS = 4
+
+LATENCY_EWMA_ALPHA = 0.1         # Weight of the newest query in the latency average
+MAX_TRACKED_KBS = 10_000
+
+# bits -> [(oversample, measured recall@10)], ascending
+OVERSAMPLE_RECALL = {
+    4: [(1, 0.335), (2, 0.45), (4, 0.605), (8, 0.815), (16, 0.95), (32, 1.0)],
+    8: [(1, 0.75), (2, 0.955), (4, 0.995), (8, 1.0)],
+}
+
+_COLUMNS = """
+    c.id, c.content, c.token_count, c.chunk_index,
+    c.source_file, c.source_page, c.source_section, c.document_id,
+    1 - (c.embedding <=> CAST(:query_vec AS vector)) AS score
+"""
+
+
+# kb id -> path ("compressed" | "exact") -> {"queries", "avg_ms", "last_ms"}
+_latency: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+
+@dataclass
+class RetrievalSettings:
+    mode: str
+    oversample: int
+
+
+def kb_bits(kb) -> int:
+    """Code width the KB's compressed store is written with."""
+    return COMPRESSION_BITS.get(getattr(kb, "compression_method", None) or "", DEFAULT_BITS)
+
+
+def oversample_for_recall(recall_target: float, bits: int) -> int:
+    """Smallest calibrated oversample factor that meets recall_target."""
+    table = OVERSAMPLE_RECALL.get(bits, OVERSAMPLE_RECALL[DEFAULT_BITS])
+    for oversample, recall in table:
+        if recall >= recall_target:
+            return oversample
+    return table[-1][0]
+
+
+def retrieval_settings(kb) -> RetrievalSettings:
+    """Resolve a KB's retrieval_config (all keys optional) to concrete settings."""
+    config = getattr(kb, "retrieval_config", None) or {}
+    oversample = config.get("oversample")
+    if not oversample:
+        oversample = oversample_for_recall(config.get("recall_target", DEFAULT_RECALL_TARGET), kb_bits(kb))
+    return RetrievalSettings(mode=config.get("mode", "auto"), oversample=int(oversample))
+
+
+def validate_retrieval_config(config: dict) -> dict:
+    """Validate a retrieval_config update. Raises ValueError with a user-facing message."""
+    cleaned: dict = {}
+    mode = config.get("mode", "auto")
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Invalid retrieval mode. Must be one of: {', '.join(RETRIEVAL_MODES)}")
+    cleaned["mode"] = mode
+
+    if config.get("oversample") is not None:
+        oversample = config["oversample"]
+        if isinstance(oversample, bool) or not isinstance(oversample, int) or not 1 <= oversample <= MAX_OVERSAMPLE:
+            raise ValueError(f"oversample must be an integer between 1 and {MAX_OVERSAMPLE}")
+        cleaned["oversample"] = oversample
+
+    if config.get("recall_target") is not None:
+        target = config["recall_target"]
+        if isinstance(target, bool) or not isinstance(target, (int, float)) or not 0 < target <= 1:
+            raise ValueError("recall_target must be a number in (0, 1]")
+        cleaned["recall_target"] = float(target)
+
+    return cleaned
+
+
+async def nearest_chunks(
+    db: AsyncSession,
+    kb,
+    query_embedding: List[float],
+    top_k: int,
+    org_id: Optional[uuid.UUID] = None,
+) -> List[Any]:
+    """
+    Top-k kb_chunks rows for a query embedding, best first.
+
+    Rows have id, content, token_count, chunk_index, source_file,
+    source_page, source_section, document_id and score (cosine similarity).
+    When org_id is given rows are also filtered on kb_chunks.org_id.
+    Database errors propagate to the caller.
+    """
+    settings = retrieval_settings(kb)
+    if settings.mode != "exact":
+        started = time.perf_counter()
+        n_candidates = min(MAX_CANDIDATES, max(top_k, top_k * settings.oversample))
+        candidates = await _compressed_candidates(kb, query_embedding, n_candidates)
+        if candidates is not None:
+            rows = await _rerank(db, kb.id, query_embedding, candidates, top_k, org_id)
+            if len(rows) >= min(top_k, len(candidates)):
+                _record_latency(kb.id, "compressed", started)
+                return rows
+            logger.info(f"Compressed store for KB {kb.id} is stale, using exact scan")
+
+    started = time.perf_counter()
+    rows = await _exact_scan(db, kb.id, query_embedding, top_k, org_id)
+    _record_latency(kb.id, "exact", started)
+    return rows
+
+
+def _record_latency(kb_id, path: str, started: float) -> None:
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    key = str(kb_id)
+    if key not in _latency and len(_latency) >= MAX_TRACKED_KBS:
+        _latency.pop(next(iter(_latency)))
+    entry = _latency.setdefault(key, {}).get(path)
+    if entry is None:
+        _latency[key][path] = {"queries": 1, "avg_ms": elapsed_ms, "last_ms": elapsed_ms}
+        return
+    entry["queries"] += 1
+    entry["avg_ms"] += LATENCY_EWMA_ALPHA * (elapsed_ms - entry["avg_ms"])
+    entry["last_ms"] = elapsed_ms
+
+
+def retrieval_latency(kb_id) -> Dict[str, Dict[str, float]]:
+    """This process's retrieval latency for the KB, per path."""
+    return {
+        path: {"queries": int(v["queries"]), "avg_ms": round(v["avg_ms"], 2), "last_ms": round(v["last_ms"], 2)}
+        for path, v in _latency.get(str(kb_id), {}).items()
+    }
+
+
+async def _compressed_candidates(kb, query_embedding: List[float], n_candidates: int) -> Optional[List[uuid.UUID]]:
+    """Stage 1: best chunk ids from the compressed store, or None to fall back."""
+    from app.services.compressed_vector_store import compressed_vector_store
+
+    try:
+        stored = await asyncio.to_thread(compressed_vector_store.count, kb.id)
+        if stored == 0 or stored < (kb.chunk_count or 0):
+            return None
+        hits = await asyncio.to_thread(compressed_vector_store.search, kb.id, query_embedding, n_candidates)
+    except Exception as e:
+        logger.warning(f"Compressed candidate scan failed for KB {kb.id}: {e}")
+        return None
+    return [chunk_id for chunk_id, _ in hits] or None
+
+
+async def _rerank(
+    db: AsyncSession,
+    kb_id: uuid.UUID,
+    query_embedding: List[float],
+    candidates: List[uuid.UUID],
+    top_k: int,
+    org_id: Optional[uuid.UUID],
+) -> List[Any]:
+    """Stage 2: exact cosine over the candidate ids only."""
+    org_filter = "AND c.org_id = :org_id" if org_id else ""
+    params = {
+        "query_vec": pack_vector(query_embedding),
+        "kb_id": str(kb_id),
+        "ids": candidates,
+        "top_k": top_k,
+    }
+    if org_id:
+        params["org_id"] = str(org_id)
+    result = await db.execute(
+        sa_text(f"""
+            SELECT {_COLUMNS}
+            FROM kb_chunks c
+            WHERE c.id = ANY(CAST(:ids AS uuid[]))
+              AND c.knowledge_base_id = :kb_id
+              {org_filter}
+              AND c.embedding IS NOT NULL
+            ORDER BY c.embedding <=> CAST(:query_vec AS vector)
+            LIMIT :top_k
+        """),
+        params,
+    )
+    return result.fetchall()
+
+
+async def _exact_scan(
+    db: AsyncSession,
+    kb_id: uuid.UUID,
+    query_embedding: List[float],
+    top_k: int,
+    org_id: Optional[uuid.UUID],
+) -> List[Any]:
+    """Exact cosine over every chunk in the KB."""
+    org_filter = "AND c.org_id = :org_id" if org_id else ""
+    params = {
+        "query_vec": pack_vector(query_embedding),
+        "kb_id": str(kb_id),
+        "top_k": top_k,
+    }
+    if org_id:
+        params["org_id"] = str(org_id)
+    result = await db.execute(
+        sa_text(f"""
+            SELECT {_COLUMNS}
+            FROM kb_chunks c
+            WHERE c.knowledge_base_id = :kb_id
+              {org_filter}
+              AND c.embedding IS NOT NULL
+            ORDER BY c.embedding <=> CAST(:query_vec AS vector)
+            LIMIT :top_k
+        """),
+        params,
+    )
+    return result.fetchall()
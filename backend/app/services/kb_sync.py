@@ -0,0 +1,640 @@
+"""
+Cloud-storage KB sync pipeline.
+
+A sync streams the bucket listing and pushes every new or changed object
+through bounded stages, each with its own concurrency limit:
+
+  list ──▶ download ──▶ parse + chunk ──▶ embed ──▶ write
+           (8 tasks)    (4 tasks, on     (2 tasks,   (1 task,
+                         the kb_parsing   batched     bulk insert per
+                         process pool)    across      batch of docs)
+                                          documents)
+
+Stages are joined by bounded queues, so a slow stage (usually embedding
+under provider rate limits) pushes back on the listing instead of
+buffering downloaded files in memory. A rate-limit error puts every embed
+worker into one shared, exponentially growing cooldown.
+
+A changed file is diffed against its stored chunks by content hash, so
+only new chunks are embedded and written; vectors the org already has for
+the same text are reused (see kb_embedding_store).
+
+Progress is checkpointed to knowledge_bases.sync_state. Listings come back
+in key order, and ``resume_after`` is the highest key whose predecessors
+are all written; a sync that was interrupted or failed lists from there
+on its next run. GET /knowledge-bases/{id}/sync-status reads the same state.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, select, update
+
+from app.core.database import get_db_session
+from app.models.knowledge_base import KnowledgeBase, KBDocument, KBChunk
+from app.services import kb_embedding_store
+from app.services.kb_embedding_store import ChunkPlan
+from app.services.kb_parsing import parse_document
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+DOWNLOAD_CONCURRENCY = 8
+PARSE_CONCURRENCY = 4
+EMBED_CONCURRENCY = 2
+EMBED_BATCH_CHUNKS = 96          # chunks per embedding call, gathered across documents
+EMBED_LINGER_SECONDS = 0.2       # how long a short batch waits for more documents
+EMBED_MAX_RETRIES = 5            # rate-limited retries per batch
+RATE_LIMIT_BACKOFF_BASE = 2.0    # seconds, doubled per consecutive retry
+RATE_LIMIT_BACKOFF_MAX = 60.0
+WRITE_BATCH_DOCS = 16
+QUEUE_DEPTH = 2                  # items buffered per consuming worker
+CHECKPOINT_INTERVAL_SECONDS = 2.0
+DELETE_BATCH = 500
+
+# sync_state statuses a new run picks up from
+RESUMABLE = ("running", "interrupted", "failed")
+
+_DONE = object()  # end-of-stream marker, one per consuming worker
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _is_rate_limited(exc: Exception) -> bool:
+    err = str(exc).lower()
+    return (
+        "rate limit" in err or "rate_limit" in err or "429" in err
+        or "too many requests" in err or "RateLimitError" in type(exc).__name__
+    )
+
+
+@dataclass
+class _Item:
+    """One object moving through the pipeline."""
+
+    key: str
+    etag: str
+    size: Optional[int]
+    existing: Any = None  # (id, file_hash, status) row of the KBDocument at this path
+    content: Optional[bytes] = None
+    file_hash: str = ""
+    chunks: List[str] = field(default_factory=list)
+    tokens: List[int] = field(default_factory=list)
+    hashes: List[str] = field(default_factory=list)
+    pages: List[Optional[int]] = field(default_factory=list)
+    sections: List[Optional[str]] = field(default_factory=list)
+    plan: Optional[ChunkPlan] = None  # how the chunks map onto the document's stored ones
+    embeddings: Optional[List[List[float]]] = None  # one per plan.add entry
+    error: Optional[str] = None
+
+    @property
+    def file_name(self) -> str:
+        return self.key.rsplit("/", 1)[-1]
+
+    @property
+    def file_type(self) -> str:
+        return self.file_name.rsplit(".", 1)[-1].lower() if "." in self.file_name else "txt"
+
+    @property
+    def pending(self) -> int:
+        """Chunks that still need a vector."""
+        return len(self.plan.add) if self.plan is not None else 0
+
+
+class SyncProgress:
+    """Counters and the resume watermark of one sync run, persisted as sync_state."""
+
+    def __init__(self, previous: Optional[dict] = None):
+        resume = previous if (
+            previous and previous.get("status") in RESUMABLE and previous.get("resume_after")
+        ) else {}
+        # Only keys up to the watermark are known to be finished; the rest are listed again
+        through = dict(resume.get("through") or {"processed": 0, "unchanged": 0, "errors": 0})
+        self.state: Dict[str, Any] = {
+            "run_id": str(uuid.uuid4()),
+            "status": "running",
+            "started_at": _now().isoformat(),
+            "updated_at": _now().isoformat(),
+            "resumed_from": resume.get("resume_after"),
+            "resume_after": resume.get("resume_after"),
+            "through": through,
+            "listing_complete": False,
+            **through,
+            "listed": sum(through.values()),
+            "baseline": sum(through.values()),
+            "new": 0,
+            "changed": 0,
+            "deleted": 0,
+            "current_file": None,
+            "error_message": None,
+        }
+        self._pending: deque = deque()  # listed keys in order, not yet past the watermark
+        self._settled: Dict[str, str] = {}  # key -> outcome, for settled keys still in _pending
+
+    @property
+    def resumed_from(self) -> Optional[str]:
+        return self.state["resumed_from"]
+
+    def listed(self, key: str) -> None:
+        self._pending.append(key)
+        self.state["listed"] += 1
+
+    def settle(self, key: str, outcome: str) -> None:
+        """Mark *key* finished ("processed", "unchanged" or "errors") and advance the watermark."""
+        self.state[outcome] += 1
+        self._settled[key] = outcome
+        while self._pending and self._pending[0] in self._settled:
+            done = self._pending.popleft()
+            self.state["through"][self._settled.pop(done)] += 1
+            self.state["resume_after"] = done
+
+    def snapshot(self) -> dict:
+        self.state["updated_at"] = _now().isoformat()
+        return {**self.state, "through": dict(self.state["through"])}
+
+
+class _Cooldown:
+    """Shared pause for every embed worker after a provider rate-limit error."""
+
+    def __init__(self):
+        self.until = 0.0
+
+    def trip(self, attempt: int) -> float:
+        delay = min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF_BASE * 2 ** attempt)
+        self.until = max(self.until, time.monotonic() + delay)
+        return delay
+
+    async def wait(self) -> None:
+        while (remaining := self.until - time.monotonic()) > 0:
+            await asyncio.sleep(remaining)
+
+
+class _SyncPipeline:
+    def __init__(self, kb, connector, bucket: str, prefix: str, embedder, model: str,
+                 store_dimensions: int, existing: Dict[str, Any], progress: SyncProgress):
+        self.kb = kb
+        self.connector = connector
+        self.bucket = bucket
+        self.prefix = prefix
+        self.embedder = embedder
+        self.model = model
+        self.store_dimensions = store_dimensions
+        self.existing = existing
+        self.progress = progress
+        self.seen: set = set()
+        self.cooldown = _Cooldown()
+
+    async def run(self) -> None:
+        downloads = asyncio.Queue(DOWNLOAD_CONCURRENCY * QUEUE_DEPTH)
+        parses = asyncio.Queue(PARSE_CONCURRENCY * QUEUE_DEPTH)
+        embeds = asyncio.Queue(EMBED_CONCURRENCY * QUEUE_DEPTH * 4)
+        writes = asyncio.Queue(WRITE_BATCH_DOCS * QUEUE_DEPTH)
+
+        checkpointer = asyncio.create_task(self._checkpoint_loop())
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self._stage([self._list(downloads)], downloads, DOWNLOAD_CONCURRENCY))
+                tg.create_task(self._stage(
+                    [self._download(downloads, parses) for _ in range(DOWNLOAD_CONCURRENCY)], parses, PARSE_CONCURRENCY,
+                ))
+                tg.create_task(self._stage(
+                    [self._parse(parses, embeds) for _ in range(PARSE_CONCURRENCY)], embeds, EMBED_CONCURRENCY,
+                ))
+                tg.create_task(self._stage(
+                    [self._embed(embeds, writes) for _ in range(EMBED_CONCURRENCY)], writes, 1,
+                ))
+                tg.create_task(self._write(writes))
+        except BaseExceptionGroup as eg:
+            raise eg.exceptions[0] from None
+        finally:
+            checkpointer.cancel()
+
+        await self._delete_missing()
+
+    @staticmethod
+    async def _stage(workers, outbox: asyncio.Queue, consumers: int) -> None:
+        """Run a stage's workers, then tell each downstream worker the stream has ended."""
+        await asyncio.gather(*workers)
+        for _ in range(consumers):
+            await outbox.put(_DONE)
+
+    async def _checkpoint_loop(self) -> None:
+        while True:
+            await asyncio.sleep(CHECKPOINT_INTERVAL_SECONDS)
+            try:
+                await save_sync_state(self.kb.id, self.progress)
+            except Exception as e:
+                logger.warning(f"Could not checkpoint sync for KB {self.kb.id}: {e}")
+
+    # ── Stages ──
+
+    async def _list(self, outbox: asyncio.Queue) -> None:
+        state = self.progress.state
+        async for obj in self.connector.iter_objects(self.bucket, self.prefix, state["resume_after"]):
+            key = obj["key"]
+            etag = obj.get("etag") or ""
+            self.seen.add(key)
+            self.progress.listed(key)
+
+            doc = self.existing.get(key)
+            if doc is not None and doc.status == "ready" and doc.file_hash == etag:
+                self.progress.settle(key, "unchanged")
+                continue
+            state["changed" if doc is not None else "new"] += 1
+            await outbox.put(_Item(key=key, etag=etag, size=obj.get("size"), existing=doc))
+        state["listing_complete"] = True
+
+    async def _download(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        while (item := await inbox.get()) is not _DONE:
+            try:
+                item.content = await self.connector.download_object(self.bucket, item.key)
+                item.size = len(item.content)
+                item.file_hash = item.etag or hashlib.sha256(item.content).hexdigest()
+            except Exception as e:
+                logger.error(f"Failed to download {item.key}: {e}")
+                item.error = f"Download failed: {e}"
+                item.file_hash = item.etag
+            await outbox.put(item)
+
+    async def _parse(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        while (item := await inbox.get()) is not _DONE:
+            if item.error is None:
+                try:
+                    parsed = await parse_document(
+                        item.content, item.file_type, self.kb.chunk_size, self.kb.chunk_overlap,
+                    )
+                    item.chunks, item.tokens, item.hashes = parsed.chunks, parsed.tokens, parsed.hashes
+                    item.pages, item.sections = parsed.pages, parsed.sections
+                    item.plan = await self._plan(item)
+                except Exception as e:
+                    logger.error(f"Failed to parse {item.key}: {e}")
+                    item.error = str(e)
+            item.content = None  # only the chunks travel further
+            await outbox.put(item)
+
+    async def _plan(self, item: _Item) -> ChunkPlan:
+        """Diff a changed document's chunks against its stored ones; a new document adds them all."""
+        if item.existing is None:
+            return ChunkPlan(add=list(range(len(item.chunks))))
+        async with get_db_session() as db:
+            old = await kb_embedding_store.load_document_chunks(db, item.existing.id)
+        return kb_embedding_store.plan_chunks(old, item.hashes)
+
+    async def _embed(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        ended = False
+        while not ended:
+            item = await inbox.get()
+            if item is _DONE:
+                break
+            batch = [item]
+            ended = await self._fill_batch(inbox, batch)
+            await self._embed_batch(batch)
+            for done in batch:
+                await outbox.put(done)
+
+    async def _fill_batch(self, inbox: asyncio.Queue, batch: List[_Item]) -> bool:
+        """Top up *batch* to EMBED_BATCH_CHUNKS chunks. True if the end-of-stream marker was taken."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + EMBED_LINGER_SECONDS
+        while sum(i.pending for i in batch) < EMBED_BATCH_CHUNKS:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(inbox.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is _DONE:
+                return True
+            batch.append(item)
+        return False
+
+    async def _embed_batch(self, batch: List[_Item]) -> None:
+        live = [i for i in batch if i.error is None]
+        texts = [i.chunks[index] for i in live for index in i.plan.add]
+        hashes = [i.hashes[index] for i in live for index in i.plan.add]
+        try:
+            # Chunks the org has embedded before come from the store; only the rest reach the provider
+            vectors, _ = await kb_embedding_store.embed_chunks(
+                self.kb.org_id, self.model, self.store_dimensions, texts, hashes, self._embed_texts,
+            )
+        except Exception as e:
+            if len(live) == 1:
+                logger.error(f"Failed to embed {live[0].key}: {e}")
+                live[0].error = str(e)
+                return
+            # Retry document by document so one bad file doesn't fail its batch-mates
+            for i in live:
+                await self._embed_batch([i])
+            return
+
+        pos = 0
+        for i in live:
+            i.embeddings = vectors[pos:pos + i.pending]
+            pos += i.pending
+
+    async def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        dims = self.kb.embedding_dimensions or None
+        for attempt in range(EMBED_MAX_RETRIES + 1):
+            await self.cooldown.wait()
+            try:
+                return await self.embedder.generate_embeddings(texts, model=self.model, dimensions=dims)
+            except Exception as e:
+                if attempt == EMBED_MAX_RETRIES or not _is_rate_limited(e):
+                    raise
+                delay = self.cooldown.trip(attempt)
+                logger.warning(f"Embedding rate-limited for KB {self.kb.id}, backing off {delay:.1f}s")
+
+    async def _write(self, inbox: asyncio.Queue) -> None:
+        ended = False
+        while not ended:
+            item = await inbox.get()
+            if item is _DONE:
+                break
+            batch = [item]
+            while len(batch) < WRITE_BATCH_DOCS and not inbox.empty():
+                item = inbox.get_nowait()
+                if item is _DONE:
+                    ended = True
+                    break
+                batch.append(item)
+            await self._write_batch(batch)
+
+    async def _write_batch(self, batch: List[_Item]) -> None:
+        from app.services.kb_compression import index_chunks, remove_chunks
+
+        try:
+            removed, ids, vectors = await self._commit(batch)
+        except Exception as e:
+            if len(batch) > 1:
+                for item in batch:
+                    await self._write_batch([item])
+                return
+            item = batch[0]
+            logger.error(f"Failed to store {item.key}: {e}")
+            if item.error is not None:
+                # Not even the error row could be written; the next sync retries the file
+                self.progress.settle(item.key, "errors")
+                return
+            item.error, item.embeddings = str(e), None
+            await self._write_batch([item])
+            return
+
+        for item in batch:
+            self.progress.settle(item.key, "errors" if item.error else "processed")
+        self.progress.state["current_file"] = batch[-1].key
+
+        await remove_chunks(self.kb.id, removed)
+        await index_chunks(self.kb, ids, vectors)
+
+    async def _commit(self, batch: List[_Item]) -> Tuple[list, list, list]:
+        """Store a batch of documents and their chunks in one transaction."""
+        kb = self.kb
+        removed, ids, vectors = [], [], []
+        docs = chunks = tokens = 0
+
+        async with get_db_session() as db:
+            for item in batch:
+                ok = item.error is None
+                values = dict(
+                    file_hash=item.file_hash or None,
+                    file_size=item.size,
+                    status="ready" if ok else "error",
+                    chunk_count=len(item.chunks) if ok else 0,
+                    error_message=None if ok else item.error[:1000],
+                    updated_at=_now(),
+                )
+                if item.existing is not None:
+                    doc_id = item.existing.id
+                    docs -= item.existing.status == "ready"
+                    await db.execute(update(KBDocument).where(KBDocument.id == doc_id).values(**values))
+                else:
+                    doc_id = uuid.uuid4()
+                    db.add(KBDocument(
+                        id=doc_id, knowledge_base_id=kb.id, org_id=kb.org_id, file_name=item.file_name,
+                        file_path=item.key, file_type=item.file_type, **values,
+                    ))
+
+                if not ok:
+                    if item.existing is not None:
+                        old = (await db.execute(
+                            delete(KBChunk).where(KBChunk.document_id == doc_id)
+                            .returning(KBChunk.id, KBChunk.token_count)
+                        )).all()
+                        removed.extend(row.id for row in old)
+                        chunks -= len(old)
+                        tokens -= sum(row.token_count or 0 for row in old)
+                    continue
+
+                written = await kb_embedding_store.write_document_chunks(
+                    db,
+                    kb_id=kb.id,
+                    org_id=kb.org_id,
+                    doc_id=doc_id,
+                    file_name=item.file_name,
+                    chunks=item.chunks,
+                    tokens=item.tokens,
+                    hashes=item.hashes,
+                    plan=item.plan,
+                    vectors=item.embeddings or [],
+                    metadata={"processed_at": _now().isoformat()},
+                    pages=item.pages,
+                    sections=item.sections,
+                )
+                removed.extend(written.removed)
+                ids.extend(written.added)
+                vectors.extend(item.embeddings or [])
+                docs += 1
+                chunks += written.chunk_delta
+                tokens += written.token_delta
+
+            await db.execute(
+                update(KnowledgeBase)
+                .where(KnowledgeBase.id == kb.id)
+                .values(
+                    document_count=KnowledgeBase.document_count + docs,
+                    chunk_count=KnowledgeBase.chunk_count + chunks,
+                    total_tokens=KnowledgeBase.total_tokens + tokens,
+                )
+            )
+        return removed, ids, vectors
+
+    async def _delete_missing(self) -> None:
+        """Drop documents whose objects are gone. A resumed run only saw keys after its watermark."""
+        from app.services.kb_compression import remove_chunks
+
+        floor = self.progress.resumed_from
+        gone = [
+            doc for path, doc in self.existing.items()
+            if path not in self.seen and (floor is None or path is None or path > floor)
+        ]
+        for start in range(0, len(gone), DELETE_BATCH):
+            part = gone[start:start + DELETE_BATCH]
+            doc_ids = [doc.id for doc in part]
+            async with get_db_session() as db:
+                old = (await db.execute(
+                    delete(KBChunk).where(KBChunk.document_id.in_(doc_ids)).returning(KBChunk.id, KBChunk.token_count)
+                )).all()
+                await db.execute(delete(KBDocument).where(KBDocument.id.in_(doc_ids)))
+                await db.execute(
+                    update(KnowledgeBase)
+                    .where(KnowledgeBase.id == self.kb.id)
+                    .values(
+                        document_count=KnowledgeBase.document_count - sum(doc.status == "ready" for doc in part),
+                        chunk_count=KnowledgeBase.chunk_count - len(old),
+                        total_tokens=KnowledgeBase.total_tokens - sum(row.token_count or 0 for row in old),
+                    )
+                )
+            await remove_chunks(self.kb.id, [row.id for row in old])
+            self.progress.state["deleted"] += len(part)
+
+
+async def save_sync_state(kb_id: uuid.UUID, progress: SyncProgress, **kb_values) -> None:
+    async with get_db_session() as db:
+        await db.execute(
+            update(KnowledgeBase)
+            .where(KnowledgeBase.id == kb_id)
+            .values(sync_state=progress.snapshot(), **kb_values)
+        )
+
+
+async def sync_kb(kb_id: uuid.UUID) -> Dict[str, Any]:
+    """
+    Sync a KB from its bucket: new and changed files are ingested, files
+    removed from storage are deleted. Resumes an unfinished previous run.
+
+    Returns the run summary.
+    """
+    from app.services.kb_ingestion import EmbeddingGenerator
+    from app.services.storage_connector import get_connector_for_kb
+
+    async with get_db_session() as db:
+        kb = (await db.execute(select(KnowledgeBase).where(KnowledgeBase.id == kb_id))).scalar_one_or_none()
+        if not kb:
+            raise ValueError(f"Knowledge base {kb_id} not found")
+        if kb.source_type == "upload":
+            raise ValueError("Cannot sync upload-based KB from storage")
+
+        progress = SyncProgress(kb.sync_state)
+        kb.status = "syncing"
+        kb.sync_state = progress.snapshot()
+        await db.commit()
+
+    state = progress.state
+    logger.info(
+        f"Starting storage sync for KB {kb_id} ({kb.name}, {kb.source_type})"
+        + (f", resuming after {state['resume_after']}" if state["resume_after"] else "")
+    )
+
+    try:
+        async with get_db_session() as db:
+            connector, bucket, prefix = await get_connector_for_kb(kb, db)
+
+            # Resolve the embedding model once for the whole run
+            embedder = EmbeddingGenerator(kb.org_id)
+            model = kb.embedding_model if kb.embedding_model != "auto" else None
+            if model is None:
+                model = await embedder.get_cheapest_embedding_model(db)
+            if model is None:
+                raise RuntimeError(
+                    f"No embedding model available for org {kb.org_id}. "
+                    f"Connect a provider with embedding support (OpenAI, GCP Vertex AI, or AWS Bedrock)."
+                )
+            store_dimensions = embedder.store_dimensions(model, kb.embedding_dimensions or None)
+
+            rows = await db.execute(
+                select(KBDocument.id, KBDocument.file_path, KBDocument.file_hash, KBDocument.status)
+                .where(KBDocument.knowledge_base_id == kb_id)
+            )
+            existing = {row.file_path: row for row in rows.all()}
+
+        await _SyncPipeline(
+            kb, connector, bucket, prefix, embedder, model, store_dimensions, existing, progress,
+        ).run()
+
+    except asyncio.CancelledError:
+        logger.warning(f"Storage sync for KB {kb_id} interrupted after {state['resume_after']}")
+        state["status"] = "interrupted"
+        await save_sync_state(
+            kb_id, progress, status=case((KnowledgeBase.document_count > 0, "ready"), else_="pending"),
+        )
+        raise
+    except Exception as e:
+        logger.error(f"Storage sync failed for KB {kb_id}: {e}")
+        state["status"] = "failed"
+        state["error_message"] = str(e)[:1000]
+        await save_sync_state(kb_id, progress, status="error")
+        raise
+
+    state["status"] = "completed"
+    state["current_file"] = None
+    processed, errors = state["processed"], state["errors"]
+    await save_sync_state(
+        kb_id, progress,
+        status="error" if errors and not processed else "ready",
+        last_synced_at=_now(),
+    )
+
+    summary = {
+        "new": state["new"],
+        "changed": state["changed"],
+        "unchanged": state["unchanged"],
+        "deleted": state["deleted"],
+        "processed": processed,
+        "errors": errors,
+        "total_remote": state["listed"],
+    }
+    logger.info(f"Sync complete for KB {kb_id}: {summary}")
+    return summary
+
+
+def sync_status(kb: KnowledgeBase) -> Dict[str, Any]:
+    """KBSyncStatus fields for a KB, from its checkpointed sync state."""
+    state = kb.sync_state
+    if not state:
+        return {
+            "knowledge_base_id": kb.id,
+            "status": kb.status,
+            "progress_percentage": 100 if kb.status == "ready" else None,
+            "files_processed": kb.document_count,
+            "files_total": kb.document_count,
+        }
+
+    done = state.get("processed", 0) + state.get("unchanged", 0) + state.get("errors", 0)
+    total = state.get("listed", 0)
+    percentage, eta = None, None
+    if state.get("status") == "completed":
+        percentage = 100
+    elif state.get("listing_complete") and total:
+        percentage = int(100 * done / total)
+        # Rate of this run only; the baseline was carried over from the run it resumed
+        run_done = done - state.get("baseline", 0)
+        started = datetime.fromisoformat(state["started_at"])
+        updated = datetime.fromisoformat(state["updated_at"])
+        elapsed = (updated - started).total_seconds()
+        if state.get("status") == "running" and run_done > 0 and elapsed > 0:
+            eta = updated + timedelta(seconds=(total - done) * elapsed / run_done)
+
+    return {
+        "knowledge_base_id": kb.id,
+        "status": kb.status,
+        "progress_percentage": percentage,
+        "files_processed": done,
+        "files_total": total,
+        "files_failed": state.get("errors", 0),
+        "files_skipped": state.get("unchanged", 0),
+        "files_deleted": state.get("deleted", 0),
+        "current_file": state.get("current_file"),
+        "error_message": state.get("error_message"),
+        "started_at": state.get("started_at"),
+        "estimated_completion": eta,
+    }
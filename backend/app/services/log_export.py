@@ -0,0 +1,349 @@
+"""
+Log export worker — turns pending LogExportJob rows into gzip files.
+
+``GET /logs/export`` only records a job. This worker picks jobs up and
+writes the matching ``platform_logs`` rows as gzip-compressed CSV or NDJSON
+(the ``json`` format), one row per line.
+
+Exports can run to tens of millions of rows, so nothing here holds the
+result set or a long transaction:
+
+  - jobs are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` in a short
+    transaction, so any number of workers can poll the same table
+  - rows are read in keyset pages on (created_at, id); each page is its own
+    short transaction, fetched through a server-side cursor in partitions
+    of STREAM_FETCH_SIZE, and encoded + compressed straight to disk
+  - the export is bounded by the time the job started, so rows that arrive
+    while it runs don't keep extending it
+  - each page updates processed_records / progress / heartbeat_at on the job;
+    a "running" job whose heartbeat goes stale (worker died) is reclaimed
+    and restarted from the beginning
+
+Files are written under EXPORT_DIR. With ``BONITO_LOG_EXPORT_STORAGE=gcs``
+the finished file is uploaded (resumable, chunked) to the GCS bucket used
+for KB uploads under ``{org_id}/log-exports/`` and the local copy removed.
+
+Usage:
+    # In lifespan:
+    await start_log_export_worker()
+    await stop_log_export_worker()
+
+    # After creating a job (optional — the worker also polls):
+    notify_export_queued()
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db_session
+from app.models.logging import LogExportJob, PlatformLog
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+
+EXPORT_DIR = os.getenv("BONITO_LOG_EXPORT_DIR", "/tmp/bonito-log-exports")
+EXPORT_STORAGE = os.getenv("BONITO_LOG_EXPORT_STORAGE", "local")   # local | gcs
+POLL_INTERVAL_SECONDS = 5
+PAGE_SIZE = 20_000                # Rows per keyset page (one short transaction each)
+STREAM_FETCH_SIZE = 2_000         # Rows per server-side cursor fetch
+STALE_HEARTBEAT_SECONDS = 300     # Reclaim "running" jobs not updated for this long
+DOWNLOAD_TTL_HOURS = 24
+GZIP_LEVEL = 6
+
+CSV_COLUMNS = [
+    "id", "created_at", "log_type", "event_type", "severity", "trace_id", "user_id",
+    "resource_type", "resource_id", "action", "duration_ms", "cost", "message", "metadata",
+]
+
+_SELECT_COLUMNS = (
+    PlatformLog.id, PlatformLog.created_at, PlatformLog.log_type, PlatformLog.event_type,
+    PlatformLog.severity, PlatformLog.trace_id, PlatformLog.user_id, PlatformLog.resource_type,
+    PlatformLog.resource_id, PlatformLog.action, PlatformLog.duration_ms, PlatformLog.cost,
+    PlatformLog.message, PlatformLog.event_metadata,
+)
+
+_task: Optional[asyncio.Task] = None
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    ts = datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _filter_clauses(org_id, filters: Dict[str, Any], snapshot: datetime) -> List[Any]:
+    """WHERE clauses for a job's filters (same keys the export route records)."""
+    clauses = [PlatformLog.org_id == org_id, PlatformLog.created_at <= snapshot]
+    for key in ("log_type", "event_type", "severity", "resource_type"):
+        if filters.get(key):
+            clauses.append(getattr(PlatformLog, key) == filters[key])
+    date_from = _parse_ts(filters.get("date_from"))
+    date_to = _parse_ts(filters.get("date_to"))
+    if date_from:
+        clauses.append(PlatformLog.created_at >= date_from)
+    if date_to:
+        clauses.append(PlatformLog.created_at <= date_to)
+    return clauses
+
+
+# ─── Encoding ───
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return json.dumps(value, default=str)
+    return value
+
+
+def encode_csv(rows: Sequence[Sequence[Any]], header: bool = False) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(CSV_COLUMNS)
+    writer.writerows([_cell(v) for v in row] for row in rows)
+    return buf.getvalue().encode()
+
+
+def encode_ndjson(rows: Sequence[Sequence[Any]], header: bool = False) -> bytes:
+    lines = [json.dumps(dict(zip(CSV_COLUMNS, row)), default=str) for row in rows]
+    return ("\n".join(lines) + "\n").encode() if lines else b""
+
+
+_ENCODERS = {"csv": (encode_csv, "csv"), "json": (encode_ndjson, "ndjson")}
+
+
+class _GzipFileSink:
+    """Appends encoded chunks to a gzip file; blocking I/O runs in a thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._fh = gzip.open(path, "wb", compresslevel=GZIP_LEVEL)
+
+    async def write(self, data: bytes) -> None:
+        if data:
+            await asyncio.to_thread(self._fh.write, data)
+
+    async def close(self) -> int:
+        await asyncio.to_thread(self._fh.close)
+        return os.path.getsize(self.path)
+
+    def discard(self) -> None:
+        try:
+            self._fh.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+# ─── Job lifecycle ───
+
+async def claim_job() -> Optional[LogExportJob]:
+    """Claim the oldest pending (or abandoned running) job, or None."""
+    stale_before = _now() - timedelta(seconds=STALE_HEARTBEAT_SECONDS)
+    async with get_db_session() as session:
+        job = (await session.execute(
+            select(LogExportJob)
+            .where(or_(
+                LogExportJob.status == "pending",
+                and_(LogExportJob.status == "running", LogExportJob.heartbeat_at < stale_before),
+            ))
+            .order_by(LogExportJob.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )).scalar_one_or_none()
+        if job is None:
+            return None
+        if job.status == "running":
+            logger.warning(f"Reclaiming log export {job.id} (heartbeat {job.heartbeat_at})")
+        now = _now()
+        job.status = "running"
+        job.started_at = now
+        job.heartbeat_at = now
+        job.progress = 0
+        job.processed_records = 0
+        job.error_message = None
+    return job
+
+
+async def _update_job(job_id, **values) -> None:
+    async with get_db_session() as session:
+        await session.execute(update(LogExportJob).where(LogExportJob.id == job_id).values(**values))
+
+
+async def _read_page(
+    session: AsyncSession, clauses: List[Any], after: Optional[tuple], sink: _GzipFileSink, encode,
+) -> tuple:
+    """Stream one keyset page into *sink*. Returns (rows written, last (created_at, id))."""
+    where = list(clauses)
+    if after is not None:
+        where.append(tuple_(PlatformLog.created_at, PlatformLog.id) > tuple_(*after))
+    stmt = (
+        select(*_SELECT_COLUMNS)
+        .where(and_(*where))
+        .order_by(PlatformLog.created_at, PlatformLog.id)
+        .limit(PAGE_SIZE)
+        .execution_options(yield_per=STREAM_FETCH_SIZE)
+    )
+    count, last = 0, None
+    result = await session.stream(stmt)
+    async for partition in result.partitions():
+        await sink.write(encode(partition))
+        count += len(partition)
+        last = (partition[-1].created_at, partition[-1].id)
+    return count, last
+
+
+async def run_job(job: LogExportJob) -> None:
+    """Export one claimed job. Never raises — failures are recorded on the job."""
+    encoder = _ENCODERS.get(job.export_format)
+    if encoder is None:
+        await _update_job(job.id, status="failed", completed_at=_now(),
+                          error_message=f"Unsupported export format: {job.export_format}")
+        return
+    encode, extension = encoder
+
+    filename = f"{job.id}.{extension}.gz"
+    sink = _GzipFileSink(os.path.join(EXPORT_DIR, str(job.org_id), filename))
+    clauses = _filter_clauses(job.org_id, job.filters or {}, job.started_at or _now())
+
+    try:
+        async with get_db_session() as session:
+            total = (await session.execute(
+                select(func.count()).select_from(PlatformLog).where(and_(*clauses))
+            )).scalar_one()
+        await _update_job(job.id, total_records=total)
+
+        processed, after = 0, None
+        if extension == "csv":
+            await sink.write(encode_csv([], header=True))
+        while True:
+            async with get_db_session() as session:
+                count, last = await _read_page(session, clauses, after, sink, encode)
+            if count == 0:
+                break
+            processed += count
+            after = last
+            await _update_job(
+                job.id,
+                processed_records=processed,
+                progress=min(99, processed * 100 // total) if total else 99,
+                heartbeat_at=_now(),
+            )
+            if count < PAGE_SIZE:
+                break
+
+        size = await sink.close()
+        file_path = sink.path
+        if EXPORT_STORAGE == "gcs":
+            from app.services.gcs_storage import upload_export_file
+            file_path = await upload_export_file(job.org_id, sink.path, filename)
+            os.remove(sink.path)
+
+        now = _now()
+        await _update_job(
+            job.id,
+            status="completed",
+            progress=100,
+            processed_records=processed,
+            total_records=max(total, processed),
+            file_path=file_path,
+            file_size_bytes=size,
+            download_expires_at=now + timedelta(hours=DOWNLOAD_TTL_HOURS),
+            completed_at=now,
+            heartbeat_at=now,
+        )
+        logger.info(f"Log export {job.id} completed: {processed} rows, {size} bytes -> {file_path}")
+    except asyncio.CancelledError:
+        # Shutting down — hand the job back so another worker restarts it now
+        sink.discard()
+        try:
+            await _update_job(job.id, status="pending", heartbeat_at=None)
+        except Exception:
+            pass
+        raise
+    except Exception as e:
+        sink.discard()
+        logger.exception(f"Log export {job.id} failed")
+        try:
+            await _update_job(job.id, status="failed", completed_at=_now(), error_message=str(e)[:2000])
+        except Exception:
+            logger.exception(f"Could not mark log export {job.id} as failed")
+
+
+# ─── Background worker ───
+
+def notify_export_queued() -> None:
+    """Wake this process's worker so a new job starts without waiting for the next poll."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def _worker_loop():
+    while True:
+        try:
+            job = await claim_job()
+            if job is not None:
+                await run_job(job)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Log export worker error: {e}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+async def start_log_export_worker():
+    """Start the background log export worker."""
+    global _task, _wakeup
+    if _task is not None and not _task.done():
+        return
+    _wakeup = asyncio.Event()
+    _task = asyncio.create_task(_worker_loop())
+    logger.info(f"Log export worker started (storage={EXPORT_STORAGE}, page={PAGE_SIZE})")
+
+
+async def stop_log_export_worker():
+    """
+    Stop the worker. A job cut off mid-run is reset to pending right away, so
+    another worker restarts it; the stale-heartbeat reclaim only covers a
+    worker that died without getting to run that reset.
+    """
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+    logger.info("Log export worker stopped")
@@ -5,20 +5,28 @@ Provides async MCP client that connects to MCP servers via stdio (subprocess)
 or HTTP/SSE transport. Handles tool discovery, tool execution, authentication,
 and connection lifecycle management.
 
+Agent executions lease connections from ``mcp_pool`` (MCPConnectionPool)
+instead of connecting per execution: connections are kept per (org, server
+config hash), opened in parallel, health-checked and evicted when idle,
+and each server's tools/list result is cached until its config changes.
+
 Usage:
-    manager = MCPClientManager()
-    async with manager.connect(server_config) as client:
-        tools = await client.list_tools()
-        result = await client.call_tool("tool_name", {"arg": "value"})
+    manager = MCPClientManager(pool=mcp_pool, org_id=org_id)
+    tools = await manager.connect_servers(server_configs)
+    result = await manager.call_tool("mcp_server_tool_name", {"arg": "value"})
+    await manager.disconnect_all()  # returns the connections to the pool
 """
 
 import asyncio
+import hashlib
 import json
 import logging
 import subprocess
+import time
 import uuid
+from collections import deque
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Deque, Dict, List, Optional, Tuple
 
 import httpx
 
@@ -30,6 +38,13 @@ HTTP_CONNECT_TIMEOUT = 30  # seconds for HTTP connection
 HTTP_READ_TIMEOUT = 60  # seconds for HTTP read
 TOOL_CALL_TIMEOUT = 60  # seconds per tool call
 
+# Connection pool
+POOL_MAX_CONNECTIONS_PER_SERVER = 4  # concurrent leases per (org, server config)
+POOL_IDLE_TIMEOUT = 300  # seconds an unused connection is kept open
+POOL_HEALTH_CHECK_INTERVAL = 30  # seconds between sweeps of idle connections
+POOL_PING_TIMEOUT = 5  # seconds for a health-check ping
+TOOL_CATALOG_TTL = 600  # seconds before a server's cached tools/list is refreshed
+
 
 class MCPError(Exception):
     """Base exception for MCP operations."""
@@ -49,17 +64,32 @@ class MCPToolCallError(MCPError):
 class MCPToolDefinition:
     """Represents a tool discovered from an MCP server."""
 
-    def __init__(self, name: str, description: str, input_schema: Dict[str, Any]):
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        input_schema: Dict[str, Any],
+        annotations: Optional[Dict[str, Any]] = None,
+    ):
         self.name = name
         self.description = description
         self.input_schema = input_schema
+        self.annotations = annotations or {}  # MCP tool hints, e.g. readOnlyHint
+
+    @property
+    def read_only(self) -> bool:
+        """The server declares the tool has no side effects (annotations.readOnlyHint)."""
+        return self.annotations.get("readOnlyHint") is True
 
     def to_dict(self) -> Dict[str, Any]:
-        return {
+        data = {
             "name": self.name,
             "description": self.description,
             "input_schema": self.input_schema,
         }
+        if self.annotations:
+            data["annotations"] = self.annotations
+        return data
 
     def to_openai_tool(self, namespaced_name: str) -> Dict[str, Any]:
         """Convert to OpenAI function-calling tool format."""
@@ -78,6 +108,7 @@ class MCPToolDefinition:
             name=tool_data.get("name", ""),
             description=tool_data.get("description", ""),
             input_schema=tool_data.get("inputSchema", tool_data.get("input_schema", {})),
+            annotations=tool_data.get("annotations"),
         )
 
 
@@ -99,6 +130,25 @@ class MCPClient:
     def tools(self) -> List[MCPToolDefinition]:
         return self._tools
 
+    @property
+    def alive(self) -> bool:
+        """Connected and the transport is still usable."""
+        return self._connected
+
+    async def ping(self) -> None:
+        """Round-trip a JSON-RPC ping. Raises if the server doesn't answer."""
+        response = await asyncio.wait_for(
+            self._send_request(self._build_jsonrpc_request("ping")),
+            timeout=POOL_PING_TIMEOUT,
+        )
+        error = response.get("error")
+        # Servers that predate ping answer "method not found", which still proves they're up
+        if error and error.get("code") != -32601:
+            raise MCPError(f"ping failed: {error}")
+
+    async def _send_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
     def _next_request_id(self) -> int:
         self._request_id += 1
         return self._request_id
@@ -151,6 +201,12 @@ class StdioMCPClient(MCPClient):
         self._process: Optional[asyncio.subprocess.Process] = None
         self._read_lock = asyncio.Lock()
         self._write_lock = asyncio.Lock()
+        # Responses are matched to requests by order on the stream, so one request at a time
+        self._request_lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._connected and self._process is not None and self._process.returncode is None
 
     async def connect(self) -> None:
         """Start the MCP server subprocess and initialize the connection."""
@@ -165,7 +221,8 @@ class StdioMCPClient(MCPClient):
                 *self._args,
                 stdin=asyncio.subprocess.PIPE,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
+                # Nothing reads stderr; a pipe would fill and block a long-lived pooled server
+                stderr=asyncio.subprocess.DEVNULL,
                 env=process_env,
                 cwd=self._cwd,
             )
@@ -246,6 +303,8 @@ class StdioMCPClient(MCPClient):
                 timeout=TOOL_CALL_TIMEOUT,
             )
         except asyncio.TimeoutError:
+            # The late response would be read as the answer to the next request
+            self._connected = False
             raise MCPToolCallError(
                 f"Tool call '{tool_name}' timed out after {TOOL_CALL_TIMEOUT}s"
             )
@@ -277,21 +336,22 @@ class StdioMCPClient(MCPClient):
 
         request_bytes = (json.dumps(request) + "\n").encode("utf-8")
 
-        async with self._write_lock:
-            self._process.stdin.write(request_bytes)
-            await self._process.stdin.drain()
+        async with self._request_lock:
+            async with self._write_lock:
+                self._process.stdin.write(request_bytes)
+                await self._process.stdin.drain()
 
-        async with self._read_lock:
-            try:
-                line = await asyncio.wait_for(
-                    self._process.stdout.readline(),
-                    timeout=TOOL_CALL_TIMEOUT,
-                )
-                if not line:
-                    raise MCPError("MCP server closed stdout")
-                return json.loads(line.decode("utf-8").strip())
-            except json.JSONDecodeError as e:
-                raise MCPError(f"Invalid JSON from MCP server: {e}")
+            async with self._read_lock:
+                try:
+                    line = await asyncio.wait_for(
+                        self._process.stdout.readline(),
+                        timeout=TOOL_CALL_TIMEOUT,
+                    )
+                    if not line:
+                        raise MCPError("MCP server closed stdout")
+                    return json.loads(line.decode("utf-8").strip())
+                except json.JSONDecodeError as e:
+                    raise MCPError(f"Invalid JSON from MCP server: {e}")
 
     async def _send_notification(self, method: str, params: Optional[Dict[str, Any]] = None) -> None:
         """Send a JSON-RPC notification (no response expected)."""
@@ -593,76 +653,335 @@ def parse_namespaced_tool_name(namespaced_name: str) -> Optional[tuple[str, str]
     return ("unknown", namespaced_name[4:])
 
 
+def server_config_hash(server: Dict[str, Any]) -> str:
+    """Hash of the parts of a server config that determine its connection."""
+    material = {
+        "transport_type": server.get("transport_type"),
+        "endpoint_config": server.get("endpoint_config") or {},
+        "auth_config": server.get("auth_config") or {},
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _PoolSlot:
+    """Connections and cached tool catalog for one (org, server config)."""
+
+    def __init__(self, max_connections: int):
+        self.idle: Deque[Tuple[MCPClient, float]] = deque()  # (client, idle since)
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.in_use = 0
+        self.tools: Optional[List[MCPToolDefinition]] = None
+        self.tools_at = 0.0
+        self.server_ids: set = set()
+        self.closed = False
+
+    def cached_tools(self, ttl: float) -> Optional[List[MCPToolDefinition]]:
+        if self.tools is not None and time.monotonic() - self.tools_at < ttl:
+            return self.tools
+        return None
+
+
+class MCPLease:
+    """A pooled connection checked out by one agent execution."""
+
+    def __init__(self, client: MCPClient, tools: List[MCPToolDefinition], slot: _PoolSlot):
+        self.client = client
+        self.tools = tools
+        self.broken = False  # set on transport errors; the connection is closed on release
+        self._slot = slot
+
+
+class MCPConnectionPool:
+    """Long-lived MCP connections shared across agent executions.
+
+    Connections are keyed by (org_id, server_config_hash), so a config edit
+    lands on a fresh key and never reuses a connection made with the old
+    endpoint or credentials. Each lease is exclusive: one execution talks to
+    a connection at a time, and at most ``max_connections`` leases per key
+    are out at once. ``sweep()`` closes connections idle longer than
+    ``idle_timeout`` and pings the rest.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = POOL_MAX_CONNECTIONS_PER_SERVER,
+        idle_timeout: float = POOL_IDLE_TIMEOUT,
+        tools_ttl: float = TOOL_CATALOG_TTL,
+    ):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.tools_ttl = tools_ttl
+        self._slots: Dict[Tuple[str, str], _PoolSlot] = {}
+
+    def _slot(self, org_id: Any, server: Dict[str, Any]) -> _PoolSlot:
+        key = (str(org_id), server_config_hash(server))
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _PoolSlot(self.max_connections)
+        slot.server_ids.add(str(server["id"]))
+        return slot
+
+    async def acquire(self, org_id: Any, server: Dict[str, Any]) -> MCPLease:
+        """Check out a connected client and its tools for *server*.
+
+        Reuses an idle connection when one is alive, otherwise connects a
+        new one. tools/list is only sent when the cached catalog is missing
+        or older than ``tools_ttl``.
+        """
+        slot = self._slot(org_id, server)
+        try:
+            await asyncio.wait_for(slot.semaphore.acquire(), timeout=STDIO_STARTUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise MCPConnectionError(
+                f"All {self.max_connections} connections to MCP server '{server['name']}' are busy"
+            )
+
+        client: Optional[MCPClient] = None
+        try:
+            while slot.idle:
+                candidate, _ = slot.idle.pop()
+                if candidate.alive:
+                    client = candidate
+                    break
+                await self._close_client(candidate)
+
+            if client is None:
+                client = create_mcp_client(
+                    server_name=server["name"],
+                    server_id=str(server["id"]),
+                    transport_type=server["transport_type"],
+                    endpoint_config=server.get("endpoint_config", {}),
+                    auth_config=server.get("auth_config"),
+                )
+                await client.connect()
+
+            tools = slot.cached_tools(self.tools_ttl)
+            if tools is None:
+                tools = await client.list_tools()
+                slot.tools, slot.tools_at = tools, time.monotonic()
+        except BaseException:
+            slot.semaphore.release()
+            if client is not None:
+                await self._close_client(client)
+            raise
+
+        slot.in_use += 1
+        return MCPLease(client, tools, slot)
+
+    async def release(self, lease: MCPLease) -> None:
+        """Return a lease. Broken, dead or invalidated connections are closed."""
+        slot = lease._slot
+        slot.in_use -= 1
+        try:
+            if slot.closed or lease.broken or not lease.client.alive:
+                await self._close_client(lease.client)
+            else:
+                slot.idle.append((lease.client, time.monotonic()))
+        finally:
+            slot.semaphore.release()
+
+    async def invalidate(self, org_id: Any, server_id: Any) -> None:
+        """Drop connections and cached tools for a server whose config changed or was deleted.
+
+        Idle connections are closed now; leased ones are closed when released.
+        """
+        org_id, server_id = str(org_id), str(server_id)
+        for key, slot in list(self._slots.items()):
+            if key[0] == org_id and server_id in slot.server_ids:
+                del self._slots[key]
+                await self._close_slot(slot)
+
+    async def sweep(self) -> None:
+        """Evict connections idle past ``idle_timeout`` and ping the others."""
+        now = time.monotonic()
+        for key, slot in list(self._slots.items()):
+            # Take the idle connections out while they're checked so acquire() can't hand one out mid-ping
+            idle, expired = [], []
+            while slot.idle:
+                client, since = slot.idle.popleft()
+                if client.alive and now - since < self.idle_timeout:
+                    idle.append((client, since))
+                else:
+                    expired.append(client)
+
+            results = await asyncio.gather(
+                *(client.ping() for client, _ in idle), return_exceptions=True,
+            )
+            for (client, since), result in reversed(list(zip(idle, results))):
+                if isinstance(result, BaseException):
+                    logger.info(f"MCP server '{client.server_name}' failed health check: {result}")
+                    expired.append(client)
+                elif not slot.closed:
+                    slot.idle.appendleft((client, since))
+                else:
+                    expired.append(client)
+            for client in expired:
+                await self._close_client(client)
+
+            if (
+                self._slots.get(key) is slot and not slot.idle and slot.in_use == 0
+                and slot.cached_tools(self.tools_ttl) is None
+            ):
+                del self._slots[key]
+
+    async def close(self) -> None:
+        """Close every idle connection and forget all cached catalogs."""
+        slots = list(self._slots.values())
+        self._slots.clear()
+        for slot in slots:
+            await self._close_slot(slot)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "servers": len(self._slots),
+            "idle": sum(len(s.idle) for s in self._slots.values()),
+            "in_use": sum(s.in_use for s in self._slots.values()),
+        }
+
+    async def _close_slot(self, slot: _PoolSlot) -> None:
+        slot.closed = True
+        slot.tools = None
+        while slot.idle:
+            client, _ = slot.idle.pop()
+            await self._close_client(client)
+
+    @staticmethod
+    async def _close_client(client: MCPClient) -> None:
+        try:
+            await client.disconnect()
+        except Exception as e:
+            logger.warning(f"Error disconnecting MCP client {client.server_id}: {e}")
+
+
+mcp_pool = MCPConnectionPool()
+_sweeper_task: Optional[asyncio.Task] = None
+
+
+async def _sweep_loop():
+    while True:
+        await asyncio.sleep(POOL_HEALTH_CHECK_INTERVAL)
+        try:
+            await mcp_pool.sweep()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"MCP pool sweep failed: {e}")
+
+
+async def start_mcp_pool():
+    """Start the idle-eviction / health-check loop for the MCP pool."""
+    global _sweeper_task
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.create_task(_sweep_loop())
+        logger.info("MCP connection pool started")
+
+
+async def stop_mcp_pool():
+    """Stop the sweep loop and close pooled MCP connections."""
+    global _sweeper_task
+    if _sweeper_task and not _sweeper_task.done():
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+    _sweeper_task = None
+    await mcp_pool.close()
+
+
 class MCPClientManager:
     """Manages MCP client connections for an agent session.
 
     Handles connecting to multiple MCP servers, tool discovery, and routing
-    tool calls to the correct server.
+    tool calls to the correct server. With a *pool*, connections are leased
+    from it and handed back by ``disconnect_all``; without one, each session
+    opens and closes its own connections.
     """
 
-    def __init__(self):
+    def __init__(self, pool: Optional[MCPConnectionPool] = None, org_id: Optional[Any] = None):
+        self._pool = pool
+        self._org_id = org_id
         self._clients: Dict[str, MCPClient] = {}  # server_id → client
+        self._leases: Dict[str, MCPLease] = {}  # server_id → pooled lease
+        self._server_tools: Dict[str, List[MCPToolDefinition]] = {}  # server_id → un-namespaced tools
         self._tool_map: Dict[str, tuple[str, str]] = {}  # namespaced_name → (server_id, original_tool_name)
+        self._read_only_tools: set = set()  # namespaced names annotated readOnlyHint
 
     async def connect_servers(
         self, servers: List[Dict[str, Any]]
     ) -> List[MCPToolDefinition]:
-        """Connect to multiple MCP servers and discover all tools.
+        """Connect to multiple MCP servers in parallel and discover all tools.
 
         Args:
             servers: List of server configs, each with keys:
                 - id, name, transport_type, endpoint_config, auth_config
 
         Returns:
-            Combined list of all discovered tools (namespaced).
+            Combined list of all discovered tools (namespaced), in server order.
         """
-        all_tools: List[MCPToolDefinition] = []
+        results = await asyncio.gather(
+            *(self._connect_server(server) for server in servers), return_exceptions=True,
+        )
 
-        for server in servers:
-            server_id = str(server["id"])
+        all_tools: List[MCPToolDefinition] = []
+        for server, result in zip(servers, results):
             server_name = server["name"]
-
-            try:
-                client = create_mcp_client(
-                    server_name=server_name,
-                    server_id=server_id,
-                    transport_type=server["transport_type"],
-                    endpoint_config=server.get("endpoint_config", {}),
-                    auth_config=server.get("auth_config"),
+            if isinstance(result, MCPConnectionError):
+                logger.warning(f"Failed to connect to MCP server '{server_name}': {result}")
+                continue
+            if isinstance(result, BaseException):
+                logger.warning(
+                    f"Unexpected error connecting to MCP server '{server_name}': {result}"
                 )
+                continue
 
-                await client.connect()
-                tools = await client.list_tools()
-
-                self._clients[server_id] = client
-
-                # Namespace tools and build mapping
-                for tool in tools:
-                    namespaced = make_namespaced_tool_name(server_name, tool.name)
-                    self._tool_map[namespaced] = (server_id, tool.name)
-                    all_tools.append(
-                        MCPToolDefinition(
-                            name=namespaced,
-                            description=f"[{server_name}] {tool.description}",
-                            input_schema=tool.input_schema,
-                        )
+            # Namespace tools and build mapping
+            server_id = str(server["id"])
+            for tool in result:
+                namespaced = make_namespaced_tool_name(server_name, tool.name)
+                self._tool_map[namespaced] = (server_id, tool.name)
+                if tool.read_only:
+                    self._read_only_tools.add(namespaced)
+                all_tools.append(
+                    MCPToolDefinition(
+                        name=namespaced,
+                        description=f"[{server_name}] {tool.description}",
+                        input_schema=tool.input_schema,
+                        annotations=tool.annotations,
                     )
-
-                logger.info(
-                    f"MCP server '{server_name}' connected: {len(tools)} tools discovered"
                 )
 
-            except MCPConnectionError as e:
-                logger.warning(f"Failed to connect to MCP server '{server_name}': {e}")
-                continue
-            except Exception as e:
-                logger.warning(
-                    f"Unexpected error connecting to MCP server '{server_name}': {e}"
-                )
-                continue
+            logger.info(
+                f"MCP server '{server_name}' connected: {len(result)} tools discovered"
+            )
 
         return all_tools
 
+    async def _connect_server(self, server: Dict[str, Any]) -> List[MCPToolDefinition]:
+        server_id = str(server["id"])
+        if self._pool is not None:
+            lease = await self._pool.acquire(self._org_id, server)
+            self._leases[server_id] = lease
+            self._clients[server_id] = lease.client
+            tools = lease.tools
+        else:
+            client = create_mcp_client(
+                server_name=server["name"],
+                server_id=server_id,
+                transport_type=server["transport_type"],
+                endpoint_config=server.get("endpoint_config", {}),
+                auth_config=server.get("auth_config"),
+            )
+            await client.connect()
+            tools = await client.list_tools()
+            self._clients[server_id] = client
+        self._server_tools[server_id] = tools
+        return tools
+
+    def server_tools(self, server_id: str) -> List[MCPToolDefinition]:
+        """Un-namespaced tools discovered (or served from cache) for a server."""
+        return self._server_tools.get(server_id, [])
+
     async def call_tool(self, namespaced_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Route a tool call to the correct MCP server.
 
@@ -688,6 +1007,10 @@ class MCPClientManager:
         except MCPToolCallError as e:
             return {"error": str(e)}
         except Exception as e:
+            # Transport failure: don't hand this connection to the next execution
+            lease = self._leases.get(server_id)
+            if lease is not None:
+                lease.broken = True
             logger.error(f"MCP tool call failed for {namespaced_name}: {e}")
             return {"error": f"MCP tool call failed: {str(e)}"}
 
@@ -695,6 +1018,10 @@ class MCPClientManager:
         """Check if a tool name is a registered MCP tool."""
         return tool_name in self._tool_map
 
+    def is_read_only_tool(self, tool_name: str) -> bool:
+        """Check if an MCP tool is annotated as side-effect free (readOnlyHint)."""
+        return tool_name in self._read_only_tools
+
     def get_server_id_for_tool(self, tool_name: str) -> Optional[str]:
         """Get the server ID for a given MCP tool name."""
         mapping = self._tool_map.get(tool_name)
@@ -706,14 +1033,21 @@ class MCPClientManager:
         return mapping[1] if mapping else None
 
     async def disconnect_all(self) -> None:
-        """Disconnect all MCP clients."""
+        """Release pooled connections and disconnect unpooled ones."""
         for server_id, client in self._clients.items():
+            lease = self._leases.get(server_id)
             try:
-                await client.disconnect()
+                if lease is not None:
+                    await self._pool.release(lease)
+                else:
+                    await client.disconnect()
             except Exception as e:
                 logger.warning(f"Error disconnecting MCP client {server_id}: {e}")
         self._clients.clear()
+        self._leases.clear()
+        self._server_tools.clear()
         self._tool_map.clear()
+        self._read_only_tools.clear()
 
     @property
     def connected_servers(self) -> List[str]:
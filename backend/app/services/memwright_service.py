@@ -125,13 +125,13 @@ class MemwrightService:
         assistant_msg: str,
         model_id: str,
         tags: Optional[list[str]] = None,
-    ) -> None:
-        """Store a conversation turn as memory."""
+    ) -> bool:
+        """Store a conversation turn as memory. Returns whether anything was written."""
         if not _AGENT_MEMORY_AVAILABLE:
-            return
+            return False
         budget = self._get_budget(model_id)
         if budget == 0:
-            return
+            return False
 
         try:
             def _store():
@@ -152,8 +152,10 @@ class MemwrightService:
                     )
 
             await asyncio.get_running_loop().run_in_executor(self._executor, _store)
+            return True
         except Exception as e:
             logger.warning(f"Memwright store error (non-fatal): {e}")
+            return False
 
     async def clear(self, session_id: str, agent_id: str, org_id: str) -> None:
         """Clear all memories for a session."""
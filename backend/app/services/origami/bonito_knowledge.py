@@ -304,6 +304,7 @@ async def retrieve_context_for_query(
     """
     from app.models.knowledge_base import KnowledgeBase
     from app.services.kb_ingestion import search_chunks
+    from app.services.query_embedding_cache import query_embedding_cache
 
     kb_row = await db.execute(
         select(KnowledgeBase).where(
@@ -315,7 +316,9 @@ async def retrieve_context_for_query(
     if not kb:
         return []
 
-    vector = await _embed_via_gateway(query)
+    vector = await query_embedding_cache.get_or_embed(
+        PLATFORM_ORG_ID, query, _embed_via_gateway, model=PLATFORM_EMBED_MODEL
+    )
     if not vector:
         return []
 
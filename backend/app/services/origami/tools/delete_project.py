@@ -222,6 +222,9 @@ class DeleteProjectTool(OrigamiTool):
                 )
             )
             kbs_deleted = [{"id": str(kb.id), "name": kb.name} for kb in tagged_kbs]
+            from app.services.kb_compression import drop_kb
+            for kb_id in kb_ids:
+                await drop_kb(kb_id)
 
         keys_revoked: list[dict[str, str]] = []
         if delete_keys:
@@ -0,0 +1,205 @@
+"""
+Per-org compiled policy snapshots for gateway enforcement.
+
+``gateway.enforce_policies`` runs on every /v1/* call. Reading the Policy
+rows, the org's tier and today's spend from the DB each time costs three or
+four round-trips before the upstream call even starts. Instead each worker
+keeps a compiled snapshot per org (model allow-lists, daily spend cap,
+monthly call limit) and revalidates it against a version counter in Redis.
+Writes through the policies and subscription routes bump that version, so
+every worker reloads on its next request.
+
+The live counters come from Redis too: the monthly call counter maintained
+by ``feature_gate.increment_usage_counter`` and the per-day spend ledger
+kept by ``spend_ledger``, read in the same pipeline as the version check.
+A warm request therefore costs one Redis round-trip and no SQL.
+
+Redis keys:
+    policy_version:{org_id}              — INCR'd on every policy/tier write
+    gateway:spend:{org_id}:{YYYY-MM-DD}  — today's spend (owned by spend_ledger)
+    gateway_calls:{org_id}:{YYYY-MM}     — this month's gateway calls
+
+Without Redis the snapshot is still cached, bounded by SNAPSHOT_MAX_AGE.
+"""
+
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.organization import Organization
+from app.models.policy import Policy
+from app.services.spend_ledger import spend_key
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+SNAPSHOT_MAX_AGE = 300        # Reload at least every 5 min even if no version bump is seen
+
+
+@dataclass(frozen=True)
+class PolicySnapshot:
+    """Everything ``enforce_policies`` needs about an org, compiled once."""
+
+    version: int
+    loaded_at: float
+    # (policy name, allowed model ids) for each enabled model_access policy
+    model_access: tuple[tuple[str, tuple[str, ...]], ...] = ()
+    allowed_models: Optional[frozenset[str]] = None  # intersection; None = unrestricted
+    max_daily_spend: Optional[float] = None
+    monthly_call_limit: float = float("inf")
+
+
+@dataclass
+class OrgCounters:
+    """Live usage counters read alongside the version check."""
+
+    today_spend: Optional[float] = None
+    month_calls: Optional[int] = None
+
+
+_snapshots: dict[uuid.UUID, PolicySnapshot] = {}
+
+
+def _redis():
+    """Read redis_client lazily — it's None at import time, initialized in lifespan."""
+    from app.core.redis import redis_client as _rc
+    return _rc
+
+
+def _version_key(org_id: uuid.UUID) -> str:
+    return f"policy_version:{org_id}"
+
+
+def calls_key(org_id: uuid.UUID) -> str:
+    # Same key feature_gate.increment_usage_counter writes (naive UTC month).
+    return f"gateway_calls:{org_id}:{datetime.utcnow().strftime('%Y-%m')}"
+
+
+def compile_snapshot(
+    policies: list[Policy],
+    monthly_call_limit: float,
+    version: int,
+) -> PolicySnapshot:
+    """Fold an org's enabled policies into a snapshot.
+
+    Every enabled policy must pass: allow-lists intersect and the strictest
+    spend cap wins.
+    """
+    model_access: list[tuple[str, tuple[str, ...]]] = []
+    allowed: Optional[frozenset[str]] = None
+    max_daily: Optional[float] = None
+
+    for policy in policies:
+        rules = policy.rules_json or {}
+        if policy.type == "model_access":
+            models = tuple(rules.get("allowed_models") or ())
+            if not models:
+                continue
+            model_access.append((policy.name, models))
+            allowed = frozenset(models) if allowed is None else allowed & frozenset(models)
+        elif policy.type == "spend_limits":
+            cap = rules.get("max_daily_spend")
+            if cap is None:
+                continue
+            max_daily = float(cap) if max_daily is None else min(max_daily, float(cap))
+
+    return PolicySnapshot(
+        version=version,
+        loaded_at=time.time(),
+        model_access=tuple(model_access),
+        allowed_models=allowed,
+        max_daily_spend=max_daily,
+        monthly_call_limit=monthly_call_limit,
+    )
+
+
+async def _load_snapshot(db: AsyncSession, org_id: uuid.UUID, version: int) -> PolicySnapshot:
+    from app.services.feature_gate import SubscriptionTier, TierLimits
+
+    result = await db.execute(
+        select(Policy).where(
+            and_(
+                Policy.org_id == org_id,
+                Policy.type.in_(("model_access", "spend_limits")),
+                Policy.enabled.is_(True),
+            )
+        ).order_by(Policy.created_at)
+    )
+    policies = list(result.scalars().all())
+
+    tier_result = await db.execute(
+        select(Organization.subscription_tier).where(Organization.id == org_id)
+    )
+    tier = tier_result.scalar_one_or_none()
+    try:
+        limit = TierLimits.get_limit(SubscriptionTier(tier), "gateway_calls_per_month") if tier else float("inf")
+    except ValueError:
+        limit = float("inf")
+
+    return compile_snapshot(policies, float(limit), version)
+
+
+async def get_policy_state(
+    db: AsyncSession, org_id: uuid.UUID
+) -> tuple[PolicySnapshot, OrgCounters]:
+    """Return the org's snapshot plus live counters, reloading only on a version change."""
+    counters = OrgCounters()
+    version: Optional[int] = None
+
+    r = _redis()
+    if r is not None:
+        try:
+            pipeline = r.pipeline()
+            pipeline.get(_version_key(org_id))
+            pipeline.get(spend_key(org_id))
+            pipeline.get(calls_key(org_id))
+            raw_version, raw_spend, raw_calls = await pipeline.execute()
+            version = int(raw_version or 0)
+            if raw_spend is not None:
+                counters.today_spend = float(raw_spend)
+            if raw_calls is not None:
+                counters.month_calls = int(raw_calls)
+        except Exception as e:
+            logger.debug(f"Policy state read failed for org {org_id}: {e}")
+            version = None
+
+    snapshot = _snapshots.get(org_id)
+    stale = (
+        snapshot is None
+        or time.time() - snapshot.loaded_at > SNAPSHOT_MAX_AGE
+        or (version is not None and version != snapshot.version)
+    )
+    if stale:
+        snapshot = await _load_snapshot(db, org_id, version if version is not None else 0)
+        _snapshots[org_id] = snapshot
+    return snapshot, counters
+
+
+def drop_local(org_id: Optional[uuid.UUID] = None) -> None:
+    """Forget this worker's snapshot for *org_id* (or all orgs)."""
+    if org_id is None:
+        _snapshots.clear()
+    else:
+        _snapshots.pop(org_id, None)
+
+
+async def invalidate(org_id: uuid.UUID) -> None:
+    """Bump the org's policy version so every worker reloads its snapshot.
+
+    Call after the write has been committed, otherwise another worker can
+    reload the old rows under the new version.
+    """
+    drop_local(org_id)
+    r = _redis()
+    if r is None:
+        return
+    try:
+        await r.incr(_version_key(org_id))
+    except Exception as e:
+        logger.warning(f"Policy version bump failed for org {org_id}: {e}")
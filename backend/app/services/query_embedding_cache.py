@@ -0,0 +1,219 @@
+"""
+Query-embedding cache for knowledge-base retrieval.
+
+Gateway RAG (``_perform_rag_retrieval_inner``), agent KB search
+(``kb_content.search_knowledge_base``), the KB search endpoint and the
+bonito-knowledge lookup all embed the user's query on every call, so a
+question asked twice against the same KB pays the upstream embedding
+latency (and cost) twice.
+
+Embeddings are cached in two tiers:
+
+- an in-process LRU (``LOCAL_MAX_ENTRIES`` entries, ``LOCAL_TTL_SECONDS``)
+- Redis, shared across workers (``REDIS_TTL_SECONDS``), stored as base64
+  of the pgvector binary encoding (~8 KB for 1536 dims)
+
+Keys are a hash of (org, embedding model, dimensions, normalized query), so
+orgs never share vectors and a KB switching models never reads stale ones.
+Normalization is Unicode NFKC plus whitespace collapsing — case is kept
+because embedding models are case-sensitive. Queries longer than
+``MAX_QUERY_CHARS`` are embedded but not cached. Concurrent misses for the
+same key share one upstream call.
+
+Redis errors are logged and treated as misses; the cache never fails a
+search that the embedding provider could have served.
+
+Usage:
+    from app.services.query_embedding_cache import embed_query
+
+    vector = await embed_query(org_id, query, model=embed_model, dimensions=embed_dims)
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.pgvector import pack_vector, unpack_vector
+
+logger = logging.getLogger(__name__)
+
+# ── Config ──
+LOCAL_MAX_ENTRIES = 2048          # ~12 MB of 1536-dim float lists
+LOCAL_TTL_SECONDS = 600
+REDIS_TTL_SECONDS = 6 * 3600
+MAX_QUERY_CHARS = 2000
+KEY_PREFIX = "qemb"
+
+
+def _redis():
+    from app.core.redis import redis_client as _rc
+    return _rc
+
+
+def normalize_query(query: str) -> str:
+    """NFKC-normalize and collapse whitespace."""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+def cache_key(org_id: uuid.UUID, model: Optional[str], dimensions: Optional[int], query: str) -> str:
+    """Redis/LRU key for a query embedding."""
+    material = "\x1f".join((str(org_id), model or "auto", str(dimensions or 0), normalize_query(query)))
+    return f"{KEY_PREFIX}:{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+
+EmbedFn = Callable[[str], Awaitable[Optional[List[float]]]]
+
+
+class QueryEmbeddingCache:
+    """Two-tier (LRU + Redis) cache of query embeddings."""
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES, ttl_seconds: float = LOCAL_TTL_SECONDS):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "uncacheable": 0}
+
+    async def get_or_embed(
+        self,
+        org_id: uuid.UUID,
+        query: str,
+        embed: EmbedFn,
+        *,
+        model: Optional[str] = None,
+        dimensions: Optional[int] = None,
+    ) -> Optional[List[float]]:
+        """Return the cached embedding for *query*, calling *embed* on a miss.
+
+        Exceptions from *embed* propagate; empty results are not cached.
+        """
+        if len(query) > MAX_QUERY_CHARS:
+            self._stats["uncacheable"] += 1
+            return await embed(query)
+
+        key = cache_key(org_id, model, dimensions, query)
+        vector = self._get_local(key)
+        if vector is not None:
+            self._stats["local_hits"] += 1
+            return vector
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            await asyncio.wait([pending])
+            if not pending.cancelled():
+                return pending.result()
+            # The request that owned the call went away; embed ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            vector = await self._load(key, query, embed)
+            future.set_result(vector)
+            return vector
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved; waiters re-raise it via result()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _load(self, key: str, query: str, embed: EmbedFn) -> Optional[List[float]]:
+        vector = await self._get_redis(key)
+        if vector is not None:
+            self._stats["redis_hits"] += 1
+            self._put_local(key, vector)
+            return vector
+
+        self._stats["misses"] += 1
+        # Embed the normalized text so every query sharing this key gets
+        # the vector it would have gotten on a miss.
+        vector = await embed(normalize_query(query))
+        if vector:
+            vector = list(vector)
+            self._put_local(key, vector)
+            await self._put_redis(key, vector)
+        return vector
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, vector = entry
+        if time.monotonic() - stored_at > self._ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return vector
+
+    def _put_local(self, key: str, vector: List[float]) -> None:
+        self._entries[key] = (time.monotonic(), vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_redis(self, key: str) -> Optional[List[float]]:
+        redis = _redis()
+        if redis is None:
+            return None
+        try:
+            raw = await redis.get(key)
+            return unpack_vector(base64.b64decode(raw)) if raw else None
+        except Exception as e:
+            logger.debug(f"Query embedding cache read failed: {e}")
+            return None
+
+    async def _put_redis(self, key: str, vector: List[float]) -> None:
+        redis = _redis()
+        if redis is None:
+            return
+        try:
+            payload = base64.b64encode(pack_vector(vector)).decode("ascii")
+            await redis.set(key, payload, ex=REDIS_TTL_SECONDS)
+        except Exception as e:
+            logger.debug(f"Query embedding cache write failed: {e}")
+
+    def clear(self) -> None:
+        """Drop the in-process tier (Redis entries expire on their own)."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"local_entries": len(self._entries), "local_capacity": self._max_entries, **self._stats}
+
+
+# Singleton
+query_embedding_cache = QueryEmbeddingCache()
+
+
+async def embed_query(
+    org_id: uuid.UUID,
+    query: str,
+    *,
+    model: Optional[str] = None,
+    dimensions: Optional[int] = None,
+) -> Optional[List[float]]:
+    """Embed a search query with the org's embedding route, via the cache.
+
+    Same contract as ``EmbeddingGenerator.generate_embeddings([query])[0]``:
+    returns None when no embedding came back, raises on provider errors.
+    """
+    from app.services.kb_ingestion import EmbeddingGenerator
+
+    async def _embed(text: str) -> Optional[List[float]]:
+        embeddings = await EmbeddingGenerator(org_id).generate_embeddings(
+            [text], model=model, dimensions=dimensions
+        )
+        return embeddings[0] if embeddings else None
+
+    return await query_embedding_cache.get_or_embed(
+        org_id, query, _embed, model=model, dimensions=dimensions
+    )
@@ -0,0 +1,192 @@
+"""
+Shared sliding-window rate limiter for gateway keys and agents.
+
+Both ``gateway.check_rate_limit`` and ``AgentEngine._check_rate_limit`` used
+fixed one-minute buckets, so a client could spend a full quota at 12:00:59
+and another at 12:01:00, and each check cost two to four Redis round-trips
+(GET/INCR, EXPIRE, effective-RPM lookup, pipeline).
+
+Here each check is one Lua script: it reads the current and previous
+minute buckets, weights the previous one by how much of it still overlaps
+the sliding window, resolves an optional limit override (the autoscaler's
+effective RPM) and increments the current bucket only if the request fits.
+The per-minute bucket keys are unchanged, so anything reading
+``agent_rate:{agent_id}:{minute}`` keeps working.
+
+Hot keys can opt into local leasing: once a worker sees more than
+HOT_KEY_THRESHOLD checks per second for a key, it reserves a small slice of
+the quota in one script call and spends it in-process until the slice runs
+out or the lease expires. Leased-but-unused tokens still count against the
+window, which bounds the over-reservation at one lease per worker.
+"""
+
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+WINDOW_SECONDS = 60
+HOT_KEY_THRESHOLD = 20       # Checks per second (per worker) before leasing kicks in
+LEASE_FRACTION = 0.05        # Lease 5% of the limit at a time...
+MAX_LEASE_TOKENS = 50        # ...capped so a lease can't starve other workers
+LEASE_TTL_SECONDS = 1.0
+_MAX_TRACKED_KEYS = 10_000
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a rate-limit check."""
+
+    allowed: bool
+    limit: int
+    used: int  # Weighted requests in the sliding window, including this one if allowed
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.used)
+
+
+@dataclass
+class _Lease:
+    tokens: int
+    limit: int
+    used: int
+    expires_at: float
+
+
+_leases: dict[str, _Lease] = {}
+_hits: dict[str, tuple[int, int]] = {}  # key -> (second, checks this second)
+
+
+# KEYS: current bucket, previous bucket, [limit override]
+# ARGV: default limit, weight of previous bucket, tokens wanted, bucket TTL
+_SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+if KEYS[3] then
+    local override = redis.call('get', KEYS[3])
+    if override then limit = tonumber(override) end
+end
+local curr = tonumber(redis.call('get', KEYS[1]) or '0')
+local prev = tonumber(redis.call('get', KEYS[2]) or '0')
+local used = math.floor(prev * tonumber(ARGV[2])) + curr
+local grant = math.min(tonumber(ARGV[3]), limit - used)
+if grant < 1 then
+    return {0, used, limit}
+end
+if redis.call('incrby', KEYS[1], grant) == grant then
+    redis.call('expire', KEYS[1], tonumber(ARGV[4]))
+end
+return {grant, used + grant, limit}
+"""
+
+
+def _now() -> float:
+    return time.time()
+
+
+def bucket_key(prefix: str, bucket: int) -> str:
+    return f"{prefix}:{bucket}"
+
+
+async def _run(redis, prefix: str, limit: int, want: int, limit_key: Optional[str]) -> tuple[int, int, int]:
+    now = _now()
+    bucket = int(now // WINDOW_SECONDS)
+    elapsed = (now % WINDOW_SECONDS) / WINDOW_SECONDS
+    keys = [bucket_key(prefix, bucket), bucket_key(prefix, bucket - 1)]
+    if limit_key:
+        keys.append(limit_key)
+    granted, used, effective = await redis.eval(
+        _SLIDING_WINDOW_LUA,
+        len(keys),
+        *keys,
+        limit,
+        repr(1.0 - elapsed),
+        want,
+        WINDOW_SECONDS * 2,
+    )
+    return int(granted), int(used), int(effective)
+
+
+def _is_hot(prefix: str) -> bool:
+    second = int(_now())
+    last_second, count = _hits.get(prefix, (second, 0))
+    count = count + 1 if last_second == second else 1
+    if len(_hits) > _MAX_TRACKED_KEYS and prefix not in _hits:
+        _hits.clear()
+    _hits[prefix] = (second, count)
+    return count > HOT_KEY_THRESHOLD
+
+
+def _take_lease(prefix: str) -> Optional[RateLimitResult]:
+    lease = _leases.get(prefix)
+    if lease is None:
+        return None
+    if lease.tokens <= 0 or time.monotonic() >= lease.expires_at:
+        del _leases[prefix]
+        return None
+    lease.tokens -= 1
+    lease.used += 1
+    return RateLimitResult(allowed=True, limit=lease.limit, used=min(lease.used, lease.limit))
+
+
+async def hit(
+    redis,
+    prefix: str,
+    limit: int,
+    *,
+    limit_key: Optional[str] = None,
+    lease: bool = False,
+) -> RateLimitResult:
+    """Count one request against ``{prefix}:{minute}`` and report whether it fits.
+
+    *limit_key* names a Redis key whose integer value, when present,
+    replaces *limit* (used for the autoscaler's effective RPM). With
+    *lease* a hot key is served from a locally reserved slice of quota.
+    Redis errors propagate; callers decide whether to fail open.
+    """
+    if lease:
+        leased = _take_lease(prefix)
+        if leased is not None:
+            return leased
+
+    want = 1
+    if lease and _is_hot(prefix):
+        want = max(1, min(MAX_LEASE_TOKENS, math.floor(limit * LEASE_FRACTION)))
+
+    granted, used, effective = await _run(redis, prefix, limit, want, limit_key)
+    if granted < 1:
+        return RateLimitResult(allowed=False, limit=effective, used=used)
+
+    if granted > 1:
+        if len(_leases) > _MAX_TRACKED_KEYS:
+            _leases.clear()
+        _leases[prefix] = _Lease(
+            tokens=granted - 1,
+            limit=effective,
+            used=used - granted + 1,
+            expires_at=time.monotonic() + LEASE_TTL_SECONDS,
+        )
+        used = used - granted + 1
+    return RateLimitResult(allowed=True, limit=effective, used=used)
+
+
+async def peek(
+    redis,
+    prefix: str,
+    limit: int,
+    *,
+    limit_key: Optional[str] = None,
+) -> RateLimitResult:
+    """Current sliding-window usage without counting a request."""
+    _, used, effective = await _run(redis, prefix, limit, 0, limit_key)
+    return RateLimitResult(allowed=used < effective, limit=effective, used=used)
+
+
+def drop_leases() -> None:
+    """Forget all local leases and hot-key counters."""
+    _leases.clear()
+    _hits.clear()
@@ -0,0 +1,283 @@
+"""
+Gateway request log writer — batched, off the request path.
+
+Every /v1/* call writes a ``GatewayRequest`` row, and managed-provider calls
+also bump the provider's usage counters. Doing that inline costs an ORM
+flush plus a CloudProvider lookup before the response goes back, and the
+failover/error paths each opened a session of their own — at a few hundred
+requests per second that is where the DB pool (SCALING.md) runs out.
+
+Handlers hand their row to ``request_log_writer.submit()`` instead. Rows go
+into a bounded in-memory queue; a background task drains it and writes each
+batch with one multi-row INSERT, pricing managed-provider rows and bumping
+provider counters in the same transaction (one lookup per batch, atomic
+``UPDATE ... SET x = x + n`` per provider).
+
+Backpressure: when the queue is full ``submit`` waits briefly for room,
+then writes the row inline rather than dropping billing data. Shutdown
+stops accepting rows and drains the queue before the DB pool closes. When
+the writer is not running (scripts, tests) rows are written inline.
+
+Usage:
+    from app.services.request_log_writer import request_log_writer
+
+    await request_log_writer.submit(log_entry)   # GatewayRequest, never raises
+
+    # In lifespan:
+    await request_log_writer.start()
+    await request_log_writer.stop()
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, insert, select, tuple_, update
+
+from app.core.database import get_db_session
+from app.models.cloud_provider import CloudProvider
+from app.models.gateway import GatewayRequest
+from app.services.managed_inference import calculate_marked_up_cost
+
+logger = logging.getLogger(__name__)
+
+# ── Constants ──
+
+MAX_QUEUE_SIZE = 10_000
+FLUSH_BATCH_SIZE = 500
+FLUSH_LINGER_SECONDS = 0.2        # Max wait to fill a batch once the first row arrives
+BACKPRESSURE_WAIT_SECONDS = 0.5   # How long submit() waits for room before writing inline
+DRAIN_TIMEOUT_SECONDS = 10.0
+WRITE_ATTEMPTS = 3
+
+_COLUMNS = [c for c in GatewayRequest.__table__.columns]
+
+
+def _to_row(entry: GatewayRequest) -> Dict[str, Any]:
+    """Snapshot a transient GatewayRequest into an INSERT-ready dict.
+
+    Python-side column defaults are applied here (the ORM would have done
+    it at flush), and created_at is stamped now so it reflects request
+    time rather than flush time.
+    """
+    row: Dict[str, Any] = {}
+    for column in _COLUMNS:
+        value = getattr(entry, column.key, None)
+        if value is None and column.default is not None and column.default.is_scalar:
+            value = column.default.arg
+        row[column.key] = value
+    row["id"] = row["id"] or uuid.uuid4()
+    row["created_at"] = row["created_at"] or datetime.now(timezone.utc)
+    return row
+
+
+async def _apply_managed_pricing(session, rows: List[Dict[str, Any]]) -> None:
+    """Batch version of gateway._track_managed_inference.
+
+    Marks rows served by a managed provider with their marked-up cost and
+    adds the batch's tokens/cost to each provider's counters.
+    """
+    billable = [r for r in rows if r.get("provider") and r.get("cost") and r.get("status") == "success"]
+    if not billable:
+        return
+
+    pairs = {(r["org_id"], r["provider"]) for r in billable}
+    result = await session.execute(
+        select(CloudProvider.id, CloudProvider.org_id, CloudProvider.provider_type)
+        .where(
+            and_(
+                tuple_(CloudProvider.org_id, CloudProvider.provider_type).in_(list(pairs)),
+                CloudProvider.status == "active",
+                CloudProvider.is_managed.is_(True),
+            )
+        )
+        .order_by(CloudProvider.created_at)
+    )
+    managed: Dict[tuple, uuid.UUID] = {}
+    for provider_id, org_id, provider_type in result.all():
+        managed.setdefault((org_id, provider_type), provider_id)
+    if not managed:
+        return
+
+    usage: Dict[uuid.UUID, list] = defaultdict(lambda: [0, 0.0])
+    for row in billable:
+        provider_id = managed.get((row["org_id"], row["provider"]))
+        if provider_id is None:
+            continue
+        marked_up = calculate_marked_up_cost(row["cost"])
+        row["is_managed"] = True
+        row["marked_up_cost"] = marked_up
+        usage[provider_id][0] += (row.get("input_tokens") or 0) + (row.get("output_tokens") or 0)
+        usage[provider_id][1] += marked_up
+
+    for provider_id, (tokens, cost) in usage.items():
+        await session.execute(
+            update(CloudProvider)
+            .where(CloudProvider.id == provider_id)
+            .values(
+                managed_usage_tokens=func.coalesce(CloudProvider.managed_usage_tokens, 0) + tokens,
+                managed_usage_cost=func.coalesce(CloudProvider.managed_usage_cost, 0) + cost,
+            )
+        )
+
+
+class RequestLogWriter:
+    """Bounded queue + background batch writer for GatewayRequest rows."""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self._stats: Dict[str, float] = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "inline_writes": 0,
+            "backpressure_waits": 0,
+            "batches": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "avg_flush_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def start(self):
+        """Start the background writer."""
+        if self._running:
+            return
+        self._queue = asyncio.Queue(maxsize=MAX_QUEUE_SIZE)
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            "Request log writer started (batch %d, linger %.2fs, queue %d)",
+            FLUSH_BATCH_SIZE, FLUSH_LINGER_SECONDS, MAX_QUEUE_SIZE,
+        )
+
+    async def stop(self):
+        """Stop accepting rows and drain what's queued."""
+        if not self._running:
+            return
+        self._running = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.error(
+                "Request log writer drain timed out with %d rows still queued",
+                self._queue.qsize(),
+            )
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info("Request log writer stopped")
+
+    async def submit(self, entry: GatewayRequest) -> None:
+        """Queue a request log row. Never raises."""
+        try:
+            row = _to_row(entry)
+        except Exception as e:
+            logger.error(f"Failed to serialize gateway request log: {e}")
+            return
+
+        if not self._running:
+            self._stats["inline_writes"] += 1
+            await self._write([row])
+            return
+
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self._stats["backpressure_waits"] += 1
+            try:
+                await asyncio.wait_for(self._queue.put(row), timeout=BACKPRESSURE_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning("Request log queue full — writing row inline")
+                self._stats["inline_writes"] += 1
+                await self._write([row])
+                return
+        self._stats["enqueued"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and flush latency for dashboards / admin endpoints."""
+        return {
+            "running": self._running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": MAX_QUEUE_SIZE,
+            **self._stats,
+        }
+
+    async def _next_batch(self) -> List[Dict[str, Any]]:
+        """Wait for a row, then gather more until the batch is full or the linger expires."""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + FLUSH_LINGER_SECONDS
+        while len(batch) < FLUSH_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        """Background loop: drain the queue in batches."""
+        while True:
+            try:
+                batch = await self._next_batch()
+            except asyncio.CancelledError:
+                break
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        """INSERT *rows* in one statement, retrying transient failures."""
+        started = time.perf_counter()
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                async with get_db_session() as session:
+                    await _apply_managed_pricing(session, rows)
+                    await session.execute(insert(GatewayRequest).values(rows))
+                break
+            except Exception as e:
+                if attempt == WRITE_ATTEMPTS:
+                    self._stats["failed"] += len(rows)
+                    logger.error(f"Failed to write {len(rows)} gateway request logs: {e}")
+                    return
+                # Pricing may have been applied to the dicts already; reset
+                # so the retry doesn't see stale managed flags.
+                for row in rows:
+                    row["is_managed"] = False
+                    row["marked_up_cost"] = None
+                await asyncio.sleep(0.2 * 2 ** attempt)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._stats["written"] += len(rows)
+        self._stats["batches"] += 1
+        self._stats["last_flush_ms"] = round(elapsed_ms, 2)
+        self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed_ms), 2)
+        # Exponentially-weighted so the number tracks current behaviour
+        avg = self._stats["avg_flush_ms"]
+        self._stats["avg_flush_ms"] = round(elapsed_ms if not avg else avg * 0.9 + elapsed_ms * 0.1, 2)
+
+
+# Singleton
+request_log_writer = RequestLogWriter()
@@ -0,0 +1,274 @@
+"""
+Shared router-config cache — one serialized LiteLLM model list per org in
+Redis, shared by every uvicorn worker.
+
+Building a router means a Vault read per provider plus a DB join and alias
+expansion. Without a shared tier every worker pays that separately on its
+first request for an org, and TTL expiry makes all workers stampede Vault
+at once. This module stores the built model list once per org so a worker
+with a cold in-process cache only has to deserialize it.
+
+The model list carries provider credentials, so the payload is encrypted
+with the app secret (same AES-GCM helper as the DB credential fallback).
+If no secret is available the shared tier is skipped entirely rather than
+writing credentials to Redis in plaintext.
+
+Redis keys:
+    gateway:router_config:{org_id}       — encrypted {model_list, built_at}
+    gateway:router_config_lock:{org_id}  — single-flight rebuild lock (SET NX)
+    gateway:router_config_gen:{org_id}   — invalidation generation counter
+    gateway:router_invalidate            — pub/sub channel ("*" = all orgs)
+
+Everything here is best-effort: a Redis error degrades to the per-process
+cache in ``gateway.get_router``, never to a failed request.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Callable, Optional
+
+from app.core.encryption import decrypt_credentials, encrypt_credentials
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+ROUTER_CONFIG_TTL = 3000          # 50 minutes — Azure AD tokens in the list expire at 1 hr
+ROUTER_REFRESH_AHEAD = 600        # Start a background rebuild in the last 10 minutes
+ROUTER_LOCK_TTL = 60              # Upper bound on a rebuild (Vault + DB)
+INVALIDATION_CHANNEL = "gateway:router_invalidate"
+_ALL_ORGS = "*"
+
+# Background listener handle
+_listener_task: Optional[asyncio.Task] = None
+
+
+def _redis():
+    """Read redis_client lazily — it's None at import time, initialized in lifespan."""
+    from app.core.redis import redis_client as _rc
+    return _rc
+
+
+def _secret() -> Optional[str]:
+    from app.core.config import settings
+    return settings.encryption_key or os.getenv("SECRET_KEY") or os.getenv("ENCRYPTION_KEY")
+
+
+def _config_key(org_id: uuid.UUID) -> str:
+    return f"gateway:router_config:{org_id}"
+
+
+def _lock_key(org_id: uuid.UUID) -> str:
+    return f"gateway:router_config_lock:{org_id}"
+
+
+def _gen_key(org_id: uuid.UUID) -> str:
+    return f"gateway:router_config_gen:{org_id}"
+
+
+def needs_refresh(built_at: float, now: Optional[float] = None) -> bool:
+    """True once an entry is inside the refresh-ahead window."""
+    age = (now or time.time()) - built_at
+    return age >= ROUTER_CONFIG_TTL - ROUTER_REFRESH_AHEAD
+
+
+def is_fresh(built_at: float, now: Optional[float] = None) -> bool:
+    """True while an entry may still be served."""
+    return (now or time.time()) - built_at < ROUTER_CONFIG_TTL
+
+
+async def get_generation(org_id: uuid.UUID) -> int:
+    """Current invalidation generation for *org_id* (0 if unknown)."""
+    r = _redis()
+    if r is None:
+        return 0
+    try:
+        return int(await r.get(_gen_key(org_id)) or 0)
+    except Exception as e:
+        logger.debug(f"Router config generation read failed for org {org_id}: {e}")
+        return 0
+
+
+async def load_model_list(org_id: uuid.UUID) -> Optional[tuple[list[dict], float]]:
+    """Return ``(model_list, built_at)`` from the shared tier, or None on miss."""
+    r = _redis()
+    secret = _secret()
+    if r is None or not secret:
+        return None
+    try:
+        raw = await r.get(_config_key(org_id))
+        if not raw:
+            return None
+        payload = decrypt_credentials(raw, secret)
+        return payload["model_list"], float(payload["built_at"])
+    except Exception as e:
+        logger.warning(f"Shared router config read failed for org {org_id}: {e}")
+        return None
+
+
+async def wait_for_model_list(
+    org_id: uuid.UUID, timeout: float, interval: float = 0.1
+) -> Optional[tuple[list[dict], float]]:
+    """Poll the shared tier while another worker holds the rebuild lock."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        shared = await load_model_list(org_id)
+        if shared and is_fresh(shared[1]):
+            return shared
+        r = _redis()
+        try:
+            if r is None or not await r.exists(_lock_key(org_id)):
+                return None  # builder gave up (or finished with nothing to share)
+        except Exception:
+            return None
+        await asyncio.sleep(interval)
+    return None
+
+
+async def store_model_list(
+    org_id: uuid.UUID,
+    model_list: list[dict],
+    built_at: float,
+    generation: Optional[int] = None,
+) -> bool:
+    """Write a built model list to the shared tier.
+
+    When *generation* is given the write is dropped if ``reset_router`` ran
+    while the list was being built, so a slow rebuild can't resurrect
+    credentials for a provider that was just removed.
+    """
+    r = _redis()
+    secret = _secret()
+    if r is None or not secret:
+        return False
+    try:
+        if generation is not None and await get_generation(org_id) != generation:
+            logger.info(f"Discarding stale router config for org {org_id} (invalidated during rebuild)")
+            return False
+        payload = encrypt_credentials({"model_list": model_list, "built_at": built_at}, secret)
+        # Keep the entry a little past its serving TTL so a worker can still
+        # see built_at and decide to refresh rather than treat it as a miss.
+        await r.set(_config_key(org_id), payload, ex=ROUTER_CONFIG_TTL + ROUTER_REFRESH_AHEAD)
+        return True
+    except Exception as e:
+        logger.warning(f"Shared router config write failed for org {org_id}: {e}")
+        return False
+
+
+async def acquire_refresh_lock(org_id: uuid.UUID) -> Optional[str]:
+    """Try to become the single worker rebuilding *org_id*. Returns a token or None."""
+    r = _redis()
+    if r is None:
+        return "local"  # No shared tier — in-process dedup is all we need
+    token = uuid.uuid4().hex
+    try:
+        acquired = await r.set(_lock_key(org_id), token, nx=True, ex=ROUTER_LOCK_TTL)
+        return token if acquired else None
+    except Exception as e:
+        logger.debug(f"Router refresh lock failed for org {org_id}: {e}")
+        return "local"
+
+
+_RELEASE_LOCK_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+async def release_refresh_lock(org_id: uuid.UUID, token: str) -> None:
+    """Release the rebuild lock if we still own it."""
+    r = _redis()
+    if r is None or token == "local":
+        return
+    try:
+        await r.eval(_RELEASE_LOCK_LUA, 1, _lock_key(org_id), token)
+    except Exception as e:
+        logger.debug(f"Router refresh lock release failed for org {org_id}: {e}")
+
+
+async def invalidate(org_id: Optional[uuid.UUID] = None) -> None:
+    """Drop shared entries and tell every worker to drop its local router.
+
+    With *org_id* None every shared entry is deleted. Per-org generation
+    counters are only bumped for targeted invalidations, so a rebuild that
+    races a global reset may still land — acceptable for an admin action.
+    """
+    r = _redis()
+    if r is None:
+        return
+    try:
+        if org_id is not None:
+            pipeline = r.pipeline()
+            pipeline.delete(_config_key(org_id))
+            pipeline.incr(_gen_key(org_id))
+            pipeline.expire(_gen_key(org_id), ROUTER_CONFIG_TTL * 2)
+            await pipeline.execute()
+        else:
+            async for key in r.scan_iter(match="gateway:router_config:*", count=100):
+                await r.delete(key)
+        await r.publish(INVALIDATION_CHANNEL, str(org_id) if org_id is not None else _ALL_ORGS)
+    except Exception as e:
+        logger.warning(f"Router config invalidation failed for org {org_id}: {e}")
+
+
+async def _listen(on_invalidate: Callable[[Optional[uuid.UUID]], None]):
+    """Subscribe to invalidation messages and forward them to *on_invalidate*."""
+    logger.info("Router config invalidation listener started")
+    while True:
+        pubsub = None
+        try:
+            r = _redis()
+            if r is None:
+                await asyncio.sleep(5)
+                continue
+            pubsub = r.pubsub()
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if not message:
+                    continue
+                data = message.get("data")
+                if isinstance(data, bytes):
+                    data = data.decode()
+                if data == _ALL_ORGS:
+                    on_invalidate(None)
+                else:
+                    try:
+                        on_invalidate(uuid.UUID(data))
+                    except (ValueError, TypeError):
+                        logger.debug(f"Ignoring malformed router invalidation message: {data!r}")
+        except asyncio.CancelledError:
+            logger.info("Router config invalidation listener stopping")
+            raise
+        except Exception as e:
+            logger.warning(f"Router config invalidation listener error: {e}")
+            await asyncio.sleep(5)
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+async def start_invalidation_listener(on_invalidate: Callable[[Optional[uuid.UUID]], None]):
+    """Start the background pub/sub listener."""
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(_listen(on_invalidate))
+
+
+async def stop_invalidation_listener():
+    """Stop the background pub/sub listener."""
+    global _listener_task
+    if _listener_task and not _listener_task.done():
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+    _listener_task = None
@@ -0,0 +1,279 @@
+"""
+Incremental daily spend ledger for the gateway spend cap.
+
+``check_spend_cap`` used to run ``SUM(gateway_requests.cost)`` for today on
+every request, which gets slower as an org's traffic grows through the day
+— exactly when the cap matters. Instead each org has a per-day counter in
+Redis that the request handlers bump with ``INCRBYFLOAT`` as they record
+cost, so the cap check is a single O(1) read.
+
+The counter is seeded from ``gateway_requests`` the first time it is read
+on a given day (increments are skipped until then, so a seed never double
+counts), and a background loop periodically reconciles every live counter
+against the table to correct drift from failed increments or rows that
+were rolled back after being counted.
+
+Threshold notifications (80% / 100% of the cap) are claimed with SET NX so
+each crossing notifies admins once per org, day and cap value, rather than
+on every request over the line.
+
+Redis keys:
+    gateway:spend:{org_id}:{YYYY-MM-DD}                        — today's spend (USD)
+    gateway:spend_alert:{org_id}:{YYYY-MM-DD}:{threshold}:{cap} — alert sent marker
+    gateway:spend_reconcile_lock                                — one reconciler at a time
+
+Without Redis the cap check falls back to the SQL sum and alerts are
+de-duplicated per worker.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select, and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.gateway import GatewayRequest
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+SPEND_KEY_TTL = 2 * 86400        # Keep yesterday's counter around across the UTC day boundary
+RECONCILE_INTERVAL = 300         # Seconds between reconciliation passes
+RECONCILE_LOCK_TTL = 240         # < interval, > any realistic pass
+_RECONCILE_LOCK_KEY = "gateway:spend_reconcile_lock"
+
+# Background reconciler handle
+_task: Optional[asyncio.Task] = None
+
+# Alert markers when Redis is unavailable: (org_id, day, threshold, cap)
+_local_alerts: set[tuple[uuid.UUID, str, str, str]] = set()
+
+
+def _redis():
+    """Read redis_client lazily — it's None at import time, initialized in lifespan."""
+    from app.core.redis import redis_client as _rc
+    return _rc
+
+
+def _today() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _day_str(day: Optional[datetime] = None) -> str:
+    return (day or _today()).strftime("%Y-%m-%d")
+
+
+def spend_key(org_id: uuid.UUID, day: Optional[datetime] = None) -> str:
+    return f"gateway:spend:{org_id}:{_day_str(day)}"
+
+
+def _alert_key(org_id: uuid.UUID, day: str, threshold: str, cap: str) -> str:
+    return f"gateway:spend_alert:{org_id}:{day}:{threshold}:{cap}"
+
+
+def _today_filter():
+    today_start = _today().replace(hour=0, minute=0, second=0, microsecond=0)
+    return and_(
+        GatewayRequest.created_at >= today_start,
+        GatewayRequest.status == "success",
+    )
+
+
+async def _sum_today(db: AsyncSession, org_ids: list[uuid.UUID]) -> dict[uuid.UUID, float]:
+    """Today's successful spend per org, straight from gateway_requests."""
+    result = await db.execute(
+        select(GatewayRequest.org_id, func.coalesce(func.sum(GatewayRequest.cost), 0))
+        .where(and_(GatewayRequest.org_id.in_(org_ids), _today_filter()))
+        .group_by(GatewayRequest.org_id)
+    )
+    totals = {org_id: 0.0 for org_id in org_ids}
+    for org_id, total in result.all():
+        totals[org_id] = float(total or 0)
+    return totals
+
+
+# Only bump a counter that has already been seeded for the day; an unseeded
+# counter will pick this request up from gateway_requests when it is seeded.
+_RECORD_LUA = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incrbyfloat', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+async def record_spend(org_id: uuid.UUID, cost: Optional[float]) -> None:
+    """Add a successful request's cost to the org's ledger for today.
+
+    Call wherever a GatewayRequest with status "success" is written.
+    Never raises — the reconciler repairs anything missed here.
+    """
+    if not cost or cost <= 0:
+        return
+    r = _redis()
+    if r is None:
+        return
+    try:
+        await r.eval(_RECORD_LUA, 1, spend_key(org_id), repr(float(cost)))
+    except Exception as e:
+        logger.debug(f"Spend ledger increment failed for org {org_id}: {e}")
+
+
+async def get_today_spend(db: AsyncSession, org_id: uuid.UUID) -> float:
+    """Today's successful spend for *org_id*.
+
+    Reads the ledger when it exists; otherwise sums gateway_requests once
+    and seeds the ledger for the rest of the day.
+    """
+    r = _redis()
+    key = spend_key(org_id)
+    if r is not None:
+        try:
+            cached = await r.get(key)
+            if cached is not None:
+                return float(cached)
+        except Exception as e:
+            logger.debug(f"Spend ledger read failed for org {org_id}: {e}")
+
+    result = await db.execute(
+        select(func.coalesce(func.sum(GatewayRequest.cost), 0)).where(
+            and_(GatewayRequest.org_id == org_id, _today_filter())
+        )
+    )
+    today_cost = float(result.scalar())
+
+    if r is not None:
+        try:
+            await r.set(key, repr(today_cost), ex=SPEND_KEY_TTL, nx=True)
+        except Exception as e:
+            logger.debug(f"Spend ledger seed failed for org {org_id}: {e}")
+    return today_cost
+
+
+async def claim_threshold_alert(org_id: uuid.UUID, threshold: str, cap: float) -> bool:
+    """Return True exactly once per org, day, threshold and cap value.
+
+    The cap is part of the key so raising the cap re-arms the alerts.
+    """
+    day = _day_str()
+    cap_str = f"{cap:.2f}"
+    r = _redis()
+    if r is not None:
+        try:
+            claimed = await r.set(
+                _alert_key(org_id, day, threshold, cap_str), "1", nx=True, ex=SPEND_KEY_TTL
+            )
+            return bool(claimed)
+        except Exception as e:
+            logger.debug(f"Spend alert claim failed for org {org_id}: {e}")
+
+    marker = (org_id, day, threshold, cap_str)
+    if marker in _local_alerts:
+        return False
+    # Drop markers from previous days so the set doesn't grow forever
+    stale = {m for m in _local_alerts if m[1] != day}
+    _local_alerts.difference_update(stale)
+    _local_alerts.add(marker)
+    return True
+
+
+# Replace the counter only if nothing was recorded while we were summing.
+_COMPARE_AND_SET_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+async def reconcile(db: AsyncSession) -> int:
+    """Correct today's ledgers against gateway_requests.
+
+    Returns the number of counters that were rewritten. A counter that
+    moved while the sum was running is left for the next pass, so a
+    concurrent increment is never lost.
+    """
+    r = _redis()
+    if r is None:
+        return 0
+
+    suffix = f":{_day_str()}"
+    observed: dict[uuid.UUID, str] = {}
+    async for key in r.scan_iter(match=f"gateway:spend:*{suffix}", count=200):
+        if isinstance(key, bytes):
+            key = key.decode()
+        try:
+            org_id = uuid.UUID(key[len("gateway:spend:"):-len(suffix)])
+        except ValueError:
+            continue
+        value = await r.get(key)
+        if value is not None:
+            observed[org_id] = value.decode() if isinstance(value, bytes) else value
+    if not observed:
+        return 0
+
+    totals = await _sum_today(db, list(observed))
+    corrected = 0
+    for org_id, before in observed.items():
+        actual = totals.get(org_id, 0.0)
+        if abs(float(before) - actual) < 1e-9:
+            continue
+        swapped = await r.eval(
+            _COMPARE_AND_SET_LUA, 1, spend_key(org_id), before, repr(actual), SPEND_KEY_TTL
+        )
+        if swapped:
+            corrected += 1
+            logger.info(f"Spend ledger drift for org {org_id}: {float(before):.6f} -> {actual:.6f}")
+    return corrected
+
+
+async def _reconcile_pass():
+    """Run one reconciliation if no other worker is doing it."""
+    from app.core.database import get_db_session
+
+    r = _redis()
+    if r is None:
+        return
+    # The lock is left to expire rather than released, so the other workers'
+    # loops skip this interval instead of repeating the pass right after.
+    if not await r.set(_RECONCILE_LOCK_KEY, "1", nx=True, ex=RECONCILE_LOCK_TTL):
+        return
+    async with get_db_session() as db:
+        await reconcile(db)
+
+
+async def _run_loop():
+    """Background loop that reconciles spend ledgers."""
+    await asyncio.sleep(30)
+    while True:
+        try:
+            await _reconcile_pass()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Spend ledger reconciliation failed: {e}")
+        await asyncio.sleep(RECONCILE_INTERVAL)
+
+
+async def start_spend_reconciler():
+    """Start the background reconciliation loop."""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run_loop())
+        logger.info("Spend ledger reconciler started")
+
+
+async def stop_spend_reconciler():
+    """Stop the background reconciliation loop."""
+    global _task
+    if _task and not _task.done():
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+    _task = None
@@ -7,28 +7,25 @@ Connects to customer's S3/Azure Blob/GCS buckets using their provider credential
 Flow:
 1. KB has source_type (s3/azure_blob/gcs) and source_config (bucket, prefix, etc.)
 2. We find the matching provider for the org and pull creds from Vault
-3. List objects in the bucket/prefix
+3. Stream objects in the bucket/prefix, page by page
 4. Compare hashes to detect new/changed files
-5. Download and feed into the existing ingestion pipeline
+5. Download and feed through the sync pipeline (kb_sync)
 """
 
-import hashlib
 import logging
 import uuid
 import asyncio
 import json
 import mimetypes
-from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from io import BytesIO
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 
-from app.models.knowledge_base import KnowledgeBase, KBDocument, KBChunk
+from app.models.knowledge_base import KnowledgeBase
 from app.models.cloud_provider import CloudProvider
 from app.core.vault import vault_client
-from app.core.database import get_db_session
 
 logger = logging.getLogger(__name__)
 
@@ -41,12 +38,38 @@ SUPPORTED_EXTENSIONS = {
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB per file
 
 
+def _accept(key: str, size: Optional[int]) -> bool:
+    """Supported extension and under MAX_FILE_SIZE."""
+    ext = "." + key.rsplit(".", 1)[-1].lower() if "." in key else ""
+    if ext not in SUPPORTED_EXTENSIONS:
+        return False
+    if size and size > MAX_FILE_SIZE:
+        logger.warning(f"Skipping {key}: too large ({size} bytes)")
+        return False
+    return True
+
+
+async def _next_page(pages: Iterator):
+    """Fetch the next listing page from a blocking SDK iterator, or None."""
+    return await asyncio.to_thread(next, pages, None)
+
+
 class StorageConnector:
     """Base interface for cloud storage operations."""
 
+    async def iter_objects(
+        self, bucket: str, prefix: str = "", start_after: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream supported objects as {key, size, etag, last_modified}, one listing
+        page at a time, in key order. Keys <= start_after are skipped.
+        """
+        raise NotImplementedError
+        yield  # pragma: no cover
+
     async def list_objects(self, bucket: str, prefix: str = "") -> List[Dict[str, Any]]:
         """List objects in a bucket/prefix. Returns list of {key, size, etag, last_modified}."""
-        raise NotImplementedError
+        return [obj async for obj in self.iter_objects(bucket, prefix)]
 
     async def download_object(self, bucket: str, key: str) -> bytes:
         """Download a single object from storage."""
@@ -58,46 +81,40 @@ class S3Connector(StorageConnector):
 
     def __init__(self, access_key_id: str, secret_access_key: str, region: str = "us-east-1"):
         import boto3
+        from botocore.config import Config
+
         self.client = boto3.client(
             "s3",
             aws_access_key_id=access_key_id,
             aws_secret_access_key=secret_access_key,
             region_name=region,
+            # Enough pooled connections for kb_sync's parallel downloads
+            config=Config(max_pool_connections=32),
         )
 
-    async def list_objects(self, bucket: str, prefix: str = "") -> List[Dict[str, Any]]:
-        objects = []
-        paginator = self.client.get_paginator("list_objects_v2")
+    async def iter_objects(self, bucket, prefix="", start_after=None):
         params = {"Bucket": bucket}
         if prefix:
             params["Prefix"] = prefix
+        if start_after:
+            params["StartAfter"] = start_after
+        pages = iter(self.client.get_paginator("list_objects_v2").paginate(**params))
 
-        loop = asyncio.get_event_loop()
-        pages = await loop.run_in_executor(None, lambda: list(paginator.paginate(**params)))
-
-        for page in pages:
+        while (page := await _next_page(pages)) is not None:
             for obj in page.get("Contents", []):
-                key = obj["Key"]
-                ext = "." + key.rsplit(".", 1)[-1].lower() if "." in key else ""
-                if ext not in SUPPORTED_EXTENSIONS:
-                    continue
-                if obj["Size"] > MAX_FILE_SIZE:
-                    logger.warning(f"Skipping {key}: too large ({obj['Size']} bytes)")
+                if not _accept(obj["Key"], obj["Size"]):
                     continue
-                objects.append({
-                    "key": key,
+                yield {
+                    "key": obj["Key"],
                     "size": obj["Size"],
                     "etag": obj.get("ETag", "").strip('"'),
                     "last_modified": obj.get("LastModified"),
-                })
-        return objects
+                }
 
     async def download_object(self, bucket: str, key: str) -> bytes:
-        loop = asyncio.get_event_loop()
-        resp = await loop.run_in_executor(
-            None, lambda: self.client.get_object(Bucket=bucket, Key=key)
-        )
-        return resp["Body"].read()
+        def _get() -> bytes:
+            return self.client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        return await asyncio.to_thread(_get)
 
 
 class AzureBlobConnector(StorageConnector):
@@ -112,35 +129,28 @@ class AzureBlobConnector(StorageConnector):
         account_url = f"https://{storage_account}.blob.core.windows.net"
         self.service = BlobServiceClient(account_url=account_url, credential=credential)
 
-    async def list_objects(self, bucket: str, prefix: str = "") -> List[Dict[str, Any]]:
+    async def iter_objects(self, bucket, prefix="", start_after=None):
         container = self.service.get_container_client(bucket)
-        objects = []
-        loop = asyncio.get_event_loop()
+        # No server-side start-after: earlier names are listed and skipped
+        pages = iter(container.list_blobs(name_starts_with=prefix or None).by_page())
 
-        blobs = await loop.run_in_executor(
-            None, lambda: list(container.list_blobs(name_starts_with=prefix or None))
-        )
-        for blob in blobs:
-            ext = "." + blob.name.rsplit(".", 1)[-1].lower() if "." in blob.name else ""
-            if ext not in SUPPORTED_EXTENSIONS:
-                continue
-            if blob.size and blob.size > MAX_FILE_SIZE:
-                continue
-            objects.append({
-                "key": blob.name,
-                "size": blob.size,
-                "etag": blob.etag.strip('"') if blob.etag else "",
-                "last_modified": blob.last_modified,
-            })
-        return objects
+        while (page := await _next_page(pages)) is not None:
+            blobs = await asyncio.to_thread(list, page)
+            for blob in blobs:
+                if start_after and blob.name <= start_after:
+                    continue
+                if not _accept(blob.name, blob.size):
+                    continue
+                yield {
+                    "key": blob.name,
+                    "size": blob.size,
+                    "etag": blob.etag.strip('"') if blob.etag else "",
+                    "last_modified": blob.last_modified,
+                }
 
     async def download_object(self, bucket: str, key: str) -> bytes:
         container = self.service.get_container_client(bucket)
-        loop = asyncio.get_event_loop()
-        blob_data = await loop.run_in_executor(
-            None, lambda: container.download_blob(key).readall()
-        )
-        return blob_data
+        return await asyncio.to_thread(lambda: container.download_blob(key).readall())
 
 
 class GCSConnector(StorageConnector):
@@ -153,32 +163,28 @@ class GCSConnector(StorageConnector):
         credentials = gcp_sa.Credentials.from_service_account_info(service_account_json)
         self.client = gcs_storage.Client(credentials=credentials, project=service_account_json.get("project_id"))
 
-    async def list_objects(self, bucket: str, prefix: str = "") -> List[Dict[str, Any]]:
+    async def iter_objects(self, bucket, prefix="", start_after=None):
         gcs_bucket = self.client.bucket(bucket)
-        loop = asyncio.get_event_loop()
-        blobs = await loop.run_in_executor(
-            None, lambda: list(gcs_bucket.list_blobs(prefix=prefix or None))
-        )
-        objects = []
-        for blob in blobs:
-            ext = "." + blob.name.rsplit(".", 1)[-1].lower() if "." in blob.name else ""
-            if ext not in SUPPORTED_EXTENSIONS:
-                continue
-            if blob.size and blob.size > MAX_FILE_SIZE:
-                continue
-            objects.append({
-                "key": blob.name,
-                "size": blob.size,
-                "etag": blob.etag or "",
-                "last_modified": blob.updated,
-            })
-        return objects
+        # start_offset is inclusive, so the checkpoint key itself is skipped below
+        pages = iter(gcs_bucket.list_blobs(prefix=prefix or None, start_offset=start_after or None).pages)
+
+        while (page := await _next_page(pages)) is not None:
+            blobs = await asyncio.to_thread(list, page)
+            for blob in blobs:
+                if start_after and blob.name <= start_after:
+                    continue
+                if not _accept(blob.name, blob.size):
+                    continue
+                yield {
+                    "key": blob.name,
+                    "size": blob.size,
+                    "etag": blob.etag or "",
+                    "last_modified": blob.updated,
+                }
 
     async def download_object(self, bucket: str, key: str) -> bytes:
-        gcs_bucket = self.client.bucket(bucket)
-        blob = gcs_bucket.blob(key)
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, blob.download_as_bytes)
+        blob = self.client.bucket(bucket).blob(key)
+        return await asyncio.to_thread(blob.download_as_bytes)
 
 
 async def get_connector_for_kb(kb: KnowledgeBase, db: AsyncSession) -> Tuple[StorageConnector, str, str]:
@@ -253,175 +259,10 @@ async def get_connector_for_kb(kb: KnowledgeBase, db: AsyncSession) -> Tuple[Sto
 async def sync_kb_from_storage(kb_id: uuid.UUID) -> Dict[str, Any]:
     """
     Full sync: list objects in the configured bucket, compare with existing docs,
-    download new/changed files, and feed into the ingestion pipeline.
+    ingest new/changed files and drop deleted ones.
 
-    Returns sync summary with counts.
+    Runs through the bounded, resumable pipeline in kb_sync. Returns sync
+    summary with counts.
     """
-    from app.services.kb_ingestion import process_document
-
-    async with get_db_session() as db:
-        result = await db.execute(select(KnowledgeBase).where(KnowledgeBase.id == kb_id))
-        kb = result.scalar_one_or_none()
-        if not kb:
-            raise ValueError(f"Knowledge base {kb_id} not found")
-
-        if kb.source_type == "upload":
-            raise ValueError("Cannot sync upload-based KB from storage")
-
-        logger.info(f"Starting storage sync for KB {kb_id} ({kb.name}, {kb.source_type})")
-
-        # Mark as syncing
-        kb.status = "syncing"
-        await db.commit()
-
-        try:
-            connector, bucket, prefix = await get_connector_for_kb(kb, db)
-
-            # 1. List remote objects
-            remote_objects = await connector.list_objects(bucket, prefix)
-            logger.info(f"Found {len(remote_objects)} files in {kb.source_type}://{bucket}/{prefix}")
-
-            # 2. Get existing documents (by file_path) to detect changes
-            existing_result = await db.execute(
-                select(KBDocument).where(KBDocument.knowledge_base_id == kb_id)
-            )
-            existing_docs = {doc.file_path: doc for doc in existing_result.scalars().all()}
-
-            # 3. Determine new/changed/deleted
-            new_files = []
-            changed_files = []
-            unchanged = 0
-            remote_keys = set()
-
-            for obj in remote_objects:
-                key = obj["key"]
-                remote_keys.add(key)
-                etag = obj.get("etag", "")
-
-                if key not in existing_docs:
-                    new_files.append(obj)
-                elif existing_docs[key].file_hash != etag:
-                    changed_files.append(obj)
-                else:
-                    unchanged += 1
-
-            # Files deleted from storage
-            deleted_keys = set(existing_docs.keys()) - remote_keys
-            deleted_count = 0
-            for key in deleted_keys:
-                doc = existing_docs[key]
-                # Delete chunks first, then document
-                await db.execute(
-                    KBChunk.__table__.delete().where(KBChunk.document_id == doc.id)
-                )
-                await db.execute(
-                    KBDocument.__table__.delete().where(KBDocument.id == doc.id)
-                )
-                kb.document_count = max(0, kb.document_count - 1)
-                kb.chunk_count = max(0, kb.chunk_count - (doc.chunk_count or 0))
-                deleted_count += 1
-            if deleted_count:
-                await db.commit()
-
-            logger.info(
-                f"Sync plan: {len(new_files)} new, {len(changed_files)} changed, "
-                f"{unchanged} unchanged, {deleted_count} deleted"
-            )
-
-            # 4. Process new and changed files
-            processed = 0
-            errors = 0
-
-            for obj_list, is_update in [(new_files, False), (changed_files, True)]:
-                for obj in obj_list:
-                    key = obj["key"]
-                    filename = key.rsplit("/", 1)[-1] if "/" in key else key
-                    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else "txt"
-
-                    try:
-                        # Download file
-                        content = await connector.download_object(bucket, key)
-                        file_hash = obj.get("etag", hashlib.sha256(content).hexdigest())
-
-                        if is_update:
-                            # Delete old chunks for this document
-                            old_doc = existing_docs[key]
-                            await db.execute(
-                                KBChunk.__table__.delete().where(KBChunk.document_id == old_doc.id)
-                            )
-                            kb.chunk_count = max(0, kb.chunk_count - (old_doc.chunk_count or 0))
-                            kb.document_count = max(0, kb.document_count - 1)
-                            # Update document record
-                            old_doc.status = "pending"
-                            old_doc.file_hash = file_hash
-                            old_doc.file_size = len(content)
-                            old_doc.chunk_count = 0
-                            old_doc.error_message = None
-                            old_doc.updated_at = datetime.now(timezone.utc)
-                            await db.commit()
-                            doc_id = old_doc.id
-                        else:
-                            # Create new document record
-                            doc = KBDocument(
-                                knowledge_base_id=kb_id,
-                                org_id=kb.org_id,
-                                file_name=filename,
-                                file_path=key,
-                                file_type=ext,
-                                file_size=len(content),
-                                file_hash=file_hash,
-                                status="pending",
-                            )
-                            db.add(doc)
-                            await db.flush()
-                            await db.refresh(doc)
-                            doc_id = doc.id
-                            await db.commit()
-
-                        # Process through ingestion pipeline (parse → chunk → embed → store)
-                        await process_document(doc_id, content, kb_id)
-                        processed += 1
-                        logger.info(f"Processed {key} ({processed}/{len(new_files) + len(changed_files)})")
-
-                        # Small delay between files to avoid embedding rate limits
-                        await asyncio.sleep(1)
-
-                    except Exception as e:
-                        logger.error(f"Failed to process {key}: {e}")
-                        errors += 1
-                        # Mark doc as error if we created it
-                        try:
-                            if not is_update:
-                                doc_result = await db.execute(
-                                    select(KBDocument).where(KBDocument.id == doc_id)
-                                )
-                                doc_obj = doc_result.scalar_one_or_none()
-                                if doc_obj:
-                                    doc_obj.status = "error"
-                                    doc_obj.error_message = str(e)[:1000]
-                                    await db.commit()
-                        except Exception:
-                            pass
-
-            # 5. Update KB status
-            kb.status = "ready" if errors == 0 else ("error" if processed == 0 else "ready")
-            kb.last_synced_at = datetime.now(timezone.utc)
-            await db.commit()
-
-            summary = {
-                "new": len(new_files),
-                "changed": len(changed_files),
-                "unchanged": unchanged,
-                "deleted": deleted_count,
-                "processed": processed,
-                "errors": errors,
-                "total_remote": len(remote_objects),
-            }
-            logger.info(f"Sync complete for KB {kb_id}: {summary}")
-            return summary
-
-        except Exception as e:
-            logger.error(f"Storage sync failed for KB {kb_id}: {e}")
-            kb.status = "error"
-            await db.commit()
-            raise
+    from app.services.kb_sync import sync_kb
+    return await sync_kb(kb_id)
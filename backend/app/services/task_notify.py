@@ -0,0 +1,125 @@
+"""
+Task completion notifications — push-based wake-ups for delegated work.
+
+collect_results used to re-read every pending task hash once a second until
+they all finished, which added up to a second of latency per wait and kept
+every waiting agent polling Redis. Now whoever finishes a task publishes a
+small message on the channel of the execution that started it, and the
+collector blocks on that channel instead:
+
+  - AgentEngine._execute_background_task publishes after writing the final
+    ``task:{org_id}:{task_id}`` state;
+  - the overflow queue drainer publishes after writing
+    ``agent_queue_result:{ticket_id}``, for tickets enqueued with a channel.
+
+Pub/sub is fire-and-forget, so a message is only a hint: the task hash stays
+the source of truth and the collector re-reads it on every wake-up and once
+more when its wait runs out, so no result is lost.
+
+Redis keys:
+    task_done:{org_id}:{parent_id}  — pub/sub channel; JSON {"task_id", "status"}
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Iterable, Optional
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───
+TASK_POLL_FALLBACK = 1.0  # Seconds between status checks when pub/sub is unavailable
+
+
+def task_channel(org_id, parent_id) -> str:
+    """Completion channel for tasks started by *parent_id* (an execution or orchestrator)."""
+    return f"task_done:{org_id}:{parent_id}"
+
+
+async def publish_task_done(redis: Redis, channel: Optional[str], task_id: str, status: str) -> None:
+    """Announce that *task_id* reached a final *status*. Best-effort."""
+    if not channel:
+        return
+    try:
+        await redis.publish(channel, json.dumps({"task_id": task_id, "status": status}))
+    except Exception as e:
+        logger.warning(f"Task completion publish failed for {task_id}: {e}")
+
+
+class TaskWaiter:
+    """Subscription to one or more completion channels.
+
+    Subscribe before the first status check so a completion published in
+    between is not missed. Without channels, or when the subscription
+    fails, ``wait()`` degrades to sleeping TASK_POLL_FALLBACK.
+
+    Usage:
+        async with TaskWaiter(redis, channels) as waiter:
+            ...check status...
+            task_id = await waiter.wait(timeout)  # None on timeout
+    """
+
+    def __init__(self, redis: Redis, channels: Iterable[str]):
+        self._redis = redis
+        self._channels = sorted(set(c for c in channels if c))
+        self._pubsub = None
+
+    @property
+    def subscribed(self) -> bool:
+        return self._pubsub is not None
+
+    async def __aenter__(self) -> "TaskWaiter":
+        if self._channels:
+            pubsub = None
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(*self._channels)
+                self._pubsub = pubsub
+            except Exception as e:
+                logger.debug(f"Task completion subscribe failed, polling instead: {e}")
+                await self._close(pubsub)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pubsub, self._pubsub = self._pubsub, None
+        await self._close(pubsub)
+
+    async def wait(self, timeout: float) -> Optional[str]:
+        """Block until a completion arrives; returns its task_id, or None on timeout."""
+        if timeout <= 0:
+            return None
+        if self._pubsub is None:
+            await asyncio.sleep(min(timeout, TASK_POLL_FALLBACK))
+            return None
+
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            except Exception as e:
+                logger.debug(f"Task completion wait failed, polling instead: {e}")
+                await self.__aexit__()
+                await asyncio.sleep(min(max(remaining, 0), TASK_POLL_FALLBACK))
+                return None
+            if not message:
+                continue
+            data = message.get("data")
+            if isinstance(data, bytes):
+                data = data.decode()
+            try:
+                return str(json.loads(data)["task_id"])
+            except (ValueError, TypeError, KeyError):
+                logger.debug(f"Ignoring malformed task completion message: {data!r}")
+        return None
+
+    @staticmethod
+    async def _close(pubsub) -> None:
+        if pubsub is None:
+            return
+        try:
+            await pubsub.aclose()
+        except Exception:
+            pass
@@ -22,7 +22,7 @@ Memory savings: 1536-dim float32 (6144 bytes) -> quantized (192-768 bytes)
 Usage:
   codebook = CompressionCodebook.create(dimensions=1536, bits=4)
   compressed = codebook.compress(embeddings)  # List[ndarray] -> List[bytes]
-  scores = codebook.search(query_embedding, compressed_vectors, top_k=10)
+  scores = codebook.similarity(query_embedding, compressed_vectors, top_k=10)
 """
 
 import numpy as np
@@ -35,6 +35,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Rows encoded/scored per matmul; keeps each float32 block cache-resident
+_BATCH_ROWS = 256
+
+# Radius header layout (matches struct.pack('f'))
+_RADIUS_DTYPE = np.dtype('=f4')
+
 
 @dataclass
 class CompressionCodebook:
@@ -103,30 +109,45 @@ class CompressionCodebook:
           3. Quantize direction components to n-bit integers
           4. Store as: [float32 radius] + [packed n-bit values] + [qjl sign bits]
         """
-        if not embeddings:
+        if len(embeddings) == 0:
             return []
 
-        results = []
-        arr = np.array(embeddings, dtype=np.float32)
-
-        for vec in arr:
-            compressed = self._compress_single(vec)
-            results.append(compressed)
+        radii, packed, qjl = self.encode(embeddings)
+        # Pack: [radius float32] + [quantized values] + [qjl sign bits]
+        rows = np.concatenate(
+            [radii.astype(_RADIUS_DTYPE).view(np.uint8).reshape(-1, 4), packed, qjl], axis=1
+        )
+        zero_blob = struct.pack('f', 0.0) + b'\x00' * (self.dimensions * self.bits // 8 + 1)
+        return [zero_blob if radii[i] < 1e-10 else rows[i].tobytes() for i in range(len(rows))]
 
-        return results
+    def encode(self, embeddings: List[List[float]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Encode embeddings into fixed-stride matrices instead of per-vector blobs.
 
-    def _compress_single(self, vec: np.ndarray) -> bytes:
-        """Compress a single vector."""
-        # Step 1: Random rotation (PolarQuant)
-        rotated = self._rotation_matrix @ vec
+        Returns (radii, packed_codes, qjl_bits): float32 (n,), uint8
+        (n, quant_bytes) and uint8 (n, qjl_bytes). Vectors are encoded in
+        blocks of _BATCH_ROWS: one rotation matmul, one QJL matmul and
+        vectorized bit packing per block. Zero vectors encode as all zeros.
+        """
+        arr = np.asarray(embeddings, dtype=np.float32)
+        n = len(arr)
+        radii = np.zeros(n, dtype=np.float32)
+        packed = np.zeros((n, self._quant_bytes()), dtype=np.uint8)
+        qjl = np.zeros((n, self._qjl_bytes()), dtype=np.uint8)
+        for start in range(0, n, _BATCH_ROWS):
+            end = min(start + _BATCH_ROWS, n)
+            self._encode_block(arr[start:end], radii[start:end], packed[start:end], qjl[start:end])
+        return radii, packed, qjl
+
+    def _encode_block(self, block: np.ndarray, radii: np.ndarray, packed: np.ndarray, qjl: np.ndarray):
+        """Encode a (n, dimensions) float32 block into the given output rows."""
+        # Step 1: Random rotation (PolarQuant), row-wise R @ v
+        rotated = block @ self._rotation_matrix.T
 
         # Step 2: Separate radius and direction (polar decomposition)
-        radius = np.linalg.norm(rotated)
-        if radius < 1e-10:
-            # Zero vector edge case
-            return struct.pack('f', 0.0) + b'\x00' * (self.dimensions * self.bits // 8 + 1)
-
-        direction = rotated / radius
+        block_radii = np.linalg.norm(rotated, axis=1).astype(np.float32)
+        is_zero = block_radii < 1e-10
+        direction = rotated / np.where(is_zero, np.float32(1.0), block_radii)[:, None]
 
         # Step 3: Quantize direction to n-bit integers
         # After rotation, components are approximately uniform on [-1, 1]
@@ -135,171 +156,196 @@ class CompressionCodebook:
         quantized = np.clip(
             np.round((direction + 1.0) * 0.5 * levels),
             0, levels
-        ).astype(np.uint8 if self.bits <= 8 else np.uint16)
+        ).astype(np.uint8)
+
+        radii[:] = np.where(is_zero, np.float32(0.0), block_radii)
+        packed[:] = _pack_codes(quantized, self.bits)
 
         # Step 4: QJL sign-bit correction on residual
-        qjl_bits = b''
-        if self.use_qjl and self._qjl_matrix is not None:
-            # Reconstruct approximate direction from quantized values
-            approx_direction = (quantized.astype(np.float32) / levels) * 2.0 - 1.0
-            residual = direction - approx_direction
+        if qjl.shape[1] and self._qjl_matrix is not None:
+            residual = direction - self._dequantize_table()[quantized]
+            projected = residual @ self._qjl_matrix.T
+            qjl[:] = np.packbits(projected >= 0, axis=1)
+        packed[is_zero] = 0
+        qjl[is_zero] = 0
 
-            # Project residual through QJL matrix, keep sign bits
-            projected = self._qjl_matrix @ residual
-            signs = (projected >= 0).astype(np.uint8)
+    def decompress(self, compressed: List[bytes]) -> List[List[float]]:
+        """Decompress quantized vectors back to approximate float32."""
+        if not compressed:
+            return []
 
-            # Pack sign bits into bytes
-            qjl_bits = np.packbits(signs).tobytes()
+        radii, codes = self.unpack(compressed)
+        # Inverse rotation, row-wise R.T @ d
+        # (QJL bits primarily help similarity, not reconstruction, so they are not applied here)
+        vecs = radii[:, None] * (self._dequantize_table()[codes] @ self._rotation_matrix)
+        vecs[np.abs(radii) < 1e-10] = 0.0
+        return vecs.astype(np.float32).tolist()
 
-        # Pack: [radius float32] + [quantized values] + [qjl sign bits]
-        header = struct.pack('f', radius)
-
-        if self.bits == 4:
-            # Pack two 4-bit values per byte
-            packed = bytearray()
-            for i in range(0, len(quantized), 2):
-                high = quantized[i] & 0x0F
-                low = (quantized[i + 1] & 0x0F) if i + 1 < len(quantized) else 0
-                packed.append((high << 4) | low)
-            quant_bytes = bytes(packed)
-        elif self.bits == 3:
-            # Pack 3-bit values: 8 values per 3 bytes
-            quant_bytes = _pack_3bit(quantized)
-        elif self.bits == 8:
-            quant_bytes = quantized.tobytes()
-        elif self.bits == 2:
-            # Pack 4 values per byte
-            packed = bytearray()
-            for i in range(0, len(quantized), 4):
-                byte = 0
-                for j in range(4):
-                    if i + j < len(quantized):
-                        byte |= (quantized[i + j] & 0x03) << (6 - 2 * j)
-                packed.append(byte)
-            quant_bytes = bytes(packed)
-        else:
-            quant_bytes = quantized.tobytes()
+    def unpack(self, compressed: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Split compressed vectors into a radius array and a contiguous code matrix.
 
-        return header + quant_bytes + qjl_bits
+        Returns (radii, codes) where radii is float32 of shape (n,) and codes
+        is uint8 of shape (n, dimensions). Blobs shorter than the full record
+        (zero vectors) are zero-padded, so they decode with radius 0.
+        """
+        quant_bytes = self._quant_bytes()
+        record = 4 + quant_bytes + self._qjl_bytes()
+        if any(len(data) != record for data in compressed):
+            compressed = [data[:record].ljust(record, b'\x00') for data in compressed]
 
-    def decompress(self, compressed: List[bytes]) -> List[List[float]]:
-        """Decompress quantized vectors back to approximate float32."""
-        results = []
-        for data in compressed:
-            vec = self._decompress_single(data)
-            results.append(vec.tolist())
-        return results
-
-    def _decompress_single(self, data: bytes) -> np.ndarray:
-        """Decompress a single vector."""
-        # Extract radius
-        radius = struct.unpack('f', data[:4])[0]
-        if abs(radius) < 1e-10:
-            return np.zeros(self.dimensions, dtype=np.float32)
-
-        # Extract quantized values
-        quant_data = data[4:]
-        levels = (1 << self.bits) - 1
+        buf = np.frombuffer(b''.join(compressed), dtype=np.uint8).reshape(len(compressed), record)
+        radii = buf[:, :4].copy().view(_RADIUS_DTYPE).reshape(-1).astype(np.float32)
+        codes = _unpack_codes(buf[:, 4:4 + quant_bytes], self.bits, self.dimensions)
+        return radii, codes
+
+    def score_codes(self, query: List[float], radii: np.ndarray, codes: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Cosine scores of a query against an unpacked (radii, codes) matrix.
+
+        Scores blocks of _BATCH_ROWS rows with a single matmul each.
+        Returns None when the query is a zero vector.
+        """
+        query_direction = self._query_direction(query)
+        if query_direction is None:
+            return None
 
-        if self.bits == 4:
-            n_quant_bytes = (self.dimensions + 1) // 2
-            packed = quant_data[:n_quant_bytes]
-            quantized = np.zeros(self.dimensions, dtype=np.float32)
-            for i, byte in enumerate(packed):
-                idx = i * 2
-                if idx < self.dimensions:
-                    quantized[idx] = (byte >> 4) & 0x0F
-                if idx + 1 < self.dimensions:
-                    quantized[idx + 1] = byte & 0x0F
-        elif self.bits == 3:
-            n_quant_bytes = (self.dimensions * 3 + 7) // 8
-            quantized = _unpack_3bit(quant_data[:n_quant_bytes], self.dimensions)
-        elif self.bits == 8:
-            quantized = np.frombuffer(quant_data[:self.dimensions], dtype=np.uint8).astype(np.float32)
-        elif self.bits == 2:
-            n_quant_bytes = (self.dimensions + 3) // 4
-            packed = quant_data[:n_quant_bytes]
-            quantized = np.zeros(self.dimensions, dtype=np.float32)
-            for i, byte in enumerate(packed):
-                for j in range(4):
-                    idx = i * 4 + j
-                    if idx < self.dimensions:
-                        quantized[idx] = (byte >> (6 - 2 * j)) & 0x03
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _BATCH_ROWS):
+            scores[start:start + _BATCH_ROWS] = self._score_block(query_direction, codes[start:start + _BATCH_ROWS])
+
+        # Cosine similarity = dot(q_dir, v_dir) (radii cancel in cosine)
+        scores[np.abs(radii) < 1e-10] = 0.0
+        return scores
+
+    def score_packed(self, query: List[float], radii: np.ndarray, packed: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Like score_codes, but over packed code rows as returned by encode().
+
+        2/4-bit rows are scored straight from the packed bytes, one bit-plane
+        matmul per value position in the byte; other widths are unpacked one
+        block at a time. Either way a memory-mapped code array is scanned in
+        place without materializing the whole unpacked matrix.
+        """
+        query_direction = self._query_direction(query)
+        if query_direction is None:
+            return None
+
+        scores = np.zeros(len(packed), dtype=np.float32)
+        if self.bits in (2, 4):
+            group = 8 // self.bits
+            mask = np.uint8((1 << self.bits) - 1)
+            padded = np.zeros(packed.shape[1] * group, dtype=np.float32)
+            padded[:self.dimensions] = query_direction
+            # Value j of every byte pairs with query components j, j + group, ...
+            planes = [(shift, padded[j::group]) for j, shift in enumerate(_group_shifts(self.bits))]
+            for start in range(0, len(packed), _BATCH_ROWS):
+                block = packed[start:start + _BATCH_ROWS]
+                dot = np.zeros(len(block), dtype=np.float32)
+                code_sum = np.zeros(len(block), dtype=np.float32)
+                code_sq_sum = np.zeros(len(block), dtype=np.float32)
+                for shift, plane_query in planes:
+                    plane = ((block >> shift) & mask).astype(np.float32)
+                    dot += plane @ plane_query
+                    if self.bits != 4:
+                        code_sum += plane.sum(axis=1)
+                        code_sq_sum += np.einsum('ij,ij->i', plane, plane)
+                scores[start:start + _BATCH_ROWS] = self._combine_scores(
+                    query_direction, dot, code_sum, code_sq_sum
+                )
         else:
-            quantized = np.frombuffer(quant_data[:self.dimensions], dtype=np.uint8).astype(np.float32)
+            for start in range(0, len(packed), _BATCH_ROWS):
+                codes = _unpack_codes(packed[start:start + _BATCH_ROWS], self.bits, self.dimensions)
+                scores[start:start + _BATCH_ROWS] = self._score_block(query_direction, codes)
 
-        # Reconstruct direction
-        direction = (quantized / levels) * 2.0 - 1.0
+        scores[np.abs(radii) < 1e-10] = 0.0
+        return scores
 
-        # Apply QJL correction if present
-        if self.use_qjl and self._qjl_matrix is not None:
-            qjl_start = 4 + len(quant_data) - len(quant_data)  # Need to calculate properly
-            # For now, skip QJL decompression (it primarily helps similarity, not reconstruction)
+    def _query_direction(self, query: List[float]) -> Optional[np.ndarray]:
+        """Rotate the query once and normalize it; None for a zero query."""
+        rotated_query = self._rotation_matrix @ np.asarray(query, dtype=np.float32)
+        query_radius = np.linalg.norm(rotated_query)
+        if query_radius < 1e-10:
+            return None
+        return rotated_query / query_radius
+
+    def _score_block(self, query_direction: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Score one block of unpacked codes against a rotated query direction."""
+        block_codes = codes.astype(np.float32)
+        dot = block_codes @ query_direction
+        if self.bits in (4, 8):
+            return self._combine_scores(query_direction, dot, None, None)
+        return self._combine_scores(
+            query_direction,
+            dot,
+            block_codes.sum(axis=1),
+            np.einsum('ij,ij->i', block_codes, block_codes),
+        )
 
-        # Inverse rotation
-        vec = radius * (self._rotation_matrix.T @ direction)
-        return vec.astype(np.float32)
+    def _combine_scores(
+        self,
+        query_direction: np.ndarray,
+        dot: np.ndarray,
+        code_sum: Optional[np.ndarray],
+        code_sq_sum: Optional[np.ndarray],
+    ) -> np.ndarray:
+        """
+        Turn raw code statistics into cosine scores.
+
+        The dequantization grid is affine in the code, level(c) = c * step - 1,
+        so dot(q, level(codes)) = step * (codes @ q) - sum(q): scoring needs a
+        matmul on the raw codes, never a per-element lookup.
+        """
+        levels = (1 << self.bits) - 1
+        step = np.float32(2.0 / levels)
+        block = step * dot - query_direction.sum(dtype=np.float32)
+
+        # 4/8-bit scores compare against the dequantized grid directly; the
+        # other widths historically went through a full decode + renormalize,
+        # which is the grid direction scaled to unit length.
+        if self.bits not in (4, 8):
+            # ||level(c)||^2 = step^2 * sum(c^2) - 2 * step * sum(c) + dims
+            sq_norms = step * step * code_sq_sum - 2.0 * step * code_sum + self.dimensions
+            norms = np.sqrt(np.maximum(sq_norms, 0.0))
+            block = np.where(norms < 1e-10, 0.0, block / np.where(norms < 1e-10, 1.0, norms))
+        return block
 
     def similarity(self, query: List[float], compressed_vectors: List[bytes], top_k: int = 10) -> List[Tuple[int, float]]:
         """
         Compute cosine similarity between a query and compressed vectors.
         Returns list of (index, score) tuples, sorted by score descending.
 
-        Compresses the query using the same codebook, then computes
-        approximate dot product in compressed space.
+        Rotates the query into the codebook's space, then scores it against
+        the dequantized directions of every compressed vector.
         """
-        query_arr = np.array(query, dtype=np.float32)
+        if not compressed_vectors:
+            return []
 
-        # Rotate query once
-        rotated_query = self._rotation_matrix @ query_arr
-        query_radius = np.linalg.norm(rotated_query)
-        if query_radius < 1e-10:
+        radii, codes = self.unpack(compressed_vectors)
+        scores = self.score_codes(query, radii, codes)
+        if scores is None:
             return [(i, 0.0) for i in range(min(top_k, len(compressed_vectors)))]
-        query_direction = rotated_query / query_radius
-
-        scores = []
+        return top_k_scores(scores, top_k)
+
+    def _quant_bytes(self) -> int:
+        """Size of the packed quantized-values section of a record."""
+        if self.bits == 3:
+            # 8 values per 3 bytes, last group zero-padded
+            return (self.dimensions + 7) // 8 * 3
+        if self.bits in (2, 4):
+            return (self.dimensions * self.bits + 7) // 8
+        return self.dimensions
+
+    def _qjl_bytes(self) -> int:
+        """Size of the QJL sign-bit section of a record."""
+        if not self.use_qjl:
+            return 0
+        return (self.dimensions // 4 + 7) // 8
+
+    def _dequantize_table(self) -> np.ndarray:
+        """Lookup table mapping each quantization level to its direction value."""
         levels = (1 << self.bits) - 1
-
-        for idx, data in enumerate(compressed_vectors):
-            # Extract radius
-            radius = struct.unpack('f', data[:4])[0]
-            if abs(radius) < 1e-10:
-                scores.append((idx, 0.0))
-                continue
-
-            # Extract and dequantize direction
-            quant_data = data[4:]
-            if self.bits == 4:
-                n_bytes = (self.dimensions + 1) // 2
-                packed = quant_data[:n_bytes]
-                direction = np.zeros(self.dimensions, dtype=np.float32)
-                for i, byte in enumerate(packed):
-                    bidx = i * 2
-                    if bidx < self.dimensions:
-                        direction[bidx] = ((byte >> 4) & 0x0F) / levels * 2.0 - 1.0
-                    if bidx + 1 < self.dimensions:
-                        direction[bidx + 1] = (byte & 0x0F) / levels * 2.0 - 1.0
-            elif self.bits == 8:
-                direction = np.frombuffer(quant_data[:self.dimensions], dtype=np.uint8).astype(np.float32)
-                direction = direction / levels * 2.0 - 1.0
-            else:
-                # Fallback: decompress fully
-                vec = self._decompress_single(data)
-                r = np.linalg.norm(vec)
-                if r < 1e-10:
-                    scores.append((idx, 0.0))
-                    continue
-                direction = vec / r
-                # Need to rotate into compressed space for comparison
-                direction = self._rotation_matrix @ direction
-
-            # Cosine similarity = dot(q_dir, v_dir) (radii cancel in cosine)
-            score = float(np.dot(query_direction, direction))
-            scores.append((idx, score))
-
-        # Sort by score descending
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return scores[:top_k]
+        return (np.arange(levels + 1, dtype=np.float32) / levels) * 2.0 - 1.0
 
     def to_dict(self) -> dict:
         """Serialize codebook config (not the matrices -- those are regenerated from seed)."""
@@ -344,38 +390,65 @@ def _block_diagonal(blocks: list, total_dims: int) -> np.ndarray:
     return result
 
 
-def _pack_3bit(values: np.ndarray) -> bytes:
-    """Pack array of 3-bit values into bytes (8 values per 3 bytes)."""
-    result = bytearray()
-    for i in range(0, len(values), 8):
-        chunk = values[i:i + 8]
-        # Pad to 8 if needed
-        if len(chunk) < 8:
-            chunk = np.pad(chunk, (0, 8 - len(chunk)))
-        # Pack 8 x 3-bit values into 3 bytes (24 bits)
-        bits = 0
-        for j, v in enumerate(chunk):
-            bits |= (int(v) & 0x07) << (21 - 3 * j)
-        result.append((bits >> 16) & 0xFF)
-        result.append((bits >> 8) & 0xFF)
-        result.append(bits & 0xFF)
-    return bytes(result)
-
-
-def _unpack_3bit(data: bytes, count: int) -> np.ndarray:
-    """Unpack 3-bit packed bytes back to array."""
-    result = np.zeros(count, dtype=np.float32)
-    idx = 0
-    for i in range(0, len(data), 3):
-        if i + 2 >= len(data):
-            break
-        bits = (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
-        for j in range(8):
-            if idx >= count:
-                break
-            result[idx] = (bits >> (21 - 3 * j)) & 0x07
-            idx += 1
-    return result
+def _pack_codes(codes: np.ndarray, bits: int) -> np.ndarray:
+    """
+    Pack a (n, dims) uint8 code matrix into (n, packed_bytes) rows.
+
+    2/4-bit codes are packed MSB-first, 8 // bits values per byte. 3-bit
+    codes are packed 8 values per 3 bytes (24 bits, MSB-first). Both pad the
+    last group with zeros. Other widths use one byte per value.
+    """
+    if bits not in (2, 3, 4):
+        return codes
+    group = 8 if bits == 3 else 8 // bits
+    if codes.shape[1] % group:
+        codes = np.pad(codes, ((0, 0), (0, group - codes.shape[1] % group)))
+    shifts = _group_shifts(bits)
+    if bits == 3:
+        grouped = codes.reshape(len(codes), -1, 8).astype(np.uint32) << shifts
+        word = np.bitwise_or.reduce(grouped, axis=2)
+        packed = np.stack([(word >> 16) & 0xFF, (word >> 8) & 0xFF, word & 0xFF], axis=2)
+        return packed.astype(np.uint8).reshape(len(codes), -1)
+    grouped = codes.reshape(len(codes), -1, group) << shifts
+    return np.bitwise_or.reduce(grouped, axis=2).astype(np.uint8)
+
+
+def _unpack_codes(packed: np.ndarray, bits: int, count: int) -> np.ndarray:
+    """Unpack (n, packed_bytes) rows from _pack_codes back to a (n, count) uint8 matrix."""
+    if bits not in (2, 3, 4):
+        return np.ascontiguousarray(packed[:, :count])
+    mask = (1 << bits) - 1
+    if bits == 3:
+        triples = packed.reshape(len(packed), -1, 3).astype(np.uint32)
+        word = (triples[:, :, 0] << 16) | (triples[:, :, 1] << 8) | triples[:, :, 2]
+        codes = (word[:, :, None] >> _group_shifts(bits)) & mask
+        return np.ascontiguousarray(codes.reshape(len(packed), -1)[:, :count].astype(np.uint8))
+    # Byte -> codes lookup: one gather instead of per-shift arithmetic
+    table = ((np.arange(256, dtype=np.uint8)[:, None] >> _group_shifts(bits)) & mask).astype(np.uint8)
+    return np.ascontiguousarray(table[packed].reshape(len(packed), -1)[:, :count])
+
+
+def _group_shifts(bits: int) -> np.ndarray:
+    """Left-shift of each value within a packed group, first value in the high bits."""
+    group = 8 if bits == 3 else 8 // bits
+    dtype = np.uint32 if bits == 3 else np.uint8
+    return (np.arange(group - 1, -1, -1) * bits).astype(dtype)
+
+
+def top_k_scores(scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+    """Return the top_k (index, score) pairs, score descending, ties by index."""
+    n = len(scores)
+    if top_k <= 0 or n == 0:
+        return []
+    if top_k < n:
+        # argpartition picks arbitrarily among scores tied with the k-th best,
+        # so take every row that reaches it and let the sort keep the lowest indices
+        kth = scores[np.argpartition(-scores, top_k - 1)[top_k - 1]]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(n)
+    order = candidates[np.lexsort((candidates, -scores[candidates]))][:top_k]
+    return [(int(i), float(scores[i])) for i in order]
 
 
 # ─── Benchmark / Test ───
@@ -0,0 +1,126 @@
+"""DB round trips per agent turn — buffered AgentMessageWriter vs per-message persistence.
+
+Persists one turn (an assistant message with N tool calls plus the N tool
+results) and counts the statements sent to the database with a
+``before_cursor_execute`` listener:
+
+  - writer : app.services.agent_message_writer.AgentMessageWriter — one
+             sequence reservation + one multi-row INSERT per turn
+  - legacy : the previous AgentEngine._persist_message, kept here for
+             comparison — SELECT max(sequence) + flush per message
+
+Runs against an in-memory SQLite database, so the timings only show the
+relative cost; on PostgreSQL each statement is also a network round trip.
+
+Usage
+-----
+  python -m scripts.agent_message_benchmark              # N = 1, 4, 16
+  python -m scripts.agent_message_benchmark 1 8 32 64
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import app.models  # noqa: F401 — resolve every foreign key target
+from app.core.database import Base
+from app.models.agent_message import AgentMessage
+from app.models.agent_session import AgentSession
+from app.services.agent_message_writer import AgentMessageWriter
+
+
+# ─── Previous implementation (for comparison) ───
+
+async def _legacy_persist(db: AsyncSession, session: AgentSession, role: str, **fields) -> AgentMessage:
+    result = await db.execute(
+        select(func.coalesce(func.max(AgentMessage.sequence), 0) + 1)
+        .where(AgentMessage.session_id == session.id)
+    )
+    message = AgentMessage(
+        session_id=session.id, org_id=session.org_id, role=role, sequence=result.scalar(), **fields,
+    )
+    db.add(message)
+    session.message_count += 1
+    session.last_message_at = datetime.now(timezone.utc)
+    await db.flush()
+    return message
+
+
+async def _legacy_turn(db: AsyncSession, session: AgentSession, tool_results: int) -> None:
+    await _legacy_persist(db, session, "assistant", tool_calls=[{"id": f"c{i}"} for i in range(tool_results)])
+    for i in range(tool_results):
+        await _legacy_persist(db, session, "tool", content=f"result {i}", tool_call_id=f"c{i}")
+
+
+async def _writer_turn(db: AsyncSession, session: AgentSession, tool_results: int) -> None:
+    writer = AgentMessageWriter(db, session)
+    writer.add("assistant", tool_calls=[{"id": f"c{i}"} for i in range(tool_results)])
+    for i in range(tool_results):
+        writer.add("tool", content=f"result {i}", tool_call_id=f"c{i}")
+    await writer.flush()
+
+
+# ─── Driver ───
+
+async def _measure(factory, engine, turn, tool_results: int, turns: int = 20):
+    async with factory() as db:
+        session = AgentSession(
+            agent_id=uuid.uuid4(), org_id=uuid.uuid4(), session_key=f"bench:{uuid.uuid4()}",
+            status="active", message_count=0, total_tokens=0, total_cost=Decimal(0), next_sequence=1,
+        )
+        db.add(session)
+        await db.commit()
+
+        statements: List[str] = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(engine.sync_engine, "before_cursor_execute", listener)
+        t0 = time.perf_counter()
+        try:
+            for _ in range(turns):
+                await turn(db, session, tool_results)
+            await db.commit()
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", listener)
+        elapsed = time.perf_counter() - t0
+
+    data_statements = [s for s in statements if s.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE"))]
+    return len(data_statements) / turns, elapsed / turns
+
+
+async def run_benchmark(sizes: List[int]):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all, tables=[AgentSession.__table__, AgentMessage.__table__],
+        )
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    print(f"\n{'=' * 72}")
+    print("  AGENT MESSAGE PERSISTENCE: statements per turn (assistant + N tool results)")
+    print(f"{'=' * 72}\n")
+    print(f"  {'N':>4} {'legacy stmts':>13} {'writer stmts':>13} {'legacy ms':>10} {'writer ms':>10}")
+
+    results = []
+    for n in sizes:
+        legacy_stmts, legacy_s = await _measure(factory, engine, _legacy_turn, n)
+        writer_stmts, writer_s = await _measure(factory, engine, _writer_turn, n)
+        results.append({"n": n, "legacy": legacy_stmts, "writer": writer_stmts})
+        print(f"  {n:>4} {legacy_stmts:>13.1f} {writer_stmts:>13.1f} {legacy_s * 1000:>10.2f} {writer_s * 1000:>10.2f}")
+    print()
+
+    await engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", nargs="*", type=int, default=[1, 4, 16], help="tool results per turn")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.sizes))
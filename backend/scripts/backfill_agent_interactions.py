@@ -0,0 +1,121 @@
+"""Backfill the agent interaction ledger from agent_messages.
+
+Background
+----------
+Project breadcrumbs read agent -> agent edges from agent_interactions /
+agent_interaction_messages (migration 054), which AgentEngine writes as
+calls run. Calls made before that migration only exist as tool_calls JSON
+on agent_messages; this script replays them into the ledger.
+
+It reads the same rows breadcrumbs used to parse:
+  - assistant messages with tool_calls naming invoke_agent / delegate_task
+  - tool messages written by external orchestration (tool_name set and
+    tool_calls carrying the target)
+
+Rows are read in keyset pages on agent_messages.id, one transaction per
+page. Recording is idempotent per (message, tool call), so the script can
+be re-run or run while the engine is live. Targets that no longer exist
+(agent deleted) are skipped.
+
+Usage
+-----
+  python -m scripts.backfill_agent_interactions
+  python -m scripts.backfill_agent_interactions --project-id <uuid>
+  python -m scripts.backfill_agent_interactions --page-size 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import uuid
+from typing import Optional
+
+from sqlalchemy import and_, or_, select
+
+from app.core.database import get_db_session
+from app.models.agent import Agent
+from app.models.agent_message import AgentMessage
+from app.models.agent_session import AgentSession
+from app.services.agent_interactions import INTERACTION_KINDS, interaction_calls, record_interaction
+
+
+async def backfill(project_id: Optional[uuid.UUID] = None, page_size: int = 2000) -> dict:
+    stats = {"messages": 0, "recorded": 0, "already_recorded": 0, "skipped": 0}
+    after: Optional[uuid.UUID] = None
+
+    while True:
+        stmt = (
+            select(
+                AgentMessage.id, AgentMessage.role, AgentMessage.tool_name, AgentMessage.tool_calls,
+                AgentMessage.cost, AgentMessage.latency_ms, AgentMessage.created_at,
+                Agent.id.label("agent_id"), Agent.org_id, Agent.project_id,
+            )
+            .join(AgentSession, AgentMessage.session_id == AgentSession.id)
+            .join(Agent, AgentSession.agent_id == Agent.id)
+            .where(
+                AgentMessage.tool_calls.isnot(None),
+                or_(
+                    AgentMessage.role == "assistant",
+                    and_(AgentMessage.role == "tool", AgentMessage.tool_name.in_(INTERACTION_KINDS)),
+                ),
+            )
+            .order_by(AgentMessage.id)
+            .limit(page_size)
+        )
+        if after is not None:
+            stmt = stmt.where(AgentMessage.id > after)
+        if project_id is not None:
+            stmt = stmt.where(Agent.project_id == project_id)
+
+        async with get_db_session() as db:
+            rows = (await db.execute(stmt)).all()
+            if not rows:
+                break
+            targets = {
+                target
+                for row in rows
+                for _, _, target in interaction_calls(row.tool_calls, row.tool_name if row.role == "tool" else None)
+            }
+            known = set((await db.execute(select(Agent.id).where(Agent.id.in_(targets)))).scalars()) if targets else set()
+
+            for row in rows:
+                stats["messages"] += 1
+                kind = row.tool_name if row.role == "tool" else None
+                for tool_call_id, call_kind, target in interaction_calls(row.tool_calls, kind):
+                    if target not in known:
+                        stats["skipped"] += 1
+                        continue
+                    added = await record_interaction(
+                        db,
+                        org_id=row.org_id,
+                        project_id=row.project_id,
+                        source_agent_id=row.agent_id,
+                        target_agent_id=target,
+                        kind=call_kind,
+                        message_id=row.id,
+                        tool_call_id=tool_call_id,
+                        at=row.created_at,
+                    )
+                    stats["recorded" if added else "already_recorded"] += 1
+        after = rows[-1].id
+        print(f"  ... {stats['messages']} messages scanned, {stats['recorded']} calls recorded")
+
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--project-id", type=uuid.UUID, default=None)
+    parser.add_argument("--page-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    stats = asyncio.run(backfill(args.project_id, args.page_size))
+    print(
+        f"Done: {stats['messages']} messages, {stats['recorded']} calls recorded, "
+        f"{stats['already_recorded']} already present, {stats['skipped']} with a missing target"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""TextChunker throughput benchmark — offset-based chunker vs the previous recursive one.
+
+Chunks synthetic text of 1 MB, 10 MB and 100 MB with the KB defaults
+(chunk_size=512, overlap=50). The text mixes normal paragraphs with
+long unbroken paragraphs, which is where the previous implementation's
+per-split string concatenation went quadratic.
+
+  - current : app.services.kb_ingestion.TextChunker (single pass per
+              separator level, running lengths, lazy chunks)
+  - legacy  : the previous split_text_recursive + add_overlap, kept here
+              for comparison; only run up to --legacy-max-mb because it
+              gets very slow on large inputs
+
+Usage
+-----
+  python -m scripts.chunker_benchmark                  # 1, 10, 100 MB
+  python -m scripts.chunker_benchmark 1 10             # chosen sizes (MB)
+  python -m scripts.chunker_benchmark --legacy-max-mb 1
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+from app.services.kb_ingestion import TextChunker
+
+CHUNK_SIZE = 512
+OVERLAP = 50
+WORDS = (
+    "the model gateway routes each request to a provider based on cost latency and policy "
+    "knowledge base chunks are embedded once and reused across documents in the same org"
+).split()
+
+
+def make_text(size_bytes: int, seed: int = 7) -> str:
+    """Paragraphs of 20-200 words, with one in ten a run-on paragraph of ~20k words."""
+    rng = random.Random(seed)
+    parts: List[str] = []
+    total = 0
+    while total < size_bytes:
+        words = rng.randint(20, 200) if rng.random() > 0.1 else 20_000
+        sentence_every = rng.randint(8, 25)
+        paragraph = " ".join(
+            rng.choice(WORDS) + ("." if i % sentence_every == sentence_every - 1 else "")
+            for i in range(words)
+        )
+        parts.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(parts)[:size_bytes]
+
+
+# ─── Previous implementation (for comparison) ───
+
+class _LegacyChunker:
+    def __init__(self, chunk_size: int, overlap: int):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+    def estimate_tokens(self, text: str) -> int:
+        return len(text) // 4
+
+    def split_text_recursive(self, text: str, separators: List[str] = None) -> List[str]:
+        if separators is None:
+            separators = ["\n\n", "\n", ". ", "! ", "? ", " ", ""]
+        if not text.strip():
+            return []
+        if self.estimate_tokens(text) <= self.chunk_size:
+            return [text.strip()]
+        if not separators:
+            return [
+                text[i:i + self.chunk_size * 4].strip()
+                for i in range(0, len(text), self.chunk_size * 4)
+                if text[i:i + self.chunk_size * 4].strip()
+            ]
+        separator, remaining = separators[0], separators[1:]
+        chunks, current = [], ""
+        for split in text.split(separator):
+            if not split.strip():
+                continue
+            potential = current + (separator if current else "") + split
+            if self.estimate_tokens(potential) <= self.chunk_size:
+                current = potential
+            else:
+                if current:
+                    chunks.append(current.strip())
+                if self.estimate_tokens(split) > self.chunk_size:
+                    chunks.extend(self.split_text_recursive(split, remaining))
+                    current = ""
+                else:
+                    current = split.strip()
+        if current:
+            chunks.append(current.strip())
+        return chunks
+
+    def chunk_text(self, text: str) -> List[str]:
+        chunks = self.split_text_recursive(text)
+        if len(chunks) <= 1 or self.overlap <= 0:
+            return chunks
+        out = [chunks[0]]
+        for prev, chunk in zip(chunks, chunks[1:]):
+            words = prev.split()
+            out.append((" ".join(words[-self.overlap:]) if len(words) >= self.overlap else prev) + " " + chunk)
+        return out
+
+
+# ─── Driver ───
+
+def _time(chunker, text: str):
+    t0 = time.perf_counter()
+    count = 0
+    for _ in chunker.chunk_text(text):
+        count += 1
+    return time.perf_counter() - t0, count
+
+
+def run_benchmark(sizes_mb: List[int], legacy_max_mb: int = 10):
+    print(f"\n{'=' * 72}")
+    print(f"  TEXT CHUNKER: chunk_size={CHUNK_SIZE}, overlap={OVERLAP}")
+    print(f"{'=' * 72}\n")
+    print(f"  {'Input':>8} {'chunks':>9} {'current':>10} {'MB/s':>8} {'legacy':>10} {'speedup':>8}")
+
+    results = []
+    for mb in sizes_mb:
+        text = make_text(mb * 1024 * 1024)
+        current_s, count = _time(TextChunker(CHUNK_SIZE, OVERLAP), text)
+        row = {"mb": mb, "chunks": count, "current_s": current_s, "legacy_s": None}
+        legacy = "skipped"
+        speedup = ""
+        if mb <= legacy_max_mb:
+            legacy_s, legacy_count = _time(_LegacyChunker(CHUNK_SIZE, OVERLAP), text)
+            assert legacy_count == count, "chunkers disagree"
+            row["legacy_s"] = legacy_s
+            legacy = f"{legacy_s:>9.2f}s"
+            speedup = f"{legacy_s / current_s:>7.1f}x"
+        results.append(row)
+        print(f"  {mb:>6}MB {count:>9} {current_s:>9.2f}s {mb / current_s:>8.1f} {legacy:>10} {speedup:>8}")
+    print()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", nargs="*", type=int, default=[1, 10, 100], help="input sizes in MB")
+    parser.add_argument("--legacy-max-mb", type=int, default=10, help="largest input to run the legacy chunker on")
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.legacy_max_mb)
@@ -0,0 +1,97 @@
+"""MCP setup overhead per agent execution — per-execution connections vs the pool.
+
+Runs the MCP part of ``AgentEngine.execute`` (connect_servers, one tool
+call, disconnect_all) repeatedly against local stdio echo servers
+(tests/mcp_echo_server.py):
+
+  - cold : MCPClientManager() with no pool — every execution spawns each
+           server and runs initialize and tools/list (servers in parallel;
+           before the pool they also connected one at a time)
+  - warm : MCPClientManager(pool=...) — the first execution connects, later
+           ones lease the open connections and reuse the cached tool catalog
+
+Usage
+-----
+  python -m scripts.mcp_pool_benchmark                       # 3 servers, 20 executions
+  python -m scripts.mcp_pool_benchmark --servers 5 --runs 50
+  python -m scripts.mcp_pool_benchmark --startup-delay 0.5   # slow-starting servers (e.g. npx)
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import List, Optional
+
+from app.services.mcp_client import MCPClientManager, MCPConnectionPool
+
+ECHO_SERVER = os.path.join(os.path.dirname(__file__), "..", "tests", "mcp_echo_server.py")
+
+
+def make_servers(count: int, startup_delay: float) -> List[dict]:
+    return [
+        {
+            "id": f"echo-{i}",
+            "name": f"echo{i}",
+            "transport_type": "stdio",
+            # A distinct arg per server so each gets its own pool slot
+            "endpoint_config": {
+                "command": sys.executable,
+                "args": [ECHO_SERVER, "--startup-delay", str(startup_delay), f"--instance={i}"],
+            },
+            "auth_config": {"type": "none"},
+        }
+        for i in range(count)
+    ]
+
+
+async def _execute(servers: List[dict], pool: Optional[MCPConnectionPool]) -> float:
+    t0 = time.perf_counter()
+    manager = MCPClientManager(pool=pool, org_id="bench-org")
+    tools = await manager.connect_servers(servers)
+    assert len(tools) == len(servers), "a server failed to connect"
+    await manager.call_tool(tools[0].name, {"text": "ping"})
+    await manager.disconnect_all()
+    return time.perf_counter() - t0
+
+
+async def run_benchmark(server_count: int, runs: int, startup_delay: float):
+    servers = make_servers(server_count, startup_delay)
+    print(f"\n{'=' * 72}")
+    print(f"  MCP SETUP PER EXECUTION: {server_count} stdio servers, {runs} executions, "
+          f"startup delay {startup_delay}s")
+    print(f"{'=' * 72}\n")
+
+    cold = [await _execute(servers, None) for _ in range(runs)]
+
+    pool = MCPConnectionPool()
+    try:
+        first = await _execute(servers, pool)
+        warm = [await _execute(servers, pool) for _ in range(runs)]
+    finally:
+        await pool.close()
+
+    def row(label, samples):
+        ms = sorted(s * 1000 for s in samples)
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        print(f"  {label:<24} {statistics.median(ms):>10.2f} {p95:>10.2f}")
+
+    print(f"  {'':<24} {'p50 ms':>10} {'p95 ms':>10}")
+    row("cold (no pool)", cold)
+    row("warm: first execution", [first])
+    row("warm: pooled", warm)
+    print(f"\n  speedup (p50): {statistics.median(cold) / statistics.median(warm):.0f}x\n")
+    return {"cold": cold, "first": first, "warm": warm}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=3, help="number of MCP servers per agent")
+    parser.add_argument("--runs", type=int, default=20, help="executions per mode")
+    parser.add_argument("--startup-delay", type=float, default=0.0, help="simulated server start-up time (s)")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.servers, args.runs, args.startup_delay))
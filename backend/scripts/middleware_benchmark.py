@@ -0,0 +1,250 @@
+"""Middleware overhead microbenchmark — BaseHTTPMiddleware stack vs raw-ASGI pipeline.
+
+Drives the ASGI app in-process (no sockets, no server) so the numbers are
+the middleware cost alone:
+
+  - bare      : the routes with no middleware at all
+  - legacy    : the previous stack — six BaseHTTPMiddleware layers (LogEmit,
+                RequestID, SecurityHeaders, BodySizeLimit, RateLimit, Audit)
+                under Starlette's GZipMiddleware
+  - pipeline  : app.middleware.pipeline — one MiddlewarePipeline layer with
+                the same stages under the event-stream-safe GZipMiddleware
+
+Paths measured: a small dashboard JSON response, a small gateway /v1/*
+response, and a 50-event SSE stream sent with Accept-Encoding: gzip (for
+which it also reports how many body chunks reached the client before the
+stream ended — Starlette's gzip held them all until the end).
+
+Redis rate limiting is skipped (TESTING=1) and the GCS sink is a no-op so
+only framework and stage overhead is timed.
+
+Usage
+-----
+  python -m scripts.middleware_benchmark            # 5000 requests per case
+  python -m scripts.middleware_benchmark 20000
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from unittest.mock import patch
+
+os.environ.setdefault("TESTING", "1")
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.middleware.gzip import GZipMiddleware as StarletteGZipMiddleware  # noqa: E402
+from starlette.responses import JSONResponse, StreamingResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from app.middleware import log_emit  # noqa: E402
+from app.middleware.audit import AuditStage, _should_audit  # noqa: E402
+from app.middleware.log_emit import LogEmitStage, _infer_feature, _infer_log_type  # noqa: E402
+from app.middleware.pipeline import GZipMiddleware, MiddlewarePipeline  # noqa: E402
+from app.middleware.security import (  # noqa: E402
+    GATEWAY_MAX_BODY_BYTES,
+    RateLimitStage,
+    RequestBodySizeLimitStage,
+    RequestIDStage,
+    SecurityHeadersStage,
+)
+
+SSE_EVENTS = 50
+
+
+class _NullSink:
+    def emit(self, *args, **kwargs):
+        pass
+
+
+# ─── Routes ───
+
+async def _ping(request):
+    return JSONResponse({"ok": True})
+
+
+async def _stream(request):
+    async def events():
+        for i in range(SSE_EVENTS):
+            yield f"data: {{\"choices\": [{{\"delta\": {{\"content\": \"token {i}\"}}}}]}}\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def _routes_app():
+    return Starlette(routes=[
+        Route("/api/ping", _ping),
+        Route("/v1/ping", _ping),
+        Route("/v1/stream", _stream),
+    ])
+
+
+# ─── Previous BaseHTTPMiddleware stack (same per-request work, I/O stubbed) ───
+
+class _LegacyAudit(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if not _should_audit(request.url.path, request.method):
+            return await call_next(request)
+        return await call_next(request)
+
+
+class _LegacyRateLimit(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if os.environ.get("TESTING"):
+            return await call_next(request)
+        return await call_next(request)
+
+
+class _LegacyBodySize(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if request.url.path.startswith("/v1/"):
+            content_length = request.headers.get("content-length")
+            if content_length and int(content_length) > GATEWAY_MAX_BODY_BYTES:
+                return JSONResponse({"error": "too large"}, status_code=413)
+        return await call_next(request)
+
+
+class _LegacySecurityHeaders(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = "geolocation=(), camera=(), microphone=()"
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+
+class _LegacyRequestID(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
+        request.state.request_id = request_id
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+class _LegacyLogEmit(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        sink = log_emit.get_gcs_sink()
+        path = request.url.path
+        sink.emit(level="info", message=path, log_type=_infer_log_type(path), feature=_infer_feature(path))
+        response = await call_next(request)
+        # The old stage tried the JWT decode for user and org separately
+        for _ in range(2):
+            auth = request.headers.get("authorization", "")
+            if auth.startswith("Bearer "):
+                try:
+                    from app.services.auth_service import decode_token
+                    decode_token(auth[7:])
+                except Exception:
+                    pass
+        sink.emit(level="info", message=path, status_code=response.status_code)
+        return response
+
+
+def legacy_app():
+    app = _routes_app()
+    for layer in (_LegacyAudit, _LegacyRateLimit, _LegacyBodySize, _LegacySecurityHeaders,
+                  _LegacyRequestID, _LegacyLogEmit):
+        app = layer(app)
+    return StarletteGZipMiddleware(app, minimum_size=1000)
+
+
+def pipeline_app():
+    app = MiddlewarePipeline(_routes_app(), stages=[
+        RequestIDStage(),
+        LogEmitStage(),
+        SecurityHeadersStage(),
+        RequestBodySizeLimitStage(),
+        RateLimitStage(),
+        AuditStage(),
+    ])
+    return GZipMiddleware(app, minimum_size=1000)
+
+
+# ─── Driver ───
+
+def _scope(path: str):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "server": ("bench", 80), "client": ("127.0.0.1", 5000),
+        "headers": [
+            (b"host", b"bench"),
+            (b"accept-encoding", b"gzip"),
+            (b"authorization", b"Bearer bn-benchmark-key"),
+        ],
+    }
+
+
+async def _request(app, path: str):
+    """Run one request. Returns (body chunks seen before the stream ended, total chunks)."""
+    received = False
+    complete = asyncio.Event()
+    chunks = []
+
+    async def receive():
+        # Like uvicorn: the body once, then http.disconnect after the response is done
+        nonlocal received
+        if received:
+            await complete.wait()
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append((message.get("body", b""), message.get("more_body", False)))
+            if not message.get("more_body", False):
+                complete.set()
+
+    await app(_scope(path), receive, send)
+    early = sum(1 for body, more in chunks if body and more)
+    return early, len(chunks)
+
+
+async def _time(app, path: str, n: int) -> float:
+    for _ in range(min(200, n)):
+        await _request(app, path)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await _request(app, path)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+async def run_benchmark(n: int = 5000):
+    apps = {"bare": _routes_app(), "legacy": legacy_app(), "pipeline": pipeline_app()}
+    cases = [("/api/ping", n), ("/v1/ping", n), ("/v1/stream", max(200, n // 10))]
+
+    print(f"\n{'=' * 78}")
+    print("  MIDDLEWARE OVERHEAD: BaseHTTPMiddleware stack vs raw-ASGI pipeline")
+    print(f"{'=' * 78}\n")
+    print(f"  {'Path':<12} {'bare':>10} {'legacy':>10} {'pipeline':>10} {'legacy ovh':>11} {'pipe ovh':>10} {'speedup':>8}")
+
+    results = []
+    with patch.object(log_emit, "get_gcs_sink", return_value=_NullSink()):
+        for path, count in cases:
+            timings = {name: await _time(app, path, count) for name, app in apps.items()}
+            legacy_ovh = timings["legacy"] - timings["bare"]
+            pipe_ovh = timings["pipeline"] - timings["bare"]
+            speedup = legacy_ovh / pipe_ovh if pipe_ovh > 0 else float("inf")
+            results.append({"path": path, **timings, "legacy_overhead_us": legacy_ovh, "pipeline_overhead_us": pipe_ovh})
+            print(
+                f"  {path:<12} {timings['bare']:>8.1f}us {timings['legacy']:>8.1f}us {timings['pipeline']:>8.1f}us "
+                f"{legacy_ovh:>9.1f}us {pipe_ovh:>8.1f}us {speedup:>7.1f}x"
+            )
+
+        print(f"\n  SSE with Accept-Encoding: gzip — chunks delivered before the stream ended ({SSE_EVENTS} events):")
+        for name in ("legacy", "pipeline"):
+            early, total = await _request(apps[name], "/v1/stream")
+            print(f"    {name:<9} {early:>3} of {total} body messages carried data mid-stream")
+    print()
+    return results
+
+
+if __name__ == "__main__":
+    requests_per_case = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    asyncio.run(run_benchmark(requests_per_case))
@@ -0,0 +1,51 @@
+"""Minimal stdio MCP server used by the connection pool tests and benchmark.
+
+Speaks newline-delimited JSON-RPC 2.0 on stdin/stdout and exposes one tool,
+``echo``, which returns its ``text`` argument. ``--startup-delay`` simulates
+a slow-starting server (e.g. ``npx`` fetching a package).
+"""
+
+import json
+import sys
+import time
+
+TOOLS = [{
+    "name": "echo",
+    "description": "Echo the given text",
+    "inputSchema": {"type": "object", "properties": {"text": {"type": "string"}}},
+}]
+
+
+def handle(request):
+    method = request.get("method")
+    if method == "initialize":
+        return {"protocolVersion": "2024-11-05", "capabilities": {"tools": {}},
+                "serverInfo": {"name": "echo", "version": "1.0.0"}}
+    if method == "ping":
+        return {}
+    if method == "tools/list":
+        return {"tools": TOOLS}
+    if method == "tools/call":
+        text = request.get("params", {}).get("arguments", {}).get("text", "")
+        return {"content": [{"type": "text", "text": text}]}
+    raise LookupError(method)
+
+
+def main():
+    if "--startup-delay" in sys.argv:
+        time.sleep(float(sys.argv[sys.argv.index("--startup-delay") + 1]))
+    for line in sys.stdin:
+        request = json.loads(line)
+        if "id" not in request:  # notification
+            continue
+        try:
+            response = {"jsonrpc": "2.0", "id": request["id"], "result": handle(request)}
+        except LookupError as e:
+            response = {"jsonrpc": "2.0", "id": request["id"],
+                        "error": {"code": -32601, "message": f"Method not found: {e}"}}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,17 +7,21 @@ Covers:
   Group 3 — Multi-Agent / invoke_agent (connections, depth limit, parallel, roster)
   Group 4 — Async Orchestration (delegate_task, check_task, collect_results, background task)
   Group 5 — Security (SSRF, org isolation, audit trail, input sanitization)
+  Group 6 — Tool call scheduling (read-only calls concurrent, mutating calls sequential)
+  Group 7 — Streaming (gateway token stream, execute_stream events)
 """
 
 import asyncio
 import json
 import time
 import uuid
+from contextlib import ExitStack, asynccontextmanager
 from datetime import datetime, timezone
 from decimal import Decimal
 from typing import Any, Dict, List, Optional
 from unittest.mock import AsyncMock, MagicMock, patch, PropertyMock
 
+import fakeredis
 import pytest
 import pytest_asyncio
 from fastapi import HTTPException
@@ -26,6 +30,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from app.models.agent import Agent
 from app.models.agent_connection import AgentConnection
+from app.models.agent_mcp_server import AgentMCPServer
 from app.models.agent_message import AgentMessage
 from app.models.agent_session import AgentSession
 from app.models.audit import AuditLog
@@ -35,7 +40,14 @@ from app.services.agent_engine import (
     COLLECT_RESULTS_MAX_WAIT,
     MAX_AGENT_DEPTH,
     AgentEngine,
+    AgentRateLimitError,
+    _detached_runs,
+    _execution_id,
+    _mcp_manager,
 )
+from app.services.gateway import chat_completion_stream
+from app.services.mcp_client import MCPClient, MCPClientManager, MCPConnectionPool, MCPToolDefinition
+from app.services.task_notify import publish_task_done, task_channel
 from app.schemas.bonobot import AgentRunResult, SecurityMetadata
 
 
@@ -189,6 +201,16 @@ def _build_mock_redis(
     pipeline_mock.execute = AsyncMock(return_value=[rate_count + 1, True])
     mock.pipeline = MagicMock(return_value=pipeline_mock)
 
+    # Sliding-window limiter script: (script, numkeys, *keys, limit, weight, want, ttl)
+    async def _eval(script, numkeys, *args):
+        limit, _weight, want, _ttl = args[numkeys:]
+        grant = min(int(want), int(limit) - rate_count)
+        if grant < 1:
+            return [0, rate_count, int(limit)]
+        return [grant, rate_count + grant, int(limit)]
+
+    mock.eval = AsyncMock(side_effect=_eval)
+
     # hset / hgetall for async task orchestration
     _store: Dict[str, Dict[str, str]] = task_data or {}
 
@@ -312,6 +334,115 @@ class TestCoreExecution:
         assert "user" in roles
         assert "assistant" in roles
 
+    @pytest.mark.asyncio
+    async def test_concurrent_executions_on_one_engine(self, test_engine, agent, target_agent, mock_redis):
+        """4b. Two executions sharing an engine (as routes and the scheduler do) keep their messages apart."""
+        factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+        for a in (agent, target_agent):
+            a.tool_policy = {"mode": "all"}
+            a.max_turns = 3
+        turns: Dict[str, int] = {}
+
+        async def interleaving_gateway(**kwargs):
+            request_messages = kwargs["request_data"]["messages"]
+            user_msg = [m for m in request_messages if m["role"] == "user"][-1]["content"]
+            turns[user_msg] = turns.get(user_msg, 0) + 1
+            # The first caller sleeps longest, so the executions overlap at every step
+            await asyncio.sleep(0.05 if user_msg == "from A" else 0.01)
+            if turns[user_msg] == 1:
+                return _make_llm_response(None, tool_calls=[_make_tool_call("get_current_time", {}, f"call {user_msg}")])
+            return _make_llm_response(f"reply to {user_msg}")
+
+        engine = AgentEngine()
+
+        async def run(a, text):
+            async with factory() as db:
+                result = await engine.execute(a, text, db, _build_mock_redis())
+                await db.commit()
+                return result
+
+        with _patch_gateway(side_effect=interleaving_gateway), _patch_db_session(test_engine):
+            result_a, result_b = await asyncio.gather(run(agent, "from A"), run(target_agent, "from B"))
+
+        assert (result_a.content, result_b.content) == ("reply to from A", "reply to from B")
+        async with factory() as db:
+            for a, text in ((agent, "from A"), (target_agent, "from B")):
+                rows = (await db.execute(
+                    select(AgentMessage.role, AgentMessage.content, AgentMessage.tool_call_id, AgentMessage.sequence)
+                    .join(AgentSession, AgentSession.id == AgentMessage.session_id)
+                    .where(AgentSession.agent_id == a.id)
+                    .order_by(AgentMessage.sequence)
+                )).all()
+                assert [(r.role, r.content if r.role != "tool" else r.tool_call_id) for r in rows] == [
+                    ("user", text), ("assistant", None), ("tool", f"call {text}"), ("assistant", f"reply to {text}"),
+                ]
+                assert [r.sequence for r in rows] == [1, 2, 3, 4]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_executions_keep_their_mcp_leases(self, test_engine, agent, target_agent, mock_redis):
+        """4c. Overlapping executions on one engine call their own MCP servers and release every lease."""
+        factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as db:
+            for a, server in ((agent, "docs-a"), (target_agent, "docs-b")):
+                a.tool_policy = {"mode": "all"}
+                db.add(a)
+                db.add(AgentMCPServer(
+                    agent_id=a.id, org_id=a.org_id, name=server, transport_type="http",
+                    endpoint_config={"url": f"https://{server}.example"},
+                ))
+            await db.commit()
+
+        calls: List[tuple] = []
+
+        class _Client(MCPClient):
+            async def connect(self):
+                self._connected = True
+
+            async def disconnect(self):
+                self._connected = False
+
+            async def list_tools(self):
+                return [MCPToolDefinition(name="search", description="Search", input_schema={})]
+
+            async def call_tool(self, tool_name, arguments):
+                calls.append((arguments["caller"], self.server_name))
+                return {"result": "ok"}
+
+        def create_client(server_name, server_id, **kwargs):
+            return _Client(server_name, server_id)
+
+        turns: Dict[str, int] = {}
+
+        async def interleaving_gateway(**kwargs):
+            request_messages = kwargs["request_data"]["messages"]
+            user_msg = [m for m in request_messages if m["role"] == "user"][-1]["content"]
+            turns[user_msg] = turns.get(user_msg, 0) + 1
+            # A connects first and calls its tool after B has connected
+            await asyncio.sleep(0.05 if user_msg == "docs-a" else 0.01)
+            if turns[user_msg] == 1:
+                tool = f"mcp_{user_msg.replace('-', '_')}_search"
+                return _make_llm_response(None, tool_calls=[_make_tool_call(tool, {"caller": user_msg})])
+            return _make_llm_response(f"done {user_msg}")
+
+        pool = MCPConnectionPool(max_connections=1)
+        engine = AgentEngine()
+
+        async def run(a, text):
+            async with factory() as db:
+                result = await engine.execute(a, text, db, _build_mock_redis())
+                await db.commit()
+                return result
+
+        with _patch_gateway(side_effect=interleaving_gateway), _patch_db_session(test_engine), \
+                patch("app.services.agent_engine.mcp_pool", pool), \
+                patch("app.services.mcp_client.create_mcp_client", side_effect=create_client):
+            result_a, result_b = await asyncio.gather(run(agent, "docs-a"), run(target_agent, "docs-b"))
+
+        assert (result_a.content, result_b.content) == ("done docs-a", "done docs-b")
+        assert sorted(calls) == [("docs-a", "docs-a"), ("docs-b", "docs-b")]
+        assert pool.stats()["in_use"] == 0
+        assert _mcp_manager.get() is None
+
     @pytest.mark.asyncio
     async def test_session_continuity(self, test_engine, test_session, agent, mock_redis):
         """3. Second message in same session includes prior context."""
@@ -390,8 +521,7 @@ class TestCoreExecution:
         from app.services.agent_engine import AgentRateLimitError
 
         # Simulate redis returning current count == rate_limit_rpm
-        redis = _build_mock_redis(rate_count=0)
-        redis.get = AsyncMock(return_value=str(agent.rate_limit_rpm))  # Already at limit
+        redis = _build_mock_redis(rate_count=agent.rate_limit_rpm)  # Already at limit
 
         with _patch_gateway(_make_llm_response("Nope")):
             engine = AgentEngine()
@@ -1044,6 +1174,146 @@ class TestAsyncOrchestration:
         # The fallback response includes an error message
         assert "error" in last_mapping.get("response", "").lower()
 
+    @pytest.mark.asyncio
+    async def test_background_task_publishes_completion(
+        self, test_engine, test_session, agent, target_agent, mock_redis
+    ):
+        """28c. _execute_background_task announces the final state on the parent's channel."""
+        redis = _build_mock_redis()
+        task_id = str(uuid.uuid4())
+        channel = task_channel(agent.org_id, "parent-exec")
+
+        with (
+            _patch_gateway(_make_llm_response("Background result")),
+            _patch_db_session(test_engine),
+        ):
+            await AgentEngine()._execute_background_task(
+                task_id=task_id,
+                org_id=agent.org_id,
+                project_id=agent.project_id,
+                target_agent_id=str(target_agent.id),
+                message="Background work",
+                depth=1,
+                redis=redis,
+                notify=channel,
+            )
+
+        redis.publish.assert_awaited_once()
+        published_channel, payload = redis.publish.await_args.args
+        assert published_channel == channel
+        assert json.loads(payload) == {"task_id": task_id, "status": "completed"}
+
+    @pytest.mark.asyncio
+    async def test_delegations_use_their_own_execution_channel(
+        self, test_engine, agent, target_agent, connection, mock_redis
+    ):
+        """28d. Concurrent executions on one engine announce their tasks on separate channels."""
+        factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+        agent.tool_policy = {"mode": "all"}
+        redis = _build_mock_redis()
+        seen: Dict[str, int] = {}
+
+        async def gateway(**kwargs):
+            user_msg = [m for m in kwargs["request_data"]["messages"] if m["role"] == "user"][-1]["content"]
+            seen[user_msg] = seen.get(user_msg, 0) + 1
+            await asyncio.sleep(0.01)
+            if user_msg.startswith("orchestrate") and seen[user_msg] == 1:
+                return _make_llm_response(None, tool_calls=[_make_tool_call(
+                    "delegate_task", {"agent_id": str(target_agent.id), "message": "work"},
+                )])
+            return _make_llm_response("done")
+
+        engine = AgentEngine()
+
+        async def run(text):
+            async with factory() as db:
+                await engine.execute(agent, text, db, redis)
+                await db.commit()
+
+        with _patch_gateway(side_effect=gateway), _patch_db_session(test_engine):
+            await asyncio.gather(run("orchestrate 1"), run("orchestrate 2"))
+            await asyncio.sleep(0.1)  # let the background tasks finish
+
+        pending_writes = [
+            c.kwargs["mapping"] for c in redis.hset.call_args_list
+            if (c.kwargs.get("mapping") or {}).get("status") == "pending"
+        ]
+        channels = {m["notify"] for m in pending_writes}
+        assert len(pending_writes) == 2 and len(channels) == 2
+        assert all(c.startswith(f"task_done:{agent.org_id}:") for c in channels)
+        assert _execution_id.get() is None
+
+    @pytest.mark.asyncio
+    async def test_collect_results_wakes_on_completion(self, test_session, agent):
+        """28e. collect_results wakes within 50 ms of a completion being published."""
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        channel = task_channel(agent.org_id, "parent-exec")
+        task_id = str(uuid.uuid4())
+        key = f"task:{agent.org_id}:{task_id}"
+        await redis.hset(key, mapping={"status": "pending", "notify": channel})
+
+        engine = AgentEngine()
+        collector = asyncio.create_task(
+            engine._tool_collect_results(agent, {"task_ids": [task_id]}, test_session, redis)
+        )
+        await asyncio.sleep(0.2)
+        assert not collector.done()
+
+        await redis.hset(key, mapping={"status": "completed", "response": "done"})
+        published_at = time.perf_counter()
+        await publish_task_done(redis, channel, task_id, "completed")
+        result = await collector
+        latency = time.perf_counter() - published_at
+
+        assert result["all_completed"] is True
+        assert result["results"][0]["response"] == "done"
+        assert latency < 0.05
+
+    @pytest.mark.asyncio
+    async def test_collect_results_ignores_other_tasks_of_the_parent(self, test_session, agent):
+        """28f. Completions of tasks that are not being collected don't end the wait."""
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        channel = task_channel(agent.org_id, "parent-exec")
+        task_id = str(uuid.uuid4())
+        key = f"task:{agent.org_id}:{task_id}"
+        await redis.hset(key, mapping={"status": "pending", "notify": channel})
+
+        collector = asyncio.create_task(
+            AgentEngine()._tool_collect_results(agent, {"task_ids": [task_id]}, test_session, redis)
+        )
+        await asyncio.sleep(0.05)
+        await publish_task_done(redis, channel, "some-other-task", "completed")
+        await asyncio.sleep(0.05)
+        assert not collector.done()
+
+        await redis.hset(key, "status", "failed")
+        await publish_task_done(redis, channel, task_id, "failed")
+        result = await asyncio.wait_for(collector, timeout=1)
+        assert result["all_completed"] is True
+        assert result["results"][0]["status"] == "failed"
+
+    @pytest.mark.asyncio
+    async def test_collect_results_final_check_catches_unannounced_completion(self, test_session, agent):
+        """28g. A completion whose message was lost is still picked up by the final status check."""
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        channel = task_channel(agent.org_id, "parent-exec")
+        task_id = str(uuid.uuid4())
+        key = f"task:{agent.org_id}:{task_id}"
+        await redis.hset(key, mapping={"status": "pending", "notify": channel})
+
+        async def _complete_silently():
+            await asyncio.sleep(0.1)
+            await redis.hset(key, "status", "completed")
+
+        with patch("app.services.agent_engine.COLLECT_RESULTS_MAX_WAIT", 0.3):
+            _, result = await asyncio.gather(
+                _complete_silently(),
+                AgentEngine()._tool_collect_results(agent, {"task_ids": [task_id]}, test_session, redis),
+            )
+
+        assert result["all_completed"] is True
+        assert result["results"][0]["status"] == "completed"
+
 
 # ══════════════════════════════════════════════════════════════════
 # Group 5 — Security
@@ -1188,3 +1458,369 @@ class TestSecurity:
             result, sanitized = engine._sanitize_input(msg)
             assert sanitized is False, f"Should not flag clean message: {msg}"
             assert result == msg
+
+
+# ══════════════════════════════════════════════════════════════════
+# Group 6 — Tool Call Scheduling
+# ══════════════════════════════════════════════════════════════════
+
+
+class TestToolScheduling:
+    """Read-only tool calls in one turn run concurrently; mutating ones don't."""
+
+    DELAY = 0.2
+
+    @pytest.fixture
+    def fake_tools(self):
+        """Patch _execute_tool with tools that sleep DELAY * args["weight"] and record timings."""
+        events: List[tuple] = []
+        sessions: Dict[str, Any] = {}
+
+        async def fake_execute_tool(self_engine, ag, tool_call, db, red):
+            call_id = tool_call["id"]
+            sessions[call_id] = db
+            args = json.loads(tool_call["function"]["arguments"])
+            events.append(("start", call_id, time.monotonic()))
+            await asyncio.sleep(self.DELAY * args.get("weight", 1))
+            events.append(("end", call_id, time.monotonic()))
+            return {"call": call_id}
+
+        @asynccontextmanager
+        async def fake_get_db_session():
+            yield object()
+
+        with patch.object(AgentEngine, "_execute_tool", fake_execute_tool), \
+                patch("app.core.database.get_db_session", fake_get_db_session):
+            yield events, sessions
+
+    async def _run(self, calls, limit=4):
+        engine = AgentEngine()
+        db = object()
+        started = time.monotonic()
+        results = await engine._run_tool_calls(MagicMock(), calls, db, None, asyncio.Semaphore(limit))
+        return results, time.monotonic() - started, db
+
+    @pytest.mark.asyncio
+    async def test_read_only_calls_run_concurrently_in_call_order(self, fake_tools):
+        """Four KB searches take about one search's time; results keep the model's order."""
+        events, sessions = fake_tools
+        calls = [_make_tool_call("search_knowledge_base", {"weight": w}) for w in (1.5, 1, 0.5, 1)]
+
+        results, elapsed, db = await self._run(calls)
+
+        assert elapsed < self.DELAY * 2.5
+        assert [r[0]["id"] for r in results] == [c["id"] for c in calls]
+        assert [r[2] for r in results] == [{"call": c["id"]} for c in calls]
+        # Each concurrent call gets its own session, never the shared one
+        assert db not in sessions.values() and len({id(s) for s in sessions.values()}) == 4
+
+    @pytest.mark.asyncio
+    async def test_mutating_calls_are_sequential_barriers(self, fake_tools):
+        """A mutating call waits for earlier reads, and later reads wait for it."""
+        events, sessions = fake_tools
+        calls = [
+            _make_tool_call("search_knowledge_base", {}),
+            _make_tool_call("get_current_time", {}),
+            _make_tool_call("send_notification", {}),
+            _make_tool_call("http_request", {"method": "POST"}),
+            _make_tool_call("list_models", {}),
+        ]
+
+        results, elapsed, db = await self._run(calls)
+
+        assert elapsed >= self.DELAY * 4
+        at = {(kind, call_id): t for kind, call_id, t in events}
+        ids = [c["id"] for c in calls]
+        assert at[("start", ids[2])] >= max(at[("end", ids[0])], at[("end", ids[1])])
+        assert at[("start", ids[3])] >= at[("end", ids[2])]
+        assert at[("start", ids[4])] >= at[("end", ids[3])]
+        assert sessions[ids[2]] is db and sessions[ids[3]] is db
+        assert [r[0]["id"] for r in results] == ids
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_capped_per_execution(self, fake_tools):
+        """With two slots, four reads run two at a time."""
+        events, _ = fake_tools
+        calls = [_make_tool_call("search_knowledge_base", {}) for _ in range(4)]
+
+        _, elapsed, _ = await self._run(calls, limit=2)
+
+        running = peak = 0
+        for kind, _, _ in sorted(events, key=lambda e: (e[2], e[0] == "start")):
+            running += 1 if kind == "start" else -1
+            peak = max(peak, running)
+        assert peak == 2
+        assert self.DELAY * 2 <= elapsed < self.DELAY * 3.5
+
+    def test_classification(self):
+        """Built-ins by declaration, http_request by method, MCP tools by readOnlyHint."""
+        engine = AgentEngine()
+        manager = MCPClientManager()
+        manager._tool_map = {"mcp_s3_list": ("s1", "list"), "mcp_s3_put": ("s1", "put")}
+        manager._read_only_tools = {"mcp_s3_list"}
+
+        def read_only(name, args=None):
+            return engine._is_read_only_call(_make_tool_call(name, args or {}))
+
+        token = _mcp_manager.set(manager)
+        try:
+            assert read_only("search_knowledge_base") and read_only("invoke_agent")
+            assert read_only("http_request", {"url": "https://x"}) and not read_only("http_request", {"method": "DELETE"})
+            assert read_only("mcp_s3_list") and not read_only("mcp_s3_put")
+            assert not read_only("send_notification") and not read_only("delegate_task")
+            assert not read_only("mcp_unregistered_tool")
+        finally:
+            _mcp_manager.reset(token)
+
+
+# ══════════════════════════════════════════════════════════════════
+# Group 7 — Streaming
+# ══════════════════════════════════════════════════════════════════
+
+
+def _chunk(content=None, tool_calls=None, usage=None, finish_reason=None, model="gpt-4o"):
+    """One OpenAI-format stream chunk, as LiteLLM's model_dump() returns it."""
+    delta: Dict[str, Any] = {}
+    if content is not None:
+        delta["content"] = content
+    if tool_calls is not None:
+        delta["tool_calls"] = tool_calls
+    chunk: Dict[str, Any] = {
+        "id": "chatcmpl-stream",
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage:
+        chunk["usage"] = usage
+    return chunk
+
+
+class _StreamingRouter:
+    """Mock LiteLLM router: acompletion(stream=True) replays one scripted turn per call."""
+
+    model_list = [{"model_name": "gpt-4o", "litellm_params": {"model": "openai/gpt-4o"}}]
+
+    def __init__(self, *turns: List[Dict[str, Any]], delay: float = 0.0, fail_after: Optional[int] = None):
+        self.turns = list(turns)
+        self.delay = delay
+        self.fail_after = fail_after
+        self.calls: List[Dict[str, Any]] = []
+        self.chunks_sent = 0
+
+    async def acompletion(self, **kwargs):
+        self.calls.append(kwargs)
+        chunks = self.turns.pop(0)
+
+        async def _stream():
+            for i, chunk in enumerate(chunks):
+                if self.fail_after is not None and i == self.fail_after:
+                    raise RuntimeError("upstream connection reset")
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                self.chunks_sent += 1
+                yield MagicMock(model_dump=MagicMock(return_value=chunk))
+
+        return _stream()
+
+
+def _patch_streaming_provider(router: _StreamingRouter):
+    """Route gateway streaming to *router*; returns (stack, request_log_writer, record_spend)."""
+    stack = ExitStack()
+    stack.enter_context(patch("app.services.gateway.get_router", AsyncMock(return_value=router)))
+    log_writer = stack.enter_context(patch("app.services.gateway.request_log_writer"))
+    log_writer.submit = AsyncMock()
+    record_spend = stack.enter_context(patch("app.services.gateway.spend_ledger.record_spend", AsyncMock()))
+    stack.enter_context(patch("app.services.gateway.emit_gateway_event", AsyncMock()))
+    return stack, log_writer, record_spend
+
+
+def _text_turn(*parts, prompt_tokens=30, completion_tokens=20):
+    return (
+        [_chunk(content=p) for p in parts]
+        + [_chunk(finish_reason="stop", usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})]
+    )
+
+
+def _tool_turn(call_id, name, arguments):
+    """A tool call split across chunks the way providers stream them."""
+    half = len(arguments) // 2
+    return [
+        _chunk(tool_calls=[{"index": 0, "id": call_id, "type": "function",
+                            "function": {"name": name, "arguments": arguments[:half]}}]),
+        _chunk(tool_calls=[{"index": 0, "function": {"arguments": arguments[half:]}}]),
+        _chunk(finish_reason="tool_calls", usage={"prompt_tokens": 25, "completion_tokens": 10}),
+    ]
+
+
+class TestStreaming:
+    """Gateway token streaming and streamed agent executions."""
+
+    @pytest.mark.asyncio
+    async def test_gateway_stream_forwards_deltas_and_rebuilds_response(self):
+        """Deltas reach the callback in order; the return value matches chat_completion's shape."""
+        router = _StreamingRouter(
+            _tool_turn("call_1", "search_knowledge_base", '{"query": "pricing"}')[:2] + _text_turn("Hel", "lo"),
+        )
+        deltas: List[str] = []
+
+        async def on_delta(text):
+            deltas.append(text)
+
+        stack, log_writer, record_spend = _patch_streaming_provider(router)
+        emit = stack.enter_context(patch("app.services.gateway.emit_gateway_event", AsyncMock()))
+        with stack:
+            org_id = uuid.uuid4()
+            response = await chat_completion_stream(
+                {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "bonito": {}},
+                org_id, AgentEngine.INTERNAL_KEY_ID, MagicMock(), on_delta,
+            )
+
+        assert deltas == ["Hel", "lo"]
+        assert router.calls[0]["stream"] is True
+        assert "bonito" not in router.calls[0]
+
+        message = response["choices"][0]["message"]
+        assert message["content"] == "Hello"
+        assert message["tool_calls"] == [{
+            "id": "call_1", "type": "function",
+            "function": {"name": "search_knowledge_base", "arguments": '{"query": "pricing"}'},
+        }]
+        assert response["usage"] == {"prompt_tokens": 30, "completion_tokens": 20, "total_tokens": 50}
+        assert response["model"] == "gpt-4o"
+
+        log_entry = log_writer.submit.await_args.args[0]
+        assert (log_entry.status, log_entry.provider, log_entry.input_tokens) == ("success", "openai", 30)
+        record_spend.assert_awaited_once_with(org_id, log_entry.cost)
+        assert response["cost"] == float(log_entry.cost or 0)
+
+        # Streamed calls reach the platform log stream like chat_completion's
+        emit.assert_awaited_once()
+        assert emit.await_args.args == (org_id, "request")
+        assert emit.await_args.kwargs["metadata"]["stream"] is True
+        assert emit.await_args.kwargs["cost"] == log_entry.cost
+
+    @pytest.mark.asyncio
+    async def test_gateway_stream_error_after_first_delta_is_logged_and_raised(self):
+        """Once output has been handed out there is no failover: the error is logged and raised."""
+        router = _StreamingRouter(_text_turn("partial", "never sent"), fail_after=1)
+        stack, log_writer, record_spend = _patch_streaming_provider(router)
+        emit = stack.enter_context(patch("app.services.gateway.emit_gateway_event", AsyncMock()))
+        with stack, pytest.raises(RuntimeError, match="connection reset"):
+            await chat_completion_stream(
+                {"model": "gpt-4o", "messages": []}, uuid.uuid4(), AgentEngine.INTERNAL_KEY_ID,
+                MagicMock(), AsyncMock(),
+            )
+
+        assert len(router.calls) == 1
+        assert log_writer.submit.await_args.args[0].status == "error"
+        record_spend.assert_not_awaited()
+        assert emit.await_args.args[1] == "error"
+
+    @pytest.mark.asyncio
+    async def test_execute_with_events_streams_tokens_and_tool_progress(
+        self, test_engine, test_session, agent, mock_redis
+    ):
+        """A streamed run reports session, tool and token events and persists like a normal run."""
+        agent.tool_policy = {"mode": "all"}
+        test_session.add(agent)
+        await test_session.flush()
+
+        router = _StreamingRouter(
+            _tool_turn("call_t", "get_current_time", "{}"),
+            _text_turn("It is ", "noon."),
+        )
+        events: List[tuple] = []
+
+        async def on_event(event, data):
+            events.append((event, data))
+
+        stack, _, record_spend = _patch_streaming_provider(router)
+        with stack, _patch_db_session(test_engine):
+            result = await AgentEngine().execute(
+                agent, "What time is it?", test_session, _build_mock_redis(), on_event=on_event,
+            )
+
+        kinds = [e for e, _ in events if e != "memory"]
+        assert kinds == ["session", "tool_start", "tool_end", "token", "token"]
+        assert events[1][1] == {"id": "call_t", "name": "get_current_time"}
+        assert events[2][1]["ok"] is True
+        assert "".join(d["content"] for e, d in events if e == "token") == "It is noon."
+
+        assert result.content == "It is noon."
+        assert result.tokens == 35 + 50
+        assert record_spend.await_count == 2
+
+        session_id = uuid.UUID(events[0][1]["session_id"])
+        rows = await test_session.execute(
+            select(AgentMessage.role, AgentMessage.content)
+            .where(AgentMessage.session_id == session_id)
+            .order_by(AgentMessage.sequence)
+        )
+        assert [r.role for r in rows] == ["user", "assistant", "tool", "assistant"]
+
+    @pytest.mark.asyncio
+    async def test_execute_stream_yields_first_token_before_the_model_finishes(
+        self, test_engine, agent, mock_redis
+    ):
+        """Time to first token: the first delta is out while the provider is still streaming."""
+        router = _StreamingRouter(_text_turn("one ", "two ", "three ", "four"), delay=0.02)
+        stack, _, _ = _patch_streaming_provider(router)
+        seen: List[str] = []
+        with stack, _patch_db_session(test_engine):
+            async for event, data in AgentEngine().execute_stream(agent.id, "Count", _build_mock_redis()):
+                seen.append(event)
+                if event == "token" and seen.count("token") == 1:
+                    assert router.chunks_sent < 5
+                if event == "done":
+                    assert data.content == "one two three four"
+
+        assert seen[0] == "session" and seen[-1] == "done"
+
+    @pytest.mark.asyncio
+    async def test_streams_on_a_shared_engine_stay_separate(self, test_engine, agent, target_agent, mock_redis):
+        """Concurrent streams on one engine each get only their own tokens."""
+        router = _StreamingRouter(_text_turn("a1 ", "a2"), _text_turn("b1 ", "b2"), delay=0.01)
+        engine = AgentEngine()
+
+        async def collect(a):
+            return [d["content"] async for e, d in engine.execute_stream(a.id, "Hi", _build_mock_redis()) if e == "token"]
+
+        stack, _, _ = _patch_streaming_provider(router)
+        with stack, _patch_db_session(test_engine):
+            tokens_a, tokens_b = await asyncio.gather(collect(agent), collect(target_agent))
+
+        assert sorted(["".join(tokens_a), "".join(tokens_b)]) == ["a1 a2", "b1 b2"]
+        assert all(router.calls[i]["stream"] for i in range(2))
+
+    @pytest.mark.asyncio
+    async def test_execute_stream_reports_rejection_as_first_event(self, test_engine, agent, mock_redis):
+        """Rate-limit rejections come out before any session exists, so the route can still answer 429."""
+        redis = _build_mock_redis(rate_count=agent.rate_limit_rpm)
+        with _patch_db_session(test_engine):
+            events = [e async for e in AgentEngine().execute_stream(agent.id, "Hi", redis)]
+
+        assert len(events) == 1
+        assert events[0][0] == "error"
+        assert isinstance(events[0][1], AgentRateLimitError)
+
+    @pytest.mark.asyncio
+    async def test_execute_stream_finishes_after_client_disconnects(self, test_engine, test_session, agent, mock_redis):
+        """Closing the stream early doesn't cut the run short: it completes and commits."""
+        router = _StreamingRouter(_text_turn("a", "b", "c", "d"), delay=0.02)
+        stack, _, record_spend = _patch_streaming_provider(router)
+        with stack, _patch_db_session(test_engine):
+            stream = AgentEngine().execute_stream(agent.id, "Hello", _build_mock_redis())
+            async for event, data in stream:
+                if event == "token":
+                    break
+            await stream.aclose()
+            assert _detached_runs
+            await asyncio.gather(*list(_detached_runs))
+
+        record_spend.assert_awaited_once()
+        rows = await test_session.execute(
+            select(AgentMessage.content)
+            .join(AgentSession, AgentSession.id == AgentMessage.session_id)
+            .where(AgentSession.agent_id == agent.id, AgentMessage.role == "assistant")
+        )
+        assert rows.scalars().all() == ["abcd"]
@@ -0,0 +1,121 @@
+"""Tests for the pre-aggregated agent interaction ledger."""
+
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.agent_interaction import AgentInteraction
+from app.models.agent_message import AgentMessage
+from app.services.agent_interactions import (
+    edge_messages,
+    edge_totals,
+    hour_bucket,
+    interaction_calls,
+    record_interaction,
+)
+
+ORG, PROJECT = uuid.uuid4(), uuid.uuid4()
+SOURCE, TARGET, OTHER = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+T0 = datetime(2026, 3, 1, 10, 15, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+async def db(test_engine):
+    factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session:
+        yield session
+
+
+def _call(call_id, name, agent_id):
+    return {"id": call_id, "function": {"name": name, "arguments": json.dumps({"agent_id": str(agent_id)})}}
+
+
+async def _message(db, tool_calls, at=T0):
+    msg = AgentMessage(
+        id=uuid.uuid4(), session_id=uuid.uuid4(), org_id=ORG, role="assistant",
+        tool_calls=tool_calls, sequence=1, created_at=at,
+    )
+    db.add(msg)
+    await db.flush()
+    return msg
+
+
+async def _record(db, msg, call_id, target=TARGET, kind="invoke_agent", at=T0, **kwargs):
+    return await record_interaction(
+        db, org_id=ORG, project_id=PROJECT, source_agent_id=SOURCE, target_agent_id=target,
+        kind=kind, message_id=msg.id, tool_call_id=call_id, at=at, **kwargs,
+    )
+
+
+class TestParsing:
+
+    def test_interaction_calls(self):
+        calls = [
+            _call("a", "invoke_agent", TARGET),
+            _call("b", "search_knowledge_base", TARGET),
+            {"function": {"name": "delegate_task", "arguments": {"agent_id": str(OTHER)}}},
+            _call("c", "invoke_agent", "not-a-uuid"),
+        ]
+        assert interaction_calls(calls) == [("a", "invoke_agent", TARGET), ("2", "delegate_task", OTHER)]
+
+    def test_kind_override_for_external_rows(self):
+        calls = [{"id": "ext-1", "function": {"name": "invoke_agent", "arguments": json.dumps({"agent_id": str(TARGET)})}}]
+        assert interaction_calls(calls, kind="delegate_task") == [("ext-1", "delegate_task", TARGET)]
+
+    def test_hour_bucket(self):
+        assert hour_bucket(T0) == datetime(2026, 3, 1, 10, tzinfo=timezone.utc)
+        assert hour_bucket(T0.replace(tzinfo=None)) == hour_bucket(T0)
+
+
+class TestLedger:
+
+    async def test_calls_roll_up_per_hour(self, db):
+        msg = await _message(db, [])
+        assert await _record(db, msg, "a", cost=Decimal("0.5"), latency_ms=100)
+        assert await _record(db, msg, "b", cost=0.25, latency_ms=50, at=T0 + timedelta(minutes=20))
+        assert await _record(db, msg, "c", at=T0 + timedelta(hours=1))
+
+        rows = (await db.execute(select(AgentInteraction).order_by(AgentInteraction.bucket))).scalars().all()
+        assert [(r.count, r.total_latency_ms) for r in rows] == [(2, 150), (1, 0)]
+        assert rows[0].total_cost == Decimal("0.75")
+
+    async def test_recording_the_same_call_twice_counts_once(self, db):
+        msg = await _message(db, [])
+        assert await _record(db, msg, "a")
+        assert not await _record(db, msg, "a")
+
+        totals = await edge_totals(db, PROJECT)
+        assert totals[(SOURCE, TARGET)]["invoke_agent"]["count"] == 1
+
+    async def test_edge_totals_by_kind_and_range(self, db):
+        msg = await _message(db, [])
+        await _record(db, msg, "a")
+        await _record(db, msg, "b", kind="delegate_task")
+        await _record(db, msg, "c", target=OTHER)
+        await _record(db, msg, "d", at=T0 + timedelta(days=2))
+
+        totals = await edge_totals(db, PROJECT, date_to=T0 + timedelta(hours=1))
+        assert totals[(SOURCE, TARGET)]["invoke_agent"]["count"] == 1
+        assert totals[(SOURCE, TARGET)]["delegate_task"]["count"] == 1
+        assert totals[(SOURCE, OTHER)]["invoke_agent"]["count"] == 1
+        assert (await edge_totals(db, PROJECT, date_from=T0 + timedelta(days=1)))[(SOURCE, TARGET)]["invoke_agent"]["count"] == 1
+        assert await edge_totals(db, uuid.uuid4()) == {}
+
+    async def test_edge_messages_pages_newest_first(self, db):
+        msgs = [await _message(db, [], at=T0 + timedelta(minutes=i)) for i in range(5)]
+        for i, msg in enumerate(msgs):
+            await _record(db, msg, "a", at=msg.created_at)
+        await _record(db, msgs[4], "b", kind="delegate_task", at=msgs[4].created_at)  # second call, same message
+        await _record(db, msgs[0], "c", target=OTHER)
+
+        total, page = await edge_messages(db, SOURCE, TARGET, limit=2, offset=1)
+        assert total == 5
+        assert [m.id for m in page] == [msgs[3].id, msgs[2].id]
+
+        total, _ = await edge_messages(db, SOURCE, TARGET, date_from=T0 + timedelta(minutes=3))
+        assert total == 2
@@ -0,0 +1,146 @@
+"""Tests for buffered agent message persistence and sequence reservation."""
+
+import uuid
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.agent_message import AgentMessage
+from app.models.agent_session import AgentSession
+from app.services.agent_message_writer import AgentMessageWriter, reserve_sequences
+
+
+@pytest.fixture
+def session_factory(test_engine):
+    return async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest_asyncio.fixture
+async def agent_session(session_factory):
+    session = AgentSession(
+        agent_id=uuid.uuid4(), org_id=uuid.uuid4(), session_key=f"agent:test:{uuid.uuid4()}", status="active",
+    )
+    async with session_factory() as db:
+        db.add(session)
+        await db.commit()
+    return session
+
+
+@pytest.fixture
+def statements(test_engine):
+    """Every statement sent to the database, as a list of SQL strings."""
+    seen = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", _count)
+    yield seen
+    event.remove(test_engine.sync_engine, "before_cursor_execute", _count)
+
+
+async def _sequences(session_factory, session_id):
+    async with session_factory() as db:
+        rows = await db.execute(
+            select(AgentMessage.sequence, AgentMessage.content)
+            .where(AgentMessage.session_id == session_id)
+            .order_by(AgentMessage.sequence)
+        )
+        return rows.all()
+
+
+def _add_turn(writer, tool_results):
+    writer.add("assistant", tool_calls=[{"id": f"c{i}"} for i in range(tool_results)],
+               input_tokens=10, output_tokens=5, cost=Decimal("0.01"))
+    for i in range(tool_results):
+        writer.add("tool", content=f"result {i}", tool_call_id=f"c{i}", tool_name="search_knowledge_base")
+
+
+class TestWriter:
+
+    @pytest.mark.parametrize("tool_results", [1, 16])
+    async def test_a_turn_is_one_reservation_and_one_insert(
+        self, session_factory, agent_session, statements, tool_results,
+    ):
+        async with session_factory() as db:
+            session = await db.get(AgentSession, agent_session.id)
+            writer = AgentMessageWriter(db, session)
+            _add_turn(writer, tool_results)
+
+            statements.clear()
+            await writer.flush()
+            await db.commit()
+
+        writes = [s for s in statements if s.lstrip().upper().startswith(("INSERT", "UPDATE", "SELECT"))]
+        assert len(writes) == 2
+        assert writes[0].lstrip().upper().startswith("UPDATE agent_sessions".upper())
+        assert writes[1].lstrip().upper().startswith("INSERT INTO agent_messages".upper())
+
+        rows = await _sequences(session_factory, agent_session.id)
+        assert [r.sequence for r in rows] == list(range(1, tool_results + 2))
+
+    async def test_session_counters_follow_the_batch(self, session_factory, agent_session):
+        async with session_factory() as db:
+            session = await db.get(AgentSession, agent_session.id)
+            writer = AgentMessageWriter(db, session)
+            _add_turn(writer, 3)
+            await writer.flush()
+            assert (session.message_count, session.total_tokens, session.next_sequence) == (4, 15, 5)
+            await db.commit()
+
+        async with session_factory() as db:
+            stored = await db.get(AgentSession, agent_session.id)
+        assert (stored.message_count, stored.total_tokens, stored.next_sequence) == (4, 15, 5)
+        assert stored.total_cost == Decimal("0.01")
+        assert stored.last_message_at is not None
+
+    async def test_writers_sharing_a_db_session_never_collide(self, session_factory, agent_session):
+        """Interleaved writers (e.g. background work on one session) get disjoint, ordered blocks."""
+        async with session_factory() as db:
+            session = await db.get(AgentSession, agent_session.id)
+            first, second = AgentMessageWriter(db, session), AgentMessageWriter(db, session)
+            for i in range(3):
+                first.add("tool", content=f"first {i}")
+            for i in range(2):
+                second.add("tool", content=f"second {i}")
+            await second.flush()
+            await first.flush()
+            await db.commit()
+
+        rows = await _sequences(session_factory, agent_session.id)
+        assert [(r.sequence, r.content) for r in rows] == [
+            (1, "second 0"), (2, "second 1"), (3, "first 0"), (4, "first 1"), (5, "first 2"),
+        ]
+
+    async def test_stale_session_object_still_reserves_fresh_numbers(self, session_factory, agent_session):
+        """Concurrent executions each loaded the session; neither reuses the other's sequences or counts."""
+        async with session_factory() as db_a, session_factory() as db_b:
+            session_a = await db_a.get(AgentSession, agent_session.id)
+            session_b = await db_b.get(AgentSession, agent_session.id)
+            await db_b.commit()
+
+            writer_a = AgentMessageWriter(db_a, session_a)
+            writer_a.add("user", content="from a")
+            await writer_a.flush()
+            await db_a.commit()
+
+            writer_b = AgentMessageWriter(db_b, session_b)
+            writer_b.add("user", content="from b")
+            await writer_b.flush()
+            await db_b.commit()
+
+        rows = await _sequences(session_factory, agent_session.id)
+        assert [(r.sequence, r.content) for r in rows] == [(1, "from a"), (2, "from b")]
+        async with session_factory() as db:
+            assert (await db.get(AgentSession, agent_session.id)).message_count == 2
+
+    async def test_reserve_sequences_for_single_messages(self, session_factory, agent_session):
+        async with session_factory() as db:
+            session = await db.get(AgentSession, agent_session.id)
+            assert await reserve_sequences(db, session, 1) == 1
+            assert await reserve_sequences(db, session, 3) == 2
+            assert await reserve_sequences(db, session, 1) == 5
+            assert session.message_count == 5
@@ -0,0 +1,238 @@
+"""Tests for the event-driven agent overflow queue drainer."""
+
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+import pytest
+
+from app.services import agent_queue
+from app.services.agent_queue import enqueue_request, recover_dead_workers
+from app.services.task_notify import TaskWaiter, task_channel
+
+AGENT = uuid.UUID("00000000-0000-0000-0000-0000000000a1")
+
+
+@pytest.fixture
+def redis():
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("app.core.redis.redis_client", r):
+        yield r
+
+
+@pytest.fixture(autouse=True)
+def _reset_state():
+    agent_queue._draining.clear()
+    agent_queue._rearm.clear()
+    yield
+    agent_queue._draining.clear()
+    agent_queue._rearm.clear()
+
+
+async def _enqueue(redis, n, agent_id=AGENT):
+    tickets = []
+    for i in range(n):
+        res = await enqueue_request(agent_id, uuid.uuid4(), uuid.uuid4(), f"msg {i}", None, None, redis)
+        tickets.append(res["ticket_id"])
+    return tickets
+
+
+class _FakeRunner:
+    """Stands in for _run_ticket: records concurrency, finishes like the real one."""
+
+    def __init__(self, redis, delay=0.01, rate_limited=()):
+        self.redis = redis
+        self.delay = delay
+        self.rate_limited = set(rate_limited)
+        self.active = 0
+        self.peak = 0
+        self.order = []
+
+    async def __call__(self, agent_id_str, ticket_id, redis):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if ticket_id in self.rate_limited:
+                self.rate_limited.discard(ticket_id)
+                await agent_queue._requeue(redis, agent_id_str, ticket_id)
+                return False
+            self.order.append(ticket_id)
+            notify = await redis.hget(f"agent_queue_req:{ticket_id}", "notify")
+            await agent_queue._finish(redis, ticket_id, {"status": "completed"}, result={"content": "ok"}, notify=notify)
+            return True
+        finally:
+            self.active -= 1
+
+
+def _concurrency(limit):
+    async def _agent_concurrency(agent_id_str, redis):
+        return limit
+    return patch.object(agent_queue, "_agent_concurrency", _agent_concurrency)
+
+
+class TestEnqueue:
+
+    async def test_enqueue_marks_agent_ready(self, redis):
+        await _enqueue(redis, 2)
+        assert await redis.zrange(agent_queue.READY_KEY, 0, -1) == [str(AGENT)]
+        assert await redis.smembers(agent_queue.AGENTS_KEY) == {str(AGENT)}
+        assert await redis.llen(f"agent_queue:{AGENT}") == 2
+
+    async def test_queue_full(self, redis):
+        with patch.object(agent_queue, "QUEUE_MAX_DEPTH", 1):
+            await _enqueue(redis, 1)
+            res = await enqueue_request(AGENT, uuid.uuid4(), uuid.uuid4(), "x", None, None, redis)
+        assert res["queued"] is False
+
+
+class TestDrain:
+
+    async def test_runs_tickets_concurrently_up_to_limit(self, redis):
+        tickets = await _enqueue(redis, 10)
+        runner = _FakeRunner(redis)
+        with _concurrency(4), patch.object(agent_queue, "_run_ticket", runner):
+            claimed = await agent_queue._drain_agent_queue(str(AGENT), redis)
+
+        assert claimed == 10
+        assert runner.peak == 4
+        assert sorted(runner.order) == sorted(tickets)
+        assert await redis.llen(f"agent_queue:{AGENT}") == 0
+        assert await redis.llen(agent_queue._inflight_key(agent_queue.WORKER_ID)) == 0
+        status = await agent_queue.get_queue_status(tickets[0], redis)
+        assert status["status"] == "completed"
+
+    async def test_rate_limited_ticket_is_retried(self, redis):
+        tickets = await _enqueue(redis, 3)
+        runner = _FakeRunner(redis, rate_limited={tickets[0]})
+        with _concurrency(1), patch.object(agent_queue, "_run_ticket", runner), \
+                patch.object(agent_queue, "DRAIN_RETRY_DELAY", 0.01):
+            claimed = await agent_queue._drain_agent_queue(str(AGENT), redis)
+
+        assert claimed == 4
+        assert runner.order == tickets
+
+    async def test_dispatcher_wakes_on_enqueue(self, redis):
+        runner = _FakeRunner(redis)
+        with _concurrency(2), patch.object(agent_queue, "_run_ticket", runner):
+            task = asyncio.create_task(agent_queue._drain_loop())
+            try:
+                await asyncio.sleep(0.05)
+                tickets = await _enqueue(redis, 3)
+                for _ in range(100):
+                    if len(runner.order) == 3:
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                task.cancel()
+                await task
+        assert sorted(runner.order) == sorted(tickets)
+
+    async def test_rearm_while_draining(self, redis):
+        await _enqueue(redis, 1)
+        runner = _FakeRunner(redis, delay=0.05)
+        with _concurrency(1), patch.object(agent_queue, "_run_ticket", runner):
+            agent_queue._start_drain(str(AGENT), redis)
+            await asyncio.sleep(0.01)
+            late = await _enqueue(redis, 1)
+            agent_queue._start_drain(str(AGENT), redis)
+            assert str(AGENT) in agent_queue._rearm
+            await agent_queue._draining[str(AGENT)]
+        assert late[0] in runner.order
+
+    async def test_finished_ticket_is_announced_on_its_parent_channel(self, redis):
+        org_id, parent_id = uuid.uuid4(), uuid.uuid4()
+        channel = task_channel(org_id, parent_id)
+        res = await enqueue_request(AGENT, org_id, uuid.uuid4(), "x", None, parent_id, redis)
+        ticket_id = res["ticket_id"]
+
+        @asynccontextmanager
+        async def _no_agent_session():
+            db = MagicMock()
+            db.execute = AsyncMock(return_value=MagicMock(scalar_one_or_none=MagicMock(return_value=None)))
+            yield db
+
+        async with TaskWaiter(redis, [channel]) as waiter:
+            with patch("app.core.database.get_db_session", _no_agent_session):
+                await agent_queue._run_ticket(str(AGENT), ticket_id, redis)
+            assert await waiter.wait(1) == ticket_id
+
+        status = await agent_queue.get_queue_status(ticket_id, redis)
+        assert status["status"] == "failed"
+
+
+class TestStatusWait:
+
+    async def test_status_wait_returns_when_the_ticket_finishes(self, redis):
+        (ticket_id,) = await _enqueue(redis, 1)
+        runner = _FakeRunner(redis, delay=0.2)
+
+        async def _drain():
+            await asyncio.sleep(0.05)
+            with _concurrency(1), patch.object(agent_queue, "_run_ticket", runner):
+                await agent_queue._drain_agent_queue(str(AGENT), redis)
+
+        drain = asyncio.create_task(_drain())
+        started = asyncio.get_running_loop().time()
+        status = await agent_queue.get_queue_status(ticket_id, redis, wait=5)
+        elapsed = asyncio.get_running_loop().time() - started
+        await drain
+
+        assert status["status"] == "completed"
+        assert status["result"]["content"] == "ok"
+        assert 0.2 <= elapsed < 0.5
+
+    async def test_status_wait_times_out_with_current_status(self, redis):
+        (ticket_id,) = await _enqueue(redis, 1)
+        status = await agent_queue.get_queue_status(ticket_id, redis, wait=0.1)
+        assert status["status"] == "queued"
+        assert status["position"] == 1
+
+
+class TestRecovery:
+
+    async def test_dead_worker_tickets_go_back_to_front(self, redis):
+        tickets = await _enqueue(redis, 3)
+        dead = "dead-worker"
+        queue_key = f"agent_queue:{AGENT}"
+        await redis.sadd(agent_queue.WORKERS_KEY, dead)
+        for _ in range(2):
+            await redis.lmove(queue_key, agent_queue._inflight_key(dead), "LEFT", "RIGHT")
+        await redis.delete(agent_queue.READY_KEY)
+
+        assert await recover_dead_workers(redis) == 2
+        assert await redis.lrange(queue_key, 0, -1) == tickets
+        assert await redis.zrange(agent_queue.READY_KEY, 0, -1) == [str(AGENT)]
+        assert dead not in await redis.smembers(agent_queue.WORKERS_KEY)
+        assert await redis.llen(agent_queue._inflight_key(agent_queue.WORKER_ID)) == 0
+
+    async def test_live_worker_is_left_alone(self, redis):
+        await _enqueue(redis, 1)
+        live = "live-worker"
+        await redis.sadd(agent_queue.WORKERS_KEY, live)
+        await redis.set(agent_queue._heartbeat_key(live), "1", ex=30)
+        await redis.lmove(f"agent_queue:{AGENT}", agent_queue._inflight_key(live), "LEFT", "RIGHT")
+
+        assert await recover_dead_workers(redis) == 0
+        assert await redis.llen(agent_queue._inflight_key(live)) == 1
+
+    async def test_stranded_agent_is_rearmed(self, redis):
+        await _enqueue(redis, 1)
+        other = uuid.uuid4()
+        await redis.sadd(agent_queue.AGENTS_KEY, str(other))
+        await redis.delete(agent_queue.READY_KEY)
+
+        await agent_queue._rearm_stranded(redis)
+        assert await redis.zrange(agent_queue.READY_KEY, 0, -1) == [str(AGENT)]
+        assert await redis.smembers(agent_queue.AGENTS_KEY) == {str(AGENT)}
+
+    async def test_shutdown_releases_inflight(self, redis):
+        tickets = await _enqueue(redis, 2)
+        await redis.lmove(f"agent_queue:{AGENT}", agent_queue._inflight_key(agent_queue.WORKER_ID), "LEFT", "RIGHT")
+        await agent_queue._heartbeat(redis)
+
+        await agent_queue._release_inflight(redis)
+        assert await redis.lrange(f"agent_queue:{AGENT}", 0, -1) == tickets
+        assert agent_queue.WORKER_ID not in await redis.smembers(agent_queue.WORKERS_KEY)
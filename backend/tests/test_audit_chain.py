@@ -0,0 +1,243 @@
+"""Tests for the batched audit chain appender and checkpointed verification."""
+
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.audit import AuditChainCheckpoint, AuditLog
+from app.services import audit_chain as chain_module
+from app.services.audit_chain import AuditChainAppender, compute_entry_hash, merkle_root, verify_chain
+
+ORG = uuid.UUID("00000000-0000-0000-0000-0000000000c1")
+
+
+@pytest.fixture
+def session_factory(test_engine):
+    return async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+def db_session_patch(session_factory):
+    @asynccontextmanager
+    async def _get_db_session():
+        async with session_factory() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    with patch.object(chain_module, "get_db_session", _get_db_session):
+        yield
+
+
+@pytest.fixture
+def redis():
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("app.core.redis.redis_client", r):
+        yield r
+
+
+@pytest.fixture
+def small_interval():
+    with patch.object(chain_module, "CHECKPOINT_INTERVAL", 4), patch.object(chain_module, "VERIFY_PAGE_SIZE", 3):
+        yield
+
+
+def _row(i, org_id=ORG):
+    return {
+        "org_id": org_id,
+        "action": "post",
+        "resource_type": "provider",
+        "details_json": {"method": "POST", "path": f"/api/providers/{i}", "status_code": 200},
+        "ip_address": "127.0.0.1",
+    }
+
+
+async def _entries(session_factory, org_id=ORG):
+    async with session_factory() as session:
+        result = await session.execute(
+            select(AuditLog).where(AuditLog.org_id == org_id).order_by(AuditLog.chain_seq)
+        )
+        return result.scalars().all()
+
+
+async def _verify(session_factory, **kwargs):
+    async with session_factory() as session:
+        return await verify_chain(session, ORG, **kwargs)
+
+
+class TestHashing:
+
+    def test_merkle_root(self):
+        a, b, c = (compute_entry_hash("", ORG, None, "x", "y", {"path": str(i)}, datetime.now(timezone.utc)) for i in range(3))
+        assert merkle_root([a]) == a
+        assert merkle_root([a, b, c]) != merkle_root([a, c, b])
+        assert len(merkle_root([a, b, c])) == 64
+
+    def test_naive_and_utc_timestamps_hash_alike(self):
+        aware = datetime.now(timezone.utc)
+        naive = aware.replace(tzinfo=None)
+        assert compute_entry_hash("", ORG, None, "x", "y", None, aware) == \
+            compute_entry_hash("", ORG, None, "x", "y", None, naive)
+
+
+class TestAppender:
+
+    async def test_batch_is_chained_in_order(self, db_session_patch, session_factory, redis, small_interval):
+        appender = AuditChainAppender()
+        await appender.start()
+        for i in range(10):
+            await appender.submit(_row(i))
+        await appender.stop()
+
+        entries = await _entries(session_factory)
+        assert [e.chain_seq for e in entries] == list(range(1, 11))
+        assert [e.details_json["path"] for e in entries] == [f"/api/providers/{i}" for i in range(10)]
+        prev = ""
+        for e in entries:
+            assert e.prev_hash == prev
+            prev = e.entry_hash
+        assert appender.stats()["batches"] == 1
+        head = await redis.hgetall(chain_module.HEAD_KEY_PREFIX + str(ORG))
+        assert head == {"seq": "10", "hash": entries[-1].entry_hash}
+
+    async def test_checkpoints_commit_to_each_interval(self, db_session_patch, session_factory, redis, small_interval):
+        appender = AuditChainAppender()
+        for i in range(9):
+            await appender.submit(_row(i))  # inline, one entry per append
+
+        entries = await _entries(session_factory)
+        async with session_factory() as session:
+            cps = (await session.execute(
+                select(AuditChainCheckpoint).order_by(AuditChainCheckpoint.seq)
+            )).scalars().all()
+        assert [cp.seq for cp in cps] == [4, 8]
+        assert cps[1].entry_hash == entries[7].entry_hash
+        assert cps[1].merkle_root == merkle_root([e.entry_hash for e in entries[4:8]])
+
+    async def test_other_worker_advancing_the_chain_is_picked_up(
+        self, db_session_patch, session_factory, redis, small_interval,
+    ):
+        first, second = AuditChainAppender(), AuditChainAppender()
+        await first.submit(_row(0))
+        await second.submit(_row(1))
+        await second.submit(_row(2))
+        await first.submit(_row(3))
+
+        entries = await _entries(session_factory)
+        assert [e.chain_seq for e in entries] == [1, 2, 3, 4]
+        assert entries[3].prev_hash == entries[2].entry_hash
+        assert (await _verify(session_factory))["valid"]
+
+    async def test_orgless_entries_get_their_own_chain(self, db_session_patch, session_factory, redis):
+        appender = AuditChainAppender()
+        await appender.submit(_row(0, org_id=None))
+        await appender.submit(_row(1))
+        await appender.submit(_row(2, org_id=None))
+
+        async with session_factory() as session:
+            system = (await session.execute(
+                select(AuditLog.chain_seq).where(AuditLog.org_id.is_(None)).order_by(AuditLog.chain_seq)
+            )).scalars().all()
+        assert system == [1, 2]
+        assert [e.chain_seq for e in await _entries(session_factory)] == [1]
+
+
+class TestVerify:
+
+    async def _append(self, n):
+        appender = AuditChainAppender()
+        await appender.start()
+        for i in range(n):
+            await appender.submit(_row(i))
+        await appender.stop()
+
+    async def test_resumes_from_last_verified_checkpoint(
+        self, db_session_patch, session_factory, redis, small_interval,
+    ):
+        await self._append(10)
+
+        first = await _verify(session_factory)
+        assert first["valid"] and first["total_entries"] == 10
+        assert first["checkpoint_seq"] == 8
+
+        await self._append(3)
+        second = await _verify(session_factory)
+        assert second["valid"]
+        assert second["verified_from_seq"] == 9
+        assert second["total_entries"] == 5
+        assert second["checkpoint_seq"] == 12
+
+        full = await _verify(session_factory, full=True)
+        assert full["valid"] and full["total_entries"] == 13
+
+    async def test_tampered_entry_is_detected(self, db_session_patch, session_factory, redis, small_interval):
+        await self._append(6)
+        entries = await _entries(session_factory)
+        async with session_factory() as session:
+            await session.execute(
+                update(AuditLog).where(AuditLog.id == entries[4].id)
+                .values(details_json={"path": "/api/providers/x", "status_code": 200})
+            )
+            await session.commit()
+
+        result = await _verify(session_factory)
+        assert not result["valid"]
+        assert result["broken_entry_id"] == entries[4].id
+
+    async def test_deleted_entry_is_detected(self, db_session_patch, session_factory, redis, small_interval):
+        await self._append(6)
+        entries = await _entries(session_factory)
+        async with session_factory() as session:
+            await session.delete(await session.get(AuditLog, entries[2].id))
+            await session.commit()
+
+        result = await _verify(session_factory)
+        assert not result["valid"]
+        assert result["broken_entry_id"] == entries[3].id
+        assert "gap" in result["message"]
+
+    async def test_date_window_follows_chain_order(self, db_session_patch, session_factory, redis, small_interval):
+        """Timestamps aren't monotonic in chain_seq; a window edge must not cut the chain."""
+        base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        appender = AuditChainAppender()
+        for minute in (10, 20, 40, 30, 50, 60):   # seq 3 was stamped after seq 4
+            await appender.submit({**_row(minute), "created_at": base + timedelta(minutes=minute)})
+
+        result = await _verify(session_factory, date_to=base + timedelta(minutes=35))
+        assert result["valid"], result["message"]
+        assert result["total_entries"] == 4
+
+        result = await _verify(session_factory, date_from=base + timedelta(minutes=35))
+        assert result["valid"] and result["verified_from_seq"] == 3
+        assert result["total_entries"] == 4
+
+        empty = await _verify(session_factory, date_from=base + timedelta(days=1))
+        assert empty["valid"] and empty["total_entries"] == 0
+
+    async def test_system_chain_positions_are_unique(self, session_factory):
+        async with session_factory() as session:
+            session.add_all([
+                AuditLog(org_id=None, action="login", resource_type="user", chain_seq=1),
+                AuditLog(org_id=None, action="login", resource_type="user", chain_seq=1),
+            ])
+            with pytest.raises(IntegrityError):
+                await session.commit()
+
+    async def test_unchained_rows_are_ignored(self, db_session_patch, session_factory, redis, small_interval):
+        await self._append(2)
+        async with session_factory() as session:
+            session.add(AuditLog(org_id=ORG, action="create", resource_type="policy"))
+            await session.commit()
+
+        result = await _verify(session_factory)
+        assert result["valid"] and result["total_entries"] == 2
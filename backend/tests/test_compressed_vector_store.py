@@ -0,0 +1,215 @@
+"""Tests for the memory-mapped compressed vector store."""
+
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from app.services import compressed_vector_store as cvs
+from app.services.compressed_vector_store import CompressedVectorStore, codebook_for_kb
+
+DIMS = 64
+KB = uuid.UUID("00000000-0000-0000-0000-00000000000b")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CompressedVectorStore(root=str(tmp_path))
+
+
+def _vectors(n, seed=0):
+    vecs = np.random.RandomState(seed).randn(n, DIMS).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _ids(n):
+    return [uuid.uuid4() for _ in range(n)]
+
+
+class TestAppendAndSearch:
+
+    def test_search_matches_codebook_similarity(self, store):
+        vecs = _vectors(50)
+        ids = _ids(50)
+        assert store.append(KB, ids, vecs, bits=4) == 50
+
+        hits = store.search(KB, vecs[7], top_k=5)
+        cb = codebook_for_kb(KB, DIMS, 4)
+        expected = cb.similarity(vecs[7], cb.compress(vecs), top_k=5)
+
+        assert [h[0] for h in hits] == [ids[i] for i, _ in expected]
+        assert [h[1] for h in hits] == pytest.approx([s for _, s in expected], abs=1e-6)
+        assert hits[0][0] == ids[7]
+
+    def test_search_spans_segments(self, store):
+        first, second = _vectors(20, seed=1), _vectors(20, seed=2)
+        first_ids, second_ids = _ids(20), _ids(20)
+        store.append(KB, first_ids, first)
+        store.append(KB, second_ids, second)
+
+        assert store.count(KB) == 40
+        assert store.search(KB, second[3], top_k=1)[0][0] == second_ids[3]
+        assert store.search(KB, first[11], top_k=1)[0][0] == first_ids[11]
+
+    def test_segments_with_different_bits(self, store):
+        vecs = _vectors(20)
+        ids = _ids(20)
+        store.append(KB, ids[:10], vecs[:10], bits=4)
+        store.append(KB, ids[10:], vecs[10:], bits=8)
+        assert store.search(KB, vecs[15], top_k=1)[0][0] == ids[15]
+
+    def test_unknown_kb_and_zero_query(self, store):
+        assert store.search(uuid.uuid4(), [1.0] * DIMS) == []
+        store.append(KB, _ids(3), _vectors(3))
+        assert store.search(KB, [0.0] * DIMS) == []
+
+    def test_length_mismatch_rejected(self, store):
+        with pytest.raises(ValueError):
+            store.append(KB, _ids(2), _vectors(3))
+
+    def test_segment_file_is_compact(self, store):
+        store.append(KB, _ids(100), _vectors(100), bits=4)
+        path = os.path.join(store.kb_dir(KB), "seg-00000000.bvs")
+        cb = codebook_for_kb(KB, DIMS, 4)
+        assert os.path.getsize(path) == 64 + 100 * (4 + cb._quant_bytes() + cb._qjl_bytes())
+        assert os.path.getsize(path) < 100 * DIMS * 4 / 4
+
+
+class TestVisibility:
+
+    def test_other_instance_sees_appends(self, store, tmp_path):
+        vecs, ids = _vectors(10), _ids(10)
+        other = CompressedVectorStore(root=str(tmp_path))
+        store.append(KB, ids[:5], vecs[:5])
+        assert other.count(KB) == 5
+        store.append(KB, ids[5:], vecs[5:])
+        assert other.count(KB) == 10
+
+    def test_delete_hides_rows(self, store):
+        vecs, ids = _vectors(10), _ids(10)
+        store.append(KB, ids, vecs)
+        store.delete(KB, [ids[4]])
+
+        assert store.count(KB) == 9
+        hits = store.search(KB, vecs[4], top_k=10)
+        assert ids[4] not in [h[0] for h in hits]
+        assert len(hits) == 9
+
+    def test_reappend_after_delete(self, store):
+        vecs, ids = _vectors(5), _ids(5)
+        store.append(KB, ids, vecs)
+        store.delete(KB, [ids[2]])
+        store.append(KB, [ids[2]], vecs[2:3])
+
+        assert store.count(KB) == 5
+        assert store.search(KB, vecs[2], top_k=1)[0][0] == ids[2]
+
+    def test_drop(self, store):
+        store.append(KB, _ids(3), _vectors(3))
+        store.drop(KB)
+        assert store.count(KB) == 0
+        assert store.kb_ids() == []
+
+
+class TestCompaction:
+
+    def test_merges_segments(self, store, monkeypatch):
+        monkeypatch.setattr(cvs, "COMPACT_MAX_SEGMENTS", 2)
+        vecs, ids = _vectors(30), _ids(30)
+        for start in range(0, 30, 10):
+            store.append(KB, ids[start:start + 10], vecs[start:start + 10])
+        before = store.search(KB, vecs[21], top_k=5)
+
+        assert store.needs_compaction(KB)
+        assert store.compact(KB)
+        assert not store.needs_compaction(KB)
+
+        files = sorted(f for f in os.listdir(store.kb_dir(KB)) if f.startswith("seg-"))
+        assert files == ["seg-00000003.bvs", "seg-00000003.ids"]
+        assert store.search(KB, vecs[21], top_k=5) == before
+
+    def test_drops_deleted_rows_and_tombstones(self, store):
+        vecs, ids = _vectors(10), _ids(10)
+        store.append(KB, ids, vecs)
+        store.delete(KB, ids[:5])
+
+        assert store.compact(KB)
+        assert store.count(KB) == 5
+        assert not os.path.exists(os.path.join(store.kb_dir(KB), "tombstones.ids"))
+        assert {h[0] for h in store.search(KB, vecs[0], top_k=10)} == set(ids[5:])
+
+    def test_deleting_everything_leaves_empty_store(self, store):
+        vecs, ids = _vectors(4), _ids(4)
+        store.append(KB, ids, vecs)
+        store.delete(KB, ids)
+        assert store.compact(KB)
+        assert store.count(KB) == 0
+        assert store.search(KB, vecs[0]) == []
+
+    def test_noop_when_not_needed(self, store):
+        store.append(KB, _ids(3), _vectors(3))
+        assert not store.compact(KB)
+
+
+class TestRebuild:
+
+    def test_staged_segments_are_invisible_until_published(self, store):
+        vecs, ids = _vectors(20), _ids(20)
+        store.append(KB, ids, vecs, bits=4)
+
+        since = store.begin_rebuild(KB)
+        staged = [store.stage(KB, ids[:10], vecs[:10], bits=8), store.stage(KB, ids[10:], vecs[10:], bits=8)]
+        assert store.count(KB) == 20
+        assert store.disk_usage(KB)["bits"] == 4
+
+        store.publish_rebuild(KB, since, staged)
+        assert store.count(KB) == 20
+        usage = store.disk_usage(KB)
+        assert (usage["segments"], usage["bits"]) == (2, 8)
+        assert store.search(KB, vecs[13], top_k=1)[0][0] == ids[13]
+        assert not os.path.exists(os.path.join(store.kb_dir(KB), "seg-00000000.bvs"))
+
+    def test_writes_during_rebuild_survive_the_swap(self, store):
+        vecs, ids = _vectors(12), _ids(12)
+        store.append(KB, ids[:10], vecs[:10])
+
+        since = store.begin_rebuild(KB)
+        staged = [store.stage(KB, ids[:10], vecs[:10], bits=8)]
+        store.append(KB, ids[10:], vecs[10:])   # ingested mid-rebuild
+        store.delete(KB, [ids[3]])              # deleted mid-rebuild
+        store.publish_rebuild(KB, since, staged)
+
+        assert store.count(KB) == 11
+        found = [h[0] for h in store.search(KB, vecs[3], top_k=12)]
+        assert ids[3] not in found and ids[11] in found
+
+    def test_rebuild_pauses_compaction(self, store, monkeypatch):
+        monkeypatch.setattr(cvs, "COMPACT_MAX_SEGMENTS", 1)
+        vecs, ids = _vectors(10), _ids(10)
+        store.append(KB, ids[:5], vecs[:5])
+        store.append(KB, ids[5:], vecs[5:])
+
+        store.begin_rebuild(KB)
+        assert not store.compact(KB)
+        monkeypatch.setattr(cvs, "REBUILD_MARKER_TTL", 0)
+        assert store.compact(KB)
+
+    def test_exclusive_rebuild_yields_to_a_running_one(self, store):
+        store.append(KB, _ids(4), _vectors(4))
+        since = store.begin_rebuild(KB)
+
+        assert store.begin_rebuild(KB, exclusive=True) is None
+        store.publish_rebuild(KB, since, [])
+        assert store.begin_rebuild(KB, exclusive=True) is not None
+
+    def test_abort_discards_staged_segments(self, store):
+        vecs, ids = _vectors(10), _ids(10)
+        store.append(KB, ids, vecs)
+        store.begin_rebuild(KB)
+        seq = store.stage(KB, ids, vecs, bits=8)
+        store.abort_rebuild(KB, [seq])
+
+        assert store.count(KB) == 10
+        assert not os.path.exists(os.path.join(store.kb_dir(KB), f"seg-{seq:08d}.bvs"))
+        assert not os.path.exists(os.path.join(store.kb_dir(KB), "rebuild"))
@@ -0,0 +1,122 @@
+"""Tests for the coalescing, AIMD-limited embedding scheduler."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.services import embedding_scheduler as scheduler_module
+from app.services.embedding_scheduler import EmbeddingScheduler
+
+
+class FakeProvider:
+    def __init__(self, failures=(), delay=0.0):
+        self.batches = []
+        self.failures = list(failures)
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+
+    async def send(self, texts):
+        self.batches.append(list(texts))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                raise self.failures.pop(0)
+            return [[float(len(t))] for t in texts]
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff():
+    with patch.object(scheduler_module, "RATE_LIMIT_BACKOFF_BASE", 0.01):
+        yield
+
+
+async def test_results_come_back_in_order():
+    provider = FakeProvider()
+    texts = [f"text {'x' * i}" for i in range(10)]
+    result = await EmbeddingScheduler().embed("lane", "test-model", texts, provider.send)
+    assert result == [[float(len(t))] for t in texts]
+
+
+async def test_concurrent_callers_share_batches():
+    provider = FakeProvider()
+    scheduler = EmbeddingScheduler()
+    a, b = await asyncio.gather(
+        scheduler.embed("lane", "test-model", ["a1", "a2"], provider.send),
+        scheduler.embed("lane", "test-model", ["b1"], provider.send),
+    )
+    assert (a, b) == ([[2.0], [2.0]], [[2.0]])
+    assert provider.batches == [["a1", "a2", "b1"]]
+
+
+async def test_batches_respect_input_and_token_limits():
+    provider = FakeProvider()
+    with patch.dict(scheduler_module.MODEL_BATCH_LIMITS, {"small": (3, 1_000), "tight": (100, 10)}):
+        await EmbeddingScheduler().embed("lane", "small", ["t"] * 7, provider.send)
+        assert [len(b) for b in provider.batches] == [3, 3, 1]
+
+        provider.batches.clear()
+        # ~5 tokens each against a 10-token budget; an oversized text still goes alone
+        await EmbeddingScheduler().embed("lane", "tight", ["x" * 16] * 4 + ["y" * 400], provider.send)
+        assert [len(b) for b in provider.batches] == [2, 2, 1]
+
+
+async def test_concurrency_grows_with_success():
+    provider = FakeProvider(delay=0.01)
+    scheduler = EmbeddingScheduler()
+    with patch.dict(scheduler_module.MODEL_BATCH_LIMITS, {"m": (1, 1_000)}):
+        await scheduler.embed("lane", "m", ["t"] * 40, provider.send)
+    assert provider.peak > scheduler_module.INITIAL_CONCURRENCY
+    assert scheduler.stats()["models"]["m"]["max_concurrency_limit"] > scheduler_module.INITIAL_CONCURRENCY
+
+
+async def test_rate_limit_halves_concurrency_and_retries():
+    provider = FakeProvider(failures=[RuntimeError("429 Too Many Requests")])
+    scheduler = EmbeddingScheduler()
+    result = await scheduler.embed("lane", "m", ["a", "b"], provider.send)
+
+    assert result == [[1.0], [1.0]]
+    assert provider.batches == [["a", "b"], ["a", "b"]]
+    stats = scheduler.stats()["models"]["m"]
+    assert stats["rate_limited"] == 1 and stats["errors"] == 0
+    assert scheduler._lanes["lane"].limit < scheduler_module.INITIAL_CONCURRENCY + 1
+
+
+async def test_rate_limit_gives_up_after_retries():
+    provider = FakeProvider(failures=[RuntimeError("rate limit exceeded")] * 10)
+    with patch.object(scheduler_module, "MAX_RATE_LIMIT_RETRIES", 2):
+        with pytest.raises(RuntimeError, match="rate limit"):
+            await EmbeddingScheduler().embed("lane", "m", ["a"], provider.send)
+    assert len(provider.batches) == 3
+
+
+async def test_error_only_fails_callers_in_the_batch():
+    provider = FakeProvider(failures=[ValueError("bad input")])
+    scheduler = EmbeddingScheduler()
+    with patch.dict(scheduler_module.MODEL_BATCH_LIMITS, {"m": (1, 1_000)}):
+        first = asyncio.create_task(scheduler.embed("lane", "m", ["bad"], provider.send))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(scheduler.embed("lane", "m", ["good"], provider.send))
+        results = await asyncio.gather(first, second, return_exceptions=True)
+
+    assert isinstance(results[0], ValueError)
+    assert results[1] == [[4.0]]
+    assert scheduler.stats()["models"]["m"]["errors"] == 1
+
+
+async def test_lanes_are_independent():
+    provider = FakeProvider()
+    scheduler = EmbeddingScheduler()
+    await asyncio.gather(
+        scheduler.embed(("org-a", "m", None), "m", ["a"], provider.send),
+        scheduler.embed(("org-b", "m", None), "m", ["b"], provider.send),
+    )
+    assert sorted(map(tuple, provider.batches)) == [("a",), ("b",)]
+    stats = scheduler.stats()["models"]["m"]
+    assert stats["lanes"] == 2 and stats["texts"] == 2 and stats["batches"] == 2
+    assert stats["texts_per_second"] > 0
@@ -0,0 +1,170 @@
+"""Tests for keeping a KB's compressed store in step with its chunks."""
+
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.knowledge_base import KnowledgeBase
+from app.services import kb_compression, kb_retrieval
+from app.services.compressed_vector_store import CompressedVectorStore
+from app.services.kb_compression import (
+    backfill_reencode, compression_stats, index_chunks, reencode_kb, remove_chunks,
+)
+
+DIMS = 32
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CompressedVectorStore(root=str(tmp_path))
+    with patch.object(kb_compression, "compressed_vector_store", store):
+        yield store
+
+
+def _kb(compression_method="polar-4bit", chunk_count=0):
+    return SimpleNamespace(
+        id=uuid.uuid4(), compression_method=compression_method, chunk_count=chunk_count,
+        embedding_dimensions=DIMS, retrieval_config=None,
+    )
+
+
+def _chunks(n, seed=0):
+    vecs = np.random.RandomState(seed).randn(n, DIMS).astype(np.float32)
+    return [uuid.uuid4() for _ in range(n)], vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+class TestIncremental:
+
+    async def test_index_and_remove(self, store):
+        kb = _kb()
+        ids, vecs = _chunks(10)
+        assert await index_chunks(kb, ids, vecs) == 10
+        await remove_chunks(kb.id, ids[:3])
+        assert store.count(kb.id) == 7
+
+    async def test_compression_off_writes_nothing(self, store):
+        kb = _kb(compression_method=None)
+        ids, vecs = _chunks(5)
+        assert await index_chunks(kb, ids, vecs) == 0
+        assert store.count(kb.id) == 0
+
+    async def test_store_errors_do_not_raise(self, store):
+        ids, vecs = _chunks(3)
+        assert await index_chunks(_kb(), ids, vecs[:2]) == 0
+
+
+class TestReencode:
+
+    @pytest.fixture
+    def session_factory(self, test_engine):
+        return async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+    @pytest.fixture(autouse=True)
+    def db(self, session_factory):
+        @asynccontextmanager
+        async def _get_db_session():
+            async with session_factory() as session:
+                yield session
+                await session.commit()
+
+        with patch.object(kb_compression, "get_db_session", _get_db_session), \
+                patch.object(kb_compression, "REENCODE_PAGE_SIZE", 4):
+            yield
+
+    async def _create_kb(self, session_factory, method, chunk_count):
+        async with session_factory() as session:
+            kb = KnowledgeBase(
+                org_id=uuid.uuid4(), name="kb", source_type="upload", compression_method=method,
+                chunk_count=chunk_count, embedding_dimensions=DIMS,
+            )
+            session.add(kb)
+            await session.commit()
+            return kb
+
+    def _pages(self, ids, vecs):
+        rows = sorted(zip(ids, vecs), key=lambda r: r[0])
+
+        async def _chunk_page(kb_id, after):
+            page = [r for r in rows if after is None or r[0] > after][:kb_compression.REENCODE_PAGE_SIZE]
+            return [SimpleNamespace(id=i, embedding=list(v)) for i, v in page]
+
+        return patch.object(kb_compression, "_chunk_page", _chunk_page)
+
+    async def test_method_change_reencodes_every_chunk(self, store, session_factory):
+        ids, vecs = _chunks(10)
+        kb = await self._create_kb(session_factory, "polar-8bit", 10)
+        store.append(kb.id, ids, vecs, bits=4)
+
+        with self._pages(ids, vecs):
+            assert await reencode_kb(kb.id) == 10
+
+        stats = await compression_stats(kb)
+        assert stats["bits"] == 8 and stats["stored_chunks"] == 10 and stats["complete"]
+        assert stats["segments"] == 3
+        assert stats["reencode"]["status"] == "completed"
+        assert store.search(kb.id, vecs[6], top_k=1)[0][0] == ids[6]
+
+    async def test_turning_compression_off_drops_the_store(self, store, session_factory):
+        ids, vecs = _chunks(4)
+        kb = await self._create_kb(session_factory, None, 4)
+        store.append(kb.id, ids, vecs)
+
+        assert await reencode_kb(kb.id) == 0
+        assert store.count(kb.id) == 0
+
+    async def test_backfill_schedules_only_stores_that_are_behind(self, store, session_factory):
+        ids, vecs = _chunks(4)
+        missing = await self._create_kb(session_factory, "polar-4bit", 4)
+        complete = await self._create_kb(session_factory, "polar-8bit", 4)
+        await self._create_kb(session_factory, None, 4)
+        store.append(complete.id, ids, vecs, bits=8)
+
+        scheduled = []
+
+        def _schedule(kb_id, backfill=False):
+            scheduled.append((kb_id, backfill))
+
+        with patch.object(kb_compression, "schedule_reencode", _schedule):
+            assert await backfill_reencode() == 1
+        assert scheduled == [(missing.id, True)]
+
+    async def test_backfill_builds_a_missing_store(self, store, session_factory):
+        ids, vecs = _chunks(6)
+        kb = await self._create_kb(session_factory, "polar-4bit", 6)
+
+        with self._pages(ids, vecs):
+            assert await reencode_kb(kb.id, backfill=True) == 6
+            assert await reencode_kb(kb.id, backfill=True) == 0   # caught up
+        assert store.count(kb.id) == 6
+
+    async def test_backfill_skips_a_store_another_worker_is_rebuilding(self, store, session_factory):
+        ids, vecs = _chunks(6)
+        kb = await self._create_kb(session_factory, "polar-4bit", 6)
+        store.begin_rebuild(kb.id)
+
+        with self._pages(ids, vecs):
+            assert await reencode_kb(kb.id, backfill=True) == 0
+            assert await reencode_kb(kb.id) == 6
+        assert store.count(kb.id) == 6
+
+
+class TestStats:
+
+    async def test_latency_is_recorded_per_path(self, store):
+        kb = _kb(chunk_count=5)
+        ids, vecs = _chunks(5)
+        await index_chunks(kb, ids, vecs)
+
+        kb_retrieval._record_latency(kb.id, "compressed", 0.0)
+        kb_retrieval._record_latency(kb.id, "compressed", 0.0)
+        stats = await compression_stats(kb)
+
+        assert stats["latency"]["compressed"]["queries"] == 2
+        assert "exact" not in stats["latency"]
+        assert stats["store_bytes"] > 0
+        assert stats["compression_ratio"] > 1
@@ -0,0 +1,161 @@
+"""Tests for content-hash chunk dedup and org-wide embedding reuse."""
+
+import json
+import sqlite3
+import uuid
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.knowledge_base import KnowledgeBase, KBDocument, KBChunk
+from app.services import kb_embedding_store, kb_ingestion
+from app.services.kb_embedding_store import OldChunk, chunk_hash, embed_chunks, plan_chunks
+
+DIMS = 4
+
+
+def _old(text, index):
+    return OldChunk(id=uuid.uuid4(), content_hash=chunk_hash(text), chunk_index=index, token_count=1, hashed=True)
+
+
+class FakeEmbedder:
+    calls = []
+
+    def __init__(self, org_id):
+        pass
+
+    async def resolve_model(self, model=None):
+        return model or "test-embed"
+
+    def store_dimensions(self, model, dimensions):
+        return dimensions or 0
+
+    async def generate_embeddings(self, texts, model=None, dimensions=None):
+        FakeEmbedder.calls.append(list(texts))
+        return [[float(len(t))] * DIMS for t in texts]
+
+
+@pytest.fixture
+def session_factory(test_engine):
+    return async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture(autouse=True)
+def env(session_factory):
+    @asynccontextmanager
+    async def _get_db_session():
+        async with session_factory() as session:
+            try:
+                yield session
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                raise
+
+    FakeEmbedder.calls = []
+    # ARRAY columns are TEXT under SQLite; let the embedding lists bind
+    with patch.dict(sqlite3.adapters, {(list, sqlite3.PrepareProtocol): json.dumps}), \
+            patch.object(kb_ingestion, "get_db_session", _get_db_session), \
+            patch.object(kb_embedding_store, "get_db_session", _get_db_session), \
+            patch.object(kb_ingestion, "EmbeddingGenerator", FakeEmbedder):
+        yield
+
+
+class TestPlan:
+
+    def test_hash_ignores_whitespace_and_unicode_form(self):
+        assert chunk_hash("café  au\nlait") == chunk_hash("café au lait")
+        assert chunk_hash("a") != chunk_hash("b")
+
+    def test_unchanged_chunks_are_kept_and_reindexed(self):
+        old = [_old("intro", 0), _old("body", 1), _old("outro", 2)]
+        plan = plan_chunks(old, [chunk_hash(t) for t in ("intro", "new", "body", "outro")])
+
+        assert [(row.id, index) for row, index in plan.keep] == [(old[0].id, 0), (old[1].id, 2), (old[2].id, 3)]
+        assert plan.add == [1] and plan.drop == []
+
+    def test_repeated_chunks_match_one_to_one(self):
+        old = [_old("same", 0), _old("same", 1), _old("gone", 2)]
+        plan = plan_chunks(old, [chunk_hash("same")] * 3)
+
+        assert [row.id for row, _ in plan.keep] == [old[0].id, old[1].id]
+        assert plan.add == [2]
+        assert plan.drop == [old[2]]
+
+
+class TestEmbedChunks:
+
+    async def test_misses_are_embedded_once_and_reused_later(self):
+        org_id = uuid.uuid4()
+        texts = ["alpha", "bravo", "alpha"]
+        hashes = [chunk_hash(t) for t in texts]
+
+        vectors, reused = await embed_chunks(org_id, "m", DIMS, texts, hashes, FakeEmbedder(org_id).generate_embeddings)
+        assert vectors == [[5.0] * DIMS] * 3 and reused == 0
+        assert FakeEmbedder.calls == [["alpha", "bravo"]]
+
+        vectors, reused = await embed_chunks(
+            org_id, "m", DIMS, ["bravo", "charlie"], [chunk_hash("bravo"), chunk_hash("charlie")],
+            FakeEmbedder(org_id).generate_embeddings,
+        )
+        assert vectors == [[5.0] * DIMS, [7.0] * DIMS] and reused == 1
+        assert FakeEmbedder.calls[-1] == ["charlie"]
+
+    async def test_store_is_keyed_by_org_model_and_dimensions(self):
+        org_id = uuid.uuid4()
+        embed = FakeEmbedder(org_id).generate_embeddings
+        await embed_chunks(org_id, "m", DIMS, ["alpha"], [chunk_hash("alpha")], embed)
+
+        for key in ((uuid.uuid4(), "m", DIMS), (org_id, "other", DIMS), (org_id, "m", 0)):
+            await embed_chunks(*key, ["alpha"], [chunk_hash("alpha")], embed)
+        assert len(FakeEmbedder.calls) == 4
+
+
+class TestReingest:
+
+    async def _setup(self, session_factory):
+        kb = KnowledgeBase(
+            id=uuid.uuid4(), org_id=uuid.uuid4(), name=f"kb-{uuid.uuid4().hex[:6]}", source_type="upload",
+            embedding_model="test-embed", embedding_dimensions=DIMS, chunk_size=4, chunk_overlap=0,
+            document_count=0, chunk_count=0, total_tokens=0,
+        )
+        doc = KBDocument(
+            id=uuid.uuid4(), knowledge_base_id=kb.id, org_id=kb.org_id, file_name="doc.txt", file_type="txt",
+        )
+        async with session_factory() as db:
+            db.add_all([kb, doc])
+            await db.commit()
+        return kb.id, doc.id
+
+    async def _chunks(self, session_factory, doc_id):
+        async with session_factory() as db:
+            rows = await db.execute(
+                select(KBChunk.id, KBChunk.content, KBChunk.chunk_index, KBChunk.content_hash)
+                .where(KBChunk.document_id == doc_id)
+                .order_by(KBChunk.chunk_index)
+            )
+            return rows.all()
+
+    async def test_reprocessing_only_touches_changed_chunks(self, session_factory):
+        kb_id, doc_id = await self._setup(session_factory)
+        first = "\n\n".join(["first paragraph", "second paragraph", "third paragraph"])
+        await kb_ingestion.process_document(doc_id, first.encode(), kb_id)
+        before = await self._chunks(session_factory, doc_id)
+        assert len(before) == 3 and all(c.content_hash == chunk_hash(c.content) for c in before)
+
+        FakeEmbedder.calls.clear()
+        second = "\n\n".join(["first paragraph", "a brand new one", "third paragraph"])
+        await kb_ingestion.process_document(doc_id, second.encode(), kb_id)
+
+        after = await self._chunks(session_factory, doc_id)
+        assert FakeEmbedder.calls == [["a brand new one"]]
+        assert [c.content for c in after] == ["first paragraph", "a brand new one", "third paragraph"]
+        assert (after[0].id, after[2].id) == (before[0].id, before[2].id)
+        assert after[1].id != before[1].id
+
+        async with session_factory() as db:
+            kb = await db.get(KnowledgeBase, kb_id)
+        assert (kb.document_count, kb.chunk_count) == (1, 3)
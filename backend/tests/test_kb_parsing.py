@@ -0,0 +1,144 @@
+"""Tests for streamed, page-aware parsing and the parse process pool."""
+
+import sys
+import time
+import types
+from unittest.mock import patch
+
+import pytest
+
+from app.services.kb_ingestion import DocumentParser, TextChunker, TextSegment
+from app.services.kb_parsing import ParsePool, parse_and_chunk
+
+
+def _fake_pypdf(pages):
+    class Page:
+        def __init__(self, text):
+            self.text = text
+
+        def extract_text(self):
+            if isinstance(self.text, Exception):
+                raise self.text
+            return self.text
+
+    class PdfReader:
+        def __init__(self, stream):
+            self.pages = [Page(text) for text in pages]
+
+    return types.SimpleNamespace(PdfReader=PdfReader)
+
+
+class TestSegments:
+
+    def test_pdf_is_read_page_by_page(self):
+        fake = _fake_pypdf(["page one", RuntimeError("broken page"), "page three"])
+        with patch.dict(sys.modules, {"PyPDF2": fake}):
+            segments = list(DocumentParser.iter_segments(b"%PDF", "pdf"))
+            text = DocumentParser.parse_document(b"%PDF", "pdf")
+
+        assert [(s.text, s.page) for s in segments] == [("page one", 1), ("page three", 3)]
+        assert text == "page one\n\npage three"
+
+    def test_markdown_is_split_at_headings(self):
+        content = b"intro text\n\n# Setup\n\ninstall it\n\n## Usage ##\n\nrun it\n"
+        segments = list(DocumentParser.iter_segments(content, "md"))
+
+        assert [s.section for s in segments] == [None, "Setup", "Usage"]
+        assert "install it" in segments[1].text and "run it" in segments[2].text
+
+    def test_other_formats_are_one_segment(self):
+        assert [s.text for s in DocumentParser.iter_segments(b"a,b\nc,d", "csv")] == ["a | b\nc | d"]
+
+
+class TestChunkSegments:
+
+    def test_single_segment_matches_chunk_text(self):
+        chunker = TextChunker(chunk_size=8, overlap=2)
+        text = "\n\n".join(f"paragraph number {i} has some words in it" for i in range(20))
+
+        streamed = [c.text for c in chunker.chunk_segments([TextSegment(text=text)])]
+        assert streamed == chunker.chunk_text(text)
+
+    def test_chunks_keep_their_page_and_section(self):
+        chunker = TextChunker(chunk_size=4, overlap=0)
+        segments = [
+            TextSegment(text="first page text", page=1, section="Intro"),
+            TextSegment(text="   ", page=2),
+            TextSegment(text="third page text", page=3, section="Body"),
+        ]
+        chunks = list(chunker.chunk_segments(iter(segments)))
+
+        assert [(c.text, c.page, c.section) for c in chunks] == [
+            ("first page text", 1, "Intro"), ("third page text", 3, "Body"),
+        ]
+
+    def test_parse_and_chunk_returns_aligned_metadata(self):
+        parsed = parse_and_chunk(b"# One\n\nalpha beta\n\n# Two\n\ngamma delta\n", "md", chunk_size=4, overlap=0)
+
+        assert len(parsed.chunks) == len(parsed.tokens) == len(parsed.hashes) == len(parsed.sections)
+        assert parsed.sections[0] == "One" and parsed.sections[-1] == "Two"
+
+        with pytest.raises(ValueError, match="No text content"):
+            parse_and_chunk(b"   \n ", "txt", chunk_size=4, overlap=0)
+
+
+class TestChunker:
+
+    def test_packs_paragraphs_then_falls_back_to_smaller_separators(self):
+        chunker = TextChunker(chunk_size=8, overlap=0)
+        text = "short one\n\nshort two\n\n" + "this paragraph is far too long. so it splits on sentences."
+        assert chunker.chunk_text(text) == [
+            "short one\n\nshort two",
+            "this paragraph is far too long",
+            "so it splits on sentences.",
+        ]
+
+    def test_overlap_prefixes_last_words_of_previous_chunk(self):
+        chunker = TextChunker(chunk_size=3, overlap=2)
+        assert chunker.chunk_text("one two three\n\nfour five six") == [
+            "one two three", "two three four five six",
+        ]
+
+    def test_oversized_word_is_split_by_characters(self):
+        chunker = TextChunker(chunk_size=2, overlap=0)
+        assert chunker.chunk_text("x" * 20) == ["x" * 8, "x" * 8, "x" * 4]
+
+    def test_chunks_are_yielded_lazily(self):
+        chunker = TextChunker(chunk_size=2, overlap=0)
+        chunks = chunker.iter_chunks("\n\n".join(["abcdefg"] * 1000))
+        assert next(chunks) == "abcdefg"
+
+    def test_tokenizer_sets_chunk_size_and_counts(self):
+        # Stand-in tokenizer: one token per character
+        chunker = TextChunker(chunk_size=10, overlap=0, tokenizer=len)
+        chunks = chunker.chunk_text("aaaa bbbb cccc dddd")
+        assert chunks == ["aaaa bbbb", "cccc dddd"]
+        assert [chunker.estimate_tokens(c) for c in chunks] == [9, 9]
+
+
+class TestParsePool:
+
+    @pytest.fixture
+    def pool(self):
+        pool = ParsePool(workers=1, timeout=30, memory_limit_mb=512)
+        yield pool
+        pool.shutdown()
+
+    async def test_runs_in_a_worker_process(self, pool):
+        parsed = await pool.run(parse_and_chunk, b"hello world", "txt", 512, 0)
+        assert parsed.chunks == ["hello world"]
+
+    async def test_timeout_replaces_the_pool(self, pool):
+        with pytest.raises(ValueError, match="timed out"):
+            await pool.run(time.sleep, 30, timeout=0.5)
+
+        # The hung worker was killed; the next file gets a fresh pool
+        parsed = await pool.run(parse_and_chunk, b"after timeout", "txt", 512, 0)
+        assert parsed.chunks == ["after timeout"]
+
+    async def test_memory_cap_fails_only_that_file(self, pool):
+        with pytest.raises(ValueError, match="too large"):
+            await pool.run(bytearray, 2 * 1024 ** 3)
+
+        parsed = await pool.run(parse_and_chunk, b"still fine", "txt", 512, 0)
+        assert parsed.chunks == ["still fine"]
@@ -0,0 +1,121 @@
+"""Tests for two-stage KB retrieval (compressed candidates + exact re-rank)."""
+
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import kb_retrieval
+from app.services.kb_retrieval import (
+    nearest_chunks,
+    oversample_for_recall,
+    retrieval_settings,
+    validate_retrieval_config,
+)
+
+
+def _kb(chunk_count=100, compression_method=None, retrieval_config=None):
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        chunk_count=chunk_count,
+        compression_method=compression_method,
+        retrieval_config=retrieval_config,
+    )
+
+
+def _db(*results):
+    """AsyncSession stand-in whose execute() returns the given row lists in order."""
+    db = MagicMock()
+    responses = []
+    for rows in results:
+        res = MagicMock()
+        res.fetchall.return_value = rows
+        responses.append(res)
+    db.execute = AsyncMock(side_effect=responses)
+    return db
+
+
+def _sql(db, call=0):
+    return str(db.execute.call_args_list[call].args[0])
+
+
+@pytest.fixture
+def store():
+    fake = MagicMock()
+    with patch("app.services.compressed_vector_store.compressed_vector_store", fake):
+        yield fake
+
+
+class TestSettings:
+
+    def test_defaults_pick_oversample_for_recall_target(self):
+        settings = retrieval_settings(_kb())
+        assert settings.mode == "auto"
+        assert settings.oversample == oversample_for_recall(kb_retrieval.DEFAULT_RECALL_TARGET, 4)
+
+    def test_8bit_needs_less_oversampling(self):
+        assert retrieval_settings(_kb(compression_method="polar-8bit")).oversample < retrieval_settings(_kb()).oversample
+
+    def test_explicit_oversample_wins(self):
+        kb = _kb(retrieval_config={"oversample": 3, "recall_target": 0.99})
+        assert retrieval_settings(kb).oversample == 3
+
+    def test_unreachable_target_uses_largest_factor(self):
+        assert oversample_for_recall(1.5, 4) == kb_retrieval.OVERSAMPLE_RECALL[4][-1][0]
+
+    def test_validate(self):
+        assert validate_retrieval_config({"mode": "exact"}) == {"mode": "exact"}
+        assert validate_retrieval_config({"oversample": 4, "recall_target": 1}) == {
+            "mode": "auto", "oversample": 4, "recall_target": 1.0,
+        }
+        for bad in ({"mode": "fast"}, {"oversample": 0}, {"oversample": True}, {"recall_target": 0}):
+            with pytest.raises(ValueError):
+                validate_retrieval_config(bad)
+
+
+class TestNearestChunks:
+
+    async def test_two_stage_when_store_is_complete(self, store):
+        kb = _kb(chunk_count=100)
+        ids = [uuid.uuid4() for _ in range(40)]
+        store.count.return_value = 100
+        store.search.return_value = [(i, 0.5) for i in ids]
+        rows = [SimpleNamespace(id=i, score=0.9) for i in ids[:5]]
+        db = _db(rows)
+
+        assert await nearest_chunks(db, kb, [0.1] * 8, 5) == rows
+        assert db.execute.await_count == 1
+        assert "ANY(CAST(:ids AS uuid[]))" in _sql(db)
+        assert db.execute.call_args.args[1]["ids"] == ids
+        assert store.search.call_args.args[2] == 5 * retrieval_settings(kb).oversample
+
+    async def test_exact_when_store_is_behind(self, store):
+        store.count.return_value = 50
+        db = _db([])
+
+        await nearest_chunks(db, _kb(chunk_count=100), [0.1] * 8, 5)
+        store.search.assert_not_called()
+        assert "ANY(" not in _sql(db)
+
+    async def test_exact_mode_skips_store(self, store):
+        db = _db([])
+        await nearest_chunks(db, _kb(retrieval_config={"mode": "exact"}), [0.1] * 8, 5, org_id=uuid.uuid4())
+        store.count.assert_not_called()
+        assert "c.org_id = :org_id" in _sql(db)
+
+    async def test_stale_candidates_fall_back_to_exact(self, store):
+        store.count.return_value = 100
+        store.search.return_value = [(uuid.uuid4(), 0.5) for _ in range(40)]
+        exact_rows = [SimpleNamespace(id=uuid.uuid4(), score=0.8) for _ in range(5)]
+        db = _db([SimpleNamespace(id=uuid.uuid4(), score=0.9)], exact_rows)
+
+        assert await nearest_chunks(db, _kb(), [0.1] * 8, 5) == exact_rows
+        assert "ANY(" in _sql(db, 0)
+        assert "ANY(" not in _sql(db, 1)
+
+    async def test_store_error_falls_back_to_exact(self, store):
+        store.count.side_effect = OSError("disk gone")
+        db = _db([])
+        assert await nearest_chunks(db, _kb(), [0.1] * 8, 5) == []
+        assert "ANY(" not in _sql(db)
@@ -0,0 +1,300 @@
+"""Tests for the cloud-storage KB sync pipeline."""
+
+import asyncio
+import json
+import sqlite3
+import uuid
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.knowledge_base import KnowledgeBase, KBDocument, KBChunk
+from app.services import kb_compression, kb_embedding_store, kb_ingestion, kb_sync, storage_connector
+from app.services.kb_sync import SyncProgress, sync_kb, sync_status
+
+DIMS = 4
+
+
+class FakeConnector:
+    def __init__(self, files):
+        self.files = dict(files)  # key -> (etag, content)
+        self.start_after = []
+
+    async def iter_objects(self, bucket, prefix="", start_after=None):
+        self.start_after.append(start_after)
+        for key in sorted(self.files):
+            if start_after and key <= start_after:
+                continue
+            etag, content = self.files[key]
+            yield {"key": key, "size": len(content), "etag": etag}
+
+    async def download_object(self, bucket, key):
+        return self.files[key][1]
+
+
+class FakeEmbedder:
+    failures = []  # exceptions raised by the next calls, in order
+    calls = []
+    block_on = None  # text that makes the call hang
+
+    def __init__(self, org_id):
+        pass
+
+    async def generate_embeddings(self, texts, model=None, dimensions=None):
+        FakeEmbedder.calls.append(list(texts))
+        if FakeEmbedder.failures:
+            raise FakeEmbedder.failures.pop(0)
+        if FakeEmbedder.block_on and any(FakeEmbedder.block_on in t for t in texts):
+            await asyncio.Event().wait()
+        return [[float(len(t))] * DIMS for t in texts]
+
+    def store_dimensions(self, model, dimensions):
+        return dimensions or 0
+
+
+@pytest.fixture
+def session_factory(test_engine):
+    return async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture(autouse=True)
+def env(session_factory):
+    # The SQLite test engine shares one connection, so sessions from concurrent stages take turns
+    lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def _get_db_session():
+        async with lock, session_factory() as session:
+            try:
+                yield session
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                raise
+
+    FakeEmbedder.failures, FakeEmbedder.calls, FakeEmbedder.block_on = [], [], None
+    # ARRAY columns are TEXT under SQLite; let the embedding lists bind
+    with patch.dict(sqlite3.adapters, {(list, sqlite3.PrepareProtocol): json.dumps}), \
+            patch.object(kb_sync, "get_db_session", _get_db_session), \
+            patch.object(kb_embedding_store, "get_db_session", _get_db_session), \
+            patch.object(kb_ingestion, "EmbeddingGenerator", FakeEmbedder), \
+            patch.object(kb_sync, "RATE_LIMIT_BACKOFF_BASE", 0.01):
+        yield
+
+
+@pytest.fixture
+def bucket():
+    connector = FakeConnector({})
+
+    async def _get_connector(kb, db):
+        return connector, "bucket", ""
+
+    with patch.object(storage_connector, "get_connector_for_kb", _get_connector):
+        yield connector
+
+
+async def _kb(session_factory, **kwargs):
+    kb = KnowledgeBase(
+        id=uuid.uuid4(), org_id=uuid.uuid4(), name=f"kb-{uuid.uuid4().hex[:6]}", source_type="s3",
+        embedding_model="test-embed", embedding_dimensions=DIMS, chunk_size=512, chunk_overlap=0,
+        document_count=0, chunk_count=0, total_tokens=0, **kwargs,
+    )
+    async with session_factory() as db:
+        db.add(kb)
+        await db.commit()
+    return kb.id
+
+
+async def _load(session_factory, kb_id):
+    async with session_factory() as db:
+        kb = await db.get(KnowledgeBase, kb_id)
+        docs = (await db.execute(select(KBDocument).where(KBDocument.knowledge_base_id == kb_id))).scalars().all()
+        chunks = (await db.execute(
+            select(KBChunk.id, KBChunk.document_id, KBChunk.content, KBChunk.token_count)
+            .where(KBChunk.knowledge_base_id == kb_id)
+        )).all()
+    return kb, {d.file_path: d for d in docs}, chunks
+
+
+class TestSync:
+
+    async def test_fresh_sync_ingests_everything(self, session_factory, bucket):
+        bucket.files.update({f"docs/{n}.txt": (n, f"contents of {n}".encode()) for n in "abc"})
+        kb_id = await _kb(session_factory)
+
+        with patch.object(kb_sync, "EMBED_CONCURRENCY", 1):
+            summary = await sync_kb(kb_id)
+
+        assert summary == {
+            "new": 3, "changed": 0, "unchanged": 0, "deleted": 0,
+            "processed": 3, "errors": 0, "total_remote": 3,
+        }
+        kb, docs, chunks = await _load(session_factory, kb_id)
+        assert kb.status == "ready" and kb.last_synced_at is not None
+        assert (kb.document_count, kb.chunk_count) == (3, 3)
+        assert kb.total_tokens == sum(c.token_count for c in chunks)
+        assert {d.status for d in docs.values()} == {"ready"}
+        assert docs["docs/a.txt"].file_hash == "a" and docs["docs/a.txt"].file_name == "a.txt"
+        assert kb.sync_state["status"] == "completed"
+        assert kb.sync_state["resume_after"] == "docs/c.txt"
+        # Small documents share one embedding call
+        assert len(FakeEmbedder.calls) == 1
+
+    async def test_resync_applies_changes_and_deletions(self, session_factory, bucket):
+        bucket.files.update({"a.txt": ("1", b"alpha"), "b.txt": ("1", b"bravo"), "c.txt": ("1", b"charlie")})
+        kb_id = await _kb(session_factory)
+        await sync_kb(kb_id)
+
+        bucket.files["b.txt"] = ("2", b"bravo, revised and longer")
+        del bucket.files["c.txt"]
+        bucket.files["d.txt"] = ("1", b"delta")
+        summary = await sync_kb(kb_id)
+
+        assert summary["new"] == 1 and summary["changed"] == 1
+        assert summary["unchanged"] == 1 and summary["deleted"] == 1
+        kb, docs, chunks = await _load(session_factory, kb_id)
+        assert set(docs) == {"a.txt", "b.txt", "d.txt"}
+        assert (kb.document_count, kb.chunk_count, len(chunks)) == (3, 3, 3)
+        assert kb.total_tokens == sum(c.token_count for c in chunks)
+        assert [c.content for c in chunks if c.document_id == docs["b.txt"].id] == ["bravo, revised and longer"]
+
+    async def test_unchanged_chunks_and_known_text_are_not_re_embedded(self, session_factory, bucket):
+        bucket.files.update({"a.txt": ("1", b"alpha"), "b.txt": ("1", b"bravo")})
+        kb_id = await _kb(session_factory)
+        await sync_kb(kb_id)
+        _, _, before = await _load(session_factory, kb_id)
+        FakeEmbedder.calls.clear()
+
+        bucket.files["a.txt"] = ("2", b"alpha")      # touched, same text
+        bucket.files["c.txt"] = ("1", b"bravo")      # new file, text the org already embedded
+        summary = await sync_kb(kb_id)
+
+        assert (summary["changed"], summary["new"]) == (1, 1)
+        assert FakeEmbedder.calls == []
+        kb, docs, chunks = await _load(session_factory, kb_id)
+        assert {c.id for c in before} <= {c.id for c in chunks}
+        assert (kb.document_count, kb.chunk_count) == (3, 3)
+        assert kb.total_tokens == sum(c.token_count for c in chunks)
+
+    async def test_unparseable_file_is_marked_error(self, session_factory, bucket):
+        bucket.files.update({"a.txt": ("1", b"alpha"), "empty.txt": ("1", b"   ")})
+        kb_id = await _kb(session_factory)
+
+        summary = await sync_kb(kb_id)
+
+        assert (summary["processed"], summary["errors"]) == (1, 1)
+        kb, docs, _ = await _load(session_factory, kb_id)
+        assert kb.status == "ready" and kb.document_count == 1
+        assert docs["empty.txt"].status == "error"
+        assert "No text content" in docs["empty.txt"].error_message
+
+        # A file that failed is retried on the next sync even though its etag is unchanged
+        bucket.files["empty.txt"] = ("1", b"now readable")
+        assert (await sync_kb(kb_id))["changed"] == 1
+        kb, docs, _ = await _load(session_factory, kb_id)
+        assert docs["empty.txt"].status == "ready" and kb.document_count == 2
+
+    async def test_rate_limits_back_off_and_retry(self, session_factory, bucket):
+        bucket.files.update({"a.txt": ("1", b"alpha")})
+        FakeEmbedder.failures = [RuntimeError("429 Too Many Requests"), RuntimeError("rate limit exceeded")]
+        kb_id = await _kb(session_factory)
+
+        assert (await sync_kb(kb_id))["processed"] == 1
+        assert len(FakeEmbedder.calls) == 3
+
+    async def test_embedding_failure_only_fails_its_document(self, session_factory, bucket):
+        bucket.files.update({"a.txt": ("1", b"alpha"), "b.txt": ("1", b"bravo")})
+        FakeEmbedder.failures = [ValueError("bad input")]  # fails the shared batch once
+        kb_id = await _kb(session_factory)
+
+        with patch.object(kb_sync, "EMBED_CONCURRENCY", 1):
+            summary = await sync_kb(kb_id)
+
+        assert (summary["processed"], summary["errors"]) == (2, 0)
+        assert [len(texts) for texts in FakeEmbedder.calls] == [2, 1, 1]
+
+    async def test_interrupted_sync_resumes_after_watermark(self, session_factory, bucket):
+        bucket.files.update({f"{n}.txt": ("1", f"file {n}".encode()) for n in "abcd"})
+        FakeEmbedder.block_on = "file c"
+        kb_id = await _kb(session_factory)
+
+        written = asyncio.Semaphore(0)
+
+        async def _index_chunks(kb, ids, vectors):
+            written.release()
+            return 0
+
+        with patch.object(kb_sync, "EMBED_BATCH_CHUNKS", 1), patch.object(kb_sync, "WRITE_BATCH_DOCS", 1), \
+                patch.object(kb_compression, "index_chunks", _index_chunks):
+            task = asyncio.create_task(sync_kb(kb_id))
+            for _ in range(3):  # a, b and d; c never comes back from embedding
+                await asyncio.wait_for(written.acquire(), 5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        kb, docs, _ = await _load(session_factory, kb_id)
+        assert set(docs) == {"a.txt", "b.txt", "d.txt"}
+        assert kb.status == "ready"
+        assert kb.sync_state["status"] == "interrupted"
+        assert kb.sync_state["resume_after"] == "b.txt"
+
+        FakeEmbedder.block_on = None
+        summary = await sync_kb(kb_id)
+
+        assert bucket.start_after == [None, "b.txt"]
+        # Counters cover the whole sync; d.txt was written past the watermark, so it is seen again but not re-embedded
+        assert (summary["processed"], summary["unchanged"], summary["deleted"]) == (3, 1, 0)
+        assert summary["new"] == 1
+        kb, docs, _ = await _load(session_factory, kb_id)
+        assert set(docs) == {"a.txt", "b.txt", "c.txt", "d.txt"}
+        assert kb.document_count == 4
+        status = sync_status(kb)
+        assert (status["files_total"], status["files_processed"], status["progress_percentage"]) == (4, 4, 100)
+
+    async def test_failed_listing_marks_kb_error(self, session_factory, bucket):
+        async def broken(*args, **kwargs):
+            raise RuntimeError("AccessDenied")
+            yield  # pragma: no cover
+
+        bucket.iter_objects = broken
+        kb_id = await _kb(session_factory)
+
+        with pytest.raises(RuntimeError):
+            await sync_kb(kb_id)
+
+        kb, _, _ = await _load(session_factory, kb_id)
+        assert kb.status == "error"
+        assert kb.sync_state["status"] == "failed" and "AccessDenied" in kb.sync_state["error_message"]
+
+
+class TestProgress:
+
+    def test_watermark_waits_for_earlier_keys(self):
+        progress = SyncProgress()
+        for key in ("a", "b", "c"):
+            progress.listed(key)
+        progress.settle("b", "processed")
+        progress.settle("c", "unchanged")
+        assert progress.state["resume_after"] is None
+        progress.settle("a", "errors")
+        assert progress.state["resume_after"] == "c"
+        assert progress.state["through"] == {"processed": 1, "unchanged": 1, "errors": 1}
+
+    def test_resume_carries_only_finished_keys(self):
+        previous = SyncProgress()
+        for key in ("a", "b", "c"):
+            previous.listed(key)
+        previous.settle("a", "processed")
+        previous.settle("c", "processed")
+        previous.state["status"] = "interrupted"
+
+        progress = SyncProgress(previous.snapshot())
+        assert progress.resumed_from == "a"
+        assert (progress.state["listed"], progress.state["processed"]) == (1, 1)
+
+        previous.state["status"] = "completed"
+        assert SyncProgress(previous.snapshot()).resumed_from is None
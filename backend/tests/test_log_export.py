@@ -0,0 +1,148 @@
+"""Tests for the streaming log export worker."""
+
+import csv
+import gzip
+import io
+import json
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.logging import LogExportJob, PlatformLog
+from app.services import log_export
+from app.services.log_export import claim_job, run_job
+
+ORG = uuid.uuid4()
+USER = uuid.uuid4()
+BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def session_factory(test_engine):
+    return async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture(autouse=True)
+def export_env(session_factory, tmp_path):
+    @asynccontextmanager
+    async def _get_db_session():
+        async with session_factory() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    with patch.object(log_export, "get_db_session", _get_db_session), \
+            patch.object(log_export, "EXPORT_DIR", str(tmp_path)), \
+            patch.object(log_export, "PAGE_SIZE", 4), \
+            patch.object(log_export, "STREAM_FETCH_SIZE", 3):
+        yield
+
+
+async def _seed(session_factory, n, **kwargs):
+    async with session_factory() as session:
+        for i in range(n):
+            fields = dict(
+                org_id=ORG, log_type="gateway", event_type="request", severity="info",
+                message=f"log {i}", event_metadata={"i": i}, created_at=BASE_TIME + timedelta(seconds=i),
+            )
+            fields.update(kwargs)
+            session.add(PlatformLog(**fields))
+        # Same timestamp, different ids: the keyset must not drop either
+        session.add(PlatformLog(org_id=ORG, log_type="gateway", event_type="request", severity="info",
+                                message="tie", created_at=BASE_TIME + timedelta(seconds=n - 1)))
+        session.add(PlatformLog(org_id=uuid.uuid4(), log_type="gateway", event_type="request",
+                                severity="info", message="other org", created_at=BASE_TIME))
+        await session.commit()
+
+
+async def _job(session_factory, export_format="csv", filters=None, **kwargs):
+    async with session_factory() as session:
+        job = LogExportJob(org_id=ORG, user_id=USER, export_format=export_format,
+                           filters=filters or {}, status="pending", **kwargs)
+        session.add(job)
+        await session.commit()
+        return job.id
+
+
+async def _load(session_factory, job_id):
+    async with session_factory() as session:
+        return await session.get(LogExportJob, job_id)
+
+
+def _read(path):
+    with gzip.open(path, "rt") as fh:
+        return fh.read()
+
+
+class TestExport:
+
+    async def test_csv_export_streams_every_row(self, session_factory):
+        await _seed(session_factory, 10)
+        job_id = await _job(session_factory)
+
+        job = await claim_job()
+        assert job.id == job_id and job.status == "running"
+        await run_job(job)
+
+        done = await _load(session_factory, job_id)
+        assert done.status == "completed"
+        assert done.progress == 100
+        assert done.total_records == done.processed_records == 11
+        assert done.file_path.endswith(".csv.gz")
+        assert done.download_expires_at is not None
+
+        rows = list(csv.DictReader(io.StringIO(_read(done.file_path))))
+        assert len(rows) == 11
+        assert sorted(r["message"] for r in rows) == sorted([f"log {i}" for i in range(10)] + ["tie"])
+        assert [r["created_at"] for r in rows] == sorted(r["created_at"] for r in rows)
+
+    async def test_ndjson_export_applies_filters(self, session_factory):
+        await _seed(session_factory, 6)
+        await _seed(session_factory, 3, severity="error")
+        job_id = await _job(session_factory, "json", {"severity": "error"})
+
+        await run_job(await claim_job())
+
+        done = await _load(session_factory, job_id)
+        lines = [json.loads(line) for line in _read(done.file_path).splitlines()]
+        assert done.file_path.endswith(".ndjson.gz")
+        assert len(lines) == 3
+        assert {line["severity"] for line in lines} == {"error"}
+        assert lines[0]["metadata"] == {"i": 0}
+
+    async def test_unknown_format_fails_the_job(self, session_factory):
+        job_id = await _job(session_factory, "parquet")
+        await run_job(await claim_job())
+        failed = await _load(session_factory, job_id)
+        assert failed.status == "failed"
+        assert "parquet" in failed.error_message
+
+
+class TestClaim:
+
+    async def test_nothing_to_claim(self, session_factory):
+        assert await claim_job() is None
+
+    async def test_claimed_job_is_not_claimed_twice(self, session_factory):
+        await _job(session_factory)
+        assert await claim_job() is not None
+        assert await claim_job() is None
+
+    async def test_stale_running_job_is_reclaimed(self, session_factory):
+        job_id = await _job(session_factory)
+        stale = datetime.now(timezone.utc) - timedelta(seconds=log_export.STALE_HEARTBEAT_SECONDS + 60)
+        async with session_factory() as session:
+            job = await session.get(LogExportJob, job_id)
+            job.status, job.heartbeat_at, job.processed_records = "running", stale, 123
+            await session.commit()
+
+        reclaimed = await claim_job()
+        assert reclaimed.id == job_id
+        assert reclaimed.processed_records == 0
@@ -8,10 +8,14 @@ Covers:
   Group 4 — MCPClientManager (multi-server, routing, namespacing)
   Group 5 — Templates and utilities
   Group 6 — Agent engine MCP integration
+  Group 7 — MCPConnectionPool (leases, tool catalog cache, invalidation, sweep)
 """
 
 import asyncio
 import json
+import os
+import sys
+import time
 import uuid
 from datetime import datetime, timezone
 from decimal import Decimal
@@ -25,6 +29,7 @@ from app.services.mcp_client import (
     MCPClient,
     MCPClientManager,
     MCPConnectionError,
+    MCPConnectionPool,
     MCPError,
     MCPToolCallError,
     MCPToolDefinition,
@@ -105,6 +110,16 @@ class TestMCPToolDefinition:
         assert tool.name == "search"
         assert tool.input_schema["type"] == "object"
 
+    def test_read_only_hint_from_annotations(self):
+        """readOnlyHint annotations mark a tool as side-effect free."""
+        read = MCPToolDefinition.from_mcp_response({"name": "get", "annotations": {"readOnlyHint": True}})
+        write = MCPToolDefinition.from_mcp_response({"name": "put", "annotations": {"destructiveHint": True}})
+        bare = MCPToolDefinition.from_mcp_response({"name": "other"})
+
+        assert read.read_only and not write.read_only and not bare.read_only
+        assert read.to_dict()["annotations"] == {"readOnlyHint": True}
+        assert "annotations" not in bare.to_dict()
+
 
 # ══════════════════════════════════════════════════════════════════
 # Group 2 — StdioMCPClient
@@ -708,3 +723,146 @@ class TestAgentEngineMCPIntegration:
 
         assert engine._is_tool_allowed(agent_mock, "mcp_aws_s3_list_buckets") is True
         assert engine._is_tool_allowed(agent_mock, "mcp_aws_s3_delete_object") is False
+
+
+# ══════════════════════════════════════════════════════════════════
+# Group 7 — Connection Pool (against a real stdio echo server)
+# ══════════════════════════════════════════════════════════════════
+
+ECHO_SERVER = os.path.join(os.path.dirname(__file__), "mcp_echo_server.py")
+
+
+def _echo_server(server_id="echo-1", *extra_args):
+    return {
+        "id": server_id,
+        "name": "echo",
+        "transport_type": "stdio",
+        "endpoint_config": {"command": sys.executable, "args": [ECHO_SERVER, *extra_args]},
+        "auth_config": {"type": "none"},
+    }
+
+
+class TestMCPConnectionPool:
+    """Tests for MCPConnectionPool using tests/mcp_echo_server.py over stdio."""
+
+    @pytest_asyncio.fixture
+    async def pool(self):
+        pool = MCPConnectionPool(max_connections=2)
+        yield pool
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_released_connection_is_reused_with_cached_tools(self, pool):
+        """A second acquire gets the same process and skips tools/list."""
+        lease = await pool.acquire("org-1", _echo_server())
+        assert [t.name for t in lease.tools] == ["echo"]
+        pid = lease.client._process.pid
+        await pool.release(lease)
+
+        with patch.object(StdioMCPClient, "list_tools") as list_tools:
+            lease = await pool.acquire("org-1", _echo_server())
+        list_tools.assert_not_called()
+        assert lease.client._process.pid == pid
+        assert await lease.client.call_tool("echo", {"text": "hi"}) == {"result": "hi"}
+        assert pool.stats() == {"servers": 1, "idle": 0, "in_use": 1}
+        await pool.release(lease)
+
+    @pytest.mark.asyncio
+    async def test_connections_are_scoped_by_org_and_config(self, pool):
+        """Other orgs and edited configs never share a connection."""
+        first = await pool.acquire("org-1", _echo_server())
+        await pool.release(first)
+
+        other_org = await pool.acquire("org-2", _echo_server())
+        edited = await pool.acquire("org-1", _echo_server("echo-1", "--startup-delay", "0"))
+        assert other_org.client is not first.client and edited.client is not first.client
+        await pool.release(other_org)
+        await pool.release(edited)
+        assert pool.stats()["servers"] == 3
+
+    @pytest.mark.asyncio
+    async def test_invalidate_closes_idle_and_leased_connections(self, pool):
+        """invalidate() closes idle connections now and leased ones on release."""
+        idle = await pool.acquire("org-1", _echo_server())
+        leased = await pool.acquire("org-1", _echo_server())
+        await pool.release(idle)
+
+        await pool.invalidate("org-1", "echo-1")
+        assert not idle.client.connected and leased.client.connected
+
+        await pool.release(leased)
+        assert not leased.client.connected
+        assert pool.stats() == {"servers": 0, "idle": 0, "in_use": 0}
+
+    @pytest.mark.asyncio
+    async def test_broken_or_dead_connections_are_not_reused(self, pool):
+        """Broken leases are closed on release; dead idle processes are skipped."""
+        lease = await pool.acquire("org-1", _echo_server())
+        lease.broken = True
+        await pool.release(lease)
+        assert not lease.client.connected and pool.stats()["idle"] == 0
+
+        lease = await pool.acquire("org-1", _echo_server())
+        await pool.release(lease)
+        lease.client._process.kill()
+        await lease.client._process.wait()
+
+        fresh = await pool.acquire("org-1", _echo_server())
+        assert fresh.client is not lease.client and fresh.client.alive
+        await pool.release(fresh)
+
+    @pytest.mark.asyncio
+    async def test_sweep_evicts_idle_connections_and_pings_the_rest(self, pool):
+        """sweep() closes connections idle past the timeout and keeps healthy ones."""
+        lease = await pool.acquire("org-1", _echo_server())
+        await pool.release(lease)
+
+        await pool.sweep()
+        assert pool.stats()["idle"] == 1 and lease.client.connected
+
+        pool.idle_timeout = 0
+        await pool.sweep()
+        assert pool.stats()["idle"] == 0 and not lease.client.connected
+
+    @pytest.mark.asyncio
+    async def test_leases_are_capped_per_server(self, pool):
+        """Acquire waits for a free slot once max_connections leases are out."""
+        leases = [await pool.acquire("org-1", _echo_server()) for _ in range(2)]
+        waiter = asyncio.create_task(pool.acquire("org-1", _echo_server()))
+        await asyncio.sleep(0.1)
+        assert not waiter.done()
+
+        await pool.release(leases[0])
+        third = await asyncio.wait_for(waiter, timeout=5)
+        assert third.client is leases[0].client
+        for lease in (leases[1], third):
+            await pool.release(lease)
+
+    @pytest.mark.asyncio
+    async def test_manager_connects_in_parallel_and_returns_leases(self, pool):
+        """Servers connect concurrently and disconnect_all hands them back to the pool."""
+        servers = [
+            _echo_server("slow-1", "--startup-delay", "1"),
+            {**_echo_server("slow-2", "--startup-delay", "1"), "name": "echo2"},
+        ]
+        manager = MCPClientManager(pool=pool, org_id="org-1")
+
+        started = time.monotonic()
+        tools = await manager.connect_servers(servers)
+        assert time.monotonic() - started < 1.8
+        assert [t.name for t in tools] == ["mcp_echo_echo", "mcp_echo2_echo"]
+
+        assert await manager.call_tool("mcp_echo2_echo", {"text": "pooled"}) == {"result": "pooled"}
+        await manager.disconnect_all()
+        # Identical configs share one slot (and one cached catalog)
+        assert pool.stats() == {"servers": 1, "idle": 2, "in_use": 0}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_on_one_stdio_connection(self, pool):
+        """Concurrent calls over one stdio stream each get their own response."""
+        lease = await pool.acquire("org-1", _echo_server())
+        results = await asyncio.gather(
+            *(lease.client.call_tool("echo", {"text": f"call-{i}"}) for i in range(20))
+        )
+        assert results == [{"result": f"call-{i}"} for i in range(20)]
+        await pool.release(lease)
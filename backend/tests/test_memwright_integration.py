@@ -67,6 +67,16 @@ def _build_mock_redis(rate_count: int = 0) -> AsyncMock:
     pipe.expire = MagicMock(return_value=pipe)
     pipe.execute = AsyncMock(return_value=[rate_count + 1, True])
     mock.pipeline = MagicMock(return_value=pipe)
+
+    # Sliding-window limiter script: (script, numkeys, *keys, limit, weight, want, ttl)
+    async def _eval(script, numkeys, *args):
+        limit, _weight, want, _ttl = args[numkeys:]
+        grant = min(int(want), int(limit) - rate_count)
+        if grant < 1:
+            return [0, rate_count, int(limit)]
+        return [grant, rate_count + grant, int(limit)]
+
+    mock.eval = AsyncMock(side_effect=_eval)
     mock.hset = AsyncMock()
     mock.hgetall = AsyncMock(return_value={})
     mock.delete = AsyncMock()
@@ -0,0 +1,222 @@
+"""Tests for the raw-ASGI middleware pipeline and streaming-safe gzip."""
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import fakeredis
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.middleware import log_emit, security
+from app.middleware.audit import AuditStage
+from app.middleware.log_emit import LogEmitStage
+from app.middleware.pipeline import GZipMiddleware, MiddlewarePipeline, Stage
+from app.middleware.security import (
+    GATEWAY_MAX_BODY_BYTES,
+    RateLimitStage,
+    RequestBodySizeLimitStage,
+    RequestIDStage,
+    SecurityHeadersStage,
+)
+
+
+async def _ok(request: Request):
+    request_id = getattr(request.state, "request_id", None)
+    return JSONResponse({"request_id": request_id}, headers={"Cache-Control": "max-age=60"})
+
+
+async def _boom(request: Request):
+    raise RuntimeError("boom")
+
+
+async def _sse(request: Request):
+    async def events():
+        for i in range(3):
+            yield f"data: {i}\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def _big(request: Request):
+    return PlainTextResponse("x" * 5000)
+
+
+async def _stream_text(request: Request):
+    async def chunks():
+        for _ in range(4):
+            yield "y" * 2000
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+ROUTES = [
+    Route("/api/ping", _ok),
+    Route("/v1/ping", _ok, methods=["GET", "POST"]),
+    Route("/api/boom", _boom),
+    Route("/v1/stream", _sse),
+    Route("/api/big", _big),
+    Route("/api/stream", _stream_text),
+]
+
+
+class _Recorder(Stage):
+    def __init__(self, gateway=True, dashboard=True):
+        self.gateway = gateway
+        self.dashboard = dashboard
+        self.completed = []
+
+    async def on_complete(self, ctx):
+        self.completed.append((ctx.path, ctx.status_code))
+
+
+def _client(*stages, gzip_min=None):
+    app = MiddlewarePipeline(Starlette(routes=ROUTES), stages)
+    if gzip_min is not None:
+        app = GZipMiddleware(app, minimum_size=gzip_min)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://test")
+
+
+@pytest.fixture
+def sink():
+    fake = MagicMock()
+    with patch.object(log_emit, "get_gcs_sink", return_value=fake):
+        yield fake
+
+
+class TestPipeline:
+
+    async def test_request_id_and_security_headers(self):
+        async with _client(RequestIDStage(), SecurityHeadersStage()) as client:
+            resp = await client.get("/api/ping", headers={"X-Request-ID": "req-1"})
+        assert resp.headers["x-request-id"] == "req-1"
+        assert resp.json() == {"request_id": "req-1"}
+        assert resp.headers["x-frame-options"] == "DENY"
+        assert resp.headers["cache-control"] == "no-store"
+
+    async def test_short_circuit_still_gets_outer_headers(self):
+        inner = _Recorder()
+        async with _client(RequestIDStage(), SecurityHeadersStage(), RequestBodySizeLimitStage(), inner) as client:
+            resp = await client.post(
+                "/v1/ping", content=b"{}", headers={"Content-Length": str(GATEWAY_MAX_BODY_BYTES + 1)}
+            )
+        assert resp.status_code == 413
+        assert "x-request-id" in resp.headers
+        assert resp.headers["x-content-type-options"] == "nosniff"
+        assert inner.completed == []
+
+    async def test_body_limit_is_gateway_only(self):
+        async with _client(RequestBodySizeLimitStage()) as client:
+            resp = await client.get("/api/ping", headers={"Content-Length": str(GATEWAY_MAX_BODY_BYTES + 1)})
+        assert resp.status_code == 200
+
+    async def test_lanes(self):
+        everywhere, dashboard_only = _Recorder(), _Recorder(gateway=False)
+        async with _client(everywhere, dashboard_only) as client:
+            await client.get("/v1/ping")
+            await client.get("/api/ping")
+        assert everywhere.completed == [("/v1/ping", 200), ("/api/ping", 200)]
+        assert dashboard_only.completed == [("/api/ping", 200)]
+
+    async def test_unhandled_error_completes_with_500(self):
+        recorder = _Recorder()
+        async with _client(recorder) as client:
+            resp = await client.get("/api/boom")
+        assert resp.status_code == 500
+        assert recorder.completed == [("/api/boom", 500)]
+
+    async def test_rate_limit(self, monkeypatch):
+        monkeypatch.delenv("TESTING", raising=False)
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+        async def _get_redis():
+            return redis
+
+        monkeypatch.setattr(security, "get_redis", _get_redis)
+        monkeypatch.setattr(security, "DEFAULT_RATE_LIMIT", (2, 60))
+        async with _client(RequestIDStage(), RateLimitStage()) as client:
+            codes = [(await client.get("/api/ping")).status_code for _ in range(3)]
+            limited = await client.get("/api/ping")
+        assert codes == [200, 200, 429]
+        assert "x-request-id" in limited.headers
+        assert limited.headers["retry-after"]
+
+
+class TestLogAndAudit:
+
+    async def test_log_events_share_request_id(self, sink):
+        async with _client(RequestIDStage(), LogEmitStage()) as client:
+            resp = await client.get("/api/ping?x=1")
+        start, end = [c.kwargs for c in sink.emit.call_args_list]
+        assert start["request_id"] == end["request_id"] == resp.headers["x-request-id"]
+        assert start["extra"]["query_string"] == "x=1"
+        assert end["status_code"] == 200
+
+    async def test_gateway_skips_token_decode(self, sink):
+        with patch("app.services.auth_service.decode_token") as decode:
+            async with _client(LogEmitStage(), AuditStage()) as client:
+                await client.get("/v1/ping", headers={"Authorization": "Bearer bn-key"})
+            decode.assert_not_called()
+        assert sink.emit.call_args.kwargs["log_type"] == "gateway"
+
+    async def test_dashboard_decodes_token_for_log_context(self, sink):
+        claims = {"sub": "user-1", "org_id": "org-1"}
+        with patch("app.services.auth_service.decode_token", return_value=claims):
+            async with _client(LogEmitStage()) as client:
+                await client.get("/api/ping", headers={"Authorization": "Bearer jwt"})
+        end = sink.emit.call_args.kwargs
+        assert (end["user_id"], end["org_id"]) == ("user-1", "org-1")
+
+
+class TestGZip:
+
+    async def test_event_stream_is_not_compressed(self):
+        async with _client(gzip_min=10) as client:
+            resp = await client.get("/v1/stream", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in resp.headers
+        assert resp.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+
+    async def test_event_stream_chunks_are_forwarded_as_produced(self):
+        app = GZipMiddleware(Starlette(routes=ROUTES), minimum_size=1)
+        sent = []
+        requested = []
+
+        async def receive():
+            if requested:
+                await asyncio.Event().wait()  # Client stays connected
+            requested.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http", "method": "GET", "path": "/v1/stream", "raw_path": b"/v1/stream",
+            "query_string": b"", "headers": [(b"accept-encoding", b"gzip")], "http_version": "1.1",
+            "scheme": "http", "server": ("test", 80), "client": ("127.0.0.1", 1), "root_path": "",
+        }
+        await app(scope, receive, send)
+        bodies = [m["body"] for m in sent if m["type"] == "http.response.body" and m.get("body")]
+        assert bodies == [b"data: 0\n\n", b"data: 1\n\n", b"data: 2\n\n"]
+
+    async def test_large_body_is_compressed(self):
+        async with _client(gzip_min=1000) as client:
+            resp = await client.get("/api/big", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert int(resp.headers["content-length"]) < 5000
+        assert resp.text == "x" * 5000
+
+    async def test_small_body_and_no_accept_encoding(self):
+        async with _client(gzip_min=10000) as client:
+            small = await client.get("/api/big", headers={"Accept-Encoding": "gzip"})
+        async with _client(gzip_min=10) as client:
+            plain = await client.get("/api/big", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in small.headers
+        assert "content-encoding" not in plain.headers
+
+    async def test_other_streams_are_compressed(self):
+        async with _client(gzip_min=10) as client:
+            resp = await client.get("/api/stream", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert resp.text == "y" * 8000
@@ -0,0 +1,144 @@
+"""Tests for compiled per-org policy snapshots used by gateway.enforce_policies."""
+
+from unittest.mock import MagicMock, patch
+
+import fakeredis
+import pytest
+from httpx import AsyncClient
+
+from app.models.gateway import GatewayKey
+from app.models.policy import Policy
+from app.services import policy_cache, spend_ledger
+from app.services.gateway import PolicyViolation, enforce_policies
+
+
+@pytest.fixture
+def fake_redis():
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("app.core.redis.redis_client", r):
+        yield r
+
+
+@pytest.fixture(autouse=True)
+def _clean_snapshots():
+    policy_cache.drop_local()
+    yield
+    policy_cache.drop_local()
+
+
+def _key(org_id):
+    key = MagicMock(spec=GatewayKey)
+    key.org_id = org_id
+    key.allowed_models = None
+    return key
+
+
+class _CountingSession:
+    """Wrap an AsyncSession and count execute() round-trips."""
+
+    def __init__(self, session):
+        self._session = session
+        self.executes = 0
+
+    async def execute(self, *args, **kwargs):
+        self.executes += 1
+        return await self._session.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+async def _add_policy(session, org_id, type_, rules, name="p"):
+    session.add(Policy(org_id=org_id, name=name, type=type_, rules_json=rules, enabled=True))
+    await session.commit()
+
+
+class TestCompileSnapshot:
+
+    def test_allow_lists_intersect_and_strictest_cap_wins(self):
+        policies = [
+            MagicMock(type="model_access", name="a", rules_json={"allowed_models": ["gpt-4o", "claude"]}),
+            MagicMock(type="model_access", name="b", rules_json={"allowed_models": ["gpt-4o"]}),
+            MagicMock(type="spend_limits", rules_json={"max_daily_spend": 50}),
+            MagicMock(type="spend_limits", rules_json={"max_daily_spend": 10.5}),
+        ]
+        snap = policy_cache.compile_snapshot(policies, 1000.0, version=3)
+        assert snap.allowed_models == frozenset({"gpt-4o"})
+        assert snap.max_daily_spend == 10.5
+        assert snap.monthly_call_limit == 1000.0
+        assert snap.version == 3
+
+    def test_no_policies_is_unrestricted(self):
+        snap = policy_cache.compile_snapshot([], float("inf"), version=0)
+        assert snap.allowed_models is None
+        assert snap.max_daily_spend is None
+
+
+class TestEnforcePoliciesWarmPath:
+
+    @pytest.mark.asyncio
+    async def test_warm_path_runs_no_sql(self, fake_redis, test_session, test_org):
+        await _add_policy(test_session, test_org.id, "model_access", {"allowed_models": ["gpt-4o"]})
+        await _add_policy(test_session, test_org.id, "spend_limits", {"max_daily_spend": 100.0})
+        await fake_redis.set(policy_cache.calls_key(test_org.id), 10)
+
+        db = _CountingSession(test_session)
+        await enforce_policies(db, _key(test_org.id), "gpt-4o")  # cold: loads snapshot + seeds spend
+        assert db.executes > 0
+
+        db.executes = 0
+        await enforce_policies(db, _key(test_org.id), "gpt-4o")
+        assert db.executes == 0
+
+    @pytest.mark.asyncio
+    async def test_snapshot_blocks_unapproved_model(self, fake_redis, test_session, test_org):
+        await _add_policy(test_session, test_org.id, "model_access", {"allowed_models": ["gpt-4o"]}, name="Approved")
+        with pytest.raises(PolicyViolation, match="not approved by organization policy 'Approved'"):
+            await enforce_policies(test_session, _key(test_org.id), "some-other-model")
+
+    @pytest.mark.asyncio
+    async def test_spend_counter_enforces_cap(self, fake_redis, test_session, test_org):
+        await _add_policy(test_session, test_org.id, "spend_limits", {"max_daily_spend": 5.0})
+        await fake_redis.set(spend_ledger.spend_key(test_org.id), 7.25)
+        await fake_redis.set(policy_cache.calls_key(test_org.id), 1)
+        with pytest.raises(PolicyViolation, match="spend cap"):
+            await enforce_policies(test_session, _key(test_org.id), "gpt-4o")
+
+    @pytest.mark.asyncio
+    async def test_monthly_quota_from_counter(self, fake_redis, test_session, test_org):
+        await fake_redis.set(policy_cache.calls_key(test_org.id), 10_000_000)
+        with pytest.raises(PolicyViolation, match="Monthly gateway call limit"):
+            await enforce_policies(test_session, _key(test_org.id), "gpt-4o")
+
+
+class TestVersionInvalidation:
+
+    @pytest.mark.asyncio
+    async def test_version_bump_reloads_snapshot(self, fake_redis, test_session, test_org):
+        await fake_redis.set(policy_cache.calls_key(test_org.id), 1)
+        await enforce_policies(test_session, _key(test_org.id), "anything")
+
+        # Another worker writes a policy and bumps the version
+        await _add_policy(test_session, test_org.id, "model_access", {"allowed_models": ["gpt-4o"]})
+
+        # Until the version moves the cached, unrestricted snapshot is served
+        await enforce_policies(test_session, _key(test_org.id), "anything")
+
+        await fake_redis.incr(f"policy_version:{test_org.id}")
+        with pytest.raises(PolicyViolation):
+            await enforce_policies(test_session, _key(test_org.id), "anything")
+
+    @pytest.mark.asyncio
+    async def test_policy_route_bumps_version(self, fake_redis, client: AsyncClient, auth_headers, test_org):
+        resp = await client.post("/api/policies/", headers=auth_headers, json={
+            "name": "Cap",
+            "type": "spend_limits",
+            "rules_json": {"max_daily_spend": 1.0},
+        })
+        assert resp.status_code == 201
+        assert await fake_redis.get(f"policy_version:{test_org.id}") == "1"
+
+        policy_id = resp.json()["id"]
+        resp = await client.patch(f"/api/policies/{policy_id}", headers=auth_headers, json={"enabled": False})
+        assert resp.status_code == 200
+        assert await fake_redis.get(f"policy_version:{test_org.id}") == "2"
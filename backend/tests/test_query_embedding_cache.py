@@ -0,0 +1,150 @@
+"""Tests for the query-embedding cache and pgvector binary encoding."""
+
+import asyncio
+import struct
+import uuid
+from unittest.mock import AsyncMock, patch
+
+import fakeredis
+import pytest
+
+from app.core.pgvector import encode_vector_param, pack_vector, unpack_vector
+from app.services import query_embedding_cache as qec
+from app.services.query_embedding_cache import QueryEmbeddingCache, embed_query
+
+
+@pytest.fixture
+def fake_redis():
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("app.core.redis.redis_client", r):
+        yield r
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    qec.query_embedding_cache.clear()
+    yield
+    qec.query_embedding_cache.clear()
+
+
+class _Embedder:
+    def __init__(self, dims=4, result="vector"):
+        self.calls = []
+        self.dims = dims
+        self.result = result
+
+    async def __call__(self, text):
+        self.calls.append(text)
+        await asyncio.sleep(0)
+        if self.result != "vector":
+            return self.result
+        return [float(len(text) + i) / 8 for i in range(self.dims)]
+
+
+class TestPgvectorEncoding:
+
+    def test_round_trip_column_width(self):
+        values = [i / 1024 for i in range(1536)]
+        data = pack_vector(values)
+        assert len(data) == 4 + 1536 * 4
+        assert struct.unpack_from(">HH", data) == (1536, 0)
+        assert unpack_vector(data) == pytest.approx(values)
+
+    def test_round_trip_other_dims(self):
+        values = [0.5, -1.25, 3.0]
+        assert unpack_vector(pack_vector(values)) == values
+
+    def test_encoder_accepts_bytes_literals_and_lists(self):
+        packed = pack_vector([1.0, 2.0])
+        assert encode_vector_param(packed) == packed
+        assert encode_vector_param("[1,2]") == packed
+        assert encode_vector_param("[1.0, 2.0]") == packed
+        assert encode_vector_param((1.0, 2.0)) == packed
+
+
+class TestQueryEmbeddingCache:
+
+    @pytest.mark.asyncio
+    async def test_repeat_query_skips_provider(self, fake_redis):
+        cache, embed, org = QueryEmbeddingCache(), _Embedder(), uuid.uuid4()
+        first = await cache.get_or_embed(org, "What is  the refund policy?", embed, model="m", dimensions=4)
+        again = await cache.get_or_embed(org, " What is the refund policy? ", embed, model="m", dimensions=4)
+        assert again == first
+        assert embed.calls == ["What is the refund policy?"]
+        assert cache.stats()["local_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_key_includes_org_model_and_dims(self, fake_redis):
+        cache, embed, org = QueryEmbeddingCache(), _Embedder(), uuid.uuid4()
+        await cache.get_or_embed(org, "q", embed, model="a", dimensions=4)
+        await cache.get_or_embed(org, "q", embed, model="b", dimensions=4)
+        await cache.get_or_embed(org, "q", embed, model="a", dimensions=8)
+        await cache.get_or_embed(uuid.uuid4(), "q", embed, model="a", dimensions=4)
+        await cache.get_or_embed(org, "Q", embed, model="a", dimensions=4)
+        assert len(embed.calls) == 5
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_is_shared_across_workers(self, fake_redis):
+        embed, org = _Embedder(), uuid.uuid4()
+        vector = await QueryEmbeddingCache().get_or_embed(org, "shared", embed, model="m")
+        key = qec.cache_key(org, "m", None, "shared")
+        assert 0 < await fake_redis.ttl(key) <= qec.REDIS_TTL_SECONDS
+
+        other_worker = QueryEmbeddingCache()
+        assert await other_worker.get_or_embed(org, "shared", embed, model="m") == pytest.approx(vector)
+        assert len(embed.calls) == 1
+        assert other_worker.stats()["redis_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_lru_and_ttl_limits(self):
+        with patch("app.core.redis.redis_client", None):
+            cache, embed, org = QueryEmbeddingCache(max_entries=2, ttl_seconds=60), _Embedder(), uuid.uuid4()
+            for q in ("a", "b", "a", "c"):  # "b" is least recently used when "c" arrives
+                await cache.get_or_embed(org, q, embed)
+            await cache.get_or_embed(org, "a", embed)
+            await cache.get_or_embed(org, "b", embed)
+            assert embed.calls == ["a", "b", "c", "b"]
+
+            now = qec.time.monotonic()
+            with patch.object(qec.time, "monotonic", return_value=now + 61):
+                await cache.get_or_embed(org, "b", embed)
+            assert embed.calls[-1] == "b" and len(embed.calls) == 5
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_call(self, fake_redis):
+        cache, embed, org = QueryEmbeddingCache(), _Embedder(), uuid.uuid4()
+        results = await asyncio.gather(*[cache.get_or_embed(org, "burst", embed) for _ in range(10)])
+        assert len(embed.calls) == 1
+        assert all(r == results[0] for r in results)
+
+    @pytest.mark.asyncio
+    async def test_failures_and_long_queries_are_not_cached(self, fake_redis):
+        cache, org = QueryEmbeddingCache(), uuid.uuid4()
+        empty = _Embedder(result=None)
+        assert await cache.get_or_embed(org, "q", empty) is None
+        assert await cache.get_or_embed(org, "q", empty) is None
+        assert len(empty.calls) == 2
+
+        failing = AsyncMock(side_effect=RuntimeError("provider down"))
+        with pytest.raises(RuntimeError):
+            await cache.get_or_embed(org, "boom", failing)
+
+        embed = _Embedder()
+        long_query = "x" * (qec.MAX_QUERY_CHARS + 1)
+        await cache.get_or_embed(org, long_query, embed)
+        await cache.get_or_embed(org, long_query, embed)
+        assert len(embed.calls) == 2
+        assert cache.stats()["uncacheable"] == 2
+
+    @pytest.mark.asyncio
+    async def test_embed_query_uses_org_embedding_route(self, fake_redis):
+        org = uuid.uuid4()
+        with patch(
+            "app.services.kb_ingestion.EmbeddingGenerator.generate_embeddings",
+            new_callable=AsyncMock,
+            return_value=[[0.1, 0.2, 0.3]],
+        ) as generate:
+            for _ in range(3):
+                vector = await embed_query(org, "how do I rotate keys", model="text-embedding-3-small", dimensions=3)
+        assert vector == [0.1, 0.2, 0.3]
+        generate.assert_awaited_once_with(["how do I rotate keys"], model="text-embedding-3-small", dimensions=3)
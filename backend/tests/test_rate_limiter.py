@@ -0,0 +1,151 @@
+"""Tests for the shared sliding-window rate limiter."""
+
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+
+from app.services import rate_limiter
+from app.services.agent_engine import AgentEngine, AgentRateLimitError
+from app.services.gateway import check_rate_limit
+
+
+@pytest.fixture
+def fake_redis():
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("app.core.redis.redis_client", r):
+        yield r
+
+
+@pytest.fixture(autouse=True)
+def _clean_leases():
+    rate_limiter.drop_leases()
+    yield
+    rate_limiter.drop_leases()
+
+
+class _Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _count_evals(redis):
+    calls = {"n": 0}
+    real_eval = redis.eval
+
+    async def _eval(*args, **kwargs):
+        calls["n"] += 1
+        return await real_eval(*args, **kwargs)
+
+    redis.eval = _eval
+    return calls
+
+
+class TestSlidingWindow:
+
+    @pytest.mark.asyncio
+    async def test_no_double_quota_at_window_boundary(self, fake_redis):
+        clock = _Clock(600 * 60 + 59.0)  # one second before a minute boundary
+        with patch.object(rate_limiter, "_now", clock):
+            allowed = [(await rate_limiter.hit(fake_redis, "rl:test", 10)).allowed for _ in range(12)]
+            assert allowed.count(True) == 10
+
+            clock.now += 2  # one second into the next minute
+            burst = [(await rate_limiter.hit(fake_redis, "rl:test", 10)).allowed for _ in range(10)]
+            # ~98% of the previous minute still overlaps the window
+            assert burst.count(True) == 1
+
+            clock.now += 45  # 46s in: floor(10 * 14/60) = 2 still count, plus 1 from this minute
+            later = [(await rate_limiter.hit(fake_redis, "rl:test", 10)).allowed for _ in range(10)]
+            assert later.count(True) == 7
+
+    @pytest.mark.asyncio
+    async def test_limit_override_key(self, fake_redis):
+        await fake_redis.set("rl:override", "3")
+        results = [
+            await rate_limiter.hit(fake_redis, "rl:ovr", 100, limit_key="rl:override") for _ in range(4)
+        ]
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert results[0].limit == 3
+        assert results[2].remaining == 0
+
+    @pytest.mark.asyncio
+    async def test_peek_does_not_count(self, fake_redis):
+        await rate_limiter.hit(fake_redis, "rl:peek", 5)
+        for _ in range(3):
+            usage = await rate_limiter.peek(fake_redis, "rl:peek", 5)
+        assert usage.used == 1
+        assert usage.remaining == 4
+
+
+class TestLeasing:
+
+    @pytest.mark.asyncio
+    async def test_hot_key_leases_quota_locally(self, fake_redis):
+        calls = _count_evals(fake_redis)
+        clock = _Clock(1000 * 60 + 10.0)
+        with patch.object(rate_limiter, "_now", clock):
+            allowed = [
+                (await rate_limiter.hit(fake_redis, "rl:hot", 1000, lease=True)).allowed for _ in range(200)
+            ]
+        assert all(allowed)
+        # 20 cold checks, then 50-token leases
+        assert calls["n"] < 30
+        assert int(await fake_redis.get(rate_limiter.bucket_key("rl:hot", 1000))) <= 200 + 50
+
+    @pytest.mark.asyncio
+    async def test_leases_never_exceed_the_limit(self, fake_redis):
+        clock = _Clock(2000 * 60 + 10.0)
+        with patch.object(rate_limiter, "_now", clock):
+            allowed = [
+                (await rate_limiter.hit(fake_redis, "rl:cap", 100, lease=True)).allowed for _ in range(300)
+            ]
+        assert allowed.count(True) == 100
+        assert int(await fake_redis.get(rate_limiter.bucket_key("rl:cap", 2000))) == 100
+
+
+class TestCallers:
+
+    @pytest.mark.asyncio
+    async def test_gateway_key_limit(self, fake_redis):
+        key_id = uuid.uuid4()
+        results = [await check_rate_limit(key_id, 3) for _ in range(5)]
+        assert results == [True, True, True, False, False]
+
+    @pytest.mark.asyncio
+    async def test_gateway_fails_open_without_redis(self):
+        with patch("app.core.redis.redis_client", None):
+            assert await check_rate_limit(uuid.uuid4(), 0) is True
+
+    @pytest.mark.asyncio
+    async def test_agent_check_is_one_round_trip(self, fake_redis):
+        agent = SimpleNamespace(
+            id=uuid.uuid4(), name="bot", org_id=uuid.uuid4(),
+            rate_limit_rpm=5, autoscale_enabled=False, autoscale_config=None,
+        )
+        calls = _count_evals(fake_redis)
+        engine = AgentEngine()
+        remaining = [(await engine._check_rate_limit(agent, fake_redis))[0] for _ in range(5)]
+        assert remaining == [4, 3, 2, 1, 0]
+        assert calls["n"] == 5
+        with pytest.raises(AgentRateLimitError):
+            await engine._check_rate_limit(agent, fake_redis)
+
+    @pytest.mark.asyncio
+    async def test_agent_autoscale_raises_limit(self, fake_redis):
+        agent = SimpleNamespace(
+            id=uuid.uuid4(), name="bot", org_id=uuid.uuid4(),
+            rate_limit_rpm=10, autoscale_enabled=True, autoscale_config={"max_replicas": 2},
+        )
+        engine = AgentEngine()
+        with patch("app.services.agent_autoscaler._log_scaling_event"):
+            results = [await engine._check_rate_limit(agent, fake_redis) for _ in range(15)]
+        _, effective_rpm, scaling_active = results[-1]
+        assert effective_rpm == 20
+        assert scaling_active is True
+        assert await fake_redis.get(f"agent_hpa:rpm:{agent.id}") == "20"
@@ -0,0 +1,161 @@
+"""Tests for the batched GatewayRequest log writer."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.cloud_provider import CloudProvider
+from app.models.gateway import GatewayRequest
+from app.services import request_log_writer as writer_module
+from app.services.managed_inference import calculate_marked_up_cost
+from app.services.request_log_writer import RequestLogWriter
+
+
+@pytest.fixture
+def session_factory(test_engine):
+    return async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+def db_session_patch(session_factory):
+    @asynccontextmanager
+    async def _get_db_session():
+        async with session_factory() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    with patch.object(writer_module, "get_db_session", _get_db_session):
+        yield
+
+
+@pytest.fixture
+def insert_counter(test_engine):
+    counts = {"inserts": 0}
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO GATEWAY_REQUESTS"):
+            counts["inserts"] += 1
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", _before)
+    yield counts
+    event.remove(test_engine.sync_engine, "before_cursor_execute", _before)
+
+
+def _entry(org_id, **kwargs):
+    fields = dict(org_id=org_id, model_requested="gpt-4o", status="success", cost=0.01)
+    fields.update(kwargs)
+    return GatewayRequest(**fields)
+
+
+async def _rows(session_factory, org_id):
+    async with session_factory() as session:
+        result = await session.execute(select(GatewayRequest).where(GatewayRequest.org_id == org_id))
+        return result.scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_rows_are_batched_and_drained_on_stop(
+    db_session_patch, session_factory, insert_counter, test_org
+):
+    writer = RequestLogWriter()
+    await writer.start()
+    await asyncio.gather(*[writer.submit(_entry(test_org.id, input_tokens=i)) for i in range(50)])
+    await writer.stop()
+
+    rows = await _rows(session_factory, test_org.id)
+    assert len(rows) == 50
+    assert sorted(r.input_tokens for r in rows) == list(range(50))
+    assert all(r.created_at is not None and r.is_managed is False for r in rows)
+    assert insert_counter["inserts"] == 1  # one multi-row INSERT
+
+    stats = writer.stats()
+    assert stats["written"] == 50
+    assert stats["queue_depth"] == 0
+    assert stats["batches"] == 1
+    assert stats["last_flush_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_submit_does_not_touch_the_db(db_session_patch, insert_counter, test_org):
+    writer = RequestLogWriter()
+    await writer.start()
+    try:
+        await writer.submit(_entry(test_org.id))
+        assert insert_counter["inserts"] == 0
+        assert writer.stats()["enqueued"] == 1
+    finally:
+        await writer.stop()
+    assert insert_counter["inserts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_managed_pricing_applied_per_batch(db_session_patch, session_factory, test_org):
+    async with session_factory() as session:
+        provider = CloudProvider(
+            org_id=test_org.id,
+            provider_type="openai",
+            status="active",
+            is_managed=True,
+            managed_usage_tokens=10,
+            managed_usage_cost=Decimal("1.0"),
+        )
+        session.add(provider)
+        await session.commit()
+        provider_id = provider.id
+
+    writer = RequestLogWriter()
+    await writer.start()
+    await writer.submit(_entry(test_org.id, provider="openai", cost=0.05, input_tokens=100, output_tokens=50))
+    await writer.submit(_entry(test_org.id, provider="openai", cost=0.10, input_tokens=200, output_tokens=0))
+    await writer.submit(_entry(test_org.id, provider="aws", cost=0.20, input_tokens=1))  # not managed
+    await writer.submit(_entry(test_org.id, provider="openai", cost=0.0, status="error"))
+    await writer.stop()
+
+    rows = {(r.provider, r.status, r.cost): r for r in await _rows(session_factory, test_org.id)}
+    managed = rows[("openai", "success", 0.05)]
+    assert managed.is_managed is True
+    assert managed.marked_up_cost == pytest.approx(calculate_marked_up_cost(0.05), abs=1e-4)
+    assert rows[("aws", "success", 0.20)].is_managed is False
+    assert rows[("openai", "error", 0.0)].is_managed is False
+
+    async with session_factory() as session:
+        provider = await session.get(CloudProvider, provider_id)
+        assert provider.managed_usage_tokens == 10 + 150 + 200
+        expected = 1.0 + calculate_marked_up_cost(0.05) + calculate_marked_up_cost(0.10)
+        assert float(provider.managed_usage_cost) == pytest.approx(expected, abs=1e-3)
+
+
+@pytest.mark.asyncio
+async def test_full_queue_falls_back_to_inline_write(db_session_patch, session_factory, test_org):
+    writer = RequestLogWriter()
+    # Running but with no consumer, so the queue stays full
+    writer._queue = asyncio.Queue(maxsize=1)
+    writer._running = True
+    with patch.object(writer_module, "BACKPRESSURE_WAIT_SECONDS", 0.01):
+        await writer.submit(_entry(test_org.id))
+        await writer.submit(_entry(test_org.id))
+
+    stats = writer.stats()
+    assert stats["queue_depth"] == 1
+    assert stats["backpressure_waits"] == 1
+    assert stats["inline_writes"] == 1
+    assert len(await _rows(session_factory, test_org.id)) == 1
+
+
+@pytest.mark.asyncio
+async def test_not_started_writes_inline(db_session_patch, session_factory, test_org):
+    writer = RequestLogWriter()
+    await writer.submit(_entry(test_org.id, status="error", error_message="boom", cost=None))
+    rows = await _rows(session_factory, test_org.id)
+    assert len(rows) == 1
+    assert rows[0].cost == 0.0  # column default applied
+    assert writer.stats()["inline_writes"] == 1
@@ -0,0 +1,191 @@
+"""Tests for the shared cross-worker gateway router cache."""
+
+import asyncio
+import time
+import uuid
+from unittest.mock import AsyncMock, patch
+
+import fakeredis
+import pytest
+
+from app.services import gateway, router_cache
+
+
+MODEL_LIST = [
+    {
+        "model_name": "gpt-4o-mini",
+        "litellm_params": {"model": "openai/gpt-4o-mini", "api_key": "sk-super-secret"},
+    },
+]
+
+
+@pytest.fixture
+def fake_redis():
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("app.core.redis.redis_client", r):
+        yield r
+
+
+@pytest.fixture(autouse=True)
+def _clean_router_state():
+    gateway._routers.clear()
+    gateway._refresh_tasks.clear()
+    gateway._refresh_not_before.clear()
+    yield
+    gateway._routers.clear()
+    gateway._refresh_tasks.clear()
+    gateway._refresh_not_before.clear()
+
+
+def _rebuild_mock(model_list=MODEL_LIST, delay: float = 0.0):
+    async def _rebuild(db, org_id):
+        if delay:
+            await asyncio.sleep(delay)
+        return [dict(m, litellm_params=dict(m["litellm_params"])) for m in model_list]
+    return AsyncMock(side_effect=_rebuild)
+
+
+class TestSharedTier:
+
+    @pytest.mark.asyncio
+    async def test_cold_miss_builds_inline_and_shares(self, fake_redis):
+        org_id = uuid.uuid4()
+        rebuild = _rebuild_mock()
+        with patch.object(gateway, "_rebuild_model_list", rebuild):
+            router = await gateway.get_router(AsyncMock(), org_id)
+
+        assert rebuild.await_count == 1
+        assert [m["model_name"] for m in router.model_list] == ["gpt-4o-mini"]
+
+        raw = await fake_redis.get(router_cache._config_key(org_id))
+        assert raw
+        assert "sk-super-secret" not in raw  # credentials are encrypted at rest
+        shared = await router_cache.load_model_list(org_id)
+        assert shared[0] == MODEL_LIST
+
+    @pytest.mark.asyncio
+    async def test_second_worker_reuses_shared_entry(self, fake_redis):
+        org_id = uuid.uuid4()
+        rebuild = _rebuild_mock()
+        with patch.object(gateway, "_rebuild_model_list", rebuild):
+            await gateway.get_router(AsyncMock(), org_id)
+            # Simulate a different worker: empty in-process cache
+            gateway._routers.clear()
+            router = await gateway.get_router(AsyncMock(), org_id)
+
+        assert rebuild.await_count == 1  # no second Vault/DB build
+        assert router.model_list[0]["model_name"] == "gpt-4o-mini"
+
+    @pytest.mark.asyncio
+    async def test_no_redis_falls_back_to_local_cache(self):
+        org_id = uuid.uuid4()
+        rebuild = _rebuild_mock()
+        with patch("app.core.redis.redis_client", None), \
+                patch.object(gateway, "_rebuild_model_list", rebuild):
+            first = await gateway.get_router(AsyncMock(), org_id)
+            second = await gateway.get_router(AsyncMock(), org_id)
+        assert first is second
+        assert rebuild.await_count == 1
+
+
+class TestRefreshAhead:
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_served_while_refreshing(self, fake_redis):
+        org_id = uuid.uuid4()
+        old_router = gateway._make_router(MODEL_LIST)
+        stale_built_at = time.time() - (router_cache.ROUTER_CONFIG_TTL - 60)
+        gateway._routers[org_id] = (old_router, stale_built_at)
+
+        rebuild = _rebuild_mock(delay=0.05)
+        with patch.object(gateway, "_rebuild_model_list", rebuild):
+            served = await gateway.get_router(AsyncMock(), org_id)
+            assert served is old_router  # never blocks on the rebuild
+            await asyncio.gather(*gateway._refresh_tasks.values())
+
+        assert rebuild.await_count == 1
+        new_router, built_at = gateway._routers[org_id]
+        assert new_router is not old_router
+        assert built_at > stale_built_at
+        assert await router_cache.load_model_list(org_id) is not None
+
+    @pytest.mark.asyncio
+    async def test_refresh_is_single_flight(self, fake_redis):
+        org_id = uuid.uuid4()
+        gateway._routers[org_id] = (
+            gateway._make_router(MODEL_LIST),
+            time.time() - (router_cache.ROUTER_CONFIG_TTL - 60),
+        )
+        rebuild = _rebuild_mock(delay=0.05)
+        with patch.object(gateway, "_rebuild_model_list", rebuild):
+            await asyncio.gather(*[gateway.get_router(AsyncMock(), org_id) for _ in range(20)])
+            await asyncio.gather(*gateway._refresh_tasks.values())
+        assert rebuild.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_lock_held_elsewhere_skips_rebuild(self, fake_redis):
+        org_id = uuid.uuid4()
+        gateway._routers[org_id] = (
+            gateway._make_router(MODEL_LIST),
+            time.time() - (router_cache.ROUTER_CONFIG_TTL - 60),
+        )
+        await fake_redis.set(router_cache._lock_key(org_id), "other-worker", ex=60)
+        rebuild = _rebuild_mock()
+        with patch.object(gateway, "_rebuild_model_list", rebuild):
+            await gateway.get_router(AsyncMock(), org_id)
+            await asyncio.gather(*gateway._refresh_tasks.values())
+        assert rebuild.await_count == 0
+
+
+class TestInvalidation:
+
+    @pytest.mark.asyncio
+    async def test_reset_router_drops_shared_entry_and_publishes(self, fake_redis):
+        org_id = uuid.uuid4()
+        with patch.object(gateway, "_rebuild_model_list", _rebuild_mock()):
+            await gateway.get_router(AsyncMock(), org_id)
+
+        pubsub = fake_redis.pubsub()
+        await pubsub.subscribe(router_cache.INVALIDATION_CHANNEL)
+        await pubsub.get_message(timeout=1.0)  # subscribe confirmation
+
+        await gateway.reset_router(org_id)
+
+        assert org_id not in gateway._routers
+        assert await fake_redis.get(router_cache._config_key(org_id)) is None
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+        assert message["data"] == str(org_id)
+        await pubsub.aclose()
+
+    @pytest.mark.asyncio
+    async def test_listener_drops_local_router(self, fake_redis):
+        org_id = uuid.uuid4()
+        gateway._routers[org_id] = (gateway._make_router(MODEL_LIST), time.time())
+
+        await gateway.start_router_cache()
+        try:
+            await asyncio.sleep(0.05)  # let the listener subscribe
+            await fake_redis.publish(router_cache.INVALIDATION_CHANNEL, str(org_id))
+            for _ in range(50):
+                if org_id not in gateway._routers:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await gateway.stop_router_cache()
+
+        assert org_id not in gateway._routers
+
+    @pytest.mark.asyncio
+    async def test_rebuild_racing_reset_is_discarded(self, fake_redis):
+        org_id = uuid.uuid4()
+
+        async def _slow_rebuild(db, oid):
+            # reset_router lands while the rebuild is in flight
+            await gateway.reset_router(oid)
+            return list(MODEL_LIST)
+
+        with patch.object(gateway, "_rebuild_model_list", AsyncMock(side_effect=_slow_rebuild)):
+            await gateway.get_router(AsyncMock(), org_id)
+
+        assert org_id not in gateway._routers
+        assert await fake_redis.get(router_cache._config_key(org_id)) is None
@@ -0,0 +1,152 @@
+"""Tests for the Redis daily spend ledger behind the gateway spend cap."""
+
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import fakeredis
+import pytest
+
+from app.models.gateway import GatewayRequest
+from app.services import policy_cache, spend_ledger
+from app.services.gateway import PolicyViolation, check_spend_cap
+from app.services.policy_cache import OrgCounters
+
+
+@pytest.fixture
+def fake_redis():
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("app.core.redis.redis_client", r):
+        yield r
+
+
+@pytest.fixture(autouse=True)
+def _clean_local_alerts():
+    spend_ledger._local_alerts.clear()
+    yield
+    spend_ledger._local_alerts.clear()
+
+
+@pytest.fixture
+def notify():
+    with patch(
+        "app.services.notifications.notification_service.notify_org_admins",
+        new_callable=AsyncMock,
+    ) as mock:
+        yield mock
+
+
+class _CountingSession:
+    """Wrap an AsyncSession and count execute() round-trips."""
+
+    def __init__(self, session):
+        self._session = session
+        self.executes = 0
+
+    async def execute(self, *args, **kwargs):
+        self.executes += 1
+        return await self._session.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+async def _log_requests(session, org_id, *costs, status="success"):
+    now = datetime.now(timezone.utc)
+    for cost in costs:
+        session.add(GatewayRequest(
+            org_id=org_id, model_requested="gpt-4o", cost=cost, status=status, created_at=now,
+        ))
+    await session.commit()
+
+
+def _snapshot(cap):
+    return policy_cache.compile_snapshot(
+        [type("P", (), {"type": "spend_limits", "name": "cap", "rules_json": {"max_daily_spend": cap}})()],
+        float("inf"),
+        version=0,
+    )
+
+
+class TestLedger:
+
+    @pytest.mark.asyncio
+    async def test_seed_then_increment(self, fake_redis, test_session, test_org):
+        await _log_requests(test_session, test_org.id, 1.0, 2.5)
+        await _log_requests(test_session, test_org.id, 9.0, status="error")
+
+        # Not seeded yet: the increment is left to the seed query
+        await spend_ledger.record_spend(test_org.id, 0.5)
+        assert await fake_redis.get(spend_ledger.spend_key(test_org.id)) is None
+
+        assert await spend_ledger.get_today_spend(test_session, test_org.id) == pytest.approx(3.5)
+
+        await spend_ledger.record_spend(test_org.id, 0.25)
+        await spend_ledger.record_spend(test_org.id, 0.0)
+        assert float(await fake_redis.get(spend_ledger.spend_key(test_org.id))) == pytest.approx(3.75)
+
+    @pytest.mark.asyncio
+    async def test_seeded_read_runs_no_sql(self, fake_redis, test_session, test_org):
+        await spend_ledger.get_today_spend(test_session, test_org.id)
+        db = _CountingSession(test_session)
+        for _ in range(5):
+            await spend_ledger.record_spend(test_org.id, 1.0)
+            await spend_ledger.get_today_spend(db, test_org.id)
+        assert db.executes == 0
+        assert await spend_ledger.get_today_spend(db, test_org.id) == pytest.approx(5.0)
+
+
+class TestReconcile:
+
+    @pytest.mark.asyncio
+    async def test_corrects_drift(self, fake_redis, test_session, test_org):
+        await _log_requests(test_session, test_org.id, 1.0, 2.0)
+        await fake_redis.set(spend_ledger.spend_key(test_org.id), "5.5")
+
+        assert await spend_ledger.reconcile(test_session) == 1
+        assert float(await fake_redis.get(spend_ledger.spend_key(test_org.id))) == pytest.approx(3.0)
+        assert await fake_redis.ttl(spend_ledger.spend_key(test_org.id)) > 0
+
+    @pytest.mark.asyncio
+    async def test_skips_counter_that_moved_during_sum(self, fake_redis, test_session, test_org):
+        await _log_requests(test_session, test_org.id, 1.0)
+        await fake_redis.set(spend_ledger.spend_key(test_org.id), "4.0")
+
+        real_sum = spend_ledger._sum_today
+
+        async def _sum_with_concurrent_increment(db, org_ids):
+            await spend_ledger.record_spend(test_org.id, 0.5)
+            return await real_sum(db, org_ids)
+
+        with patch.object(spend_ledger, "_sum_today", _sum_with_concurrent_increment):
+            assert await spend_ledger.reconcile(test_session) == 0
+        assert float(await fake_redis.get(spend_ledger.spend_key(test_org.id))) == pytest.approx(4.5)
+
+
+class TestThresholdAlerts:
+
+    @pytest.mark.asyncio
+    async def test_each_threshold_notifies_once(self, fake_redis, test_org, notify):
+        snapshot = _snapshot(10.0)
+        for spend in (8.0, 8.5, 9.9):
+            await check_spend_cap(AsyncMock(), test_org.id, snapshot, OrgCounters(today_spend=spend))
+        assert notify.await_count == 1
+        assert "Spend alert" in notify.await_args.kwargs["title"]
+
+        for spend in (10.0, 12.0, 15.0):
+            with pytest.raises(PolicyViolation, match="spend cap"):
+                await check_spend_cap(AsyncMock(), test_org.id, snapshot, OrgCounters(today_spend=spend))
+        assert notify.await_count == 2
+        assert "exceeded" in notify.await_args.kwargs["title"]
+
+    @pytest.mark.asyncio
+    async def test_raising_the_cap_rearms_alerts(self, fake_redis, test_org, notify):
+        await check_spend_cap(AsyncMock(), test_org.id, _snapshot(10.0), OrgCounters(today_spend=9.0))
+        await check_spend_cap(AsyncMock(), test_org.id, _snapshot(20.0), OrgCounters(today_spend=17.0))
+        assert notify.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_without_redis_dedups_per_worker(self, test_org, notify):
+        with patch("app.core.redis.redis_client", None):
+            for _ in range(3):
+                await check_spend_cap(AsyncMock(), test_org.id, _snapshot(10.0), OrgCounters(today_spend=9.0))
+        assert notify.await_count == 1
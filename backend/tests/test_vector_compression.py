@@ -0,0 +1,204 @@
+"""Tests for the batched CompressionCodebook encode/decode/search engine."""
+
+import struct
+
+import numpy as np
+import pytest
+
+from app.services.vector_compression import (
+    CompressionCodebook,
+    _pack_codes,
+    _unpack_codes,
+    top_k_scores,
+)
+
+
+def _codebook(dims, bits, use_qjl=True):
+    cb = CompressionCodebook(dimensions=dims, bits=bits, rotation_seed=1234, use_qjl=use_qjl)
+    cb._init_matrices()
+    return cb
+
+
+def _vectors(n, dims, seed=0):
+    vecs = np.random.RandomState(seed).randn(n, dims).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _reference_scores(cb, query, compressed):
+    """Per-vector scoring in float64, mirroring the original loop."""
+    levels = (1 << cb.bits) - 1
+    rq = cb._rotation_matrix.astype(np.float64) @ np.asarray(query, dtype=np.float64)
+    rq /= np.linalg.norm(rq)
+    radii, codes = cb.unpack(compressed)
+    scores = []
+    for radius, row in zip(radii, codes):
+        if abs(radius) < 1e-10:
+            scores.append(0.0)
+            continue
+        direction = row.astype(np.float64) / levels * 2.0 - 1.0
+        if cb.bits not in (4, 8):
+            direction /= np.linalg.norm(direction)
+        scores.append(float(rq @ direction))
+    return np.array(scores)
+
+
+class TestBitPacking:
+
+    def test_4bit_high_nibble_first(self):
+        codes = np.array([[1, 2, 3]], dtype=np.uint8)
+        assert _pack_codes(codes, 4).tobytes() == bytes([0x12, 0x30])
+
+    def test_2bit_msb_first(self):
+        codes = np.array([[3, 0, 1, 2, 1]], dtype=np.uint8)
+        assert _pack_codes(codes, 2).tobytes() == bytes([0b11000110, 0b01000000])
+
+    def test_3bit_eight_values_per_three_bytes(self):
+        codes = np.array([[7, 0, 1, 2, 3, 4, 5, 6, 7]], dtype=np.uint8)
+        packed = _pack_codes(codes, 3).tobytes()
+        assert len(packed) == 6
+        word = int.from_bytes(packed[:3], "big")
+        assert [(word >> (21 - 3 * j)) & 7 for j in range(8)] == [7, 0, 1, 2, 3, 4, 5, 6]
+        assert int.from_bytes(packed[3:], "big") == 7 << 21
+
+    @pytest.mark.parametrize("bits", [2, 3, 4, 8])
+    @pytest.mark.parametrize("dims", [8, 13, 1536])
+    def test_round_trip(self, bits, dims):
+        codes = np.random.RandomState(bits).randint(0, 1 << bits, size=(5, dims)).astype(np.uint8)
+        assert np.array_equal(_unpack_codes(_pack_codes(codes, bits), bits, dims), codes)
+
+
+class TestCompress:
+
+    @pytest.mark.parametrize("bits", [2, 3, 4, 8])
+    def test_record_layout(self, bits):
+        cb = _codebook(64, bits)
+        vecs = _vectors(3, 64)
+        compressed = cb.compress(vecs.tolist())
+        assert len({len(c) for c in compressed}) == 1
+        assert len(compressed[0]) == 4 + cb._quant_bytes() + cb._qjl_bytes()
+
+        rotated = vecs[0] @ cb._rotation_matrix.T
+        assert struct.unpack("f", compressed[0][:4])[0] == pytest.approx(np.linalg.norm(rotated), rel=1e-5)
+
+    @pytest.mark.parametrize("bits", [2, 3, 4, 8])
+    def test_codes_match_scalar_quantizer(self, bits):
+        cb = _codebook(96, bits)
+        vecs = _vectors(20, 96)
+        _, codes = cb.unpack(cb.compress(vecs))
+
+        levels = (1 << bits) - 1
+        for vec, row in zip(vecs, codes):
+            rotated = cb._rotation_matrix @ vec
+            direction = rotated / np.linalg.norm(rotated)
+            expected = np.clip(np.round((direction + 1.0) * 0.5 * levels), 0, levels)
+            # Batched matmul may differ from a matvec in the last ulp
+            assert np.abs(row.astype(int) - expected.astype(int)).max() <= 1
+            assert np.mean(row == expected) > 0.99
+
+    def test_zero_vector_keeps_legacy_blob(self):
+        cb = _codebook(32, 4)
+        compressed = cb.compress([[0.0] * 32, _vectors(1, 32)[0].tolist()])
+        assert compressed[0] == struct.pack("f", 0.0) + b"\x00" * (32 * 4 // 8 + 1)
+        assert cb.decompress(compressed)[0] == [0.0] * 32
+
+    def test_empty(self):
+        cb = _codebook(16, 4)
+        assert cb.compress([]) == []
+        assert cb.decompress([]) == []
+        assert cb.similarity([1.0] * 16, []) == []
+
+    def test_batches_larger_than_block(self, monkeypatch):
+        monkeypatch.setattr("app.services.vector_compression._BATCH_ROWS", 7)
+        cb = _codebook(32, 4)
+        vecs = _vectors(30, 32)
+        compressed = cb.compress(vecs)
+        assert len(compressed) == 30
+        radii, codes = cb.unpack(compressed)
+        for vec, radius, row in zip(vecs, radii, codes):
+            single_radius, single_codes = cb.unpack(cb.compress(vec[None, :]))
+            assert radius == pytest.approx(single_radius[0], rel=1e-5)
+            assert np.abs(row.astype(int) - single_codes[0].astype(int)).max() <= 1
+
+
+class TestDecompress:
+
+    @pytest.mark.parametrize("bits", [2, 3, 4, 8])
+    def test_reconstruction_close(self, bits):
+        cb = _codebook(128, bits, use_qjl=False)
+        vecs = _vectors(10, 128)
+        recon = np.array(cb.decompress(cb.compress(vecs)))
+        cos = np.sum(recon * vecs, axis=1) / np.linalg.norm(recon, axis=1)
+        assert cos.min() > {2: 0.7, 3: 0.7, 4: 0.85, 8: 0.99}[bits]
+
+    def test_3bit_partial_group(self):
+        cb = _codebook(10, 3, use_qjl=False)
+        compressed = cb.compress(_vectors(2, 10))
+        radii, codes = cb.unpack(compressed)
+        recon = np.array(cb.decompress(compressed))
+        direction = cb._dequantize_table()[codes]
+        expected = radii[:, None] * (direction @ cb._rotation_matrix)
+        assert np.allclose(recon, expected, atol=1e-6)
+
+
+class TestSimilarity:
+
+    @pytest.mark.parametrize("bits", [2, 3, 4, 8])
+    def test_scores_match_reference(self, bits):
+        cb = _codebook(256, bits)
+        vecs = _vectors(200, 256)
+        compressed = cb.compress(vecs)
+        compressed[5] = cb.compress([[0.0] * 256])[0]
+        query = vecs[3]
+
+        expected = _reference_scores(cb, query, compressed)
+        results = cb.similarity(query, compressed, top_k=len(compressed))
+        got = np.zeros(len(compressed))
+        for idx, score in results:
+            got[idx] = score
+        assert np.allclose(got, expected, atol=1e-5)
+        assert got[5] == 0.0
+
+        top = cb.similarity(query, compressed, top_k=10)
+        assert [i for i, _ in top] == list(np.argsort(-expected, kind="stable")[:10])
+        assert top[0][0] == 3
+
+    def test_zero_query(self):
+        cb = _codebook(16, 4)
+        compressed = cb.compress(_vectors(5, 16))
+        assert cb.similarity([0.0] * 16, compressed, top_k=3) == [(0, 0.0), (1, 0.0), (2, 0.0)]
+
+
+class TestTopK:
+
+    def test_descending_with_index_tiebreak(self):
+        scores = np.array([0.1, 0.5, 0.5, -1.0, 0.9], dtype=np.float32)
+        assert [i for i, _ in top_k_scores(scores, 3)] == [4, 1, 2]
+
+    def test_ties_at_the_cutoff_keep_the_lowest_indices(self):
+        scores = np.zeros(1000, dtype=np.float32)
+        scores[[700, 900]] = 1.0
+        assert [i for i, _ in top_k_scores(scores, 5)] == [700, 900, 0, 1, 2]
+
+    def test_k_larger_than_n(self):
+        scores = np.array([0.2, 0.3], dtype=np.float32)
+        assert [i for i, _ in top_k_scores(scores, 10)] == [1, 0]
+
+    def test_non_positive_k(self):
+        assert top_k_scores(np.array([1.0]), 0) == []
+
+
+class TestScorePacked:
+
+    @pytest.mark.parametrize("bits", [2, 3, 4, 8])
+    @pytest.mark.parametrize("dims", [64, 30])
+    def test_matches_score_codes(self, bits, dims):
+        cb = _codebook(dims, bits)
+        vecs = _vectors(40, dims)
+        vecs[9] = 0.0
+        radii, packed, _ = cb.encode(vecs)
+        _, codes = cb.unpack(cb.compress(vecs))
+
+        expected = cb.score_codes(vecs[1], radii, codes)
+        got = cb.score_packed(vecs[1], radii, packed)
+        assert np.allclose(got, expected, atol=1e-5)
+        assert got[9] == 0.0